@@ -427,6 +427,10 @@ def main():
 
     app = changedetection_app(app_config, datastore)
 
+    # Everything loaded so far lives for the whole process, take it out of the GC's way
+    from changedetectionio.gc_cleanup import get_gc_policy
+    get_gc_policy().apply_startup()
+
     # Step 2: Queue newly added watches (if -u was provided in batch mode)
     # This must happen AFTER app initialization so update_q is available
     if batch_mode and added_watch_uuids:
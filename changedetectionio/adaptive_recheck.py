@@ -0,0 +1,62 @@
+"""
+Adaptive recheck interval, for watches with 'adaptive_recheck' enabled
+
+A watch is normally checked every time_between_check (or the system default) whether the page ever
+changes or not. With adaptive_recheck the interval is learned from the checks instead:
+
+  - every check that finds no change multiplies the interval by ADAPTIVE_RECHECK_BACKOFF
+  - a change resets it to the configured interval, or to half the typical gap between the recent
+    changes (the median of the last few history timestamps) when the page changes more often than that
+  - it always stays between the watch's adaptive_recheck_min_seconds and adaptive_recheck_max_seconds,
+    which default to the configured interval and ADAPTIVE_RECHECK_MAX_MULTIPLIER times it
+  - checks that fail leave it alone, an error says nothing about how often the page changes
+
+So a page that hasn't changed in months ends up on the longest interval after a handful of checks,
+and a change brings it straight back. The learned value is kept in 'adaptive_recheck_seconds',
+Watch.effective_threshold_seconds() is what the scheduler uses.
+
+Environment variables:
+  ADAPTIVE_RECHECK_BACKOFF         — interval multiplier per unchanged check (default 1.5)
+  ADAPTIVE_RECHECK_MAX_MULTIPLIER  — default longest interval, as a multiple of the configured one (default 16)
+"""
+
+import os
+from statistics import median
+
+# How many of the newest history entries the typical change gap is taken from
+CHANGE_SAMPLE_SIZE = 10
+
+
+def backoff_factor():
+    return max(1.0, float(os.getenv('ADAPTIVE_RECHECK_BACKOFF', 1.5)))
+
+
+def max_multiplier():
+    return max(1.0, float(os.getenv('ADAPTIVE_RECHECK_MAX_MULTIPLIER', 16)))
+
+
+def bounds(base_seconds, min_seconds=None, max_seconds=None):
+    """(shortest, longest) interval, min_seconds/max_seconds are the watch's own, None for the defaults"""
+    shortest = int(min_seconds or base_seconds)
+    longest = int(max_seconds or base_seconds * max_multiplier())
+    return shortest, max(shortest, longest)
+
+
+def typical_change_gap(history_timestamps):
+    """Median seconds between the newest history entries, None with fewer than two"""
+    timestamps = sorted(int(t) for t in history_timestamps)[-CHANGE_SAMPLE_SIZE:]
+    gaps = [b - a for a, b in zip(timestamps, timestamps[1:]) if b > a]
+    return median(gaps) if gaps else None
+
+
+def next_interval(current_seconds, base_seconds, changed, history_timestamps=(), min_seconds=None, max_seconds=None):
+    """The interval to use after a successful check, current_seconds None when nothing was learned yet"""
+    shortest, longest = bounds(base_seconds, min_seconds, max_seconds)
+    if changed:
+        interval = base_seconds
+        gap = typical_change_gap(history_timestamps)
+        if gap:
+            interval = min(interval, gap / 2)
+    else:
+        interval = (current_seconds or base_seconds) * backoff_factor()
+    return int(min(max(interval, shortest), longest))
@@ -177,6 +177,8 @@ class Import(Resource):
                 return f"Invalid notification_urls: {str(e)}", 400
 
         urls = request.get_data().decode('utf8').splitlines()
+        # Built once, url_exists() would rescan every watch for every line
+        known_urls = self.datastore.build_url_index() if dedupe else set()
         # Clean and validate URLs upfront
         urls_to_import = []
         for url in urls:
@@ -189,7 +191,7 @@ class Import(Resource):
                 return f"Invalid or unsupported URL - {url}", 400
 
             # Check for duplicates if dedupe is enabled
-            if dedupe and self.datastore.url_exists(url):
+            if dedupe and url.lower() in known_urls:
                 continue
 
             urls_to_import.append(url)
@@ -202,28 +204,35 @@ class Import(Resource):
                 added.append(new_uuid)
             return added, 200
 
-        # For large imports (>= 20), process in background thread
-        else:
-            import threading
-            from loguru import logger
-
-            def import_watches_background():
-                """Background thread to import watches - discarded after completion."""
-                try:
-                    added_count = 0
-                    for url in urls_to_import:
-                        try:
-                            self.datastore.add_watch(url=url, extras=extras, tag=tags, tag_uuids=tag_uuids)
-                            added_count += 1
-                        except Exception as e:
-                            logger.error(f"Error importing URL {url}: {e}")
-
-                    logger.info(f"Background import complete: {added_count} watches created")
-                except Exception as e:
-                    logger.error(f"Error in background import: {e}")
-
-            # Start background thread and return immediately
-            thread = threading.Thread(target=import_watches_background, daemon=True, name="ImportWatches-Background")
-            thread.start()
-
-            return {'status': f'Importing {len(urls_to_import)} URLs in background', 'count': len(urls_to_import)}, 202
\ No newline at end of file
+        # For large imports (>= 20), hand over to a bulk import job, progress is at /api/v1/import/<job_id>
+        from changedetectionio.bulk_import import BulkImportJob
+        from changedetectionio.job_registry import JobRegistryFull
+        try:
+            job = BulkImportJob(datastore=self.datastore,
+                                lines=urls_to_import,
+                                extras=extras,
+                                tag=tags,
+                                tag_uuids=tag_uuids,
+                                # Already deduped against the datastore above
+                                dedupe=False,
+                                total=len(urls_to_import)).start()
+        except JobRegistryFull as e:
+            abort(503, message=f'Too many imports running - {str(e)}')
+
+        return {'status': f'Importing {len(urls_to_import)} URLs in background', 'count': len(urls_to_import), 'job_id': job.job_id}, 202
+
+
+class ImportJob(Resource):
+    def __init__(self, **kwargs):
+        # datastore is a black box dependency
+        self.datastore = kwargs['datastore']
+
+    @auth.check_token
+    @validate_openapi_request('getImportJob')
+    def get(self, job_id):
+        """Progress of a background import."""
+        from changedetectionio.bulk_import import get_job
+        job = get_job(job_id)
+        if not job:
+            abort(404, message=f'No import job found with id {job_id}')
+        return job.to_dict(), 200
@@ -0,0 +1,37 @@
+from flask import make_response
+from flask_restful import Resource
+from . import auth
+from .SystemInfo import get_cache_stats
+
+
+class Metrics(Resource):
+    def __init__(self, **kwargs):
+        # datastore is a black box dependency
+        self.datastore = kwargs['datastore']
+        self.update_q = kwargs['update_q']
+
+    @auth.check_token
+    def get(self):
+        """Return check timing histograms, queue depth and wait per priority class, worker utilisation, storage I/O, GC and cache hit rates in OpenMetrics format."""
+        import time
+        from changedetectionio import worker_pool
+        from changedetectionio.check_metrics import OPENMETRICS_CONTENT_TYPE, get_metrics
+        from changedetectionio.storage_io import get_storage_io
+        from changedetectionio.gc_cleanup import get_gc_policy
+
+        workers = worker_pool.get_worker_count()
+        busy = len(worker_pool.get_running_uuids())
+        gauges = {
+            'queue_depth': ('Watches waiting in the check queue.', self.update_q.qsize()),
+            'workers': ('Check workers running.', workers),
+            'workers_busy': ('Check workers currently running a check.', busy),
+            'worker_utilisation': ('Fraction of check workers currently busy.', round(busy / workers, 4) if workers else 0.0),
+            'watches': ('Watches in the datastore.', len(self.datastore.data.get('watching', {}))),
+            'uptime_seconds': ('Seconds since the datastore was loaded.', round(time.time() - self.datastore.start_time, 2)),
+        }
+        return make_response(
+            get_metrics().render_openmetrics(gauges=gauges, caches=get_cache_stats(datastore=self.datastore),
+                                             extra_lines=self.update_q.openmetrics_lines() + get_storage_io().openmetrics_lines() + get_gc_policy().openmetrics_lines()),
+            200,
+            {'Content-Type': OPENMETRICS_CONTENT_TYPE}
+        )
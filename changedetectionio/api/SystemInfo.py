@@ -2,6 +2,22 @@ from flask_restful import Resource
 from . import auth, validate_openapi_request
 
 
+def get_cache_stats(datastore=None):
+    from changedetectionio.dns_cache import get_dns_cache
+    from changedetectionio.content_fetchers.coalescing import get_fetch_coalescer
+    from changedetectionio.llm.response_cache import get_response_cache
+    from changedetectionio.jinja2_custom import template_cache
+    caches = {
+        'dns': get_dns_cache().stats(),
+        'fetches': get_fetch_coalescer().stats(),
+        'llm_responses': get_response_cache().stats(),
+        'jinja2_templates': template_cache.stats(),
+    }
+    if datastore is not None:
+        caches['tag_membership'] = datastore.tag_index.stats()
+    return caches
+
+
 class SystemInfo(Resource):
     def __init__(self, **kwargs):
         # datastore is a black box dependency
@@ -20,7 +36,7 @@ class SystemInfo(Resource):
         for uuid, watch in self.datastore.data.get('watching', {}).items():
             # see if now - last_checked is greater than the time that should have been
             # this is not super accurate (maybe they just edited it) but better than nothing
-            t = watch.threshold_seconds()
+            t = watch.effective_threshold_seconds(self.datastore.threshold_seconds)
             if not t:
                 # Use the system wide default
                 t = self.datastore.threshold_seconds
@@ -30,9 +46,26 @@ class SystemInfo(Resource):
             # Allow 5 minutes of grace time before we decide it's overdue
             if time_since_check - (5 * 60) > t:
                 overdue_watches.append(uuid)
-        from changedetectionio import __version__ as main_version
+        from changedetectionio import __version__ as main_version, worker_pool
+        from changedetectionio.check_metrics import get_metrics
+        from changedetectionio.storage_io import get_storage_io
+        from changedetectionio.gc_cleanup import get_gc_policy
+        from changedetectionio.sharding import get_shard
+        shard = get_shard()
         return {
+                   'caches': get_cache_stats(datastore=self.datastore),
+                   'check_timings': get_metrics().summary(),
+                   'gc': get_gc_policy().stats(),
+                   'migration': self.datastore.migration_status,
+                   'proxies': self.datastore.proxy_registry.stats(),
+                   'queue': self.update_q.stats(),
                    'queue_size': self.update_q.qsize(),
+                   'shard': shard.stats() if shard else None,
+                   'storage_io': get_storage_io().stats(),
+                   'workers': {
+                       'count': worker_pool.get_worker_count(),
+                       'busy': len(worker_pool.get_running_uuids()),
+                   },
                    'overdue_watches': overdue_watches,
                    'uptime': round(time.time() - self.datastore.start_time, 2),
                    'watch_count': len(self.datastore.data.get('watching', {})),
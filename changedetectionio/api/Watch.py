@@ -105,6 +105,7 @@ class Watch(Resource):
         watch['last_changed'] = watch_obj.last_changed
         watch['viewed'] = watch_obj.viewed
         watch['link'] = watch_obj.link
+        watch['effective_recheck_seconds'] = watch_obj.effective_threshold_seconds(self.datastore.threshold_seconds)
 
         # Resolved processor config: tag override wins over watch-level config (mirrors restock processor logic)
         import json
@@ -459,6 +460,37 @@ class WatchFavicon(Resource):
         abort(404, message=f'No Favicon available for {uuid}')
 
 
+class WatchPriceHistory(Resource):
+    def __init__(self, **kwargs):
+        # datastore is a black box dependency
+        self.datastore = kwargs['datastore']
+
+    @auth.check_token
+    @validate_openapi_request('getWatchPriceHistory')
+    def get(self, uuid):
+        """Get the price/stock timeline of a restock_diff watch."""
+        watch = self.datastore.data['watching'].get(uuid)
+        if not watch:
+            abort(404, message=f"No watch exists with the UUID of {uuid}")
+
+        if not hasattr(watch, 'get_price_series'):
+            abort(400, message=f"Watch {uuid} does not use the restock_diff processor")
+
+        from changedetectionio.processors.restock_diff.difference import compute_price_summary
+        from changedetectionio.processors.restock_diff.price_series import downsample
+
+        series = watch.get_price_series().between(from_timestamp=request.args.get('from', type=int),
+                                                  to_timestamp=request.args.get('to', type=int))
+        indexes = downsample(series, request.args.get('max_points', type=int))
+
+        return {
+            'currency': (watch.get('restock') or {}).get('currency') or '',
+            'total': len(series),
+            'summary': compute_price_summary(series),
+            'series': series.to_records(indexes),
+        }, 200
+
+
 class CreateWatch(Resource):
     def __init__(self, **kwargs):
         # datastore is a black box dependency
@@ -550,6 +582,7 @@ class CreateWatch(Resource):
                 continue
 
             list[uuid] = {
+                'effective_recheck_seconds': watch.effective_threshold_seconds(self.datastore.threshold_seconds),
                 'last_changed': watch.last_changed,
                 'last_checked': watch['last_checked'],
                 'last_error': watch['last_error'],
@@ -224,10 +224,11 @@ def validate_openapi_request(operation_id):
     return decorator
 
 # Import all API resources
-from .Watch import Watch, WatchHistory, WatchSingleHistory, WatchHistoryDiff, CreateWatch, WatchFavicon
+from .Watch import Watch, WatchHistory, WatchSingleHistory, WatchHistoryDiff, CreateWatch, WatchFavicon, WatchPriceHistory
 from .Tags import Tags, Tag
-from .Import import Import
+from .Import import Import, ImportJob
 from .SystemInfo import SystemInfo
+from .Metrics import Metrics
 from .Spec import Spec
 from .Notifications import Notifications
 
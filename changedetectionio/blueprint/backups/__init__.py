@@ -2,7 +2,7 @@ import datetime
 import glob
 import threading
 
-from flask import Blueprint, render_template, send_from_directory, flash, url_for, redirect, abort
+from flask import Blueprint, render_template, send_from_directory, flash, url_for, redirect, abort, request, Response
 from flask_babel import gettext
 import os
 
@@ -11,84 +11,197 @@ from changedetectionio.flask_app import login_optionally_required
 from loguru import logger
 
 BACKUP_FILENAME_FORMAT = "changedetection-backup-{}.zip"
+INCREMENTAL_BACKUP_FILENAME_FORMAT = "changedetection-backup-{}-incremental.zip"
+BACKUP_FILENAME_REGEX = r"^changedetection-backup-\d+(-incremental)?\.zip$"
 
+# Written into every archive, and kept beside the archives as the base for the next incremental backup
+BACKUP_MANIFEST_FILENAME = "backup-manifest.json"
 
-def create_backup(datastore_path, watches: dict, tags: dict = None):
-    logger.debug("Creating backup...")
+# Snapshots (.br), screenshots and other already-compressed members are stored as-is,
+# deflating them again costs a lot of CPU for little or no size gain
+ALREADY_COMPRESSED_EXTENSIONS = ('.br', '.gz', '.zst', '.png', '.jpg', '.jpeg', '.webp', '.deflate', '.zip')
+
+
+def _compress_type(path):
     import zipfile
+    return zipfile.ZIP_STORED if str(path).lower().endswith(ALREADY_COMPRESSED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+
+
+def _iter_backup_files(datastore_path, watches: dict, tags: dict = None):
+    """Yield (full path, archive name) for every file a backup holds"""
     from pathlib import Path
 
+    # Settings file (supports both formats)
+    # New format: changedetection.json, legacy format: url-watches.json (for backward compatibility)
+    for settings_file in ("changedetection.json", "url-watches.json"):
+        if os.path.isfile(os.path.join(datastore_path, settings_file)):
+            yield os.path.join(datastore_path, settings_file), settings_file
+
+    # The SQLite datastore backend keeps the settings, watches, tags and history indexes in changedetection.db,
+    # archived as a consistent copy made with the SQLite backup API
+    from changedetectionio.store.backend import get_backend
+    from changedetectionio.store.sqlite_backend import SQLITE_FILENAME
+    db_copy = os.path.join(datastore_path, f".backup-{threading.get_ident()}-{SQLITE_FILENAME}")
+    try:
+        if get_backend(datastore_path).snapshot_to(db_copy):
+            yield db_copy, SQLITE_FILENAME
+    finally:
+        if os.path.exists(db_copy):
+            os.unlink(db_copy)
+
+    # Tag data directories (each tag has its own {uuid}/tag.json), then any data in the watch data directories.
+    # Use the full path to access the file, but make the file 'relative' in the Zip.
+    for entity in list((tags or {}).values()) + list(watches.values()):
+        for f in Path(entity.data_dir).glob('*'):
+            if f.is_file():
+                yield str(f), os.path.join(f.parts[-2], f.parts[-1])
+
+
+def _url_lists(watches: dict):
+    """A list file with just the URLs, so it's easier to port somewhere else in the future"""
+    url_list = "".join("{}\r\n".format(w["url"]) for w in watches.values())
+    url_list_with_tags = "".join("{} {}\r\n".format(w.get('url'), w.get('tags', {})) for w in watches.values())
+    return {"url-list.txt": url_list, "url-list-with-tags.txt": url_list_with_tags}
+
+
+def _file_sha256(path, previous=None):
+    """sha256 of a file, reusing the previous manifest's hash when size and mtime are unchanged"""
+    import hashlib
+    st = os.stat(path)
+    if previous and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+        return previous
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': h.hexdigest()}
+
+
+def load_backup_manifest(datastore_path):
+    """The manifest of the most recent backup, or None when there is no usable base for an incremental backup"""
+    import json
+    try:
+        with open(os.path.join(datastore_path, BACKUP_MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError) as e:
+        logger.debug(f"No previous backup manifest ({str(e)})")
+        return None
+
+    # An incremental backup is only restorable with every archive back to the last full one
+    chain = manifest.get('chain', [])
+    if not chain or not all(os.path.isfile(os.path.join(datastore_path, name)) for name in chain):
+        logger.warning("Previous backup chain is incomplete (archives removed?), next backup will be a full backup")
+        return None
+    return manifest
+
+
+def create_backup(datastore_path, watches: dict, tags: dict = None, incremental=False):
+    """
+    Write a backup archive into the datastore directory.
+
+    With incremental=True, only the files whose content changed since the previous backup are
+    added (compared by sha256 against the previous manifest), the settings and URL lists are
+    always included. Every archive carries a manifest listing the complete file set so a chain
+    of full + incremental archives can be restored (see restore.import_from_zip_chain()).
+    """
+    logger.debug(f"Creating {'incremental ' if incremental else ''}backup...")
+    import json
+    import zipfile
+
+    previous = load_backup_manifest(datastore_path) if incremental else None
+    if incremental and not previous:
+        incremental = False
+
     # create a ZipFile object
     timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    backupname = BACKUP_FILENAME_FORMAT.format(timestamp)
+    backupname = (INCREMENTAL_BACKUP_FILENAME_FORMAT if incremental else BACKUP_FILENAME_FORMAT).format(timestamp)
     backup_filepath = os.path.join(datastore_path, backupname)
+    tmp_filepath = backup_filepath[:-len('.zip')] + '.tmp'
 
-    with zipfile.ZipFile(backup_filepath.replace('.zip', '.tmp'), "w",
+    previous_files = previous.get('files', {}) if previous else {}
+    files = {}
+    added = 0
+
+    with zipfile.ZipFile(tmp_filepath, "w",
                          compression=zipfile.ZIP_DEFLATED,
                          compresslevel=8) as zipObj:
 
-        # Add the settings file (supports both formats)
-        # New format: changedetection.json
-        changedetection_json = os.path.join(datastore_path, "changedetection.json")
-        if os.path.isfile(changedetection_json):
-            zipObj.write(changedetection_json, arcname="changedetection.json")
-            logger.debug("Added changedetection.json to backup")
-
-        # Legacy format: url-watches.json (for backward compatibility)
-        url_watches_json = os.path.join(datastore_path, "url-watches.json")
-        if os.path.isfile(url_watches_json):
-            zipObj.write(url_watches_json, arcname="url-watches.json")
-            logger.debug("Added url-watches.json to backup")
-
-        # Add tag data directories (each tag has its own {uuid}/tag.json)
-        for uuid, tag in (tags or {}).items():
-            for f in Path(tag.data_dir).glob('*'):
-                zipObj.write(f,
-                             arcname=os.path.join(f.parts[-2], f.parts[-1]),
-                             compress_type=zipfile.ZIP_DEFLATED,
-                             compresslevel=8)
-            logger.debug(f"Added tag '{tag.get('title')}' ({uuid}) to backup")
-
-        # Add any data in the watch data directory.
-        for uuid, w in watches.items():
-            for f in Path(w.data_dir).glob('*'):
-                zipObj.write(f,
-                             # Use the full path to access the file, but make the file 'relative' in the Zip.
-                             arcname=os.path.join(f.parts[-2], f.parts[-1]),
-                             compress_type=zipfile.ZIP_DEFLATED,
-                             compresslevel=8)
-
-        # Create a list file with just the URLs, so it's easier to port somewhere else in the future
-        list_file = "url-list.txt"
-        with open(os.path.join(datastore_path, list_file), "w") as f:
-            for uuid in watches:
-                url = watches[uuid]["url"]
-                f.write("{}\r\n".format(url))
-        list_with_tags_file = "url-list-with-tags.txt"
-        with open(
-                os.path.join(datastore_path, list_with_tags_file), "w"
-        ) as f:
-            for uuid in watches:
-                url = watches[uuid].get('url')
-                tag = watches[uuid].get('tags', {})
-                f.write("{} {}\r\n".format(url, tag))
-
-        # Add it to the Zip
-        zipObj.write(
-            os.path.join(datastore_path, list_file),
-            arcname=list_file,
-            compress_type=zipfile.ZIP_DEFLATED,
-            compresslevel=8,
-        )
-        zipObj.write(
-            os.path.join(datastore_path, list_with_tags_file),
-            arcname=list_with_tags_file,
-            compress_type=zipfile.ZIP_DEFLATED,
-            compresslevel=8,
-        )
+        for path, arcname in _iter_backup_files(datastore_path, watches, tags):
+            try:
+                files[arcname] = _file_sha256(path, previous_files.get(arcname))
+            except FileNotFoundError:
+                # Removed while we were walking the datastore
+                continue
+
+            is_settings = '/' not in arcname.replace(os.sep, '/')
+            if incremental and not is_settings and previous_files.get(arcname, {}).get('sha256') == files[arcname]['sha256']:
+                continue
+
+            zipObj.write(path, arcname=arcname, compress_type=_compress_type(path))
+            added += 1
+
+        for arcname, content in _url_lists(watches).items():
+            zipObj.writestr(arcname, content, compress_type=zipfile.ZIP_DEFLATED)
+
+        manifest = {
+            'type': 'incremental' if incremental else 'full',
+            'filename': backupname,
+            'created': int(datetime.datetime.now().timestamp()),
+            'parent': previous['filename'] if incremental else None,
+            'chain': (previous['chain'] if incremental else []) + [backupname],
+            'files': files,
+        }
+        zipObj.writestr(BACKUP_MANIFEST_FILENAME, json.dumps(manifest), compress_type=zipfile.ZIP_DEFLATED)
 
     # Now it's done, rename it so it shows up finally and its completed being written.
-    os.rename(backup_filepath.replace('.zip', '.tmp'), backup_filepath.replace('.tmp', '.zip'))
+    os.rename(tmp_filepath, backup_filepath)
+
+    # Only becomes the base for the next incremental backup once the archive is complete
+    manifest_path = os.path.join(datastore_path, BACKUP_MANIFEST_FILENAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    logger.info(f"Backup {backupname} complete, {added} of {len(files)} files added")
+    return backupname
+
+
+class _ZipStreamBuffer:
+    """Write-only, non-seekable file object, lets zipfile write an archive that is handed out in chunks"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_backup(datastore_path, watches: dict, tags: dict = None):
+    """Generate a full backup archive chunk by chunk, nothing is written to disk"""
+    import zipfile
+
+    buffer = _ZipStreamBuffer()
+    # zipfile falls back to data descriptors when the target can't seek
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=8) as zipObj:
+        for path, arcname in _iter_backup_files(datastore_path, watches, tags):
+            try:
+                zipObj.write(path, arcname=arcname, compress_type=_compress_type(path))
+            except FileNotFoundError:
+                continue
+            yield buffer.drain()
+
+        for arcname, content in _url_lists(watches).items():
+            zipObj.writestr(arcname, content, compress_type=zipfile.ZIP_DEFLATED)
+    yield buffer.drain()
 
 
 def construct_blueprint(datastore: ChangeDetectionStore):
@@ -113,7 +226,8 @@ def construct_blueprint(datastore: ChangeDetectionStore):
         zip_thread = threading.Thread(
             target=create_backup,
             args=(datastore.datastore_path, datastore.data.get("watching")),
-            kwargs={'tags': datastore.data['settings']['application'].get('tags', {})},
+            kwargs={'tags': datastore.data['settings']['application'].get('tags', {}),
+                    'incremental': request.args.get('incremental') == '1'},
             daemon=True,
             name="BackupCreator"
         )
@@ -134,7 +248,8 @@ def construct_blueprint(datastore: ChangeDetectionStore):
             backup_info.append({
                 'filename': os.path.basename(backup),
                 'filesize': f"{size:.2f}",
-                'creation_time': creation_time
+                'creation_time': creation_time,
+                'incremental': backup.endswith('-incremental.zip'),
             })
 
         backup_info.sort(key=lambda x: x['creation_time'], reverse=True)
@@ -146,7 +261,6 @@ def construct_blueprint(datastore: ChangeDetectionStore):
     def download_backup(filename):
         import re
         filename = filename.strip()
-        backup_filename_regex = BACKUP_FILENAME_FORMAT.format(r"\d+")
 
         # Resolve 'latest' before any validation so checks run against the real filename.
         if filename == 'latest':
@@ -155,7 +269,7 @@ def construct_blueprint(datastore: ChangeDetectionStore):
                 abort(404)
             filename = backups[0]['filename']
 
-        if not re.match(r"^" + backup_filename_regex + "$", filename):
+        if not re.match(BACKUP_FILENAME_REGEX, filename):
             abort(400)  # Bad Request if the filename doesn't match the pattern
 
         full_path = os.path.join(os.path.abspath(datastore.datastore_path), filename)
@@ -165,6 +279,18 @@ def construct_blueprint(datastore: ChangeDetectionStore):
         logger.debug(f"Backup download request for '{full_path}'")
         return send_from_directory(os.path.abspath(datastore.datastore_path), filename, as_attachment=True)
 
+    @backups_blueprint.route("/download-stream", methods=['GET'])
+    @login_optionally_required
+    def download_backup_stream():
+        """A full backup built while it downloads, for datastores too big to keep a copy of on disk"""
+        filename = BACKUP_FILENAME_FORMAT.format(datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
+        logger.debug(f"Streaming backup download '{filename}'")
+        return Response(stream_backup(datastore.datastore_path,
+                                      datastore.data.get("watching"),
+                                      tags=datastore.data['settings']['application'].get('tags', {})),
+                        mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
     @backups_blueprint.route("/", methods=['GET'])
     @backups_blueprint.route("/create", methods=['GET'])
     @login_optionally_required
@@ -185,6 +311,11 @@ def construct_blueprint(datastore: ChangeDetectionStore):
         for backup in backups:
             os.unlink(backup)
 
+        # Nothing left to be incremental against
+        manifest_path = os.path.join(datastore.datastore_path, BACKUP_MANIFEST_FILENAME)
+        if os.path.isfile(manifest_path):
+            os.unlink(manifest_path)
+
         flash(gettext("Backups were deleted."))
 
         return redirect(url_for('backups.create'))
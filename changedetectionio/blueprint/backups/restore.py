@@ -10,7 +10,7 @@ import zipfile
 from flask import Blueprint, render_template, flash, url_for, redirect, request
 from flask_babel import gettext, lazy_gettext as _l
 from wtforms import Form, BooleanField, SubmitField
-from flask_wtf.file import FileField, FileAllowed
+from flask_wtf.file import MultipleFileField, FileAllowed
 from loguru import logger
 
 from changedetectionio.flask_app import login_optionally_required
@@ -24,10 +24,12 @@ _UUID_RE = re.compile(
     r'^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$',
     re.IGNORECASE,
 )
+# Written by the datastore backend when the entity and its history index are saved, never copied as-is
+_BACKEND_INDEX_FILES_RE = re.compile(r'^(watch\.json|tag\.json|history.*\.txt)$')
 
 
 class RestoreForm(Form):
-    zip_file = FileField(_l('Backup zip file'), validators=[
+    zip_file = MultipleFileField(_l('Backup zip file'), validators=[
         FileAllowed(['zip'], _l('Must be a .zip backup file!'))
     ])
     include_groups = BooleanField(_l('Include groups'), default=True)
@@ -37,16 +39,96 @@ class RestoreForm(Form):
     submit = SubmitField(_l('Restore backup'))
 
 
+def _read_manifest(zf):
+    """The manifest of a backup archive, None for archives made before incremental backups existed"""
+    from . import BACKUP_MANIFEST_FILENAME
+    try:
+        return json.loads(zf.read(BACKUP_MANIFEST_FILENAME))
+    except KeyError:
+        return None
+    except ValueError as e:
+        raise ValueError(f"Backup archive has an unreadable manifest: {e}")
+
+
+def _order_chain(archives):
+    """
+    Sort [(manifest, ZipFile), ...] oldest first and check they form one unbroken chain,
+    a full backup followed by each incremental backup taken after it.
+    """
+    if len(archives) == 1:
+        manifest = archives[0][0]
+        if manifest and manifest.get('type') == 'incremental':
+            raise ValueError(f"{manifest.get('filename')} is an incremental backup, "
+                             f"restore it together with the backups before it ({', '.join(manifest.get('chain', [])[:-1])})")
+        return archives
+
+    if any(manifest is None for manifest, _ in archives):
+        raise ValueError("Only backups that include a manifest can be restored together as a chain")
+
+    archives = sorted(archives, key=lambda a: len(a[0].get('chain', [])))
+    if archives[0][0].get('type') != 'full':
+        raise ValueError("A backup chain must start with a full backup")
+    for (previous, _), (manifest, _) in zip(archives, archives[1:]):
+        if manifest.get('parent') != previous.get('filename'):
+            raise ValueError(f"Backup chain is broken, {manifest.get('filename')} does not follow {previous.get('filename')}")
+    return archives
+
+
+def _prune_to_manifest(tmpdir, manifest):
+    """Remove files that were deleted from the datastore before the newest backup in the chain was taken"""
+    keep = set(manifest.get('files', {}))
+    for entry in os.scandir(tmpdir):
+        if not entry.is_dir():
+            continue
+        for f in os.scandir(entry.path):
+            if f.is_file() and f"{entry.name}/{f.name}" not in keep:
+                os.unlink(f.path)
+        if not os.listdir(entry.path):
+            shutil.rmtree(entry.path)
+
+
+def _open_archived_datastore(path):
+    """The extracted backup as a datastore backend, backups of an SQLite datastore hold a changedetection.db"""
+    from changedetectionio.store.backend import BACKEND_FILE, BACKEND_SQLITE, create_backend
+    from changedetectionio.store.sqlite_backend import SQLITE_FILENAME
+    name = BACKEND_SQLITE if os.path.isfile(os.path.join(path, SQLITE_FILENAME)) else BACKEND_FILE
+    logger.debug(f"Restore: reading the backup with the '{name}' datastore backend")
+    return create_backend(path, name=name)
+
+
+def _copy_data_dir(src_dir, dst_dir):
+    """Replace the data directory with the one from the backup, without the files the backend writes itself"""
+    if os.path.exists(dst_dir):
+        shutil.rmtree(dst_dir)
+    if os.path.isdir(src_dir):
+        shutil.copytree(src_dir, dst_dir, ignore=lambda d, names: [n for n in names if _BACKEND_INDEX_FILES_RE.match(n)])
+    else:
+        os.makedirs(dst_dir)
+
+
 def import_from_zip(zip_stream, datastore, include_groups, include_groups_replace, include_watches, include_watches_replace):
     """
     Extract and import watches and groups from a backup zip stream.
+    See import_from_zip_chain(), this is the single archive case.
+    """
+    return import_from_zip_chain([zip_stream], datastore, include_groups, include_groups_replace, include_watches, include_watches_replace)
+
 
-    Mirrors the store's _load_watches / _load_tags loading pattern:
-      - UUID dirs with tag.json  → Tag.model + tag_obj.commit()
-      - UUID dirs with watch.json → rehydrate_entity + watch_obj.commit()
+def import_from_zip_chain(zip_streams, datastore, include_groups, include_groups_replace, include_watches, include_watches_replace):
+    """
+    Extract and import watches and groups from one full backup, optionally followed by the
+    incremental backups taken after it. The archives are extracted oldest first over each other,
+    then anything the newest manifest no longer lists is dropped.
+
+    The backup is read with the datastore backend it was made with (a changedetection.db for the
+    SQLite backend, otherwise the tag.json/watch.json/history*.txt files) and written through the
+    backend this datastore uses, so either kind of backup restores into either kind of datastore:
+      - tags    → Tag.model + tag_obj.commit()
+      - watches → every history index written first, then rehydrate_entity + watch_obj.commit()
+      - the rest of each UUID directory (snapshots, screenshots..) is copied as-is
 
     Returns a dict with counts: restored_groups, skipped_groups, restored_watches, skipped_watches.
-    Raises zipfile.BadZipFile if the stream is not a valid zip.
+    Raises zipfile.BadZipFile if a stream is not a valid zip.
     """
     from changedetectionio.model import Tag
 
@@ -59,47 +141,50 @@ def import_from_zip(zip_stream, datastore, include_groups, include_groups_replac
     current_watches = datastore.data['watching']
 
     with tempfile.TemporaryDirectory() as tmpdir:
-        logger.debug(f"Restore: extracting zip to {tmpdir}")
-        with zipfile.ZipFile(zip_stream, 'r') as zf:
-            total_uncompressed = sum(m.file_size for m in zf.infolist())
-            if total_uncompressed > _MAX_DECOMPRESSED_BYTES:
-                raise ValueError(
-                    f"Backup archive decompressed size ({total_uncompressed // (1024 * 1024)} MB) "
-                    f"exceeds the {_MAX_DECOMPRESSED_BYTES // (1024 * 1024)} MB limit"
-                )
-            resolved_dest = os.path.realpath(tmpdir)
-            for member in zf.infolist():
-                member_dest = os.path.realpath(os.path.join(resolved_dest, member.filename))
-                if not member_dest.startswith(resolved_dest + os.sep) and member_dest != resolved_dest:
-                    raise ValueError(f"Zip Slip path traversal detected in backup archive: {member.filename!r}")
-                zf.extract(member, tmpdir)
+        logger.debug(f"Restore: extracting {len(zip_streams)} zip(s) to {tmpdir}")
+        archives = []
+        for zip_stream in zip_streams:
+            zf = zipfile.ZipFile(zip_stream, 'r')
+            archives.append((_read_manifest(zf), zf))
+        archives = _order_chain(archives)
+
+        total_uncompressed = sum(m.file_size for _, zf in archives for m in zf.infolist())
+        if total_uncompressed > _MAX_DECOMPRESSED_BYTES:
+            raise ValueError(
+                f"Backup archive decompressed size ({total_uncompressed // (1024 * 1024)} MB) "
+                f"exceeds the {_MAX_DECOMPRESSED_BYTES // (1024 * 1024)} MB limit"
+            )
+        resolved_dest = os.path.realpath(tmpdir)
+        for _, zf in archives:
+            with zf:
+                for member in zf.infolist():
+                    member_dest = os.path.realpath(os.path.join(resolved_dest, member.filename))
+                    if not member_dest.startswith(resolved_dest + os.sep) and member_dest != resolved_dest:
+                        raise ValueError(f"Zip Slip path traversal detected in backup archive: {member.filename!r}")
+                    zf.extract(member, tmpdir)
+
+        newest_manifest = archives[-1][0]
+        if newest_manifest:
+            _prune_to_manifest(tmpdir, newest_manifest)
         logger.debug("Restore: zip extracted, scanning UUID directories")
 
-        for entry in os.scandir(tmpdir):
-            if not entry.is_dir():
-                continue
-
-            uuid = entry.name
-            if not _UUID_RE.match(uuid):
-                logger.warning(f"Restore: skipping non-UUID directory {uuid!r}")
-                continue
-            tag_json_path = os.path.join(entry.path, 'tag.json')
-            watch_json_path = os.path.join(entry.path, 'watch.json')
+        source = _open_archived_datastore(tmpdir)
+        try:
+            def _raw(uuid, data):
+                return data
+            archived_tags = source.load_tags(_raw) if include_groups else {}
+            archived_watches = source.load_watches(_raw) if include_watches else {}
 
             # --- Tags (groups) ---
-            if include_groups and os.path.exists(tag_json_path):
+            for uuid, tag_data in archived_tags.items():
+                if not _UUID_RE.match(uuid):
+                    logger.warning(f"Restore: skipping non-UUID group {uuid!r}")
+                    continue
                 if uuid in current_tags and not include_groups_replace:
                     logger.debug(f"Restore: skipping existing group {uuid} (replace not requested)")
                     skipped_groups += 1
                     continue
 
-                try:
-                    with open(tag_json_path, 'r', encoding='utf-8') as f:
-                        tag_data = json.load(f)
-                except (json.JSONDecodeError, IOError) as e:
-                    logger.error(f"Restore: failed to read tag.json for {uuid}: {e}")
-                    continue
-
                 title = tag_data.get('title', uuid)
                 logger.debug(f"Restore: importing group '{title}' ({uuid})")
 
@@ -108,10 +193,7 @@ def import_from_zip(zip_stream, datastore, include_groups, include_groups_replac
                 tag_data['processor'] = 'restock_diff'
 
                 # Copy the UUID directory so data_dir exists for commit()
-                dst_dir = os.path.join(datastore.datastore_path, uuid)
-                if os.path.exists(dst_dir):
-                    shutil.rmtree(dst_dir)
-                shutil.copytree(entry.path, dst_dir)
+                _copy_data_dir(os.path.join(tmpdir, uuid), os.path.join(datastore.datastore_path, uuid))
 
                 tag_obj = Tag.model(
                     datastore_path=datastore.datastore_path,
@@ -124,35 +206,37 @@ def import_from_zip(zip_stream, datastore, include_groups, include_groups_replac
                 logger.success(f"Restore: group '{title}' ({uuid}) restored")
 
             # --- Watches ---
-            elif include_watches and os.path.exists(watch_json_path):
+            for uuid, watch_data in archived_watches.items():
+                if not _UUID_RE.match(uuid):
+                    logger.warning(f"Restore: skipping non-UUID watch {uuid!r}")
+                    continue
                 if uuid in current_watches and not include_watches_replace:
                     logger.debug(f"Restore: skipping existing watch {uuid} (replace not requested)")
                     skipped_watches += 1
                     continue
 
-                try:
-                    with open(watch_json_path, 'r', encoding='utf-8') as f:
-                        watch_data = json.load(f)
-                except (json.JSONDecodeError, IOError) as e:
-                    logger.error(f"Restore: failed to read watch.json for {uuid}: {e}")
-                    continue
-
                 url = watch_data.get('url', uuid)
                 logger.debug(f"Restore: importing watch '{url}' ({uuid})")
 
-                # Copy UUID directory first so data_dir and history files exist
-                dst_dir = os.path.join(datastore.datastore_path, uuid)
-                if os.path.exists(dst_dir):
-                    shutil.rmtree(dst_dir)
-                shutil.copytree(entry.path, dst_dir)
+                # Copy UUID directory first so data_dir and the snapshots exist
+                _copy_data_dir(os.path.join(tmpdir, uuid), os.path.join(datastore.datastore_path, uuid))
+
+                # The history index (history.txt, or rows in changedetection.db) through this datastore's backend,
+                # before the watch is rehydrated so it starts out knowing its history
+                datastore.backend.clear_history(uuid)
+                for index_name in source.history_index_names(uuid):
+                    datastore.backend.replace_history(uuid, index_name, source.load_history(uuid, index_name))
 
                 # Mirror _load_watches / rehydrate_entity
                 watch_data['uuid'] = uuid
                 watch_obj = datastore.rehydrate_entity(uuid, watch_data)
                 current_watches[uuid] = watch_obj
                 watch_obj.commit()
+
                 restored_watches += 1
                 logger.success(f"Restore: watch '{url}' ({uuid}) restored")
+        finally:
+            source.close()
 
         logger.debug(f"Restore: scan complete - groups {restored_groups} restored / {skipped_groups} skipped, "
                      f"watches {restored_watches} restored / {skipped_watches} skipped")
@@ -191,12 +275,12 @@ def construct_restore_blueprint(datastore):
             flash(gettext("A restore is already running, check back in a few minutes"), "error")
             return redirect(url_for('backups.restore.restore'))
 
-        zip_file = request.files.get('zip_file')
-        if not zip_file or not zip_file.filename:
+        zip_files = [f for f in request.files.getlist('zip_file') if f and f.filename]
+        if not zip_files:
             flash(gettext("No file uploaded"), "error")
             return redirect(url_for('backups.restore.restore'))
 
-        if not zip_file.filename.lower().endswith('.zip'):
+        if not all(f.filename.lower().endswith('.zip') for f in zip_files):
             flash(gettext("File must be a .zip backup file"), "error")
             return redirect(url_for('backups.restore.restore'))
 
@@ -208,15 +292,20 @@ def construct_restore_blueprint(datastore):
 
         # Read into memory now — the request stream is gone once we return.
         # Read one byte beyond the limit so we can detect truncated-but-still-oversized streams.
+        zip_streams = []
+        remaining = _MAX_UPLOAD_BYTES
         try:
-            raw = zip_file.read(_MAX_UPLOAD_BYTES + 1)
-            if len(raw) > _MAX_UPLOAD_BYTES:
-                flash(gettext("Backup file is too large (max %(mb)s MB)", mb=_MAX_UPLOAD_BYTES // (1024 * 1024)), "error")
-                return redirect(url_for('backups.restore.restore'))
-            zip_bytes = io.BytesIO(raw)
-            with zipfile.ZipFile(zip_bytes):  # quick validity check before spawning
-                pass
-            zip_bytes.seek(0)
+            for zip_file in zip_files:
+                raw = zip_file.read(remaining + 1)
+                if len(raw) > remaining:
+                    flash(gettext("Backup file is too large (max %(mb)s MB)", mb=_MAX_UPLOAD_BYTES // (1024 * 1024)), "error")
+                    return redirect(url_for('backups.restore.restore'))
+                remaining -= len(raw)
+                zip_bytes = io.BytesIO(raw)
+                with zipfile.ZipFile(zip_bytes):  # quick validity check before spawning
+                    pass
+                zip_bytes.seek(0)
+                zip_streams.append(zip_bytes)
         except zipfile.BadZipFile:
             flash(gettext("Invalid or corrupted zip file"), "error")
             return redirect(url_for('backups.restore.restore'))
@@ -227,9 +316,9 @@ def construct_restore_blueprint(datastore):
         include_watches_replace = request.form.get('include_watches_replace_existing') == 'y'
 
         restore_thread = threading.Thread(
-            target=import_from_zip,
+            target=import_from_zip_chain,
             kwargs={
-                'zip_stream': zip_bytes,
+                'zip_streams': zip_streams,
                 'datastore': datastore,
                 'include_groups': include_groups,
                 'include_groups_replace': include_groups_replace,
@@ -250,7 +250,7 @@ def construct_blueprint(datastore: ChangeDetectionStore):
         browsersteps_start_session = {'start_time': time.time()}
 
         # Build proxy dict first — needed by both the CDP path and fetcher-specific launchers
-        proxy_id = datastore.get_preferred_proxy_for_watch(uuid=watch_uuid)
+        proxy_id = datastore.proxy_registry.resolve(datastore.get_preferred_proxy_for_watch(uuid=watch_uuid))
         proxy = None
         if proxy_id:
             proxy_url = datastore.proxy_list.get(proxy_id, {}).get('url')
@@ -46,7 +46,7 @@ def construct_blueprint(datastore: ChangeDetectionStore):
                                                                  watch_uuid=uuid
                                                                  )
 
-            asyncio.run(update_handler.call_browser(preferred_proxy_id=preferred_proxy))
+            asyncio.run(update_handler.call_browser(preferred_proxy_id=preferred_proxy, coalesce=False))
         # title, size is len contents not len xfer
         except content_fetcher_exceptions.Non200ErrorCodeReceived as e:
             if e.status_code == 404:
@@ -116,6 +116,9 @@ def construct_blueprint(datastore: ChangeDetectionStore):
             checks_in_progress[uuid] = {}
 
         for k, v in datastore.proxy_list.items():
+            # Pools are checked through their member proxies
+            if datastore.proxy_registry.is_pool(k):
+                continue
             if not checks_in_progress[uuid].get(k):
                 checks_in_progress[uuid][k] = long_task(uuid=uuid, preferred_proxy=k)
 
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+import io
 import time
 from wtforms import ValidationError
 from loguru import logger
@@ -6,6 +7,9 @@ from flask_babel import gettext
 
 from changedetectionio.forms import validate_url
 
+# Lists with more lines than this are imported by a background job (see bulk_import.py)
+URL_LIST_BACKGROUND_THRESHOLD = 5000
+
 
 class Importer():
     remaining_data = []
@@ -37,13 +41,26 @@ class import_url_list(Importer):
             processor=None
             ):
 
+        # Very long lists are streamed through a background bulk import job instead of blocking the request
+        if data.count("\n") >= URL_LIST_BACKGROUND_THRESHOLD:
+            from changedetectionio.bulk_import import BulkImportJob
+            from changedetectionio.job_registry import JobRegistryFull
+            try:
+                job = BulkImportJob(datastore=datastore,
+                                    lines=io.StringIO(data),
+                                    extras={'processor': processor} if processor else None,
+                                    dedupe=False).start()
+            except JobRegistryFull:
+                flash(gettext("Too many imports are running, please try again when one has finished."), 'error')
+                self.remaining_data = data.splitlines()
+                return
+            flash(gettext("Importing your list in the background, job {job_id}.").format(job_id=job.job_id))
+            return
+
         urls = data.split("\n")
         good = 0
         now = time.time()
 
-        if (len(urls) > 5000):
-            flash(gettext("Importing 5,000 of the first URLs from your list, the rest can be imported again."))
-
         for url in urls:
             url = url.strip()
             if not len(url):
@@ -247,6 +247,8 @@ def construct_blueprint(datastore: ChangeDetectionStore):
         llm_effective_max_input_chars = _get_max_input_chars(datastore)
         # Cost display: only when user configured their own key (not hosted/operator-managed)
         llm_show_costs = not llm_env_configured
+        from changedetectionio.llm.response_cache import get_response_cache
+        llm_response_cache_stats = get_response_cache().stats()
 
         output = render_template("settings.html",
                                 active_plugins=active_plugins,
@@ -259,6 +261,7 @@ def construct_blueprint(datastore: ChangeDetectionStore):
                                 llm_max_input_chars_env=llm_max_input_chars_env,
                                 llm_effective_max_input_chars=llm_effective_max_input_chars,
                                 llm_show_costs=llm_show_costs,
+                                llm_response_cache_stats=llm_response_cache_stats,
                                 python_version=python_version,
                                 uptime_seconds=uptime_seconds,
                                 available_timezones=sorted(available_timezones()),
@@ -366,7 +366,9 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, worker_pool,
                         for watch_uuid in watches_to_queue:
                             # Check if already queued or running (state captured at start)
                             if watch_uuid not in queued_uuids and watch_uuid not in running_uuids:
-                                worker_pool.queue_item_async_safe(update_q, queuedWatchMetaData.PrioritizedItem(priority=1, item={'uuid': watch_uuid}))
+                                # Bulk class, so a big recheck doesn't hold up single rechecks and the scheduled checks
+                                worker_pool.queue_item_async_safe(update_q, queuedWatchMetaData.PrioritizedItem(priority=1, item={'uuid': watch_uuid},
+                                                                                                                priority_class=queuedWatchMetaData.PRIORITY_CLASS_BULK))
                                 queued_count += 1
                             else:
                                 skipped_count += 1
@@ -503,6 +503,48 @@ def construct_blueprint(datastore: ChangeDetectionStore):
             redirect=redirect
         )
 
+    @diff_blueprint.route("/diff/<uuid_str:uuid>/extract/<string:job_id>", methods=['GET'])
+    @login_optionally_required
+    def diff_history_page_extract_job_status(uuid, job_id):
+        """Progress of a background extraction job as JSON, polled by the extract page."""
+        from flask import jsonify
+        from changedetectionio.extract_job import get_job
+
+        job = get_job(job_id, uuid=uuid)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict())
+
+    @diff_blueprint.route("/diff/<uuid_str:uuid>/extract/<string:job_id>/download", methods=['GET'])
+    @login_optionally_required
+    def diff_history_page_extract_job_download(uuid, job_id):
+        """The CSV report of a finished extraction job."""
+        from changedetectionio.extract_job import get_job
+
+        job = get_job(job_id, uuid=uuid)
+        if not job or not job.output_filename:
+            flash(gettext('No matches found while scanning all of the watch history for that RegEx.'), 'error')
+            return redirect(url_for('ui.ui_diff.diff_history_page_extract_GET', uuid=uuid))
+
+        response = make_response(send_from_directory(directory=job.watch.data_dir, path=job.output_filename, as_attachment=True))
+        response.headers['Content-type'] = 'text/csv'
+        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = "0"
+        return response
+
+    @diff_blueprint.route("/diff/<uuid_str:uuid>/extract/<string:job_id>/cancel", methods=['POST'])
+    @login_optionally_required
+    def diff_history_page_extract_job_cancel(uuid, job_id):
+        """Stop a running extraction job."""
+        from changedetectionio.extract_job import get_job
+
+        job = get_job(job_id, uuid=uuid)
+        if job:
+            job.cancel()
+            flash(gettext('Data extraction cancelled.'))
+        return redirect(url_for('ui.ui_diff.diff_history_page_extract_GET', uuid=uuid, job=job_id))
+
     @diff_blueprint.route("/diff/<uuid_str:uuid>/download-patch", methods=['GET'])
     @login_optionally_required
     def download_patch(uuid):
@@ -9,7 +9,8 @@ from jinja2 import Environment, FileSystemLoader
 from changedetectionio.store import ChangeDetectionStore
 from changedetectionio.auth_decorator import login_optionally_required
 from changedetectionio.time_handler import is_within_schedule
-from changedetectionio import worker_pool
+from changedetectionio import adaptive_recheck, worker_pool
+from changedetectionio.content_fetchers.base import fetch_max_bytes
 from changedetectionio.llm.evaluator import get_llm_config as _get_llm_config
 
 def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMetaData):
@@ -340,6 +341,9 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
                 'visual_selector_data_ready': datastore.visualselector_data_is_ready(watch_uuid=uuid),
                 'timezone_default_config': datastore.data['settings']['application'].get('scheduler_timezone_default'),
                 'using_global_webdriver_wait': not default['webdriver_delay'],
+                'default_fetch_max_bytes': fetch_max_bytes() or '',
+                'effective_recheck_seconds': watch.effective_threshold_seconds(datastore.threshold_seconds),
+                'adaptive_recheck_max_multiplier': f"{adaptive_recheck.max_multiplier():g}",
                 'uuid': uuid,
                 'watch': watch,
                 'capabilities': capabilities,
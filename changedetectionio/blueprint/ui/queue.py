@@ -8,6 +8,9 @@ Priority conventions (see uses of PrioritizedItem across the codebase):
   1     - immediate / manual recheck
   5     - clone follow-up
   >100  - scheduler-enqueued (timestamp-based)
+
+Every item is also in a priority class (interactive, sla, normal, bulk), the queue
+serves the classes by weight and shows how long each has been waiting.
 """
 
 from flask import Blueprint, jsonify, redirect, render_template, request, url_for, flash
@@ -24,7 +27,15 @@ PRIORITY_LABELS = {
 }
 
 
-def _priority_label(priority):
+CLASS_LABELS = {
+    'sla': "high",
+    'bulk': "bulk",
+}
+
+
+def _priority_label(priority, priority_class=None):
+    if priority_class in CLASS_LABELS:
+        return CLASS_LABELS[priority_class]
     if priority in PRIORITY_LABELS:
         return PRIORITY_LABELS[priority]
     if priority > 100:
@@ -68,7 +79,9 @@ def _snapshot(datastore, update_q, page=1, per_page=50):
         info = _watch_brief(datastore, entry['uuid'])
         info['position'] = entry['position']
         info['priority'] = entry['priority']
-        info['priority_label'] = _priority_label(entry['priority'])
+        info['priority_class'] = entry.get('priority_class')
+        info['priority_label'] = _priority_label(entry['priority'], entry.get('priority_class'))
+        info['deadline'] = entry.get('deadline')
         info['enqueued_at'] = entry.get('enqueued_at')
         queued_items.append(info)
 
@@ -89,6 +102,7 @@ def _snapshot(datastore, update_q, page=1, per_page=50):
             'scheduled': summary.get('scheduled_items', 0),
             'priority_breakdown': summary.get('priority_breakdown', {}),
         },
+        'classes': update_q.stats()['classes'],
         'running': running_items,
         'queued': queued_items,
         'page': page,
@@ -14,9 +14,11 @@ from changedetectionio.auth_decorator import login_optionally_required
 # bulk actions so a filtered view and the actions taken on it always agree.
 from changedetectionio.blueprint.watchlist import filters as wl_filters
 from changedetectionio.blueprint.watchlist.row_context import watch_row_context
+from changedetectionio.blueprint.watchlist.list_index import WatchListIndex
 
 def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMetaData):
     watchlist_blueprint = Blueprint('watchlist', __name__, template_folder="templates")
+    list_index = WatchListIndex(datastore)
 
     @watchlist_blueprint.route("/", methods=['GET'])
     @login_optionally_required
@@ -47,50 +49,28 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             datastore.data['watching'][uuid].commit()
             return redirect(url_for('watchlist.index', tag = active_tag_uuid))
 
-        # Sort by last_changed and add the uuid which is usually the key..
-        sorted_watches = []
         active_processor = request.args.get('processor', '').strip()
+        list_filters = wl_filters.list_filters_from_args(datastore, request.args)
+        sort_attribute = request.args.get('sort') if request.args.get('sort') else request.cookies.get('sort')
+        sort_order = request.args.get('order') if request.args.get('order') else request.cookies.get('order')
+        per_page = datastore.data['settings']['application'].get('pager_size', 50)
+        page = request.args.get(get_page_parameter(), type=int, default=1)
+
+        # Only the rows on this page are looked up, sorted from the maintained indexes (see list_index.py).
         # Toolbar facet counts are tallied over the tag/processor/search context but
         # independently of the active status toggle, so the .seg numbers stay stable
         # as you switch between All / Unread / Deals / With errors.
-        errored_count = 0
-        deals_count = 0
-        unread_count = 0
-        processor_counts = {}
-        list_filters = wl_filters.list_filters_from_args(datastore, request.args)
-        for uuid, watch in datastore.data['watching'].items():
-            # The processor facet is counted over the tag/search base (ignoring the
-            # selected processor) so every detected processor shows up and you can
-            # switch between them.
-            if not wl_filters.watch_matches_tag(datastore, watch, list_filters):
-                continue
-            if not wl_filters.watch_passes_search(watch, list_filters):
-                continue
-            proc = watch.get('processor')
-            if proc:
-                processor_counts[proc] = processor_counts.get(proc, 0) + 1
-
-            # Narrow to the selected processor for the remaining facets + the list.
-            if list_filters['processor'] and proc != list_filters['processor']:
-                continue
-            if watch.get('last_error'):
-                errored_count += 1
-            if wl_filters.watch_is_deal(watch):
-                deals_count += 1
-            # Unread = changed and not yet viewed — same test the 'unread' status
-            # filter uses, so this count matches what clicking Unread shows.
-            if not (watch.viewed or watch.last_changed == 0):
-                unread_count += 1
-            if wl_filters.watch_passes_status(watch, list_filters):
-                sorted_watches.append(watch)
+        listed = list_index.view(list_filters,
+                                 sort_attribute=sort_attribute,
+                                 sort_order=sort_order,
+                                 skip=(max(page, 1) - 1) * per_page if per_page else 0,
+                                 per_page=per_page)
 
         form = forms.quickWatchForm(request.form)
-        page = request.args.get(get_page_parameter(), type=int, default=1)
-        total_count = len(sorted_watches)
 
         pagination = Pagination(page=page,
-                                total=total_count,
-                                per_page=datastore.data['settings']['application'].get('pager_size', 50),
+                                total=listed['total'],
+                                per_page=per_page,
                                 css_framework="semantic",
                                 display_msg=_('displaying <b>{start} - {end}</b> {record_name} in total <b>{total}</b>'),
                                 record_name=_('records'))
@@ -117,10 +97,10 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             active_processor=active_processor,
             checking_now_size=len(worker_pool.get_running_uuids()),
             app_rss_token=datastore.data['settings']['application'].get('rss_access_token'),
-            errored_count=errored_count,
-            deals_count=deals_count,
-            unread_count=unread_count,
-            processor_counts=processor_counts,
+            errored_count=listed['errored_count'],
+            deals_count=listed['deals_count'],
+            unread_count=listed['unread_count'],
+            processor_counts=listed['processor_counts'],
             # body classes for app-wide state; realtime.js keeps these in sync live
             # (has-any-unviewed reveals the "Mark all viewed" button - see _watch_table.scss)
             extra_classes=' '.join(filter(None, ['has-queue' if not update_q.empty() else '',
@@ -142,11 +122,12 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             # can re-apply them and not drop the operator's current filtered view.
             active_filters=wl_filters.filter_query_args(request.args),
             search_q=request.args.get('q', '').strip(),
-            sort_attribute=request.args.get('sort') if request.args.get('sort') else request.cookies.get('sort'),
-            sort_order=request.args.get('order') if request.args.get('order') else request.cookies.get('order'),
+            sort_attribute=sort_attribute,
+            sort_order=sort_order,
             tags=sorted_tags,
             unread_changes_count=datastore.unread_changes_count,
-            watches=sorted_watches,
+            # Just this page, already sorted
+            watches=listed['watches'],
             llm_configured=llm_configured,
             llm_intent_watch_placeholder=LLM_INTENT_WATCH_PLACEHOLDER,
         )
@@ -0,0 +1,219 @@
+"""Sort order and toolbar counts for the watch list, kept up to date instead of worked out per render.
+
+The watch list used to build the whole filtered list on every page load, sort it in Jinja
+(`watches|sort(...)|pagination_slice`) and tally the toolbar counts in a loop over every watch,
+so a page of 50 rows cost as much as the whole datastore.
+
+Here every watch has one row holding its sort keys, processor, tags and status bits
+(errored/deal/unread). Each sortable column keeps a sorted list of rows, and the toolbar counts are
+kept per (tag, processor) context, split by status bits so any mix of the status toggles can be
+counted. Rows are refreshed when the watch's state_version changes (bumped on every write to the
+watch and when its history changes, see model/__init__.py and model/Watch.py). A render then
+compares one int per watch (nothing at all when no watch was written to since the last render),
+re-sorts the handful that changed and walks the sorted list for the rows on screen.
+
+Searching (?q=) still looks at every watch, a substring search can't be indexed like this, but the
+sorting and paging still come from here.
+"""
+
+import threading
+from bisect import bisect_left, insort
+
+from changedetectionio.blueprint.watchlist import filters as wl_filters
+from changedetectionio.model import watch_base
+
+# Columns the watch list table can be sorted on
+SORT_COLUMNS = ('date_created', 'paused', 'notification_muted', 'label', 'last_checked', 'last_changed')
+DEFAULT_SORT_COLUMN = 'last_changed'
+
+# Status bits
+ERRORED = 1
+DEAL = 2
+UNREAD = 4
+
+
+def sort_key(watch, column):
+    """Orders like Jinja's sort filter the template used (item lookup, then attribute, strings
+    compared case-insensitively), except that mixed types compare instead of raising"""
+    try:
+        value = watch[column]
+    except (KeyError, TypeError):
+        value = getattr(watch, column, None)
+    if value is None:
+        return 0, 0
+    if isinstance(value, str):
+        return 2, value.lower()
+    if isinstance(value, (int, float)):
+        return 1, value
+    return 2, str(value).lower()
+
+
+def watch_status(watch):
+    status = 0
+    if watch.get('last_error'):
+        status |= ERRORED
+    if wl_filters.watch_is_deal(watch):
+        status |= DEAL
+    # Unread = changed and not yet viewed, same test as the 'unread' status filter
+    if not (watch.viewed or watch.last_changed == 0):
+        status |= UNREAD
+    return status
+
+
+class _Row:
+    __slots__ = ('watch', 'version', 'seq', 'keys', 'processor', 'tags', 'status')
+
+
+class WatchListIndex:
+
+    def __init__(self, datastore):
+        self.datastore = datastore
+        self._lock = threading.Lock()
+        self._rows = {}
+        # column -> [(sort key, seq, uuid)], seq keeps equal keys in datastore order like a stable sort
+        self._sorted = {column: [] for column in SORT_COLUMNS}
+        # (tag uuid or None, processor or None) -> watches counted by status bits
+        self._counts = {}
+        self._seq = 0
+        self._tags_generation = None
+        self._state_generation = None
+
+    def _contexts(self, row):
+        for tag_uuid in (None, *row.tags):
+            yield tag_uuid, None
+            if row.processor:
+                yield tag_uuid, row.processor
+
+    def _remove(self, uuid, row):
+        for column in SORT_COLUMNS:
+            entries = self._sorted[column]
+            i = bisect_left(entries, (row.keys[column], row.seq, uuid))
+            if i < len(entries) and entries[i][2] == uuid:
+                del entries[i]
+        for context in self._contexts(row):
+            self._counts[context][row.status] -= 1
+
+    def _add(self, uuid, watch, seq):
+        row = _Row()
+        row.watch = watch
+        # Before reading anything, a write while this runs means it's looked at again next time
+        row.version = watch.state_version
+        row.seq = seq
+        row.keys = {column: sort_key(watch, column) for column in SORT_COLUMNS}
+        row.processor = watch.get('processor')
+        row.tags = frozenset(self.datastore.get_all_tags_for_watch(uuid))
+        row.status = watch_status(watch)
+
+        for column in SORT_COLUMNS:
+            insort(self._sorted[column], (row.keys[column], seq, uuid))
+        for context in self._contexts(row):
+            self._counts.setdefault(context, [0] * 8)[row.status] += 1
+        self._rows[uuid] = row
+
+    def _sync(self):
+        watching = self.datastore.data['watching']
+        tags_generation = self.datastore.tag_index.generation()
+        state_generation = watch_base.state_generation
+        if (state_generation == self._state_generation and tags_generation == self._tags_generation
+                and len(watching) == len(self._rows)):
+            # No watch was written to since last time
+            return
+        retag = tags_generation != self._tags_generation
+        self._tags_generation = tags_generation
+        # Read before looking at the watches, a write during the loop is picked up next time
+        self._state_generation = state_generation
+
+        rows = self._rows
+        for uuid, watch in list(watching.items()):
+            row = rows.get(uuid)
+            if row is not None:
+                if row.version == watch.state_version and row.watch is watch and not retag:
+                    continue
+                self._remove(uuid, row)
+                seq = row.seq
+            else:
+                self._seq += 1
+                seq = self._seq
+            self._add(uuid, watch, seq)
+
+        if len(self._rows) != len(watching):
+            for uuid in [uuid for uuid in self._rows if uuid not in watching]:
+                self._remove(uuid, self._rows.pop(uuid))
+
+    def _walk(self, column, reverse):
+        entries = self._sorted[column]
+        if not reverse:
+            for _key, _seq, uuid in entries:
+                yield uuid
+            return
+        # Descending keys, but equal keys stay in datastore order (sorted(reverse=True) is stable too)
+        end = len(entries)
+        while end > 0:
+            key = entries[end - 1][0]
+            start = bisect_left(entries, (key,), 0, end)
+            for _key, _seq, uuid in entries[start:end]:
+                yield uuid
+            end = start
+
+    def view(self, list_filters, sort_attribute=None, sort_order=None, skip=0, per_page=0):
+        """One page of the watch list plus the toolbar counts
+
+        Same results as filtering every watch with blueprint/watchlist/filters.py and sorting them
+        the way the template did, 'asc' sorting in reverse as it always has.
+        """
+        column = sort_attribute if sort_attribute in SORT_COLUMNS else DEFAULT_SORT_COLUMN
+        reverse = (sort_order or 'asc') == 'asc'
+        tag_uuid = list_filters['tag_uuid']
+        processor = list_filters['processor'] or None
+        required = ((ERRORED if list_filters['with_errors'] else 0) |
+                    (DEAL if list_filters['deals'] else 0) |
+                    (UNREAD if list_filters['unread_only'] else 0))
+
+        with self._lock:
+            self._sync()
+
+            searched = None
+            if list_filters['search_q']:
+                searched = {uuid for uuid, row in self._rows.items()
+                            if (tag_uuid is None or tag_uuid in row.tags) and wl_filters.watch_passes_search(row.watch, list_filters)}
+                processor_counts = {}
+                status_counts = [0] * 8
+                for uuid in searched:
+                    row = self._rows[uuid]
+                    if row.processor:
+                        processor_counts[row.processor] = processor_counts.get(row.processor, 0) + 1
+                    if not processor or row.processor == processor:
+                        status_counts[row.status] += 1
+            else:
+                processor_counts = {p: sum(counts) for (t, p), counts in self._counts.items()
+                                    if t == tag_uuid and p and sum(counts)}
+                status_counts = list(self._counts.get((tag_uuid, processor), [0] * 8))
+
+            rows = []
+            if not per_page or skip < sum(n for status, n in enumerate(status_counts) if status & required == required):
+                matched = 0
+                for uuid in self._walk(column, reverse):
+                    row = self._rows[uuid]
+                    if row.status & required != required:
+                        continue
+                    if processor and row.processor != processor:
+                        continue
+                    if searched is not None:
+                        if uuid not in searched:
+                            continue
+                    elif tag_uuid is not None and tag_uuid not in row.tags:
+                        continue
+                    matched += 1
+                    if matched > skip:
+                        rows.append(row.watch)
+                        if per_page and len(rows) >= per_page:
+                            break
+
+        return {
+            'watches': rows,
+            'total': sum(n for status, n in enumerate(status_counts) if status & required == required),
+            'errored_count': sum(n for status, n in enumerate(status_counts) if status & ERRORED),
+            'deals_count': sum(n for status, n in enumerate(status_counts) if status & DEAL),
+            'unread_count': sum(n for status, n in enumerate(status_counts) if status & UNREAD),
+            'processor_counts': processor_counts,
+        }
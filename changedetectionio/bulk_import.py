@@ -0,0 +1,196 @@
+"""
+Streaming bulk import of watches.
+
+Adding watches one at a time through datastore.add_watch() works for a handful of URLs, but a
+list of tens of thousands spent most of its time in places that scale with the size of the
+datastore rather than the import:
+  - url_exists() scans every watch for every imported line,
+  - tag names are looked up (and created) again for every line that carries them,
+  - every watch.json is written (and its directory fsync'd) as it is added,
+  - every new watch is due immediately, so the scheduler queued all of them on its next pass.
+
+A BulkImportJob consumes its input lazily (any iterable of lines, so the whole list is never
+split into a second copy), dedupes against a set of known URLs built once, resolves each tag
+name once, and writes the new watches in batches (one transaction per batch with the SQLite
+datastore backend). Progress is published after every batch via
+the 'bulk_import_progress' signal (relayed to socket.io) and through GET /api/v1/import/<job_id>.
+
+New watches are given a 'not before' time so the scheduler releases them at
+BULK_IMPORT_CHECKS_PER_SECOND instead of all at once.
+
+Environment variables:
+  BULK_IMPORT_BATCH_SIZE           — watches written per batch / progress update (default 500)
+  BULK_IMPORT_CHECKS_PER_SECOND    — rate the first checks of imported watches are released (default 10, 0 disables)
+"""
+
+import os
+import threading
+import time
+import uuid as uuid_builder
+
+from blinker import signal
+from loguru import logger
+
+from .job_registry import MAX_ERRORS_REPORTED, JobRegistry
+from .validate_url import is_safe_valid_url
+
+
+def parse_url_list_line(line):
+    """'https://example.com tag1, tag2' -> ('https://example.com', ['tag1', 'tag2'])"""
+    line = line.strip()
+    if not line:
+        return None, []
+    url, _, tags = line.partition(' ')
+    return url.strip(), [t.strip() for t in tags.split(',') if t.strip()]
+
+
+class BulkImportJob:
+
+    def __init__(self, datastore, lines, extras=None, tag='', tag_uuids=None, dedupe=True,
+                 batch_size=None, checks_per_second=None, total=None):
+        self.datastore = datastore
+        self.lines = lines
+        self.extras = extras or {}
+        self.tag = tag or ''
+        self.tag_uuids = [t.strip() for t in tag_uuids or [] if t.strip()]
+        self.dedupe = dedupe
+        self.batch_size = max(1, int(batch_size if batch_size is not None else os.getenv('BULK_IMPORT_BATCH_SIZE', 500)))
+        self.checks_per_second = float(checks_per_second if checks_per_second is not None
+                                       else os.getenv('BULK_IMPORT_CHECKS_PER_SECOND', 10))
+
+        self.job_id = str(uuid_builder.uuid4())
+        self.status = 'queued'
+        self.total = total
+        self.processed = 0
+        self.added = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.new_uuids = []
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+        self._tag_cache = {}
+
+    def _tag_uuids_for(self, names):
+        """Resolve tag names to UUIDs, creating each tag at most once per job"""
+        result = []
+        for name in names:
+            key = name.lower()
+            if key not in self._tag_cache:
+                self._tag_cache[key] = self.datastore.add_tag(name)
+            if self._tag_cache[key]:
+                result.append(self._tag_cache[key])
+        return result
+
+    def _error(self, message):
+        if len(self.errors) < MAX_ERRORS_REPORTED:
+            self.errors.append(message)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        with self.datastore.backend.batch():
+            for watch in batch:
+                try:
+                    watch.commit()
+                except Exception as e:
+                    logger.error(f"Bulk import {self.job_id}: could not save watch {watch.get('uuid')} - {str(e)}")
+                    self._error(f"{watch.get('url')}: {str(e)}")
+        batch.clear()
+        signal('bulk_import_progress').send(job=self.to_dict())
+
+    def run(self):
+        self.status = 'running'
+        self.started = time.time()
+        known_urls = self.datastore.build_url_index() if self.dedupe else set()
+        common_tag_uuids = self._tag_uuids_for([t for t in self.tag.split(',') if t.strip()]) + self.tag_uuids
+        # The first check of each new watch is spaced 1/checks_per_second apart, starting now
+        release_at = time.time()
+        batch = []
+
+        try:
+            for line in self.lines:
+                url, line_tags = parse_url_list_line(line)
+                if not url:
+                    continue
+                self.processed += 1
+
+                if not is_safe_valid_url(url):
+                    self.invalid += 1
+                    self._error(f"Invalid or unsupported URL - {url}")
+                    continue
+
+                if self.dedupe and url.lower() in known_urls:
+                    self.duplicates += 1
+                    continue
+
+                try:
+                    new_uuid = self.datastore.add_watch(url=url,
+                                                        extras=self.extras,
+                                                        tag_uuids=common_tag_uuids + self._tag_uuids_for(line_tags),
+                                                        save_immediately=False)
+                except Exception as e:
+                    logger.error(f"Bulk import {self.job_id}: error adding {url} - {str(e)}")
+                    self._error(f"{url}: {str(e)}")
+                    continue
+
+                if not new_uuid:
+                    self.invalid += 1
+                    self._error(f"Could not add {url}")
+                    continue
+
+                known_urls.add(url.lower())
+                watch = self.datastore.data['watching'][new_uuid]
+                if self.checks_per_second > 0:
+                    watch.import_not_before = release_at + (self.added / self.checks_per_second)
+                self.new_uuids.append(new_uuid)
+                self.added += 1
+                batch.append(watch)
+
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+
+            self._flush(batch)
+            self.status = 'done'
+        except Exception as e:
+            logger.exception(f"Bulk import {self.job_id} failed")
+            self._error(str(e))
+            self.status = 'failed'
+            self._flush(batch)
+        finally:
+            self.finished = time.time()
+
+        logger.info(f"Bulk import {self.job_id} {self.status}: {self.added} added, {self.duplicates} duplicates, "
+                    f"{self.invalid} invalid in {self.finished - self.started:.2f}s")
+        signal('bulk_import_progress').send(job=self.to_dict())
+        return self
+
+    def start(self):
+        """Run the job on a daemon thread and return immediately"""
+        _jobs.register(self)
+        threading.Thread(target=self.run, daemon=True, name=f"BulkImport-{self.job_id[:8]}").start()
+        return self
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'added': self.added,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': list(self.errors),
+            'created': int(self.created),
+            'duration_seconds': round(end - self.started, 3) if self.started else 0,
+        }
+
+
+_jobs = JobRegistry()
+
+
+def get_job(job_id):
+    return _jobs.get(job_id)
@@ -0,0 +1,321 @@
+"""
+Per-phase timing of every watch check, aggregated into histograms for /metrics and /api/v1/systeminfo
+
+"Why is this check slow" used to mean reading debug logs - fetch_time on the watch is one number
+for the whole check. Each check now carries a CheckTimings object (created by the worker, handed
+to the processor and filled in by the fetcher) that records how long each phase took:
+
+    queue_wait            time between the watch being queued and a worker picking it up
+    dns, connect          new connections only (requests fetcher, non-proxied)
+    first_byte, download  request sent -> response headers, headers -> full body (requests fetcher)
+    fetch                 the whole fetcher.run() - for the browser fetchers this is the only fetch phase
+    preprocess, filters, html_to_text, checksum
+                          text_json_diff processing stages
+    process               the whole run_changedetection(), every processor
+    llm                   AI intent / change summary calls
+    snapshot_write        screenshot, xpath data, history snapshot and last fetched HTML
+    notification_enqueue  building and queueing the change notification
+    total                 the whole check
+
+It also records how much memory the check's content took, in bytes:
+
+    body                  the response body as downloaded
+    peak                  the most held at once - the fetched body (raw and decoded) plus the
+                          processor's working copies, see difference_detection_processor.record_memory()
+
+When the check finishes the phases are folded into fixed-bucket histograms labelled by
+processor, fetcher and proxy, so nothing per-check is kept around.
+
+Environment variables:
+  CHECK_METRICS_ENABLED  — set to false to skip recording (default true)
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from changedetectionio import strtobool
+
+PHASES = ('queue_wait', 'dns', 'connect', 'first_byte', 'download', 'fetch', 'preprocess', 'filters',
+          'html_to_text', 'checksum', 'process', 'llm', 'snapshot_write', 'notification_enqueue', 'total')
+
+# Seconds, chosen to separate "in-memory", "network" and "browser" sized phases
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+MEMORY = ('body', 'peak')
+
+# Bytes, 64KB to 1GB
+MEMORY_BUCKETS = tuple(64 * 1024 * 4 ** n for n in range(8))
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+LABEL_NAMES = ('processor', 'fetcher', 'proxy')
+
+_thread = threading.local()
+
+
+class CheckTimings:
+    """The phase timings and labels of one check"""
+
+    def __init__(self):
+        self.phases = {}
+        self.labels = {}
+        self.memory_bytes = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + max(0.0, seconds)
+
+    def update(self, phases):
+        for name, seconds in (phases or {}).items():
+            self.add(name, seconds)
+
+    def memory(self, name, nbytes):
+        """Keep the largest size seen for `name`"""
+        self.memory_bytes[name] = max(self.memory_bytes.get(name, 0), int(nbytes))
+
+    @contextmanager
+    def phase(self, name):
+        """Time the wrapped block, repeated blocks of the same phase add up"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def recording(phases):
+    """Make record() on this thread add to the dict phases, used where the timed code can't see the check (urllib3 connections)"""
+    previous = getattr(_thread, 'phases', None)
+    _thread.phases = phases
+    try:
+        yield phases
+    finally:
+        _thread.phases = previous
+
+
+def record(name, seconds):
+    phases = getattr(_thread, 'phases', None)
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + max(0.0, seconds)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        total = 0
+        out = []
+        for c in self.counts:
+            total += c
+            out.append(total)
+        return out
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q quantile (+Inf when it's beyond the last bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for upper, seen in zip(self.buckets, self.cumulative()):
+            if seen >= rank:
+                return upper
+        return math.inf
+
+
+class CheckMetrics:
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # (phase, processor, fetcher, proxy) -> Histogram
+        self._histograms = {}
+        # (body/peak, processor, fetcher, proxy) -> Histogram of bytes
+        self._memory_histograms = {}
+        # (processor, fetcher, proxy) -> number of checks
+        self._checks = {}
+        self.busy_seconds = 0.0
+        self.started = time.time()
+
+    def observe_check(self, timings):
+        if not self.enabled:
+            return
+        labels = tuple(str(timings.labels.get(name) or 'none') for name in LABEL_NAMES)
+        with self._lock:
+            self._checks[labels] = self._checks.get(labels, 0) + 1
+            for phase, seconds in timings.phases.items():
+                key = (phase,) + labels
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram()
+                histogram.observe(seconds)
+            for name, nbytes in timings.memory_bytes.items():
+                key = (name,) + labels
+                histogram = self._memory_histograms.get(key)
+                if histogram is None:
+                    histogram = self._memory_histograms[key] = Histogram(MEMORY_BUCKETS)
+                histogram.observe(nbytes)
+            self.busy_seconds += timings.phases.get('total', 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._memory_histograms.clear()
+            self._checks.clear()
+            self.busy_seconds = 0.0
+
+    def summary(self):
+        """Per-phase (and per memory measure) count / average / p50 / p95 over every label combination, for systeminfo"""
+        with self._lock:
+            checks = sum(self._checks.values())
+            merged = {}
+            for (phase, *_), histogram in self._histograms.items():
+                merged.setdefault(phase, Histogram()).merge(histogram)
+            merged_memory = {}
+            for (name, *_), histogram in self._memory_histograms.items():
+                merged_memory.setdefault(name, Histogram(MEMORY_BUCKETS)).merge(histogram)
+            busy_seconds = self.busy_seconds
+
+        phases = {}
+        for phase in sorted(merged, key=lambda p: PHASES.index(p) if p in PHASES else len(PHASES)):
+            h = merged[phase]
+            phases[phase] = {
+                'count': h.count,
+                'avg_seconds': round(h.sum / h.count, 4) if h.count else 0.0,
+                'p50_seconds': _json_number(h.quantile(0.5)),
+                'p95_seconds': _json_number(h.quantile(0.95)),
+            }
+        memory = {}
+        for name in sorted(merged_memory, key=lambda n: MEMORY.index(n) if n in MEMORY else len(MEMORY)):
+            h = merged_memory[name]
+            memory[name] = {
+                'count': h.count,
+                'avg_bytes': int(h.sum / h.count) if h.count else 0,
+                'p50_bytes': _json_number(h.quantile(0.5)),
+                'p95_bytes': _json_number(h.quantile(0.95)),
+            }
+        return {'checks': checks, 'busy_seconds': round(busy_seconds, 3), 'phases': phases, 'memory': memory}
+
+    def render_openmetrics(self, gauges=None, caches=None, extra_lines=None):
+        """
+        OpenMetrics text exposition of the check histograms plus point-in-time gauges
+        gauges: {name: (help, value)}, caches: {cache name: stats() dict}, extra_lines: other metric families, already formatted
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            histograms = [(key, h.cumulative(), h.count, h.sum) for key, h in histograms]
+            memory_histograms = [(key, h.cumulative(), h.count, h.sum) for key, h in sorted(self._memory_histograms.items())]
+            checks = sorted(self._checks.items())
+            busy_seconds = self.busy_seconds
+
+        lines = [
+            '# TYPE changedetection_check_phase_seconds histogram',
+            '# UNIT changedetection_check_phase_seconds seconds',
+            '# HELP changedetection_check_phase_seconds Time spent in each phase of a watch check.',
+        ]
+        for (phase, *labels), cumulative, count, total in histograms:
+            base = format_labels(('phase',) + LABEL_NAMES, [phase] + labels)
+            for upper, seen in zip(BUCKETS, cumulative):
+                lines.append(f'changedetection_check_phase_seconds_bucket{{{base},le="{upper}"}} {seen}')
+            lines.append(f'changedetection_check_phase_seconds_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'changedetection_check_phase_seconds_count{{{base}}} {count}')
+            lines.append(f'changedetection_check_phase_seconds_sum{{{base}}} {total}')
+
+        lines += [
+            '# TYPE changedetection_check_memory_bytes histogram',
+            '# UNIT changedetection_check_memory_bytes bytes',
+            '# HELP changedetection_check_memory_bytes Response body size and peak content memory of each watch check.',
+        ]
+        for (kind, *labels), cumulative, count, total in memory_histograms:
+            base = format_labels(('kind',) + LABEL_NAMES, [kind] + labels)
+            for upper, seen in zip(MEMORY_BUCKETS, cumulative):
+                lines.append(f'changedetection_check_memory_bytes_bucket{{{base},le="{upper}"}} {seen}')
+            lines.append(f'changedetection_check_memory_bytes_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'changedetection_check_memory_bytes_count{{{base}}} {count}')
+            lines.append(f'changedetection_check_memory_bytes_sum{{{base}}} {total}')
+
+        lines += [
+            '# TYPE changedetection_checks counter',
+            '# HELP changedetection_checks Watch checks completed.',
+        ]
+        for labels, count in checks:
+            lines.append(f'changedetection_checks_total{{{format_labels(LABEL_NAMES, labels)}}} {count}')
+
+        lines += [
+            '# TYPE changedetection_worker_busy_seconds counter',
+            '# UNIT changedetection_worker_busy_seconds seconds',
+            '# HELP changedetection_worker_busy_seconds Time workers spent running checks.',
+            f'changedetection_worker_busy_seconds_total {busy_seconds}',
+        ]
+
+        for name, (help_text, value) in (gauges or {}).items():
+            lines += [
+                f'# TYPE changedetection_{name} gauge',
+                f'# HELP changedetection_{name} {help_text}',
+                f'changedetection_{name} {value}',
+            ]
+
+        if caches:
+            for metric, help_text in (('hits', 'Cache hits.'), ('misses', 'Cache misses.')):
+                lines += [
+                    f'# TYPE changedetection_cache_{metric} counter',
+                    f'# HELP changedetection_cache_{metric} {help_text}',
+                ]
+                for cache, stats in caches.items():
+                    lines.append(f'changedetection_cache_{metric}_total{{{format_labels(("cache",), [cache])}}} {stats.get(metric, 0)}')
+            lines += [
+                '# TYPE changedetection_cache_hit_ratio gauge',
+                '# HELP changedetection_cache_hit_ratio Cache hit rate since start.',
+            ]
+            for cache, stats in caches.items():
+                lines.append(f'changedetection_cache_hit_ratio{{{format_labels(("cache",), [cache])}}} {stats.get("hit_rate", 0.0)}')
+
+        lines += extra_lines or []
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def _json_number(value):
+    return None if math.isinf(value) else value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = CheckMetrics(enabled=strtobool(os.getenv('CHECK_METRICS_ENABLED', 'true')))
+    return _metrics
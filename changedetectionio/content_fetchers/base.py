@@ -1,4 +1,6 @@
 import os
+import sys
+import threading
 from abc import abstractmethod
 from loguru import logger
 from pydantic import BaseModel
@@ -60,6 +62,77 @@ def manage_user_agent(headers, current_ua=''):
 
     return None
 
+def fetch_max_bytes(watch_max_bytes=None):
+    """
+    Largest response body to download, the watch's own fetch_max_bytes or else FETCH_MAX_BYTES
+    (default 100MB, 0 for no limit). Returns None when there is no limit.
+    """
+    max_bytes = watch_max_bytes if watch_max_bytes else int(os.getenv('FETCH_MAX_BYTES', 100 * 1024 * 1024))
+    return max_bytes if max_bytes and max_bytes > 0 else None
+
+
+def check_text_body_size(body, url, max_bytes):
+    """
+    The browsers hand over the whole page as text, it can at least go no further than here.
+    Measured in UTF-8 bytes, the same limit the requests fetcher stops streaming at.
+    """
+    if body is None or body.raw is not None or not max_bytes or not isinstance(body.text, str):
+        return
+    # At most 4 bytes a character, most pages are nowhere near the limit and aren't encoded
+    if len(body.text) * 4 <= max_bytes:
+        return
+    received = len(body.text.encode('utf-8', errors='surrogatepass'))
+    if received > max_bytes:
+        from changedetectionio.content_fetchers.exceptions import ResponseTooLarge
+        raise ResponseTooLarge(url=url, max_bytes=max_bytes, received=received)
+
+
+class ResponseBody:
+    """
+    The fetched body, held once as the bytes received and only decoded to text when something reads .text
+
+    Fetchers that stream the body (requests) hash it on the way in, so the processors can compare
+    `checksum` with the last check and stop before anything is decoded. The browser fetchers only
+    ever have the text, for those `raw` and `checksum` are None.
+    """
+    __slots__ = ('raw', 'checksum', '_decode', '_text', '_lock')
+
+    def __init__(self, raw=None, text=None, decode=None, checksum=None):
+        self.raw = raw
+        self.checksum = checksum
+        # decode(raw) -> str, called once on first use
+        self._decode = decode
+        self._text = text
+        self._lock = threading.Lock()
+
+    @property
+    def decoded(self):
+        return self._decode is None
+
+    @property
+    def text(self):
+        if self._decode is not None:
+            # Can be shared between watches (see coalescing.py), decode only once
+            with self._lock:
+                if self._decode is not None:
+                    self._text = self._decode(self.raw)
+                    self._decode = None
+        return self._text
+
+    def buffers(self):
+        """What this body is holding in memory right now, without decoding it"""
+        return [b for b in (self.raw, self._text) if b is not None]
+
+
+def buffers_size(*buffers):
+    """Bytes held by the given buffers, each object counted once"""
+    seen = {}
+    for b in buffers:
+        if b is not None:
+            seen[id(b)] = b
+    return sum(sys.getsizeof(b) for b in seen.values())
+
+
 class Fetcher():
     # The fully-resolved concrete backend name this fetcher was chosen as
     # (e.g. 'html_requests', 'html_webdriver'). Set by resolve_content_fetcher()
@@ -69,13 +142,20 @@ class Fetcher():
     browser_connection_url = None
     browser_steps = None
     browser_steps_screenshot_path = None
-    content = None
+    # ResponseBody, .content is its text
+    body = None
     error = None
     fetcher_description = "No description"
+    # Finer grained fetch phases (dns, connect, first_byte, download -> seconds) when the fetcher can measure them,
+    # see check_metrics.py
+    fetch_timings = None
     headers = {}
     favicon_blob = None
     instock_data = None
     instock_data_js = ""
+    # Abort the download past this many bytes (ResponseTooLarge), None for no limit, see fetch_max_bytes()
+    max_bytes = None
+    raw_content = None
     screenshot_format = None
     status_code = None
     webdriver_js_execute_code = None
@@ -96,6 +176,9 @@ class Fetcher():
     supports_screenshots = False        # Can capture page screenshots
     supports_xpath_element_data = False # Can extract xpath element positions/data for visual selector
 
+    # Run the xpath element scraper on this fetch, the processor turns it off when nothing will use the data
+    scrape_xpath_elements = True
+
     # Screenshot element locking - prevents layout shifts during screenshot capture
     # Only needed for visual comparison (image_ssim_diff processor)
     # Locks element dimensions in the first viewport to prevent headers/ads from resizing
@@ -110,6 +193,18 @@ class Fetcher():
             self.lock_viewport_elements = kwargs.get('lock_viewport_elements')
 
 
+    @property
+    def content(self):
+        return self.body.text if self.body is not None else None
+
+    @content.setter
+    def content(self, value):
+        self.body = ResponseBody(text=value) if value is not None else None
+
+    def content_buffers(self):
+        """The response buffers this fetcher is holding, without decoding anything"""
+        return [*(self.body.buffers() if self.body is not None else []), self.raw_content, self.screenshot or None]
+
     @classmethod
     def get_status_icon_data(cls):
         """Return data for status icon to display in the watch overview.
@@ -133,9 +228,8 @@ class Fetcher():
         Explicitly clear all content from memory to free up heap space.
         Call this after content has been saved to disk.
         """
-        self.content = None
-        if hasattr(self, 'raw_content'):
-            self.raw_content = None
+        self.body = None
+        self.raw_content = None
         self.screenshot = None
         self.xpath_data = None
         # Keep headers and status_code as they're small
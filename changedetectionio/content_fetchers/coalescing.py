@@ -0,0 +1,188 @@
+"""
+Share one network fetch between watches that would make exactly the same request.
+
+Why: it is common to have many watches on the same URL with different filters (one product page, a
+selector per price) or the same RSS feed in several groups. Each of them used to be fetched on its own,
+so the origin saw the same request once per watch, usually within a second of each other because they
+all came due on the same ticker pass.
+
+call_browser() builds a key from everything that changes what the fetcher returns (URL, method, body,
+headers, proxy, fetcher, browser steps, JS, delays ...), see fetch_key(). The first watch to ask for a
+key does the fetch; any other watch asking for the same key while that fetch is running, or up to
+FETCH_COALESCE_WINDOW_SECONDS (default 5) after it finished, gets a copy of the response on its own
+fetcher object instead. Filtering, change detection and history stay per watch, only the network fetch
+is shared.
+
+- Only checks that were queued before the response arrived can share it, a check queued afterwards (the
+  watch was just added, the page was just edited, "Recheck" was just pressed) always fetches again.
+- A watch never gets the same shared response twice, its next check always fetches again.
+- A failed or cancelled fetch is never shared, the waiting watches fall back to fetching for themselves.
+- FETCH_COALESCING=false turns it off.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from loguru import logger
+
+from changedetectionio.strtobool import strtobool
+
+# What a fetcher hands to the processor, copied from the fetch that ran onto the fetchers that waited for it
+SHARED_FETCHER_ATTRIBUTES = (
+    'body',
+    'raw_content',
+    'headers',
+    'status_code',
+    'screenshot',
+    'xpath_data',
+    'instock_data',
+    'favicon_blob',
+    'error',
+)
+
+
+def fetch_key(**request):
+    """Stable hash of the request, every keyword that affects what the fetcher returns must be passed in"""
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class _SharedFetch:
+    __slots__ = ('future', 'expires_at', 'fetched_at', 'consumers')
+
+    def __init__(self, leader_uuid):
+        # concurrent.futures, the waiting watches can be on any worker's event loop
+        self.future = Future()
+        self.expires_at = None
+        # Wall clock, compared with when the check was queued
+        self.fetched_at = None
+        self.consumers = {leader_uuid}
+
+    def can_share_with(self, watch_uuid, requested_at):
+        if watch_uuid in self.consumers:
+            return False
+        return self.fetched_at is None or requested_at is None or requested_at <= self.fetched_at
+
+
+class FetchCoalescer:
+    """Thread-safe key -> in-flight/recent fetch map, fetch() is called from the worker event loops"""
+
+    def __init__(self, window=None, enabled=None):
+        self.window = float(window if window is not None else os.getenv('FETCH_COALESCE_WINDOW_SECONDS', 5))
+        self.enabled = enabled if enabled is not None else strtobool(os.getenv('FETCH_COALESCING', 'true'))
+
+        self._entries = {}
+        self._lock = threading.Lock()
+
+        self.fetches = 0
+        self.shared = 0
+        self.fallbacks = 0
+
+    def _purge(self, now):
+        for key in [k for k, e in self._entries.items() if e.expires_at is not None and e.expires_at <= now]:
+            del self._entries[key]
+
+    def _join_or_lead(self, key, watch_uuid, requested_at):
+        """Return (entry, is_leader)"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry.can_share_with(watch_uuid, requested_at):
+                entry.consumers.add(watch_uuid)
+                return entry, False
+            entry = _SharedFetch(watch_uuid)
+            self._entries[key] = entry
+            self.fetches += 1
+            return entry, True
+
+    def _finish(self, key, entry, failed):
+        with self._lock:
+            if failed:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            else:
+                entry.fetched_at = time.time()
+                entry.expires_at = time.monotonic() + self.window
+
+    async def fetch(self, key, watch_uuid, fetcher, run, requested_at=None):
+        """
+        Fill `fetcher` with the response for `key`, awaiting `run()` (the real fetch) only when no identical
+        fetch is running or recent enough to share. `requested_at` is when the check was queued (time.time()).
+        Returns True when the response was shared.
+        """
+        if not self.enabled or key is None:
+            await run()
+            return False
+
+        entry, is_leader = self._join_or_lead(key, watch_uuid, requested_at)
+
+        if is_leader:
+            try:
+                await run()
+            except BaseException as e:
+                self._finish(key, entry, failed=True)
+                entry.future.set_exception(e)
+                raise
+            entry.future.set_result({name: getattr(fetcher, name, None) for name in SHARED_FETCHER_ATTRIBUTES})
+            self._finish(key, entry, failed=False)
+            return False
+
+        try:
+            # Shielded, this check being cancelled must not cancel the fetch the other watches are waiting for
+            result = await asyncio.shield(asyncio.wrap_future(entry.future))
+        except asyncio.CancelledError:
+            if not entry.future.done():
+                # This check itself was cancelled
+                raise
+            # The leading check was cancelled (worker shutdown, its own timeout), this one still needs the page
+            result = None
+            logger.debug(f"Shared fetch was cancelled, {watch_uuid} fetching for itself")
+        except Exception as e:
+            result = None
+            logger.debug(f"Shared fetch failed ({type(e).__name__}), {watch_uuid} fetching for itself")
+
+        if result is None:
+            with self._lock:
+                self.fallbacks += 1
+            await run()
+            return False
+
+        for name, value in result.items():
+            setattr(fetcher, name, value)
+        with self._lock:
+            self.shared += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            self._purge(time.monotonic())
+            entries = len(self._entries)
+            fetches, shared = self.fetches, self.shared
+        return {
+            'entries': entries,
+            'fetches': fetches,
+            'shared': shared,
+            'fallbacks': self.fallbacks,
+            'share_rate': round(shared / (fetches + shared), 4) if fetches + shared else 0.0,
+            'window_seconds': self.window,
+        }
+
+
+_fetch_coalescer = None
+_fetch_coalescer_lock = threading.Lock()
+
+
+def get_fetch_coalescer():
+    """Return the process-wide FetchCoalescer, created on first use so env vars set by tests are honoured."""
+    global _fetch_coalescer
+    if _fetch_coalescer is None:
+        with _fetch_coalescer_lock:
+            if _fetch_coalescer is None:
+                _fetch_coalescer = FetchCoalescer()
+                logger.debug(f"Fetch coalescing {'enabled' if _fetch_coalescer.enabled else 'disabled'} (window={_fetch_coalescer.window}s)")
+    return _fetch_coalescer
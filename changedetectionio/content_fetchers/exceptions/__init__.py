@@ -16,7 +16,9 @@ class Non200ErrorCodeReceived(Exception):
 
 
 class checksumFromPreviousCheckWasTheSame(Exception):
-    def __init__(self):
+    def __init__(self, update_obj=None):
+        # Anything about the fetch that should still be saved to the watch (content-type etc)
+        self.update_obj = update_obj or {}
         return
 
 
@@ -95,3 +97,12 @@ class ReplyWithContentButNoText(Exception):
         self.html_content = html_content
         self.xpath_data = xpath_data
         return
+
+
+class ResponseTooLarge(Exception):
+    def __init__(self, url, max_bytes, received=None):
+        # received is None when the Content-Length header already said it's too big
+        self.url = url
+        self.max_bytes = max_bytes
+        self.received = received
+        return
@@ -385,11 +385,12 @@ class fetcher(Fetcher):
                 # request_gc before and after evaluate to free up memory
                 # @todo browsersteps etc
                 MAX_TOTAL_HEIGHT = int(os.getenv("SCREENSHOT_MAX_HEIGHT", SCREENSHOT_MAX_HEIGHT_DEFAULT))
-                self.xpath_data = await self.page.evaluate(XPATH_ELEMENT_JS, {
-                    "visualselector_xpath_selectors": visualselector_xpath_selectors,
-                    "max_height": MAX_TOTAL_HEIGHT
-                })
-                await self.page.request_gc()
+                if self.scrape_xpath_elements:
+                    self.xpath_data = await self.page.evaluate(XPATH_ELEMENT_JS, {
+                        "visualselector_xpath_selectors": visualselector_xpath_selectors,
+                        "max_height": MAX_TOTAL_HEIGHT
+                    })
+                    await self.page.request_gc()
 
                 self.instock_data = await self.page.evaluate(INSTOCK_DATA_JS)
                 await self.page.request_gc()
@@ -484,12 +484,13 @@ class fetcher(Fetcher):
         # Force garbage collection - pyppeteer base64 decode creates temporary buffers
         import gc
         gc.collect()
-        self.xpath_data = await self.page.evaluate(XPATH_ELEMENT_JS, {
-            "visualselector_xpath_selectors": visualselector_xpath_selectors,
-            "max_height": MAX_TOTAL_HEIGHT
-        })
-        if not self.xpath_data:
-            raise Exception(f"Content Fetcher > xPath scraper failed. Please report this URL so we can fix it :)")
+        if self.scrape_xpath_elements:
+            self.xpath_data = await self.page.evaluate(XPATH_ELEMENT_JS, {
+                "visualselector_xpath_selectors": visualselector_xpath_selectors,
+                "max_height": MAX_TOTAL_HEIGHT
+            })
+            if not self.xpath_data:
+                raise Exception(f"Content Fetcher > xPath scraper failed. Please report this URL so we can fix it :)")
 
 
         self.instock_data = await self.page.evaluate(INSTOCK_DATA_JS)
@@ -4,14 +4,194 @@ from urllib.parse import urljoin, urlparse
 import hashlib
 import os
 import re
+import time
 import asyncio
+import codecs
+from functools import lru_cache
 
-from changedetectionio import strtobool
-from changedetectionio.content_fetchers.exceptions import BrowserStepsInUnsupportedFetcher, EmptyReply, Non200ErrorCodeReceived
-from changedetectionio.content_fetchers.base import Fetcher
+from changedetectionio import strtobool, check_metrics
+from changedetectionio.content_fetchers.exceptions import BrowserStepsInUnsupportedFetcher, EmptyReply, Non200ErrorCodeReceived, ResponseTooLarge
+from changedetectionio.content_fetchers.base import Fetcher, ResponseBody
 from changedetectionio.validate_url import is_fetch_url_allowed, is_private_hostname, is_url_private_or_parser_confused
 
 
+@lru_cache(maxsize=None)
+def _pinned_dns_adapter_class():
+    """Build PinnedDNSAdapter lazily, requests/urllib3 are only imported when this fetcher actually runs."""
+    import socket
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.exceptions import NewConnectionError
+    from changedetectionio.dns_cache import get_dns_cache
+    from changedetectionio.validate_url import is_special_purpose_ip
+
+    class _PinnedDNSConnectionMixin:
+        """Connect to the addresses held in the shared DNS cache - the same ones the SSRF gate validated.
+
+        urllib3 would otherwise call getaddrinfo() again inside create_connection(), which is both a
+        wasted lookup and the window a DNS rebinding server needs. The Host header, SNI and
+        certificate checks still use the original hostname, only the socket target is pinned.
+        """
+
+        def _new_conn(self):
+            hostname = self._dns_host
+            start = time.perf_counter()
+            try:
+                addresses = get_dns_cache().resolve(hostname)
+            except socket.gaierror as e:
+                raise NewConnectionError(self, f"Failed to establish a new connection: {e}")
+            finally:
+                check_metrics.record('dns', time.perf_counter() - start)
+
+            if not strtobool(os.getenv('ALLOW_IANA_RESTRICTED_ADDRESSES', 'false')):
+                for address in addresses:
+                    blocked, why = is_special_purpose_ip(address)
+                    if blocked:
+                        raise NewConnectionError(self, f"Connection blocked: '{hostname}' resolves to {address} which is {why}")
+
+            last_error = None
+            start = time.perf_counter()
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except NewConnectionError as e:
+                    last_error = e
+                finally:
+                    self._dns_host = hostname
+                    check_metrics.record('connect', time.perf_counter() - start)
+                    start = time.perf_counter()
+            raise last_error
+
+    class _PinnedHTTPConnection(_PinnedDNSConnectionMixin, HTTPConnection):
+        pass
+
+    class _PinnedHTTPSConnection(_PinnedDNSConnectionMixin, HTTPSConnection):
+        pass
+
+    class _PinnedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = _PinnedHTTPConnection
+
+    class _PinnedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = _PinnedHTTPSConnection
+
+    class PinnedDNSAdapter(HTTPAdapter):
+        """HTTPAdapter whose direct (non-proxied) connections resolve through the shared DNS cache.
+
+        Proxied requests are left alone, the proxy does the resolving for those.
+        """
+
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': _PinnedHTTPConnectionPool,
+                'https': _PinnedHTTPSConnectionPool,
+            }
+
+    return PinnedDNSAdapter
+
+
+# Read the body in pieces this size
+BODY_CHUNK_SIZE = 64 * 1024
+
+
+def _read_body(r, url, max_bytes=None):
+    """
+    Read the response body through md5 as it arrives, giving up as soon as it's past max_bytes.
+
+    Returns (body bytes, md5 hex digest). The Content-Length (when there is one) is checked first so an
+    oversized reply is refused without reading any of it, the count as it streams in catches the rest.
+    """
+    if max_bytes:
+        length = r.headers.get('content-length', '')
+        if length.isdigit() and int(length) > max_bytes:
+            r.close()
+            raise ResponseTooLarge(url=url, max_bytes=max_bytes)
+
+    hasher = hashlib.md5()
+    chunks = []
+    received = 0
+    for chunk in r.iter_content(chunk_size=BODY_CHUNK_SIZE):
+        received += len(chunk)
+        if max_bytes and received > max_bytes:
+            r.close()
+            raise ResponseTooLarge(url=url, max_bytes=max_bytes, received=received)
+        hasher.update(chunk)
+        chunks.append(chunk)
+
+    return b''.join(chunks), hasher.hexdigest()
+
+
+def _body_encoding(url, headers, raw):
+    """Work out the text encoding of a body, only called when something actually needs the text"""
+    import chardet
+    from requests.utils import get_encoding_from_headers
+
+    content_type = headers.get('content-type', '')
+    encoding = get_encoding_from_headers(headers)
+
+    # If the response did not tell us what encoding format to expect, Then use chardet to override what `requests` thinks.
+    # For example - some sites don't tell us it's utf-8, but return utf-8 content
+    # This seems to not occur when using webdriver/selenium, it seems to detect the text encoding more reliably.
+    # https://github.com/psf/requests/issues/1604 good info about requests encoding detection
+    if not content_type or not 'charset=' in content_type:
+        # For XML/RSS feeds, check the XML declaration for encoding attribute
+        # This is more reliable than chardet which can misdetect UTF-8 as MacRoman
+        content_type = content_type.lower()
+        if 'xml' in content_type or 'rss' in content_type:
+            # Look for <?xml version="1.0" encoding="UTF-8"?>
+            xml_encoding_match = re.search(rb'<\?xml[^>]+encoding=["\']([^"\']+)["\']', raw[:200])
+            if xml_encoding_match:
+                encoding = xml_encoding_match.group(1).decode('ascii')
+            else:
+                # Default to UTF-8 for XML if no encoding found
+                encoding = 'utf-8'
+        else:
+            # No charset in HTTP header - sniff encoding in priority order matching browsers
+            # (WHATWG encoding sniffing algorithm):
+            # 1. BOM - highest confidence, check before anything else
+            # 2. <meta charset> in first 2kb
+            # 3. chardet statistical detection - last resort
+            # See: https://github.com/dgtlmoon/changedetection.io/issues/3952
+            boms = [
+                (b'\xef\xbb\xbf', 'utf-8-sig'),
+                (b'\xff\xfe', 'utf-16-le'),
+                (b'\xfe\xff', 'utf-16-be'),
+            ]
+            bom_encoding = next((enc for bom, enc in boms if raw.startswith(bom)), None)
+            if bom_encoding:
+                logger.info(f"URL: {url} Using encoding '{bom_encoding}' detected from BOM")
+                encoding = bom_encoding
+            else:
+                meta_charset_match = re.search(rb'<meta[^>]+charset\s*=\s*["\']?\s*([^"\'\s;>]+)', raw[:2000], re.IGNORECASE)
+                if meta_charset_match:
+                    encoding = meta_charset_match.group(1).decode('ascii', errors='ignore')
+                    logger.info(f"URL: {url} No content-type encoding in HTTP headers - Using encoding '{encoding}' from HTML meta charset tag")
+                else:
+                    detected = chardet.detect(raw)['encoding']
+                    logger.warning(f"URL: {url} No charset in headers or meta tag, guessed encoding as '{detected}' via chardet")
+                    if detected:
+                        encoding = detected
+    return encoding
+
+
+def _decode_body(url, headers, raw):
+    """The body as text, the same way requests' Response.text decodes it"""
+    if not raw:
+        return ''
+    encoding = _body_encoding(url, headers, raw)
+    try:
+        codec = codecs.lookup(encoding or 'utf-8').name
+    except LookupError:
+        codec = 'utf-8'
+    text = str(raw, codec, errors='replace')
+    # Decoding with errors='replace' never leaves lone surrogates (see call_browser()) - except utf-7 which can spell them out
+    if codec == 'utf-7':
+        text = text.encode('utf-8', errors='replace').decode('utf-8')
+    return text
+
+
 # "html_requests" is listed as the default fetcher in store.py!
 class fetcher(Fetcher):
     fetcher_description = _l("Basic fast Plaintext/HTTP Client")
@@ -35,7 +215,6 @@ class fetcher(Fetcher):
             ):
         """Synchronous version of run - the original requests implementation"""
 
-        import chardet
         import requests
         from requests.exceptions import ProxyError, ConnectionError, RequestException
 
@@ -62,7 +241,7 @@ class fetcher(Fetcher):
         # Retries connection timeouts, read timeouts, connection resets - not HTTP status codes
         # Especially helpful in parallel test execution when servers are slow/overloaded
         # Configurable via REQUESTS_RETRY_MAX_COUNT (default: 3 attempts)
-        from requests.adapters import HTTPAdapter
+        # The adapter also pins each connection to the DNS-cache addresses the SSRF gate validated
         from urllib3.util.retry import Retry
 
         max_retries = int(os.getenv("REQUESTS_RETRY_MAX_COUNT", "6"))
@@ -75,7 +254,7 @@ class fetcher(Fetcher):
             allowed_methods=["HEAD", "GET", "OPTIONS", "POST"],
             raise_on_status=False
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = _pinned_dns_adapter_class()(max_retries=retry_strategy)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
 
@@ -85,8 +264,15 @@ class fetcher(Fetcher):
 
         allow_iana_restricted = strtobool(os.getenv('ALLOW_IANA_RESTRICTED_ADDRESSES', 'false'))
 
+        # dns/connect are recorded by the pinned connections, r.elapsed covers request sent -> headers parsed
+        # (including any new connection), the body is streamed in after that
+        self.fetch_timings = {}
+        response_wait = 0.0
+        request_started = time.perf_counter()
+
         try:
-            # Fresh DNS check at fetch time — catches DNS rebinding regardless of add-time cache.
+            # DNS check at fetch time — the addresses validated here are the ones the pinned adapter
+            # connects to (same dns_cache entry), which is what closes the DNS rebinding window.
             # Shared with every other fetch entry point, so the scheme allowlist and the
             # parser-differential rejection (GHSA-rph4-96w6-q594) stay in step here too.
             # Per-redirect-hop re-validation is done separately in the loop below.
@@ -94,14 +280,17 @@ class fetcher(Fetcher):
             if not ok:
                 raise Exception(reason)
 
-            r = session.request(method=request_method,
-                                data=request_body.encode('utf-8') if type(request_body) is str else request_body,
-                                url=url,
-                                headers=request_headers,
-                                timeout=timeout,
-                                proxies=proxies,
-                                verify=False,
-                                allow_redirects=False)
+            with check_metrics.recording(self.fetch_timings):
+                r = session.request(method=request_method,
+                                    data=request_body.encode('utf-8') if type(request_body) is str else request_body,
+                                    url=url,
+                                    headers=request_headers,
+                                    timeout=timeout,
+                                    proxies=proxies,
+                                    verify=False,
+                                    allow_redirects=False,
+                                    stream=True)
+            response_wait += r.elapsed.total_seconds()
 
             # Manually follow redirects so each hop's resolved IP can be validated,
             # preventing SSRF via an open redirect on a public host.
@@ -116,70 +305,38 @@ class fetcher(Fetcher):
                         raise Exception(f"Redirect blocked: '{redirect_url}' resolves to a private/reserved IP address "
                                         f"or contains a parser-differential payload.")
                 current_url = redirect_url
-                r = session.request('GET', redirect_url,
-                                    headers=request_headers,
-                                    timeout=timeout,
-                                    proxies=proxies,
-                                    verify=False,
-                                    allow_redirects=False)
+                # Done with the redirect's (unread) body, frees the connection for the next hop
+                r.close()
+                with check_metrics.recording(self.fetch_timings):
+                    r = session.request('GET', redirect_url,
+                                        headers=request_headers,
+                                        timeout=timeout,
+                                        proxies=proxies,
+                                        verify=False,
+                                        allow_redirects=False,
+                                        stream=True)
+                response_wait += r.elapsed.total_seconds()
             else:
                 raise Exception("Too many redirects")
 
+            # Streamed in, hashed on the way and cut off at max_bytes instead of buffering whatever the server sends
+            raw, checksum = _read_body(r, url=url, max_bytes=self.max_bytes)
+
+            connecting = self.fetch_timings.get('dns', 0.0) + self.fetch_timings.get('connect', 0.0)
+            self.fetch_timings['first_byte'] = max(0.0, response_wait - connecting)
+            self.fetch_timings['download'] = max(0.0, time.perf_counter() - request_started - response_wait)
+
+        except ResponseTooLarge:
+            raise
         except Exception as e:
             msg = str(e)
             if proxies and 'SOCKSHTTPSConnectionPool' in msg:
                 msg = f"Proxy connection failed? {msg}"
             raise Exception(msg) from e
 
-        # If the response did not tell us what encoding format to expect, Then use chardet to override what `requests` thinks.
-        # For example - some sites don't tell us it's utf-8, but return utf-8 content
-        # This seems to not occur when using webdriver/selenium, it seems to detect the text encoding more reliably.
-        # https://github.com/psf/requests/issues/1604 good info about requests encoding detection
-        if not is_binary:
-            # Don't run this for PDF (and requests identified as binary) takes a _long_ time
-            if not r.headers.get('content-type') or not 'charset=' in r.headers.get('content-type'):
-                # For XML/RSS feeds, check the XML declaration for encoding attribute
-                # This is more reliable than chardet which can misdetect UTF-8 as MacRoman
-                content_type = r.headers.get('content-type', '').lower()
-                if 'xml' in content_type or 'rss' in content_type:
-                    # Look for <?xml version="1.0" encoding="UTF-8"?>
-                    xml_encoding_match = re.search(rb'<\?xml[^>]+encoding=["\']([^"\']+)["\']', r.content[:200])
-                    if xml_encoding_match:
-                        r.encoding = xml_encoding_match.group(1).decode('ascii')
-                    else:
-                        # Default to UTF-8 for XML if no encoding found
-                        r.encoding = 'utf-8'
-                else:
-                    # No charset in HTTP header - sniff encoding in priority order matching browsers
-                    # (WHATWG encoding sniffing algorithm):
-                    # 1. BOM - highest confidence, check before anything else
-                    # 2. <meta charset> in first 2kb
-                    # 3. chardet statistical detection - last resort
-                    # See: https://github.com/dgtlmoon/changedetection.io/issues/3952
-                    boms = [
-                        (b'\xef\xbb\xbf', 'utf-8-sig'),
-                        (b'\xff\xfe', 'utf-16-le'),
-                        (b'\xfe\xff', 'utf-16-be'),
-                    ]
-                    bom_encoding = next((enc for bom, enc in boms if r.content.startswith(bom)), None)
-                    if bom_encoding:
-                        logger.info(f"URL: {url} Using encoding '{bom_encoding}' detected from BOM")
-                        r.encoding = bom_encoding
-                    else:
-                        meta_charset_match = re.search(rb'<meta[^>]+charset\s*=\s*["\']?\s*([^"\'\s;>]+)', r.content[:2000], re.IGNORECASE)
-                        if meta_charset_match:
-                            encoding = meta_charset_match.group(1).decode('ascii', errors='ignore')
-                            logger.info(f"URL: {url} No content-type encoding in HTTP headers - Using encoding '{encoding}' from HTML meta charset tag")
-                            r.encoding = encoding
-                        else:
-                            encoding = chardet.detect(r.content)['encoding']
-                            logger.warning(f"URL: {url} No charset in headers or meta tag, guessed encoding as '{encoding}' via chardet")
-                            if encoding:
-                                r.encoding = encoding
-
         self.headers = r.headers
 
-        if not r.content or not len(r.content):
+        if not raw:
             logger.debug(f"Requests returned empty content for '{url}'")
             if not empty_pages_are_a_change:
                 raise EmptyReply(url=url, status_code=r.status_code)
@@ -190,21 +347,23 @@ class fetcher(Fetcher):
         # @todo maybe you really want to test zero-byte return pages?
         if r.status_code != 200 and not ignore_status_codes:
             # maybe check with content works?
-            raise Non200ErrorCodeReceived(url=url, status_code=r.status_code, page_html=r.text)
+            raise Non200ErrorCodeReceived(url=url, status_code=r.status_code, page_html=_decode_body(url, r.headers, raw))
 
         self.status_code = r.status_code
         if is_binary:
             # Binary files just return their checksum until we add something smarter
-            self.content = hashlib.md5(r.content).hexdigest()
+            self.body = ResponseBody(raw=raw, text=checksum, checksum=checksum)
         else:
-            self.content = r.text
+            # Not decoded until something reads .content, an unchanged page never is (see get_raw_document_checksum())
+            headers = r.headers
+            self.body = ResponseBody(raw=raw, checksum=checksum, decode=lambda raw: _decode_body(url, headers, raw))
 
-        self.raw_content = r.content
+        self.raw_content = raw
 
         # If the content is an image, set it as screenshot for SSIM/visual comparison
         content_type = r.headers.get('content-type', '').lower()
         if 'image/' in content_type:
-            self.screenshot = r.content
+            self.screenshot = raw
             logger.debug(f"Image content detected ({content_type}), set as screenshot for comparison")
 
     async def run(self,
@@ -0,0 +1,213 @@
+"""
+Process-wide DNS resolution cache shared by the SSRF checks and the HTTP fetchers.
+
+Why: every check used to call socket.getaddrinfo() at least twice for the same hostname (once in
+is_fetch_url_allowed(), once more when requests/urllib3 opened the socket), plus once per redirect
+hop and once per add-time validation. With thousands of watches spread over a few hundred hosts
+that is a lot of identical resolver round-trips, and because the check and the connect were two
+separate lookups an attacker controlled DNS server could answer "public" to the first and
+"169.254.169.254" to the second (DNS rebinding).
+
+Now both go through the same cache entry: the SSRF gate validates the addresses held here and the
+requests fetcher (see content_fetchers/requests.py PinnedDNSAdapter) connects to exactly those
+addresses, so there is no second lookup to rebind.
+
+socket.getaddrinfo() does not expose the record TTL, so entries live for DNS_CACHE_TTL_SECONDS
+(default 60) which acts as an upper bound - keep it at or below the shortest TTL you care about.
+Failed lookups are cached for DNS_CACHE_NEGATIVE_TTL_SECONDS (default 10) so a dead domain shared
+by many watches does not hammer the resolver either. DNS_CACHE_TTL_SECONDS=0 disables caching.
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+
+def _is_ip_literal(hostname):
+    try:
+        ipaddress.ip_address(hostname)
+        return True
+    except ValueError:
+        return False
+
+
+def _addresses_from_getaddrinfo(infos):
+    """Reduce getaddrinfo() output (one row per family/socktype/proto) to unique IP strings, in resolver order."""
+    addresses = []
+    for info in infos:
+        # Strip any IPv6 zone index (fe80::1%eth0) - ipaddress and the SSRF checks want the bare address
+        address = str(info[4][0]).split('%', 1)[0]
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+class DNSCache:
+    """Thread-safe, TTL bounded hostname -> [ip, ...] cache with an asyncio front door.
+
+    resolve() is for synchronous callers (the requests fetcher runs in a thread pool), resolve_async()
+    is for the worker event loops - it uses loop.getaddrinfo() and coalesces concurrent lookups of the
+    same hostname into one resolver query.
+    """
+
+    def __init__(self, ttl=None, negative_ttl=None, max_entries=None):
+        self.ttl = float(ttl if ttl is not None else os.getenv('DNS_CACHE_TTL_SECONDS', 60))
+        self.negative_ttl = float(negative_ttl if negative_ttl is not None else os.getenv('DNS_CACHE_NEGATIVE_TTL_SECONDS', 10))
+        self.max_entries = int(max_entries if max_entries is not None else os.getenv('DNS_CACHE_MAX_ENTRIES', 4096))
+
+        # hostname -> (expires_at, addresses or None, gaierror or None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # (id(loop), hostname) -> Future, so two coroutines asking for the same name share one query
+        self._inflight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _get(self, hostname):
+        """Return the live cache entry for hostname or None, counting the hit/miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(hostname)
+                if entry[2] is not None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry
+            if entry:
+                del self._entries[hostname]
+            self.misses += 1
+            return None
+
+    def _store(self, hostname, addresses=None, error=None):
+        if not self.enabled:
+            return
+        ttl = self.negative_ttl if error is not None else self.ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[hostname] = (time.monotonic() + ttl, addresses, error)
+            self._entries.move_to_end(hostname)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _unpack(entry):
+        if entry[2] is not None:
+            raise entry[2]
+        return list(entry[1])
+
+    def resolve(self, hostname):
+        """Return the list of IP addresses for hostname, raising socket.gaierror if it does not resolve."""
+        if not hostname:
+            raise socket.gaierror(socket.EAI_NONAME, 'No hostname given')
+        hostname = hostname.rstrip('.').lower()
+
+        # Literals never touch the resolver and would only crowd out real names
+        if _is_ip_literal(hostname):
+            return [hostname]
+
+        if self.enabled:
+            entry = self._get(hostname)
+            if entry:
+                return self._unpack(entry)
+
+        try:
+            addresses = _addresses_from_getaddrinfo(socket.getaddrinfo(hostname, None))
+        except socket.gaierror as e:
+            self._store(hostname, error=e)
+            raise
+        self._store(hostname, addresses=addresses)
+        return list(addresses)
+
+    async def resolve_async(self, hostname):
+        """resolve() without blocking the event loop, sharing one in-flight query per hostname."""
+        if not hostname:
+            raise socket.gaierror(socket.EAI_NONAME, 'No hostname given')
+        hostname = hostname.rstrip('.').lower()
+
+        if _is_ip_literal(hostname):
+            return [hostname]
+
+        if self.enabled:
+            entry = self._get(hostname)
+            if entry:
+                return self._unpack(entry)
+
+        loop = asyncio.get_running_loop()
+        key = (id(loop), hostname)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return list(await asyncio.shield(pending))
+
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                addresses = _addresses_from_getaddrinfo(await loop.getaddrinfo(hostname, None))
+            except socket.gaierror as e:
+                self._store(hostname, error=e)
+                future.set_exception(e)
+                raise
+            self._store(hostname, addresses=addresses)
+            future.set_result(addresses)
+            return list(addresses)
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                # Marks any exception as retrieved so asyncio doesn't warn when no other coroutine was waiting
+                future.exception()
+
+    def invalidate(self, hostname=None):
+        """Forget one hostname, or everything when hostname is None."""
+        with self._lock:
+            if hostname is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(hostname.rstrip('.').lower(), None)
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            'ttl_seconds': self.ttl,
+        }
+
+
+_dns_cache = None
+_dns_cache_lock = threading.Lock()
+
+
+def get_dns_cache():
+    """Return the process-wide DNSCache, created on first use so env vars set by tests are honoured."""
+    global _dns_cache
+    if _dns_cache is None:
+        with _dns_cache_lock:
+            if _dns_cache is None:
+                _dns_cache = DNSCache()
+                logger.debug(f"DNS cache initialised (ttl={_dns_cache.ttl}s, negative_ttl={_dns_cache.negative_ttl}s, max_entries={_dns_cache.max_entries})")
+    return _dns_cache
@@ -0,0 +1,241 @@
+"""
+Background regex extraction across a watch's snapshot history ("Extract Data" CSV export).
+
+Scanning every snapshot (brotli decompress + re.findall) used to happen inside the POST request,
+which timed out for watches with years of history. An ExtractJob runs on its own thread instead,
+the snapshots are handed out in chunks to a small process pool (decompression and regex matching
+are CPU bound, so threads would just queue on the GIL) where each worker compiles the pattern
+once, and the results are written to the CSV in history order as they come back - only a bounded
+window of chunks is ever in flight, so neither the snapshots nor the CSV are held in memory.
+
+Short histories are scanned on the job thread, starting a pool costs more than it saves there.
+
+Progress is read back with to_dict() (polled by the extract page), a job can be cancelled between
+chunks and its finished CSV stays downloadable until the job is forgotten (see job_registry.py, the
+report file of an evicted job is removed).
+
+Environment variables:
+  EXTRACT_WORKERS                  — size of the process pool (default: CPU count, max 4)
+  EXTRACT_PROCESS_POOL_MIN_SNAPSHOTS — below this many snapshots no pool is used (default 200)
+  EXTRACT_CHUNK_SIZE               — snapshots per pool task (default 25)
+"""
+
+import csv
+import datetime
+import os
+import re
+import threading
+import time
+import uuid as uuid_builder
+from collections import deque
+
+from loguru import logger
+
+from .job_registry import MAX_ERRORS_REPORTED, JobRegistry
+
+_compiled_patterns = {}
+
+
+def _extract_chunk(regex, chunk):
+    """
+    Pool task - [(timestamp, filepath), ...] -> [(timestamp, matches, error), ...], one entry for every
+    snapshot that matched (error None) or couldn't be read (matches None).
+    """
+    from changedetectionio.model.Watch import read_history_snapshot_file
+
+    pattern = _compiled_patterns.get(regex)
+    if pattern is None:
+        pattern = _compiled_patterns[regex] = re.compile(regex, re.MULTILINE)
+
+    results = []
+    for timestamp, filepath in chunk:
+        try:
+            contents = read_history_snapshot_file(filepath)
+            if isinstance(contents, bytes):
+                continue
+            matches = pattern.findall(contents)
+        except Exception as e:
+            results.append((timestamp, None, str(e)))
+            continue
+        if matches:
+            results.append((timestamp, matches, None))
+    return results
+
+
+class ExtractJob:
+
+    def __init__(self, watch, regex, from_timestamp=None, to_timestamp=None, workers=None, chunk_size=None):
+        self.watch = watch
+        self.uuid = watch.get('uuid')
+        self.regex = regex
+        self.from_timestamp = from_timestamp
+        self.to_timestamp = to_timestamp
+        self.workers = max(1, int(workers if workers is not None else os.getenv('EXTRACT_WORKERS', min(4, os.cpu_count() or 1))))
+        self.chunk_size = max(1, int(chunk_size if chunk_size is not None else os.getenv('EXTRACT_CHUNK_SIZE', 25)))
+        self.min_pool_snapshots = int(os.getenv('EXTRACT_PROCESS_POOL_MIN_SNAPSHOTS', 200))
+
+        self.job_id = str(uuid_builder.uuid4())
+        self.status = 'queued'
+        self.total = 0
+        self.processed = 0
+        self.matched_snapshots = 0
+        self.rows = 0
+        self.errors = []
+        self.output_filename = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+        self._cancel = threading.Event()
+
+    def _error(self, message):
+        if len(self.errors) < MAX_ERRORS_REPORTED:
+            self.errors.append(message)
+
+    def _snapshots(self):
+        """(timestamp, resolved filepath) of every snapshot in the requested range, oldest first"""
+        snapshots = []
+        for k in list(self.watch.history.keys()):
+            ts = int(k)
+            if self.from_timestamp is not None and ts < self.from_timestamp:
+                continue
+            if self.to_timestamp is not None and ts > self.to_timestamp:
+                continue
+            try:
+                filepath = self.watch.get_history_snapshot_path(timestamp=k)
+            except Exception as e:
+                self._error(f"{k}: {str(e)}")
+                continue
+            if os.path.isfile(filepath):
+                snapshots.append((k, filepath))
+        return snapshots
+
+    def _chunk_results(self, chunks):
+        """Yield the result of every chunk in order, through the process pool when it's worth it"""
+        if self.workers < 2 or self.total < self.min_pool_snapshots:
+            for chunk in chunks:
+                if self._cancel.is_set():
+                    return
+                yield _extract_chunk(self.regex, chunk)
+            return
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn, not fork - see the multiprocessing notes in changedetectionio/__init__.py
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        in_flight = deque()
+        chunks = iter(chunks)
+        try:
+            for chunk in chunks:
+                in_flight.append(executor.submit(_extract_chunk, self.regex, chunk))
+                if len(in_flight) >= self.workers * 2:
+                    break
+            while in_flight:
+                if self._cancel.is_set():
+                    return
+                result = in_flight.popleft().result()
+                next_chunk = next(chunks, None)
+                if next_chunk is not None:
+                    in_flight.append(executor.submit(_extract_chunk, self.regex, next_chunk))
+                yield result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self):
+        self.status = 'running'
+        self.started = time.time()
+        report_fname = f"report-{self.uuid}-{self.job_id[:8]}.csv"
+        tmp_path = os.path.join(self.watch.data_dir, report_fname + '.tmp')
+        f = None
+
+        try:
+            re.compile(self.regex)
+            snapshots = self._snapshots()
+            self.total = len(snapshots)
+            chunks = [snapshots[i:i + self.chunk_size] for i in range(0, len(snapshots), self.chunk_size)]
+
+            for chunk, results in zip(chunks, self._chunk_results(chunks)):
+                for timestamp, matches, error in results:
+                    if error:
+                        self._error(f"{timestamp}: {error}")
+                        continue
+                    if f is None:
+                        # A file on the disk can be transferred much faster via flask than a string reply
+                        f = open(tmp_path, 'w', newline='')
+                        csv_writer = csv.writer(f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+                        csv_writer.writerow(['Epoch seconds', 'Date'])
+                    date_str = datetime.datetime.fromtimestamp(int(timestamp)).strftime('%Y-%m-%d %H:%M:%S')
+                    for r in matches:
+                        csv_writer.writerow([timestamp, date_str] + ([r] if isinstance(r, str) else list(r)))
+                        self.rows += 1
+                    self.matched_snapshots += 1
+                self.processed += len(chunk)
+
+            if self._cancel.is_set():
+                self.status = 'cancelled'
+            else:
+                if f:
+                    f.close()
+                    f = None
+                    os.replace(tmp_path, os.path.join(self.watch.data_dir, report_fname))
+                    self.output_filename = report_fname
+                self.status = 'done'
+        except Exception as e:
+            logger.exception(f"Extract job {self.job_id} for {self.uuid} failed")
+            self._error(str(e))
+            self.status = 'failed'
+        finally:
+            if f:
+                f.close()
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            self.finished = time.time()
+
+        logger.info(f"Extract job {self.job_id} for {self.uuid} {self.status}: {self.processed}/{self.total} snapshots, "
+                    f"{self.rows} rows in {self.finished - self.started:.2f}s")
+        return self
+
+    def start(self):
+        """Run the job on a daemon thread and return immediately"""
+        _jobs.register(self)
+        threading.Thread(target=self.run, daemon=True, name=f"ExtractJob-{self.job_id[:8]}").start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def remove_output(self):
+        if self.output_filename:
+            try:
+                os.unlink(os.path.join(self.watch.data_dir, self.output_filename))
+            except FileNotFoundError:
+                pass
+            self.output_filename = None
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            'job_id': self.job_id,
+            'uuid': self.uuid,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'matched_snapshots': self.matched_snapshots,
+            'rows': self.rows,
+            'errors': list(self.errors),
+            'has_output': bool(self.output_filename),
+            'created': int(self.created),
+            'duration_seconds': round(end - self.started, 3) if self.started else 0,
+        }
+
+
+_jobs = JobRegistry(on_evict=lambda job: job.remove_output())
+
+
+def get_job(job_id, uuid=None):
+    """The job, optionally only if it belongs to the watch with this UUID"""
+    job = _jobs.get(job_id)
+    if job and uuid and job.uuid != uuid:
+        return None
+    return job
@@ -41,11 +41,12 @@ from loguru import logger
 
 from changedetectionio import __version__
 from changedetectionio import queuedWatchMetaData
-from changedetectionio.api import Watch, WatchHistory, WatchSingleHistory, WatchHistoryDiff, CreateWatch, Import, SystemInfo, Tag, Tags, Notifications, WatchFavicon, Spec
+from changedetectionio.api import Watch, WatchHistory, WatchSingleHistory, WatchHistoryDiff, CreateWatch, Import, ImportJob, SystemInfo, Metrics, Tag, Tags, Notifications, WatchFavicon, WatchPriceHistory, Spec
 from changedetectionio.api.Search import Search
 from .time_handler import is_within_schedule
 from changedetectionio.languages import get_available_languages, get_language_codes, get_flag_for_locale, get_timeago_locale
 from changedetectionio.favicon_utils import get_favicon_mime_type
+from changedetectionio import image_derivatives
 
 IN_PYTEST = "pytest" in sys.modules or "PYTEST_CURRENT_TEST" in os.environ
 
@@ -60,6 +61,21 @@ update_q = RecheckPriorityQueue()
 notification_q = NotificationQueue()
 MAX_QUEUE_SIZE = 5000
 
+# GET endpoints that change (and commit) data, refused like any POST while the datastore is migrating.
+# endpoint -> the query args that make it write, an empty tuple when every GET writes
+WRITES_ON_GET = {
+    'watch': ('recheck', 'paused', 'muted'),
+    'createwatch': ('recheck_all',),
+    'tag': ('recheck', 'muted'),
+    'watchlist.index': ('op',),
+    'tags.mute': (),
+    'price_data_follower.accept': (),
+    'price_data_follower.reject': (),
+    'settings.settings_reset_api_key': (),
+    'settings.toggle_all_paused': (),
+    'settings.toggle_all_muted': (),
+}
+
 app = Flask(__name__,
             static_url_path="",
             static_folder="static",
@@ -351,6 +367,11 @@ def _jinja2_filter_pagination_slice(arr, skip):
 
     return arr
 
+@app.template_filter('derivative_version')
+def _jinja2_filter_derivative_version(filename):
+    # Cache-busting value for pre-generated images, see image_derivatives.py
+    return image_derivatives.derivative_version(filename)
+
 @app.template_filter('format_seconds_ago')
 def _jinja2_filter_seconds_precise(timestamp):
     if timestamp == False:
@@ -643,7 +664,7 @@ def changedetection_app(config=None, datastore_o=None):
             elif request.path.startswith('/socket.io/'):
                 return None
             # API routes - use their own auth mechanism (@auth.check_token)
-            elif request.path.startswith('/api/'):
+            elif request.path.startswith('/api/') or request.path == '/metrics':
                 return None
             else:
                 return login_manager.unauthorized()
@@ -658,6 +679,9 @@ def changedetection_app(config=None, datastore_o=None):
     watch_api.add_resource(WatchFavicon,
                            '/api/v1/watch/<uuid_str:uuid>/favicon',
                            resource_class_kwargs={'datastore': datastore})
+    watch_api.add_resource(WatchPriceHistory,
+                           '/api/v1/watch/<uuid_str:uuid>/price-history',
+                           resource_class_kwargs={'datastore': datastore})
     watch_api.add_resource(WatchHistory,
                            '/api/v1/watch/<uuid_str:uuid>/history',
                            resource_class_kwargs={'datastore': datastore})
@@ -671,10 +695,16 @@ def changedetection_app(config=None, datastore_o=None):
     watch_api.add_resource(SystemInfo, '/api/v1/systeminfo',
                            resource_class_kwargs={'datastore': datastore, 'update_q': update_q})
 
+    watch_api.add_resource(Metrics, '/api/v1/metrics', '/metrics',
+                           resource_class_kwargs={'datastore': datastore, 'update_q': update_q})
+
     watch_api.add_resource(Import,
                            '/api/v1/import',
                            resource_class_kwargs={'datastore': datastore})
 
+    watch_api.add_resource(ImportJob, '/api/v1/import/<string:job_id>',
+                           resource_class_kwargs={'datastore': datastore})
+
     watch_api.add_resource(Tags, '/api/v1/tags',
                            resource_class_kwargs={'datastore': datastore})
 
@@ -784,6 +814,22 @@ def changedetection_app(config=None, datastore_o=None):
 
         return redirect(url_for('login', redirect=redirect_url if redirect_url else None))
 
+    @app.before_request
+    def read_only_while_migrating():
+        # Schema updates are running in the background (store/updates.py), only reads are served until they finish
+        if not datastore.migrating.is_set() or (request.endpoint and 'login' in request.endpoint):
+            return None
+        writes = request.method not in ('GET', 'HEAD', 'OPTIONS')
+        if not writes and request.endpoint in WRITES_ON_GET:
+            write_args = WRITES_ON_GET[request.endpoint]
+            writes = not write_args or any(request.args.get(arg) for arg in write_args)
+        if writes:
+            from flask import make_response
+            response = make_response(gettext("Datastore upgrade in progress, changes can be made again when it has finished."), 503)
+            response.headers['Retry-After'] = '30'
+            return response
+        return None
+
     @app.before_request
     def before_request_handle_cookie_x_settings():
         # Set the auth cookie path if we're running as X-settings/X-Forwarded-Prefix
@@ -869,6 +915,18 @@ def changedetection_app(config=None, datastore_o=None):
             if not watch:
                 abort(404)
 
+            # Pre-generated small copy when there is one (see image_derivatives.py), the URL carries
+            # its content hash so the browser can keep it for good
+            derivative_filename = watch.get_favicon_derivative_filename()
+            if derivative_filename and os.path.isfile(os.path.join(watch.data_dir, derivative_filename)):
+                response = make_response(send_from_directory(watch.data_dir, derivative_filename))
+                response.headers['Content-type'] = 'image/png'
+                if request.args.get('v') == image_derivatives.derivative_version(derivative_filename):
+                    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+                else:
+                    response.headers['Cache-Control'] = 'max-age=300, must-revalidate'
+                return response
+
             favicon_filename = watch.get_favicon_filename()
             if favicon_filename:
                 # Use cached MIME type detection
@@ -884,6 +942,27 @@ def changedetection_app(config=None, datastore_o=None):
                 response.headers['Cache-Control'] = 'max-age=300, must-revalidate'  # Cache for 5 minutes, then revalidate
                 return response
 
+        if group == 'thumbnail':
+            # Same rules as the screenshot it was made from
+            if datastore.data['settings']['application']['password'] and not flask_login.current_user.is_authenticated:
+                if not datastore.data['settings']['application'].get('shared_diff_access'):
+                    abort(403)
+            watch = datastore.data['watching'].get(filename)
+            if not watch:
+                abort(404)
+
+            # Only ever sends the file generated after the screenshot was saved, never decodes the screenshot here
+            thumbnail_filename = watch.get_thumbnail_filename()
+            if not thumbnail_filename or not os.path.isfile(os.path.join(watch.data_dir, thumbnail_filename)):
+                abort(404)
+            response = make_response(send_from_directory(watch.data_dir, thumbnail_filename))
+            response.headers['Content-type'] = 'image/jpeg'
+            if request.args.get('v') == image_derivatives.derivative_version(thumbnail_filename):
+                response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+            else:
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+
         if group == 'visual_selector_data':
             # Could be sensitive, follow password requirements
             if datastore.data['settings']['application']['password'] and not flask_login.current_user.is_authenticated:
@@ -903,6 +982,11 @@ def changedetection_app(config=None, datastore_o=None):
                     logger.error(f'Request elements.deflate at "{watch_directory}" but was not found.')
                     abort(404)
 
+                # The Visual Selector is in use, keep scraping element data on the next checks (see xpath_element_data_wanted())
+                watch = datastore.data['watching'].get(filename)
+                if watch:
+                    watch['__visual_selector_opened'] = time.time()
+
                 if response:
                     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
                     response.headers['Pragma'] = 'no-cache'
@@ -1082,17 +1166,24 @@ def changedetection_app(config=None, datastore_o=None):
                        "snapshot reads are NOT confined to the watch data directory. "
                        "This disables protection against path traversal via restored backups (GHSA-8757-69j2-hx56).")
 
+    # Sharded mode (SHARD_NODE_ID), this node only checks its share of the watches, a coordinator none
+    from changedetectionio.sharding import start_shard
+    shard = start_shard(datastore, update_q, app.config.exit)
+    runs_checks = not shard or shard.runs_checks
+
     # Start the async workers during app initialization
     # Can be overridden by ENV or use the default settings
-    n_workers = int(os.getenv("FETCH_WORKERS", datastore.data['settings']['requests']['workers']))
-    logger.info(f"Starting {n_workers} workers during app initialization")
-    worker_pool.start_workers(n_workers, update_q, notification_q, app, datastore)
+    if runs_checks:
+        n_workers = int(os.getenv("FETCH_WORKERS", datastore.data['settings']['requests']['workers']))
+        logger.info(f"Starting {n_workers} workers during app initialization")
+        worker_pool.start_workers(n_workers, update_q, notification_q, app, datastore)
 
     # Skip background threads in batch mode (just process queue and exit)
     batch_mode = app.config.get('batch_mode', False)
     if not batch_mode:
         # @todo handle ctrl break
-        ticker_thread = threading.Thread(target=ticker_thread_check_time_launch_checks, daemon=True, name="TickerThread-ScheduleChecker").start()
+        if runs_checks:
+            ticker_thread = threading.Thread(target=ticker_thread_check_time_launch_checks, daemon=True, name="TickerThread-ScheduleChecker").start()
 
         # Start configurable number of notification workers (default 1)
         notification_workers = int(os.getenv("NOTIFICATION_WORKERS", "1"))
@@ -1202,6 +1293,8 @@ def notification_runner(worker_id=0):
 # Threaded runner, look for new watches to feed into the Queue.
 def ticker_thread_check_time_launch_checks():
     import random
+    from changedetectionio.sharding import get_shard
+    shard = get_shard()
     proxy_last_called_time = {}
     last_health_check = 0
 
@@ -1233,8 +1326,8 @@ def ticker_thread_check_time_launch_checks():
 
             last_health_check = now
 
-        # Check if all checks are paused
-        if datastore.data['settings']['application'].get('all_paused', False):
+        # Check if all checks are paused, or the datastore is read-only while it's being upgraded
+        if datastore.data['settings']['application'].get('all_paused', False) or datastore.migrating.is_set():
             app.config.exit.wait(1)
             continue
 
@@ -1281,6 +1374,14 @@ def ticker_thread_check_time_launch_checks():
             if watch['paused']:
                 continue
 
+            # Sharded mode, another node checks this one
+            if shard and not shard.owns(uuid):
+                continue
+
+            # Bulk imported watches have their first check staggered, see bulk_import.py
+            if watch.import_not_before and now < watch.import_not_before:
+                continue
+
             # @todo - Maybe make this a hook?
             # Time schedule limit - Decide between watch or global settings
             scheduler_source = None
@@ -1308,8 +1409,8 @@ def ticker_thread_check_time_launch_checks():
                         f"{uuid} - Recheck scheduler, error handling timezone, check skipped - TZ name '{tz_name}' - {str(e)}")
                     return False
 
-            # If they supplied an individual entry minutes to threshold.
-            threshold = recheck_time_system_seconds if watch.get('time_between_check_use_default') else watch.threshold_seconds()
+            # If they supplied an individual entry minutes to threshold, or the learned one with adaptive_recheck
+            threshold = watch.effective_threshold_seconds(recheck_time_system_seconds)
 
             # #580 - Jitter plus/minus amount of time to make the check seem more random to the server
             jitter = datastore.data['settings']['requests'].get('jitter_seconds', 0)
@@ -1324,7 +1425,7 @@ def ticker_thread_check_time_launch_checks():
 
                     # Proxies can be set to have a limit on seconds between which they can be called
                     watch_proxy = datastore.get_preferred_proxy_for_watch(uuid=uuid)
-                    if watch_proxy and watch_proxy in list(datastore.proxy_list.keys()):
+                    if watch_proxy and watch_proxy in (datastore.proxy_list or {}):
                         # Proxy may also have some threshold minimum
                         proxy_list_reuse_time_minimum = int(datastore.proxy_list.get(watch_proxy, {}).get('reuse_time_minimum', 0))
                         if proxy_list_reuse_time_minimum:
@@ -1343,17 +1444,20 @@ def ticker_thread_check_time_launch_checks():
 
                     # Use Epoch time as priority, so we get a "sorted" PriorityQueue, but we can still push a priority 1 into it.
                     priority = int(time.time())
+                    priority_class = queuedWatchMetaData.CHECK_PRIORITY_CLASSES.get(watch.get('check_priority'), queuedWatchMetaData.PRIORITY_CLASS_NORMAL)
 
-                    # Into the queue with you
+                    # Into the queue with you, it's late once the next check would have been due
                     queued_successfully = worker_pool.queue_item_async_safe(update_q,
                                                                                queuedWatchMetaData.PrioritizedItem(priority=priority,
-                                                                                                                   item={'uuid': uuid})
+                                                                                                                   item={'uuid': uuid},
+                                                                                                                   priority_class=priority_class,
+                                                                                                                   deadline=now + max(threshold, recheck_time_minimum_seconds))
                                                                                )
                     if queued_successfully:
                         logger.debug(
                             f"> Queued watch UUID {uuid} "
                             f"Checked at {watch['last_checked']} "
-                            f"queued at {now:0.2f} priority {priority} "
+                            f"queued at {now:0.2f} priority {priority} class {priority_class} "
                             f"jitter {watch.jitter_seconds:0.2f}s, "
                             f"{now - watch['last_checked']:0.2f}s since Checked")
                     else:
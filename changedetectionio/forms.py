@@ -885,6 +885,12 @@ class processor_text_json_diff_form(commonSettingsForm):
 
     time_between_check_use_default = BooleanField(_l('Use global settings for time between check and scheduler.'), default=False)
 
+    check_priority = SelectField(_l('Check priority'), choices=[('high', _l('High')), ('normal', _l('Normal')), ('low', _l('Low'))], default='normal')
+
+    adaptive_recheck = BooleanField(_l('Adapt the time between checks to how often the page changes'), default=False)
+    adaptive_recheck_min_seconds = IntegerField(_l('Shortest time between checks (seconds)'), validators=[validators.Optional(), validators.NumberRange(min=1, message=_l("Should be at least one second"))])
+    adaptive_recheck_max_seconds = IntegerField(_l('Longest time between checks (seconds)'), validators=[validators.Optional(), validators.NumberRange(min=1, message=_l("Should be at least one second"))])
+
     llm_intent = TextAreaField(_l('AI Change Intent'), validators=[validators.Optional(), validators.Length(max=2000)],
                                render_kw={"rows": "5", "placeholder": LLM_INTENT_WATCH_PLACEHOLDER})
 
@@ -915,6 +921,7 @@ class processor_text_json_diff_form(commonSettingsForm):
     body = TextAreaField(_l('Request body'), [validators.Optional()])
     method = SelectField(_l('Request method'), choices=valid_method, default=default_method)
     ignore_status_codes = BooleanField(_l('Ignore status codes (process non-2xx status codes as normal)'), default=False)
+    fetch_max_bytes = IntegerField(_l('Maximum download size (bytes)'), validators=[validators.Optional(), validators.NumberRange(min=1, message=_l("Should be at least one byte"))])
     check_unique_lines = BooleanField(_l('Only trigger when unique lines appear in all history'), default=False)
     remove_duplicate_lines = BooleanField(_l('Remove duplicate lines of text'), default=False)
     sort_text_alphabetically =  BooleanField(_l('Sort text alphabetically'), default=False)
@@ -962,6 +969,11 @@ class processor_text_json_diff_form(commonSettingsForm):
             self.body.errors.append(gettext('Body must be empty when Request Method is set to GET'))
             result = False
 
+        if self.adaptive_recheck_min_seconds.data and self.adaptive_recheck_max_seconds.data \
+                and self.adaptive_recheck_min_seconds.data > self.adaptive_recheck_max_seconds.data:
+            self.adaptive_recheck_max_seconds.errors.append(gettext('Must not be shorter than the shortest time between checks'))
+            result = False
+
         # Attempt to validate jinja2 templates in the URL
         try:
             jinja_render(template_str=self.url.data)
@@ -1322,4 +1334,6 @@ class globalSettingsForm(Form):
 
 class extractDataForm(Form):
     extract_regex = StringField(_l('RegEx to extract'), validators=[validators.DataRequired(), ValidateSinglePythonRegexString()])
+    extract_from_date = fields.DateField(_l('From date'), validators=[validators.Optional()])
+    extract_to_date = fields.DateField(_l('To date'), validators=[validators.Optional()])
     extract_submit_button = SubmitField(_l('Extract as CSV'), render_kw={"class": "pure-button pure-button-primary"})
@@ -2,13 +2,17 @@
 
 import ctypes
 import gc
+import os
 import re
 import psutil
 import sys
 import threading
+import time
 import importlib
 from loguru import logger
 
+from changedetectionio import strtobool
+
 def memory_cleanup(app=None):
     """
     Perform comprehensive memory cleanup operations and log memory usage
@@ -159,4 +163,168 @@ def memory_cleanup(app=None):
     # Log final memory usage
     final_memory = process.memory_info().rss / 1024 / 1024
     logger.info(f"Memory cleanup completed - Final memory usage: {final_memory:,.2f} MB")
-    return "cleaned"
\ No newline at end of file
+    return "cleaned"
+
+class GCPolicy:
+    """
+    When to pay for a full garbage collection.
+
+    A full gc.collect() walks every tracked object - with tens of thousands of Watch objects that's
+    tens of milliseconds holding the GIL, which used to happen at the end of every single check in
+    every worker. Instead:
+
+    - after startup everything loaded so far (datastore, modules, app) is gc.freeze()'d into the
+      permanent generation, so collections never walk it again
+    - the young generation threshold is raised, a check allocates a lot of short-lived objects and
+      the default (700) makes generation 0 collections almost continuous
+    - maybe_collect() (called after each check) only runs a full collection when RSS grew by
+      GC_FULL_COLLECT_RSS_GROWTH_MB since the last one, or GC_FULL_COLLECT_INTERVAL seconds passed,
+      and never more often than GC_FULL_COLLECT_MIN_INTERVAL seconds
+
+    Every collection (automatic or not) is counted and timed through gc.callbacks.
+
+    Environment variables:
+      GC_THRESHOLDS                    — gen0,gen1,gen2 for gc.set_threshold() (default 10000,20,20)
+      GC_FREEZE_AFTER_STARTUP          — gc.freeze() once the app is loaded (default true)
+      GC_FULL_COLLECT_RSS_GROWTH_MB    — full collection when RSS grew this much (default 64)
+      GC_FULL_COLLECT_INTERVAL         — full collection at least this often, seconds (default 300)
+      GC_FULL_COLLECT_MIN_INTERVAL     — and no more often than this, seconds (default 10)
+    """
+
+    def __init__(self):
+        self.thresholds = tuple(int(x) for x in os.getenv('GC_THRESHOLDS', '10000,20,20').split(','))[:3]
+        self.rss_growth_bytes = int(float(os.getenv('GC_FULL_COLLECT_RSS_GROWTH_MB', 64)) * 1024 * 1024)
+        self.max_interval = float(os.getenv('GC_FULL_COLLECT_INTERVAL', 300))
+        self.min_interval = float(os.getenv('GC_FULL_COLLECT_MIN_INTERVAL', 10))
+
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+        self._last_full = time.monotonic()
+        self._rss_at_last_full = self._rss()
+        self.full_collections = {'rss_growth': 0, 'interval': 0}
+        self.frozen_objects = 0
+
+        # Per generation: collections, objects collected, total and longest pause
+        self.collections = [0, 0, 0]
+        self.collected = [0, 0, 0]
+        self.pause_seconds = [0.0, 0.0, 0.0]
+        self.max_pause_seconds = [0.0, 0.0, 0.0]
+        self._started = {}
+        gc.callbacks.append(self._gc_callback)
+
+    def _rss(self):
+        try:
+            return self._process.memory_info().rss
+        except Exception:
+            return 0
+
+    def _gc_callback(self, phase, info):
+        # Collections can start on any thread, key by thread so concurrent ones don't mix up
+        key = threading.get_ident()
+        if phase == 'start':
+            self._started[key] = time.perf_counter()
+            return
+        started = self._started.pop(key, None)
+        generation = min(info.get('generation', 2), 2)
+        self.collections[generation] += 1
+        self.collected[generation] += info.get('collected', 0)
+        if started is not None:
+            pause = time.perf_counter() - started
+            self.pause_seconds[generation] += pause
+            if pause > self.max_pause_seconds[generation]:
+                self.max_pause_seconds[generation] = pause
+
+    def apply_startup(self):
+        """Set the thresholds and freeze everything allocated so far, call once the app has finished loading"""
+        if len(self.thresholds) == 3:
+            gc.set_threshold(*self.thresholds)
+        if strtobool(os.getenv('GC_FREEZE_AFTER_STARTUP', 'true')) and hasattr(gc, 'freeze'):
+            # Don't freeze garbage from the startup itself
+            gc.collect()
+            gc.freeze()
+            self.frozen_objects = gc.get_freeze_count()
+        self._last_full = time.monotonic()
+        self._rss_at_last_full = self._rss()
+        logger.info(f"GC policy: thresholds {gc.get_threshold()}, {self.frozen_objects:,} objects frozen after startup")
+
+    def maybe_collect(self):
+        """Run a full collection if RSS grew enough or it's been too long since the last one, returns the reason or None"""
+        now = time.monotonic()
+        since_last = now - self._last_full
+        if since_last < self.min_interval:
+            return None
+
+        reason = None
+        rss = self._rss()
+        if self.rss_growth_bytes and rss - self._rss_at_last_full >= self.rss_growth_bytes:
+            reason = 'rss_growth'
+        elif self.max_interval and since_last >= self.max_interval:
+            reason = 'interval'
+        if not reason:
+            return None
+
+        with self._lock:
+            # Another worker got here first
+            if time.monotonic() - self._last_full < self.min_interval:
+                return None
+            self._last_full = time.monotonic()
+            gc.collect()
+            self._rss_at_last_full = self._rss()
+            self.full_collections[reason] += 1
+
+        logger.debug(f"GC policy: full collection ({reason}), RSS {rss / 1024 / 1024:,.1f} MB -> {self._rss_at_last_full / 1024 / 1024:,.1f} MB")
+        return reason
+
+    def stats(self):
+        return {
+            'thresholds': list(gc.get_threshold()),
+            'frozen_objects': gc.get_freeze_count() if hasattr(gc, 'get_freeze_count') else 0,
+            'full_collections': dict(self.full_collections),
+            'generations': [
+                {
+                    'collections': self.collections[g],
+                    'collected': self.collected[g],
+                    'pause_seconds': round(self.pause_seconds[g], 4),
+                    'max_pause_seconds': round(self.max_pause_seconds[g], 4),
+                }
+                for g in range(3)
+            ],
+            'rss_bytes': self._rss(),
+        }
+
+    def openmetrics_lines(self):
+        lines = [
+            '# TYPE changedetection_gc_collections counter',
+            '# HELP changedetection_gc_collections Garbage collections by generation.',
+        ]
+        lines += [f'changedetection_gc_collections_total{{generation="{g}"}} {self.collections[g]}' for g in range(3)]
+        lines += [
+            '# TYPE changedetection_gc_pause_seconds counter',
+            '# UNIT changedetection_gc_pause_seconds seconds',
+            '# HELP changedetection_gc_pause_seconds Time spent in garbage collection by generation.',
+        ]
+        lines += [f'changedetection_gc_pause_seconds_total{{generation="{g}"}} {self.pause_seconds[g]}' for g in range(3)]
+        lines += [
+            '# TYPE changedetection_gc_full_collections counter',
+            '# HELP changedetection_gc_full_collections Full collections started by the GC policy.',
+        ]
+        lines += [f'changedetection_gc_full_collections_total{{reason="{r}"}} {n}' for r, n in sorted(self.full_collections.items())]
+        lines += [
+            '# TYPE changedetection_process_resident_memory_bytes gauge',
+            '# HELP changedetection_process_resident_memory_bytes Resident set size.',
+            f'changedetection_process_resident_memory_bytes {self._rss()}',
+        ]
+        return lines
+
+
+_gc_policy = None
+_gc_policy_lock = threading.Lock()
+
+
+def get_gc_policy():
+    global _gc_policy
+    if _gc_policy is None:
+        with _gc_policy_lock:
+            if _gc_policy is None:
+                _gc_policy = GCPolicy()
+    return _gc_policy
@@ -1,3 +1,4 @@
+from bisect import bisect_right
 from functools import lru_cache
 
 from loguru import logger
@@ -598,68 +599,150 @@ def extract_json_as_string(content, json_filter, ensure_is_ldjson_info_type=None
 
     return stripped_text_from_html
 
+# Backreferences and conditionals refer to groups by number, which moves once the regex is fused with others
+_REGEX_GROUP_REFERENCE = re.compile(r'\\[1-9]|\\g<|\(\?P=|\(\?\(')
+
+
+class IgnoreRuleSet:
+    """
+    An ignore_text / trigger_text / text_should_not_be_present rule list compiled for matching, see compile_ignore_rules()
+
+    - Plain words match case-insensitively anywhere in the line, each one is searched for over the whole
+      lower-cased text in one pass (str.find) instead of lower-casing every line once per word
+    - /regex/ rules without the m or s flag run against each line, fused into a single alternation
+    - /regex/ms rules run over the whole text, their matches are mapped to line numbers with bisect over the line
+      start offsets instead of re-splitting everything up to each match
+    """
+
+    def __init__(self, wordlist):
+        self.literals = []
+        self.regexes = []
+        self.multiline_regexes = []
+
+        fusable = []
+        for k in wordlist:
+            # Skip empty strings to avoid matching everything
+            if not k or not k.strip():
+                continue
+            # Is it a regex?
+            res = re.search(PERL_STYLE_REGEX, k, re.IGNORECASE)
+            if res:
+                body = res.group(1)
+                res = re.compile(perl_style_slash_enclosed_regex_to_options(k))
+                if res.flags & re.DOTALL or res.flags & re.MULTILINE:
+                    self.multiline_regexes.append(res)
+                else:
+                    self.regexes.append(res)
+                    fusable.append((res, body))
+            else:
+                literal = k.strip().lower()
+                # A line never contains a line break in the middle, so those can never match
+                if len(literal.splitlines()) == 1:
+                    self.literals.append(literal)
+
+        self.fused_regex = self._fuse(fusable) if len(self.regexes) > 1 else None
+
+    @staticmethod
+    def _fuse(regexes):
+        """One pattern matching wherever any of the single line regexes would, or None when they can't be combined"""
+        parts = []
+        for compiled, body in regexes:
+            if compiled.flags & re.VERBOSE or _REGEX_GROUP_REFERENCE.search(body):
+                return None
+            flags = ('i' if compiled.flags & re.IGNORECASE else '') + ('a' if compiled.flags & re.ASCII else '')
+            part = f"(?{flags}:{body})" if flags else f"(?:{body})"
+            try:
+                if re.compile(part).groups != compiled.groups:
+                    return None
+            except re.error:
+                return None
+            parts.append(part)
+        try:
+            return re.compile('|'.join(parts))
+        except re.error:
+            # Duplicate group names etc
+            return None
+
+    def ignored_line_indexes(self, content, lines):
+        """0-based indexes of the lines of `content` (split into `lines` with keepends) that the rules match"""
+        ignored_lines = []
+
+        if self.multiline_regexes:
+            # Offset where each line starts, line_of(offset) is then a bisect
+            line_starts = []
+            offset = 0
+            for line in lines:
+                line_starts.append(offset)
+                offset += len(line)
+
+            def line_of(offset):
+                return bisect_right(line_starts, offset) - 1
+
+            for r in self.multiline_regexes:
+                for match in r.finditer(content):
+                    # Same as len(content[:match.end()].splitlines()) and len(content[match.start():match.end()].splitlines())
+                    end_line = line_of(match.end() - 1) + 1 if match.end() else 0
+                    match_line_count = line_of(match.end() - 1) - line_of(match.start()) + 1 if match.end() > match.start() else 0
+                    start_line = end_line - match_line_count
+
+                    if end_line - start_line <= 1:
+                        # Match is empty or in the middle of the line
+                        ignored_lines.append(start_line)
+                    else:
+                        for i in range(start_line, end_line):
+                            ignored_lines.append(i)
+
+        literal_lines = set()
+        if self.literals:
+            # Lower-casing never adds or removes line breaks, so the line numbers line up with `lines`
+            lowered = content.lower()
+            lowered_line_ends = []
+            offset = 0
+            for line in lowered.splitlines(keepends=True):
+                offset += len(line)
+                lowered_line_ends.append(offset)
+
+            for literal in self.literals:
+                position = lowered.find(literal)
+                while position != -1:
+                    line_index = bisect_right(lowered_line_ends, position)
+                    literal_lines.add(line_index)
+                    # One hit per line is enough, carry on from the next line
+                    position = lowered.find(literal, lowered_line_ends[line_index])
+
+        if not self.regexes:
+            ignored_lines.extend(sorted(literal_lines))
+            return ignored_lines
+
+        regexes = [self.fused_regex] if self.fused_regex else self.regexes
+        for line_index, line in enumerate(lines):
+            if line_index in literal_lines or any(r.search(line) for r in regexes):
+                ignored_lines.append(line_index)
+
+        return ignored_lines
+
+
+@lru_cache(maxsize=1000)
+def _compile_ignore_rules(wordlist):
+    return IgnoreRuleSet(wordlist)
+
+
+def compile_ignore_rules(wordlist):
+    """IgnoreRuleSet for the rule list, built once per distinct list and reused on every check"""
+    return _compile_ignore_rules(tuple(wordlist))
+
+
 # Mode     - "content" return the content without the matches (default)
 #          - "line numbers" return a list of line numbers that match (int list)
 #
 # wordlist - list of regex's (str) or words (str)
 # Preserves all linefeeds and other whitespacing, its not the job of this to remove that
 def strip_ignore_text(content, wordlist, mode="content"):
-    ignore_text = []
-    ignore_regex = []
-    ignore_regex_multiline = []
-    ignored_lines = []
-
     if not content:
         return ''
 
-    for k in wordlist:
-        # Skip empty strings to avoid matching everything
-        if not k or not k.strip():
-            continue
-        # Is it a regex?
-        res = re.search(PERL_STYLE_REGEX, k, re.IGNORECASE)
-        if res:
-            res = re.compile(perl_style_slash_enclosed_regex_to_options(k))
-            if res.flags & re.DOTALL or res.flags & re.MULTILINE:
-                ignore_regex_multiline.append(res)
-            else:
-                ignore_regex.append(res)
-        else:
-            ignore_text.append(k.strip())
-
-    for r in ignore_regex_multiline:
-        for match in r.finditer(content):
-            content_lines = content[:match.end()].splitlines(keepends=True)
-            match_lines = content[match.start():match.end()].splitlines(keepends=True)
-
-            end_line = len(content_lines)
-            start_line = end_line - len(match_lines)
-
-            if end_line - start_line <= 1:
-                # Match is empty or in the middle of the line
-                ignored_lines.append(start_line)
-            else:
-                for i in range(start_line, end_line):
-                    ignored_lines.append(i)
-
-    line_index = 0
     lines = content.splitlines(keepends=True)
-    for line in lines:
-        # Always ignore blank lines in this mode. (when this function gets called)
-        got_match = False
-        for l in ignore_text:
-            if l.lower() in line.lower():
-                got_match = True
-
-        if not got_match:
-            for r in ignore_regex:
-                if r.search(line):
-                    got_match = True
-
-        if got_match:
-            ignored_lines.append(line_index)
-
-        line_index += 1
+    ignored_lines = compile_ignore_rules(wordlist).ignored_line_indexes(content, lines)
 
     ignored_lines = set([i for i in ignored_lines if i >= 0 and i < len(lines)])
 
@@ -691,21 +774,30 @@ def html_to_text(html_content: str, render_anchor_tag_content=False, is_rss=Fals
     lxml.html.fromstring() with the default parser. Testing with 50 concurrent threads
     confirms this approach is thread-safe and produces deterministic output.
 
+    inscriptis itself is not: every parse attaches its output canvas to the CSS profile's
+    shared <body> element, so concurrent calls (one per worker) wrote text into each other's
+    canvas and large pages (long tables) came back empty. Each call gets its own <body> element.
+
     Alternative Approach Rejected: An explicit HTMLParser instance (thread-local or fresh)
     would also be thread-safe, but was found to break change detection logic in subtle ways
     (test_check_basic_change_detection_functionality). The default parser provides correct
     and reliable behavior.
     """
     from inscriptis import get_text
-    from inscriptis.model.config import ParserConfig
+    from inscriptis.css_profiles import CSS_PROFILES
+    from inscriptis.model.config import ParserConfig, DEFAULT_CSS_PROFILE_NAME
+
+    css = dict(CSS_PROFILES[DEFAULT_CSS_PROFILE_NAME])
+    css['body'] = css['body'].__copy__()
 
     if render_anchor_tag_content:
         parser_config = ParserConfig(
+            css=css,
             annotation_rules={"a": ["hyperlink"]},
             display_links=True
         )
     else:
-        parser_config = None
+        parser_config = ParserConfig(css=css)
     if is_rss:
         html_content = re.sub(r'<title([\s>])', r'<h1\1', html_content)
         html_content = re.sub(r'</title>', r'</h1>', html_content)
@@ -0,0 +1,193 @@
+"""
+Pre-generated image derivatives (screenshot thumbnails, resized favicons) for changedetection.io
+
+Decoding a full page screenshot with PIL takes long enough that doing it inside a request
+handler - once per watch, right after a check cycle replaced every screenshot - made the page
+render wait on dozens of image decodes. Instead the derivatives are rendered on a small
+background pool as soon as the source image is written (Watch.save_screenshot() and
+Watch.bump_favicon()), request handlers only ever look up and send the finished file.
+
+Derivative filenames carry a hash of the source image (thumbnail-<hash>.jpeg,
+favicon-32-<hash>.png), so a URL that includes the hash can be cached by the browser forever.
+
+Environment variables:
+  IMAGE_DERIVATIVE_WORKERS  — size of the background pool (default 2)
+"""
+
+import glob
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+THUMBNAIL = 'thumbnail'
+FAVICON = 'favicon-32'
+
+THUMBNAIL_SIZE = 350
+THUMBNAIL_TOP_TRIM = 500  # Pixels from top of screenshot to use
+FAVICON_SIZE = 32
+
+_EXTENSIONS = {THUMBNAIL: 'jpeg', FAVICON: 'png'}
+
+# Module-level derivative filename cache: (data_dir, kind) → basename (or None)
+# Same idea as Watch._FAVICON_FILENAME_CACHE, invalidated whenever a derivative is (re)generated.
+_DERIVATIVE_FILENAME_CACHE: dict = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+# (data_dir, kind) → True when the source changed again while its derivative was being generated
+_pending = {}
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=max(1, int(os.getenv('IMAGE_DERIVATIVE_WORKERS', 2))),
+                                           thread_name_prefix='ImageDerivative')
+    return _pool
+
+
+def _source_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def get_derivative_filename(data_dir, kind):
+    """Basename of the current derivative of this kind in data_dir, or None if it hasn't been generated (yet)"""
+    key = (data_dir, kind)
+    if key in _DERIVATIVE_FILENAME_CACHE:
+        return _DERIVATIVE_FILENAME_CACHE[key]
+
+    files = sorted(glob.glob(os.path.join(data_dir, f"{kind}-*.{_EXTENSIONS[kind]}")), key=os.path.getmtime)
+    fname = os.path.basename(files[-1]) if files else None
+    _DERIVATIVE_FILENAME_CACHE[key] = fname
+    return fname
+
+
+def derivative_version(filename):
+    """The source hash part of a derivative filename, used as a cache-busting URL parameter"""
+    if not filename:
+        return None
+    return filename.rsplit('.', 1)[0].rsplit('-', 1)[-1]
+
+
+def invalidate(data_dir):
+    for kind in _EXTENSIONS:
+        _DERIVATIVE_FILENAME_CACHE.pop((data_dir, kind), None)
+
+
+def _render_thumbnail(img):
+    from PIL import Image
+
+    # Crop top portion first (full width, top_trim height)
+    top_crop_height = min(THUMBNAIL_TOP_TRIM, img.height)
+    img = img.crop((0, 0, img.width, top_crop_height))
+
+    # Create a smaller intermediate image (to reduce memory usage)
+    aspect = img.width / img.height
+    interim_width = min(THUMBNAIL_TOP_TRIM, img.width)
+    interim_height = int(interim_width / aspect) if aspect > 0 else THUMBNAIL_TOP_TRIM
+    img = img.resize((interim_width, interim_height), Image.NEAREST)
+
+    # Convert to RGB if needed
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Crop to square from top center
+    square_size = min(img.width, img.height)
+    left = (img.width - square_size) // 2
+    img = img.crop((left, 0, left + square_size, square_size))
+
+    # Final resize to exact thumbnail size with better filter
+    return img.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR)
+
+
+def _render_favicon(img):
+    from PIL import Image
+
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    img.thumbnail((FAVICON_SIZE, FAVICON_SIZE), Image.LANCZOS)
+    return img
+
+
+def generate_derivative(data_dir, kind, source_path):
+    """
+    Render one derivative of source_path into data_dir, replacing any older one.
+    Returns the new basename, or None when there's nothing to generate - the source can't be decoded
+    (for example an SVG favicon) or the favicon is already small - and the original is served as-is.
+    """
+    from PIL import Image
+
+    if not source_path or not os.path.isfile(source_path):
+        return None
+
+    source_hash = _source_hash(source_path)
+    fname = f"{kind}-{source_hash}.{_EXTENSIONS[kind]}"
+    target = os.path.join(data_dir, fname)
+
+    if not os.path.isfile(target):
+        try:
+            with Image.open(source_path) as img:
+                if kind == THUMBNAIL:
+                    _render_thumbnail(img).save(target + '.tmp', "JPEG", quality=75, optimize=True)
+                elif img.width <= FAVICON_SIZE and img.height <= FAVICON_SIZE:
+                    # Already small, the original is served as-is
+                    fname = None
+                else:
+                    _render_favicon(img).save(target + '.tmp', "PNG", optimize=True)
+            if fname:
+                os.replace(target + '.tmp', target)
+        except Exception as e:
+            logger.debug(f"Could not create {kind} derivative of {source_path} - {str(e)}")
+            if os.path.exists(target + '.tmp'):
+                os.unlink(target + '.tmp')
+            fname = None
+
+    # Anything generated from an older source is stale now
+    for old in glob.glob(os.path.join(data_dir, f"{kind}-*.{_EXTENSIONS[kind]}")):
+        if os.path.basename(old) != fname:
+            try:
+                os.unlink(old)
+            except FileNotFoundError:
+                pass
+
+    _DERIVATIVE_FILENAME_CACHE[(data_dir, kind)] = fname
+    return fname
+
+
+def schedule_derivative(data_dir, kind, source_path, on_done=None):
+    """Queue generate_derivative() on the background pool, repeated requests for the same target are merged"""
+    key = (data_dir, kind)
+    with _pool_lock:
+        if key in _pending:
+            # Already queued or running, make sure it looks at the source once more when it finishes
+            _pending[key] = True
+            return None
+        _pending[key] = False
+
+    def _run():
+        while True:
+            fname = None
+            try:
+                fname = generate_derivative(data_dir, kind, source_path)
+                if fname and on_done:
+                    on_done(fname)
+            except Exception as e:
+                logger.error(f"Error creating {kind} derivative in {data_dir} - {str(e)}")
+
+            with _pool_lock:
+                if _pending.get(key):
+                    _pending[key] = False
+                    continue
+                _pending.pop(key, None)
+            return fname
+
+    return _get_pool().submit(_run)
@@ -6,6 +6,7 @@ from .safe_jinja import (
     render,
     render_fully_escaped,
     create_jinja_env,
+    template_cache,
     JINJA2_MAX_RETURN_PAYLOAD_SIZE,
     DEFAULT_JINJA2_EXTENSIONS,
 )
@@ -16,6 +17,7 @@ __all__ = [
     'render',
     'render_fully_escaped',
     'create_jinja_env',
+    'template_cache',
     'JINJA2_MAX_RETURN_PAYLOAD_SIZE',
     'DEFAULT_JINJA2_EXTENSIONS',
     'regex_replace',
@@ -4,9 +4,12 @@ Safe Jinja2 render with max payload sizes
 See https://jinja.palletsprojects.com/en/3.1.x/sandbox/#security-considerations
 """
 
+import hashlib
 import jinja2.sandbox
+import threading
 import typing as t
 import os
+from collections import OrderedDict
 from .extensions.TimeExtension import TimeExtension
 from .plugins import regex_replace
 
@@ -44,11 +47,83 @@ def create_jinja_env(extensions=None, **kwargs) -> jinja2.sandbox.ImmutableSandb
     return jinja2_env
 
 
+# Compiling a template (parse + codegen + compile to bytecode) costs far more than rendering it, and the same
+# handful of templates (notification body/title/URLs, the RSS entry template, watch URLs) are rendered over and over.
+# So keep one long-lived environment per extension set and a bounded LRU of compiled templates keyed by source hash.
+JINJA2_TEMPLATE_CACHE_SIZE = int(os.getenv("JINJA2_TEMPLATE_CACHE_SIZE", 500))
+
+
+class _CompiledTemplateCache:
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._environments = {}
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def environment(self, extensions=None):
+        if extensions is None:
+            extensions = DEFAULT_JINJA2_EXTENSIONS
+        # The default timezone is read from TZ when the environment is created, so it's part of the key
+        key = (tuple(extensions), os.getenv('TZ', 'UTC').strip())
+        with self._lock:
+            env = self._environments.get(key)
+        if env is None:
+            env = create_jinja_env(extensions=extensions)
+            with self._lock:
+                env = self._environments.setdefault(key, env)
+        return env
+
+    def get_template(self, template_str, extensions=None) -> jinja2.Template:
+        env = self.environment(extensions)
+        key = (id(env), hashlib.sha256(template_str.encode('utf-8', errors='surrogatepass')).digest())
+
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+
+        # Compiled outside the lock, a syntax error is raised to the caller and nothing is cached
+        template = env.from_string(template_str)
+
+        if self.max_entries > 0:
+            with self._lock:
+                self._templates[key] = template
+                while len(self._templates) > self.max_entries:
+                    self._templates.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self._environments.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._templates)
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+template_cache = _CompiledTemplateCache(max_entries=JINJA2_TEMPLATE_CACHE_SIZE)
+
+
 # This is used for notifications etc, so actually it's OK to send custom HTML such as <a href> etc, but it should limit what data is available.
 # (Which also limits available functions that could be called)
 def render(template_str, **args: t.Any) -> str:
-    jinja2_env = create_jinja_env()
-    output = jinja2_env.from_string(template_str).render(args)
+    output = template_cache.get_template(template_str).render(args)
     return output[:JINJA2_MAX_RETURN_PAYLOAD_SIZE]
 
 def render_fully_escaped(content):
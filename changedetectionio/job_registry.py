@@ -0,0 +1,49 @@
+"""
+The background jobs a user polls by job id (bulk import, "Extract Data"), remembered in memory.
+
+Each kind of job keeps its own JobRegistry. Only the last MAX_JOBS_REMEMBERED are kept, the oldest
+finished job is forgotten to make room for a new one. A job that is still queued or running is never
+evicted (that would cancel or orphan someone's work), when every slot holds one the new job is
+refused with JobRegistryFull instead.
+
+Jobs need a job_id and a `finished` attribute that stays None until their run() returns.
+"""
+
+import threading
+from collections import OrderedDict
+
+MAX_ERRORS_REPORTED = 50
+MAX_JOBS_REMEMBERED = 20
+
+
+class JobRegistryFull(Exception):
+    pass
+
+
+class JobRegistry:
+
+    def __init__(self, max_jobs=MAX_JOBS_REMEMBERED, on_evict=None):
+        self.max_jobs = max_jobs
+        self.on_evict = on_evict
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, job):
+        evicted = []
+        with self._lock:
+            for job_id in list(self._jobs):
+                if len(self._jobs) < self.max_jobs:
+                    break
+                if self._jobs[job_id].finished is not None:
+                    evicted.append(self._jobs.pop(job_id))
+            if len(self._jobs) >= self.max_jobs:
+                raise JobRegistryFull(f"{len(self._jobs)} jobs are already running, try again when one has finished")
+            self._jobs[job.job_id] = job
+
+        if self.on_evict:
+            for old_job in evicted:
+                self.on_evict(old_job)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
@@ -7,6 +7,8 @@ Two public entry points:
 
 Intent resolution: watch.llm_intent → first tag with llm_intent → None (no evaluation)
 Cache: each (intent, diff) pair is evaluated exactly once, result stored in watch.
+       Across watches, identical prompts are answered from the content-addressed cache
+       in response_cache.py (evaluate_change, summarise_change and preview_extract).
 
 Environment variable overrides (take priority over datastore settings):
   LLM_MODEL    — model string (e.g. "gpt-4o-mini", "ollama/llama3.2")
@@ -28,6 +30,7 @@ from loguru import logger
 from changedetectionio.strtobool import strtobool
 
 from . import client as llm_client
+from .response_cache import cached_completion
 from .prompt_builder import (
     build_change_summary_prompt, build_change_summary_system_prompt,
     build_eval_prompt, build_eval_system_prompt,
@@ -706,7 +709,7 @@ def summarise_change(watch, datastore, diff: str, current_snapshot: str = '') ->
     _extra_body = _thinking_extra_body(cfg['model'], settings.thinking_budget)
 
     try:
-        _resp = llm_client.completion(
+        _resp = cached_completion(
             model=cfg['model'],
             messages=[
                 _cached_system(system_prompt, model=cfg['model']),
@@ -774,7 +777,7 @@ def preview_extract(watch, datastore, content: str) -> dict | None:
     settings = get_llm_settings(datastore)
 
     try:
-        raw, tokens, *_ = llm_client.completion(
+        raw, tokens, *_ = cached_completion(
             model=cfg['model'],
             messages=[
                 _cached_system(system_prompt, model=cfg['model']),
@@ -861,7 +864,7 @@ def evaluate_change(watch, datastore, diff: str, current_snapshot: str = '') ->
 
     settings = get_llm_settings(datastore)
     try:
-        _resp = llm_client.completion(
+        _resp = cached_completion(
             model=cfg['model'],
             messages=[
                 _cached_system(system_prompt, model=cfg['model']),
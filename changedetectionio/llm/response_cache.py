@@ -0,0 +1,221 @@
+"""
+Content-addressed LLM response cache and request dispatcher.
+
+The per-watch caches (watch['llm_evaluation_cache'], the summary files written next to the
+snapshots) only help when the *same watch* asks the same question twice. In practice the same
+diff turns up on many watches at once - identical vendor pages, a tag-wide template change -
+and each of them paid for its own completion.
+
+Here responses are keyed by (model, api_base, max_tokens, extra_body, sha256(system prompt), sha256(user prompt)),
+extra_body carries the thinking budget so changing that setting asks the provider again.
+Every call made by the evaluator runs at temperature=0 (see client.completion()), so an identical
+prompt sent to the identical model is answered from memory instead of the provider.
+
+The dispatcher in front of the cache also:
+  - coalesces concurrent identical requests - the first caller makes the call, the rest wait for
+    its answer instead of firing their own (typical after a tag-wide change when several workers
+    finish at the same moment),
+  - bounds the number of in-flight calls per provider so a burst of changes can't trip the
+    provider's rate limit.
+
+Cache hits report zero tokens used, nothing was spent so nothing is added to the budgets.
+
+Environment variables:
+  LLM_RESPONSE_CACHE_TTL_SECONDS    — how long an answer stays valid (default 86400, 0 disables)
+  LLM_RESPONSE_CACHE_MAX_ENTRIES    — LRU size limit (default 2000)
+  LLM_MAX_CONCURRENT_PER_PROVIDER   — in-flight calls per provider (default 4)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from . import client as llm_client
+
+
+def _message_text(message: dict) -> str:
+    """Flatten a chat message's content, _cached_system() wraps it in a list of parts for Anthropic."""
+    content = message.get('content', '')
+    if isinstance(content, list):
+        return ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content or ''
+
+
+def compute_response_cache_key(model: str, messages: list, api_base: str = None, max_tokens: int = None,
+                               extra_body: dict = None) -> str:
+    system_hash = hashlib.sha256()
+    user_hash = hashlib.sha256()
+    for message in messages:
+        target = system_hash if message.get('role') == 'system' else user_hash
+        target.update(_message_text(message).encode('utf-8', errors='replace'))
+        target.update(b'\x00')
+
+    h = hashlib.sha256()
+    h.update(f"{model}\x00{api_base or ''}\x00{max_tokens}\x00".encode('utf-8'))
+    # Sorted so the same settings always hash the same, whatever order the dict was built in
+    h.update(json.dumps(extra_body or {}, sort_keys=True, default=str).encode('utf-8'))
+    h.update(b'\x00')
+    h.update(system_hash.digest())
+    h.update(user_hash.digest())
+    return h.hexdigest()
+
+
+def provider_key(model: str, api_base: str = None) -> str:
+    """Bucket used for the per-provider concurrency limit.
+
+    A custom api_base is its own provider (two local Ollama boxes shouldn't share a limit),
+    otherwise the litellm provider prefix ('gemini/...', 'ollama/...') or the bare model name.
+    """
+    if api_base:
+        return urlparse(api_base).netloc or api_base
+    return model.split('/', 1)[0] if '/' in model else model
+
+
+class _InFlight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMResponseCache:
+
+    def __init__(self, ttl=None, max_entries=None, max_concurrent_per_provider=None):
+        self.ttl = float(ttl if ttl is not None else os.getenv('LLM_RESPONSE_CACHE_TTL_SECONDS', 86400))
+        self.max_entries = int(max_entries if max_entries is not None else os.getenv('LLM_RESPONSE_CACHE_MAX_ENTRIES', 2000))
+        self.max_concurrent_per_provider = max(1, int(max_concurrent_per_provider if max_concurrent_per_provider is not None
+                                                      else os.getenv('LLM_MAX_CONCURRENT_PER_PROVIDER', 4)))
+
+        # key -> (expires_at, text, tokens_the_original_call_used)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _semaphore_for(self, provider):
+        with self._lock:
+            sem = self._semaphores.get(provider)
+            if sem is None:
+                sem = self._semaphores[provider] = threading.BoundedSemaphore(self.max_concurrent_per_provider)
+            return sem
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.tokens_saved += entry[2]
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, text, tokens=0):
+        if not self.enabled or not text:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, text, tokens)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def completion(self, model: str, messages: list, api_key: str = None, api_base: str = None, **kwargs) -> tuple:
+        """Drop-in for client.completion() - same arguments, same (text, total, in, out) return shape."""
+        key = compute_response_cache_key(model, messages, api_base=api_base, max_tokens=kwargs.get('max_tokens'),
+                                         extra_body=kwargs.get('extra_body'))
+
+        if self.enabled:
+            text = self.get(key)
+            if text is not None:
+                logger.debug(f"LLM response cache hit model={model!r} key={key[:12]}")
+                return text, 0, 0, 0
+
+        with self._lock:
+            waiting_on = self._inflight.get(key)
+            if waiting_on is None:
+                waiting_on = self._inflight[key] = _InFlight()
+                owner = True
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            logger.debug(f"LLM request coalesced with an identical in-flight call model={model!r} key={key[:12]}")
+            waiting_on.done.wait()
+            if waiting_on.error is not None:
+                raise waiting_on.error
+            return waiting_on.result[0], 0, 0, 0
+
+        try:
+            with self._semaphore_for(provider_key(model, api_base)):
+                # client.completion is looked up at call time so tests patching it keep working
+                response = llm_client.completion(model=model, messages=messages, api_key=api_key, api_base=api_base, **kwargs)
+            tokens = response[1] if len(response) > 1 else 0
+            self.put(key, response[0], tokens)
+            waiting_on.result = response
+            return response
+        except Exception as e:
+            waiting_on.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiting_on.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.coalesced = self.tokens_saved = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+            in_flight = len(self._inflight)
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'in_flight': in_flight,
+            'tokens_saved': self.tokens_saved,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'ttl_seconds': self.ttl,
+        }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = LLMResponseCache()
+    return _response_cache
+
+
+def cached_completion(**kwargs) -> tuple:
+    """client.completion() routed through the shared response cache and dispatcher."""
+    return get_response_cache().completion(**kwargs)
@@ -52,6 +52,14 @@ class model(EntityPersistenceMixin, watch_base):
             self.update(kw['default'])
             del kw['default']
 
+    # Bumped whenever any tag's settings change, so per-watch results that depend on
+    # the tags (store/tag_index.py) can tell they're stale without looking at every tag
+    config_generation = 0
+
+    def _config_changed(self):
+        super()._config_changed()
+        model.config_generation += 1
+
     def matches_url(self, url: str) -> bool:
         """Return True if this tag should be auto-applied to the given watch URL.
 
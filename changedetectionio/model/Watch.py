@@ -29,6 +29,7 @@ from blinker import signal
 from changedetectionio.validate_url import is_safe_valid_url
 
 from changedetectionio.strtobool import strtobool
+from changedetectionio import adaptive_recheck
 from changedetectionio.jinja2_custom import render as jinja_render
 from . import watch_base
 from .persistence import EntityPersistenceMixin
@@ -38,6 +39,7 @@ from pathlib import Path
 from loguru import logger
 
 from .. import jinja2_custom as safe_jinja
+from .. import image_derivatives
 from ..html_tools import TRANSLATE_WHITESPACE_TABLE
 
 FAVICON_RESAVE_THRESHOLD_SECONDS=86400
@@ -51,6 +53,34 @@ _FAVICON_FILENAME_CACHE: dict = {}
 minimum_seconds_recheck_time = int(os.getenv('MINIMUM_SECONDS_RECHECK_TIME', 3))
 mtable = {'seconds': 1, 'minutes': 60, 'hours': 3600, 'days': 86400, 'weeks': 86400 * 7}
 
+# Binary files are NEVER saved with .br compression, only text files are
+BINARY_SNAPSHOT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.pdf', '.bin', '.jfif')
+
+
+def read_history_snapshot_file(filepath):
+    """
+    Read one (already resolved, see model.get_history_snapshot_path()) snapshot file, text is returned as str
+    and binary snapshots (image, PDF, etc.) as bytes. Module level so it can also run in a worker process.
+    """
+    # Handle .br compressed text files
+    if filepath.endswith('.br'):
+        import brotli
+        # Brotli doesnt have a fileheader to detect it, so we rely on filename
+        # https://www.rfc-editor.org/rfc/rfc7932
+        # Note: .br should ONLY exist for text files, never binary
+        with open(filepath, 'rb') as f:
+            return brotli.decompress(f.read()).decode('utf-8')
+
+    # Binary file - return raw bytes
+    if filepath.endswith(BINARY_SNAPSHOT_EXTENSIONS):
+        with open(filepath, 'rb') as f:
+            return f.read()
+
+    # Text file - decode to string
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+
 def _brotli_save(contents, filepath, mode=None, fallback_uncompressed=False):
     """
     Save compressed data using native brotli with streaming compression.
@@ -70,7 +100,6 @@ def _brotli_save(contents, filepath, mode=None, fallback_uncompressed=False):
         Exception: if compression fails and fallback_uncompressed is False
     """
     import brotli
-    import gc
     import ctypes
 
     # Ensure contents are bytes
@@ -107,9 +136,8 @@ def _brotli_save(contents, filepath, mode=None, fallback_uncompressed=False):
 
         logger.debug(f"Finished brotli compression - From {original_size} to {total_compressed_size} bytes.")
 
-        # Cleanup: Delete compressor, force Python GC, then force C-level memory release
+        # Cleanup: Delete compressor (freed right away, nothing cyclic to collect), then force C-level memory release
         del compressor
-        gc.collect()
 
         # Force release of C-level memory back to OS (since brotli is a C library)
         try:
@@ -230,6 +258,8 @@ class model(EntityPersistenceMixin, watch_base):
     __newest_history_key = None
     __history_n = 0
     jitter_seconds = 0
+    # Set by bulk_import.py so freshly imported watches are released to the queue gradually
+    import_not_before = 0
 
     def __init__(self, *arg, **kw):
         # Validate __datastore before calling parent (Watch requires it)
@@ -325,6 +355,8 @@ class model(EntityPersistenceMixin, watch_base):
         processor_names = [name for cls, name in find_processors()]
         processor_config_files = {f"{name}.json" for name in processor_names}
 
+        self._storage_backend().clear_history(self.get('uuid'))
+
         # JSON Data, Screenshots, Textfiles (history index and snapshots), HTML in the future etc
         # But preserve processor config files (they're configuration, not history data)
         # Use glob not rglob here for safety.
@@ -335,6 +367,7 @@ class model(EntityPersistenceMixin, watch_base):
             os.unlink(item)
 
         _FAVICON_FILENAME_CACHE.pop(self.data_dir, None)
+        image_derivatives.invalidate(self.data_dir)
 
         # Force the attr to recalculate
         bump = self.history
@@ -449,7 +482,7 @@ class model(EntityPersistenceMixin, watch_base):
 
     @property
     def history(self):
-        """History index is just a text file as a list
+        """History index is just a list kept by the datastore backend, with the file backend a text file
             {watch-uuid}/history.txt
 
             contains a list like
@@ -465,44 +498,36 @@ class model(EntityPersistenceMixin, watch_base):
         if not self.data_dir:
             return []
 
-        # Read the history file as a dict
-        fname = os.path.join(self.data_dir, self.history_index_filename)
-        if os.path.isfile(fname):
-            logger.debug(f"Reading watch history index for {self.get('uuid')}")
-            with open(fname, "r", encoding='utf-8') as f:
-                for i in f.readlines():
-                    if ',' in i:
-                        k, v = i.strip().split(',', 2)
-
-                        # Always resolve history entries to within the watch's own data directory.
-                        # Entries restored from backup could contain absolute or traversal paths —
-                        # never trust them. Use realpath to also block symlink-based escapes.
-                        safe_data_dir = os.path.realpath(self.data_dir)
-                        snapshot_fname = os.path.basename(v.strip())
-                        resolved_path = os.path.realpath(os.path.join(self.data_dir, snapshot_fname))
-
-                        if not resolved_path.startswith(safe_data_dir + os.sep) and resolved_path != safe_data_dir:
-                            logger.warning(f"Skipping unsafe history entry for {self.get('uuid')}: {v!r}")
-                            continue
-
-                        if not os.path.exists(resolved_path):
-                            continue
-
-                        tmp_history[k] = resolved_path
-
-        if len(tmp_history):
-            self.__newest_history_key = list(tmp_history.keys())[-1]
-        else:
-            self.__newest_history_key = None
+        # Read the history index as a dict
+        logger.debug(f"Reading watch history index for {self.get('uuid')}")
+        safe_data_dir = os.path.realpath(self.data_dir)
+        for k, v in self._storage_backend().load_history(self.get('uuid'), self.history_index_filename):
+            # Always resolve history entries to within the watch's own data directory.
+            # Entries restored from backup could contain absolute or traversal paths —
+            # never trust them. Use realpath to also block symlink-based escapes.
+            snapshot_fname = os.path.basename(v)
+            resolved_path = os.path.realpath(os.path.join(self.data_dir, snapshot_fname))
+
+            if not resolved_path.startswith(safe_data_dir + os.sep) and resolved_path != safe_data_dir:
+                logger.warning(f"Skipping unsafe history entry for {self.get('uuid')}: {v!r}")
+                continue
 
+            if not os.path.exists(resolved_path):
+                continue
+
+            tmp_history[k] = resolved_path
+
+        newest_history_key = list(tmp_history.keys())[-1] if len(tmp_history) else None
+        if (newest_history_key, len(tmp_history)) != (self.__newest_history_key, self.__history_n):
+            self._state_changed()
+        self.__newest_history_key = newest_history_key
         self.__history_n = len(tmp_history)
 
         return tmp_history
 
     @property
     def has_history(self):
-        fname = os.path.join(self.data_dir, self.history_index_filename)
-        return os.path.isfile(fname)
+        return self._storage_backend().has_history(self.get('uuid'), self.history_index_filename)
 
     @property
     def has_browser_steps(self):
@@ -559,15 +584,11 @@ class model(EntityPersistenceMixin, watch_base):
         # When the 'last viewed' timestamp is less than the oldest snapshot, return oldest
         return sorted_keys[-1]
 
-    def get_history_snapshot(self, timestamp=None, filepath=None):
+    def get_history_snapshot_path(self, timestamp=None, filepath=None):
         """
+        Resolve a history entry to the file that actually holds it (the .br version or the plain one)
         Accepts either timestamp or filepath
-        :param timestamp:
-        :param filepath:
-        :return:
         """
-        import brotli
-
         if not filepath:
             filepath = self.history[timestamp]
 
@@ -580,13 +601,8 @@ class model(EntityPersistenceMixin, watch_base):
             if not (resolved.startswith(safe_data_dir + os.sep) or resolved == safe_data_dir):
                 raise PermissionError(f"Snapshot path {filepath!r} is outside the watch data directory")
 
-        # Check if binary file (image, PDF, etc.)
-        # Binary files are NEVER saved with .br compression, only text files are
-        binary_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.pdf', '.bin', '.jfif')
-        is_binary = any(filepath.endswith(ext) for ext in binary_extensions)
-
         # Only look for .br versions for text files
-        if not is_binary:
+        if not filepath.endswith(BINARY_SNAPSHOT_EXTENSIONS):
             # See if a brotli version exists and switch to that (text files only)
             if not filepath.endswith('.br') and os.path.isfile(f"{filepath}.br"):
                 filepath = f"{filepath}.br"
@@ -596,22 +612,16 @@ class model(EntityPersistenceMixin, watch_base):
                 if os.path.isfile(filepath.replace('.br', '')):
                     filepath = filepath.replace('.br', '')
 
-        # Handle .br compressed text files
-        if filepath.endswith('.br'):
-            # Brotli doesnt have a fileheader to detect it, so we rely on filename
-            # https://www.rfc-editor.org/rfc/rfc7932
-            # Note: .br should ONLY exist for text files, never binary
-            with open(filepath, 'rb') as f:
-                return brotli.decompress(f.read()).decode('utf-8')
-
-        # Binary file - return raw bytes
-        if is_binary:
-            with open(filepath, 'rb') as f:
-                return f.read()
+        return filepath
 
-        # Text file - decode to string
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+    def get_history_snapshot(self, timestamp=None, filepath=None):
+        """
+        Accepts either timestamp or filepath
+        :param timestamp:
+        :param filepath:
+        :return:
+        """
+        return read_history_snapshot_file(self.get_history_snapshot_path(timestamp=timestamp, filepath=filepath))
 
     def _write_atomic(self, dest, data, mode='wb'):
         """Write data atomically to dest using a temp file"""
@@ -642,16 +652,12 @@ class model(EntityPersistenceMixin, watch_base):
                 finally:
                     logger.debug(f"[{self.get('uuid')}] Deleted {item[1]} history snapshot")
         try:
-            dest = os.path.join(self.data_dir, self.history_index_filename)
-            output = "\r\n".join(
-                f"{k},{Path(v).name}"
-                for k, v in keep_part.items()
-            )+"\r\n"
-            self._write_atomic(dest=dest, data=output, mode='w')
+            self._storage_backend().replace_history(self.get('uuid'), self.history_index_filename,
+                                                  [(k, Path(v).name) for k, v in keep_part.items()])
         except Exception as e:
             logger.critical(f"{str(e)}")
         finally:
-            logger.debug(f"[{self.get('uuid')}] Updated history index {dest}")
+            logger.debug(f"[{self.get('uuid')}] Updated history index {self.history_index_filename}")
 
         # reimport
         bump = self.history
@@ -710,18 +716,13 @@ class model(EntityPersistenceMixin, watch_base):
                 dest = os.path.join(self.data_dir, snapshot_fname)
                 self._write_atomic(dest, contents.encode('utf-8'))
 
-        # Append to history.txt atomically
-        index_fname = os.path.join(self.data_dir, self.history_index_filename)
-        index_line = f"{timestamp},{snapshot_fname}\n"
-
-        with open(index_fname, 'a', encoding='utf-8') as f:
-            f.write(index_line)
-            f.flush()
-            os.fsync(f.fileno())
+        # Append to the history index (history.txt with the file backend)
+        self._storage_backend().append_history(self.get('uuid'), self.history_index_filename, timestamp, snapshot_fname)
 
         # Update internal state
         self.__newest_history_key = timestamp
         self.__history_n += 1
+        self._state_changed()
 
         # MANUAL CHAIN RESOLUTION: Watch → Global
         # With Pydantic, this would become: maxlen = watch.resolved_history_snapshot_max_length
@@ -752,6 +753,23 @@ class model(EntityPersistenceMixin, watch_base):
                 seconds += x * n
         return seconds
 
+    def effective_threshold_seconds(self, default_seconds):
+        """Seconds between checks as the scheduler uses them, the learned interval with adaptive_recheck (see adaptive_recheck.py)"""
+        base = int(default_seconds) if self.get('time_between_check_use_default') else self.threshold_seconds()
+        if not self.get('adaptive_recheck'):
+            return base
+        base = base or int(default_seconds)
+        shortest, longest = adaptive_recheck.bounds(base, self.get('adaptive_recheck_min_seconds'), self.get('adaptive_recheck_max_seconds'))
+        return int(min(max(self.get('adaptive_recheck_seconds') or base, shortest), longest))
+
+    def next_adaptive_threshold_seconds(self, default_seconds, changed):
+        """The adaptive interval after a successful check that did or didn't find a change"""
+        base = (int(default_seconds) if self.get('time_between_check_use_default') else self.threshold_seconds()) or int(default_seconds)
+        return adaptive_recheck.next_interval(self.get('adaptive_recheck_seconds'), base, changed,
+                                              history_timestamps=self.history.keys() if changed else (),
+                                              min_seconds=self.get('adaptive_recheck_min_seconds'),
+                                              max_seconds=self.get('adaptive_recheck_max_seconds'))
+
     # Iterate over all history texts and see if something new exists
     # Always applying .strip() to start/end but optionally replace any other whitespace
     def lines_contain_something_unique_compared_to_history(self, lines: list, ignore_whitespace=False):
@@ -885,6 +903,11 @@ class model(EntityPersistenceMixin, watch_base):
             if watch_check_update:
                 watch_check_update.send(watch_uuid=self.get('uuid'))
 
+            # The watchlist serves a small copy, bump again once it's ready so the browser swaps to it
+            uuid = self.get('uuid')
+            image_derivatives.schedule_derivative(self.data_dir, image_derivatives.FAVICON, fname,
+                                                  on_done=lambda _fname: signal('watch_favicon_bump').send(watch_uuid=uuid))
+
         except Exception as e:
             logger.warning(f"UUID: {self.get('uuid')} error saving FavIcon to {fname} - {str(e)}")
             return None
@@ -912,69 +935,36 @@ class model(EntityPersistenceMixin, watch_base):
         _FAVICON_FILENAME_CACHE[self.data_dir] = fname
         return fname
 
-    def get_screenshot_as_thumbnail(self, max_age=3200):
-        """Return path to a square thumbnail of the most recent screenshot.
+    def get_favicon_derivative_filename(self) -> str | None:
+        """Basename of the pre-generated small favicon, None until it has been generated (or for SVG favicons)"""
+        return image_derivatives.get_derivative_filename(self.data_dir, image_derivatives.FAVICON)
+
+    def get_thumbnail_filename(self) -> str | None:
+        """Basename of the pre-generated screenshot thumbnail, never decodes anything, see image_derivatives.py"""
+        return image_derivatives.get_derivative_filename(self.data_dir, image_derivatives.THUMBNAIL)
 
-        Creates a 150x150 pixel thumbnail from the top portion of the screenshot.
+    def get_screenshot_as_thumbnail(self):
+        """Return path to a square thumbnail of the most recent screenshot.
 
-        Args:
-            max_age: Maximum age in seconds before recreating thumbnail
+        Normally already generated in the background by save_screenshot(), it's only created here
+        (synchronously) when the screenshot is newer than the thumbnail, for example screenshots
+        written before thumbnails were pre-generated.
 
         Returns:
             Path to thumbnail or None if no screenshot exists
         """
-        import os
-        import time
-
-        thumbnail_path = os.path.join(self.data_dir, "thumbnail.jpeg")
-        top_trim = 500  # Pixels from top of screenshot to use
-
         screenshot_path = self.get_screenshot()
         if not screenshot_path:
             return None
 
-        # Reuse thumbnail if it's fresh and screenshot hasn't changed
-        if os.path.isfile(thumbnail_path):
-            thumbnail_mtime = os.path.getmtime(thumbnail_path)
-            screenshot_mtime = os.path.getmtime(screenshot_path)
-
-            if screenshot_mtime <= thumbnail_mtime and time.time() - thumbnail_mtime < max_age:
+        fname = self.get_thumbnail_filename()
+        if fname:
+            thumbnail_path = os.path.join(self.data_dir, fname)
+            if os.path.isfile(thumbnail_path) and os.path.getmtime(screenshot_path) <= os.path.getmtime(thumbnail_path):
                 return thumbnail_path
 
-        try:
-            from PIL import Image
-
-            with Image.open(screenshot_path) as img:
-                # Crop top portion first (full width, top_trim height)
-                top_crop_height = min(top_trim, img.height)
-                img = img.crop((0, 0, img.width, top_crop_height))
-
-                # Create a smaller intermediate image (to reduce memory usage)
-                aspect = img.width / img.height
-                interim_width = min(top_trim, img.width)
-                interim_height = int(interim_width / aspect) if aspect > 0 else top_trim
-                img = img.resize((interim_width, interim_height), Image.NEAREST)
-
-                # Convert to RGB if needed
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-
-                # Crop to square from top center
-                square_size = min(img.width, img.height)
-                left = (img.width - square_size) // 2
-                img = img.crop((left, 0, left + square_size, square_size))
-
-                # Final resize to exact thumbnail size with better filter
-                img = img.resize((350, 350), Image.BILINEAR)
-
-                # Save with optimized settings
-                img.save(thumbnail_path, "JPEG", quality=75, optimize=True)
-
-            return thumbnail_path
-
-        except Exception as e:
-            logger.error(f"Error creating thumbnail for {self.get('uuid')}: {str(e)}")
-            return None
+        fname = image_derivatives.generate_derivative(self.data_dir, image_derivatives.THUMBNAIL, screenshot_path)
+        return os.path.join(self.data_dir, fname) if fname else None
 
     def __get_file_ctime(self, filename):
         fname = os.path.join(self.data_dir, filename)
@@ -1117,49 +1107,9 @@ class model(EntityPersistenceMixin, watch_base):
 
 
     def extract_regex_from_all_history(self, regex):
-        import csv
-        import re
-        import datetime
-        csv_output_filename = False
-        csv_writer = False
-        f = None
-
-        # self.history will be keyed with the full path
-        for k, fname in self.history.items():
-            if os.path.isfile(fname):
-                if True:
-                    contents = self.get_history_snapshot(timestamp=k)
-                    res = re.findall(regex, contents, re.MULTILINE)
-                    if res:
-                        if not csv_writer:
-                            # A file on the disk can be transferred much faster via flask than a string reply
-                            csv_output_filename = f"report-{self.get('uuid')}.csv"
-                            f = open(os.path.join(self.data_dir, csv_output_filename), 'w')
-                            # @todo some headers in the future
-                            #fieldnames = ['Epoch seconds', 'Date']
-                            csv_writer = csv.writer(f,
-                                                    delimiter=',',
-                                                    quotechar='"',
-                                                    quoting=csv.QUOTE_MINIMAL,
-                                                    #fieldnames=fieldnames
-                                                    )
-                            csv_writer.writerow(['Epoch seconds', 'Date'])
-                            # csv_writer.writeheader()
-
-                        date_str = datetime.datetime.fromtimestamp(int(k)).strftime('%Y-%m-%d %H:%M:%S')
-                        for r in res:
-                            row = [k, date_str]
-                            if isinstance(r, str):
-                                row.append(r)
-                            else:
-                                row+=r
-                            csv_writer.writerow(row)
-
-        if f:
-            f.close()
-
-        return csv_output_filename
-
+        """Scan the whole history right here (no background job) and return the CSV report filename, or None"""
+        from changedetectionio.extract_job import ExtractJob
+        return ExtractJob(watch=self, regex=regex).run().output_filename
 
     def has_special_diff_filter_options_set(self):
 
@@ -1212,6 +1162,9 @@ class model(EntityPersistenceMixin, watch_base):
             f.write(screenshot)
             f.close()
 
+        if not as_error:
+            image_derivatives.schedule_derivative(self.data_dir, image_derivatives.THUMBNAIL, target_path)
+
 
     def get_last_fetched_text_before_filters(self):
         import brotli
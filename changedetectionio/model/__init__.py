@@ -1,4 +1,5 @@
 import os
+from contextlib import nullcontext
 import uuid
 
 from changedetectionio import strtobool
@@ -62,11 +63,17 @@ class watch_base(dict):
         method (str): HTTP method ('GET', 'POST', etc.)
         headers (dict): Custom HTTP headers to send
         proxy (str|None): Preferred proxy server
+        fetch_max_bytes (int|None): Largest response to download, None = FETCH_MAX_BYTES
         paused (bool): Whether change detection is paused
 
     Scheduling:
         time_between_check (dict): Check interval {'weeks': int, 'days': int, 'hours': int, 'minutes': int, 'seconds': int}
         time_between_check_use_default (bool): Use global default interval if True
+        check_priority (str): 'high', 'normal' or 'low', the queue class of its scheduled checks
+        adaptive_recheck (bool): Learn the interval from how often the page changes (see adaptive_recheck.py)
+        adaptive_recheck_min_seconds (int|None): Shortest adaptive interval, None = the configured interval
+        adaptive_recheck_max_seconds (int|None): Longest adaptive interval, None = ADAPTIVE_RECHECK_MAX_MULTIPLIER x the configured interval
+        adaptive_recheck_seconds (int|None): The learned interval, None until the first check with adaptive_recheck
         time_schedule_limit (dict): Weekly schedule limiting when checks can run
             Structure: {
                 'enabled': bool,
@@ -155,6 +162,13 @@ class watch_base(dict):
         - This class is used for both Watch and Tag objects (tags reuse the structure)
     """
 
+    # Bumped on every write (state_version) and on writes to the settings (config_version), so
+    # anything worked out from the watch can tell when it's stale, see store/tag_index.py and
+    # blueprint/watchlist/list_index.py. state_generation is bumped on a write to any watch.
+    state_version = 0
+    config_version = 0
+    state_generation = 0
+
     def __init__(self, *arg, **kw):
         # Store datastore reference (common to Watch and Tag)
         # Use single underscore to avoid name mangling issues in subclasses
@@ -195,6 +209,7 @@ class watch_base(dict):
             'llm_prefilter': None,           # CSS selector derived at setup time (semantic only, e.g. "footer")
             'llm_evaluation_cache': {},      # {sha256(intent+diff): {important, summary}} - evaluated once, cached
             'fetch_backend': 'system',  # plaintext, playwright etc
+            'fetch_max_bytes': None,  # None = FETCH_MAX_BYTES env var
             'fetch_time': 0.0,
             'filter_failure_notification_send': strtobool(os.getenv('FILTER_FAILURE_NOTIFICATION_SEND_DEFAULT', 'True')),
             'filter_text_added': True,
@@ -235,6 +250,11 @@ class watch_base(dict):
             'text_should_not_be_present': [],  # Text that should not present
             'time_between_check': {'weeks': None, 'days': None, 'hours': None, 'minutes': None, 'seconds': None},
             'time_between_check_use_default': True,
+            'check_priority': 'normal',  # See queuedWatchMetaData.CHECK_PRIORITY_CLASSES
+            'adaptive_recheck': False,
+            'adaptive_recheck_min_seconds': None,
+            'adaptive_recheck_max_seconds': None,
+            'adaptive_recheck_seconds': None,  # Learned, see adaptive_recheck.py
             "time_schedule_limit": {
                 "enabled": False,
                 "monday": {
@@ -330,11 +350,11 @@ class watch_base(dict):
 
         Internal method used by __setitem__, update(), pop(), etc.
         """
-        # Don't track edits during initial load or if already edited
+        self._state_changed()
+
+        # Don't track edits during initial load
         if not hasattr(self, '_watch_base__watch_was_edited'):
             return
-        if self.__watch_was_edited:
-            return  # Already marked as edited
 
         # __-prefixed keys are transient in-memory state (e.g. __check_status set by
         # set_watch_minitext_status). They never persist to disk and must not trigger
@@ -353,6 +373,14 @@ class watch_base(dict):
                 and key != 'last_viewed'
                 and key not in SYSTEM_MANAGED_NON_SPEC_FIELDS):
             self.__watch_was_edited = True
+            self._config_changed()
+
+    def _state_changed(self):
+        self.state_version += 1
+        watch_base.state_generation += 1
+
+    def _config_changed(self):
+        self.config_version += 1
 
     def __setitem__(self, key, value):
         """
@@ -570,6 +598,11 @@ class watch_base(dict):
         """
         return os.path.join(self._datastore_path, self['uuid']) if self._datastore_path else None
 
+    def _storage_backend(self):
+        """The datastore backend this watch/tag is saved to (store/backend.py)"""
+        from changedetectionio.store.backend import get_backend
+        return get_backend(self._datastore_path)
+
     def ensure_data_dir_exists(self):
         """
         Create the data directory if it doesn't exist.
@@ -663,19 +696,26 @@ class watch_base(dict):
             logger.error(f"Cannot commit {entity_type} without UUID")
             return
 
-        # Get data from subclass (may filter keys)
-        try:
-            data_dict = self._get_commit_data()
-        except Exception as e:
-            logger.error(f"Failed to prepare commit data for {uuid}: {e}")
-            return
-
-        # Save to disk via subclass implementation
-        try:
-            # Determine entity type from module name (Watch.py -> watch, Tag.py -> tag)
-            entity_type = _determine_entity_type(self.__class__)
-            filename = f"{entity_type}.json"
-            self._save_to_disk(data_dict, uuid)
-            logger.debug(f"Committed {entity_type} {uuid} to {uuid}/{filename}")
-        except Exception as e:
-            logger.error(f"Failed to commit {uuid}: {e}")
\ No newline at end of file
+        # Sharded mode, another node may have written this watch since this one last read it
+        from changedetectionio.sharding import get_shard
+        shard = get_shard()
+        if shard and _determine_entity_type(self.__class__) != 'watch':
+            shard = None
+
+        with shard.committing(self) if shard else nullcontext():
+            # Get data from subclass (may filter keys)
+            try:
+                data_dict = self._get_commit_data()
+            except Exception as e:
+                logger.error(f"Failed to prepare commit data for {uuid}: {e}")
+                return
+
+            # Save to disk via subclass implementation
+            try:
+                # Determine entity type from module name (Watch.py -> watch, Tag.py -> tag)
+                entity_type = _determine_entity_type(self.__class__)
+                filename = f"{entity_type}.json"
+                self._save_to_disk(data_dict, uuid)
+                logger.debug(f"Committed {entity_type} {uuid} to {uuid}/{filename}")
+            except Exception as e:
+                logger.error(f"Failed to commit {uuid}: {e}")
\ No newline at end of file
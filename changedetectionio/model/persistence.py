@@ -1,7 +1,7 @@
 """
 Entity persistence mixin for Watch and Tag models.
 
-Provides file-based persistence using atomic writes.
+Provides persistence through the datastore backend (store/backend.py).
 """
 
 import functools
@@ -36,10 +36,10 @@ def _determine_entity_type(cls):
 
 class EntityPersistenceMixin:
     """
-    Mixin providing file persistence for watch_base subclasses (Watch, Tag, etc.).
+    Mixin providing persistence for watch_base subclasses (Watch, Tag, etc.).
 
     This mixin provides the _save_to_disk() method required by watch_base.commit().
-    It automatically determines the correct filename and size limits based on class hierarchy.
+    It automatically determines the entity type ('watch', 'tag') based on class hierarchy.
 
     Usage:
         class model(EntityPersistenceMixin, watch_base):  # in Watch.py
@@ -51,10 +51,10 @@ class EntityPersistenceMixin:
 
     def _save_to_disk(self, data_dict, uuid):
         """
-        Save entity to disk using atomic write.
+        Save entity through the datastore backend (atomic {uuid}/watch.json or tag.json with the file backend).
 
         Implements the abstract method required by watch_base.commit().
-        Automatically determines filename and size limits from class hierarchy.
+        Automatically determines the entity type from class hierarchy.
 
         Args:
             data_dict: Dictionary to save
@@ -63,22 +63,7 @@ class EntityPersistenceMixin:
         Raises:
             ValueError: If entity type cannot be determined from class hierarchy
         """
-        # Import here to avoid circular dependency
-        from changedetectionio.store.file_saving_datastore import save_entity_atomic
-
         # Determine entity type (cached at class level, not instance level)
         entity_type = _determine_entity_type(self.__class__)
 
-        # Set filename and size limits based on entity type
-        filename = f'{entity_type}.json'
-        max_size_mb = 10 if entity_type == 'watch' else 1
-
-        # Save using generic function
-        save_entity_atomic(
-            self.data_dir,
-            uuid,
-            data_dict,
-            filename=filename,
-            entity_type=entity_type,
-            max_size_mb=max_size_mb
-        )
+        self._storage_backend().save_entity(entity_type, uuid, data_dict)
@@ -1,13 +1,16 @@
 import hashlib
 
 from changedetectionio.browser_steps.browser_steps import browser_steps_get_valid_steps
+from changedetectionio.check_metrics import CheckTimings
 from changedetectionio.content_fetchers.base import Fetcher
 from changedetectionio.validate_url import validate_fetch_url_async
 from copy import deepcopy
 from abc import abstractmethod
 import os
+import time
 from urllib.parse import urlparse
 from loguru import logger
+from changedetectionio.strtobool import strtobool
 
 SCREENSHOT_FORMAT_JPEG = 'JPEG'
 SCREENSHOT_FORMAT_PNG = 'PNG'
@@ -22,6 +25,8 @@ class difference_detection_processor():
     preferred_proxy = None
     screenshot_format = SCREENSHOT_FORMAT_JPEG
     last_raw_content_checksum = None
+    # When the check was queued (time.time()), set by the worker, decides which shared fetches it may use
+    enqueued_at = None
 
     def __init__(self, datastore, watch_uuid):
         self.datastore = datastore
@@ -37,6 +42,9 @@ class difference_detection_processor():
         # Generic fetcher that should be extended (requests, playwright etc)
         self.fetcher = Fetcher()
 
+        # Per-phase timings of this check, the worker replaces it with its own so queue/LLM/save phases end up together
+        self.timings = CheckTimings()
+
         # Load the last raw content checksum from file
         self.read_last_raw_content_checksum()
 
@@ -166,7 +174,43 @@ class difference_detection_processor():
         logger.info(f"Using preloaded Add-Watch snapshot for {self.watch.get('uuid')} - skipping network fetch")
         return True
 
-    async def call_browser(self, preferred_proxy_id=None):
+    def xpath_element_data_wanted(self):
+        """
+        Should the browser run the xpath element scraper on this check?
+
+        The scraper walks every element on the page and is one of the slowest and most memory hungry
+        steps of a browser check, but only the Visual Selector (and processors cropping to an element)
+        use what it returns - so only scrape when there's no element data yet, the watch is failing
+        (the error page is shown with its elements), the Visual Selector was opened recently, or the
+        saved data is older than VISUAL_SELECTOR_REFRESH_INTERVAL seconds.
+
+        Environment variables:
+          VISUAL_SELECTOR_SCRAPE_EVERY_CHECK  — always scrape, the previous behaviour (default false)
+          VISUAL_SELECTOR_ACTIVE_SECONDS      — how long after opening the Visual Selector checks keep scraping (default 900)
+          VISUAL_SELECTOR_REFRESH_INTERVAL    — refresh the element data at least this often, 0 to never refresh (default 86400)
+        """
+        if strtobool(os.getenv('VISUAL_SELECTOR_SCRAPE_EVERY_CHECK', 'false')):
+            return True
+
+        if self.watch.get('last_error'):
+            return True
+
+        opened = self.watch.get('__visual_selector_opened')
+        if opened and time.time() - opened < int(os.getenv('VISUAL_SELECTOR_ACTIVE_SECONDS', 900)):
+            return True
+
+        data_dir = self.watch.data_dir
+        try:
+            age = time.time() - os.path.getmtime(os.path.join(data_dir, 'elements.deflate')) if data_dir else None
+        except OSError:
+            age = None
+        if age is None:
+            return True
+
+        refresh_interval = int(os.getenv('VISUAL_SELECTOR_REFRESH_INTERVAL', 86400))
+        return bool(refresh_interval) and age > refresh_interval
+
+    async def call_browser(self, preferred_proxy_id=None, coalesce=True):
 
         from requests.structures import CaseInsensitiveDict
 
@@ -190,12 +234,16 @@ class difference_detection_processor():
         if preferred_proxy_id:
             # Custom browser endpoints should NOT have a proxy added
             if not prefer_fetch_backend.startswith('extra_browser_'):
-                proxy_url = self.datastore.proxy_list.get(preferred_proxy_id).get('url')
+                # A proxy pool hands out one of its (working) proxies for this check
+                preferred_proxy_id = self.datastore.proxy_registry.resolve(preferred_proxy_id)
+                proxy_url = self.datastore.proxy_list.get(preferred_proxy_id, {}).get('url')
                 logger.debug(f"Selected proxy key '{preferred_proxy_id}' as proxy URL '{proxy_url}' for {url}")
             else:
                 logger.debug("Skipping adding proxy data when custom Browser endpoint is specified. ")
 
         logger.debug(f"Using proxy '{proxy_url}' for {self.watch['uuid']}")
+        self.preferred_proxy = preferred_proxy_id if proxy_url else None
+        self.timings.labels.update({'fetcher': prefer_fetch_backend, 'proxy': self.preferred_proxy})
 
         # Now call the fetcher (playwright/requests/etc) with arguments that only a fetcher would need.
         # When browser_connection_url is None, it method should default to working out whats the best defaults (os env vars etc)
@@ -208,6 +256,11 @@ class difference_detection_processor():
         # can read it directly instead of re-deriving it from the fetcher class name.
         self.fetcher.backend_name = prefer_fetch_backend
 
+        if self.fetcher.supports_xpath_element_data:
+            self.fetcher.scrape_xpath_elements = self.xpath_element_data_wanted()
+            if not self.fetcher.scrape_xpath_elements:
+                logger.debug(f"Skipping xpath element scrape for {self.watch_uuid}, element data is fresh and the Visual Selector is not in use")
+
         if self.watch.has_browser_steps:
             self.fetcher.browser_steps = browser_steps_get_valid_steps(self.watch.get('browser_steps', []))
             self.fetcher.browser_steps_screenshot_path = os.path.join(self.datastore.datastore_path, self.watch.get('uuid'))
@@ -252,39 +305,99 @@ class difference_detection_processor():
         if self.watch.get('webdriver_js_execute_code') is not None and self.watch.get('webdriver_js_execute_code').strip():
             self.fetcher.webdriver_js_execute_code = self.watch.get('webdriver_js_execute_code')
 
+        # Per-watch or global (FETCH_MAX_BYTES) limit on the response size
+        from changedetectionio.content_fetchers.base import fetch_max_bytes
+        self.fetcher.max_bytes = fetch_max_bytes(self.watch.get('fetch_max_bytes'))
+
         # Requests for PDF's, images etc should be passwd the is_binary flag
         is_binary = self.watch.is_pdf
 
         # And here we go! call the right browser with browser-specific settings
         empty_pages_are_a_change = self.datastore.data['settings']['application'].get('empty_pages_are_a_change', False)
+        async def run_fetch():
+            await self.fetcher.run(
+                current_include_filters=self.watch.get('include_filters'),
+                empty_pages_are_a_change=empty_pages_are_a_change,
+                fetch_favicon=self.watch.favicon_is_expired(),
+                ignore_status_codes=ignore_status_codes,
+                is_binary=is_binary,
+                request_body=request_body,
+                request_headers=request_headers,
+                request_method=request_method,
+                screenshot_format=self.screenshot_format,
+                timeout=timeout,
+                url=url,
+                watch_uuid=self.watch_uuid,
+            )
+
+        # Watches making exactly the same request share one fetch (see content_fetchers/coalescing.py),
+        # the include filters only change the result when the browser scrapes element data for them
+        from changedetectionio.content_fetchers.coalescing import fetch_key, get_fetch_coalescer
+        key = None
+        if coalesce:
+            key = fetch_key(
+                url=url,
+                method=request_method,
+                body=request_body,
+                headers=sorted((k.lower(), v) for k, v in request_headers.items()),
+                proxy=proxy_url,
+                fetcher=prefer_fetch_backend,
+                browser_connection_url=custom_browser_connection_url,
+                browser_steps=self.fetcher.browser_steps,
+                js=self.fetcher.webdriver_js_execute_code,
+                delay=self.fetcher.render_extract_delay,
+                include_filters=self.watch.get('include_filters') if self.fetcher.supports_xpath_element_data and self.fetcher.scrape_xpath_elements else None,
+                scrape_xpath_elements=self.fetcher.scrape_xpath_elements,
+                screenshot_format=self.screenshot_format,
+                lock_viewport_elements=self.fetcher.lock_viewport_elements,
+                empty_pages_are_a_change=empty_pages_are_a_change,
+                ignore_status_codes=ignore_status_codes,
+                is_binary=is_binary,
+                timeout=timeout,
+                max_bytes=self.fetcher.max_bytes,
+            )
+
         # All fetchers are now async
-        await self.fetcher.run(
-            current_include_filters=self.watch.get('include_filters'),
-            empty_pages_are_a_change=empty_pages_are_a_change,
-            fetch_favicon=self.watch.favicon_is_expired(),
-            ignore_status_codes=ignore_status_codes,
-            is_binary=is_binary,
-            request_body=request_body,
-            request_headers=request_headers,
-            request_method=request_method,
-            screenshot_format=self.screenshot_format,
-            timeout=timeout,
-            url=url,
-            watch_uuid=self.watch_uuid,
-        )
+        from changedetectionio.store.proxy_registry import is_proxy_failure
+        fetch_started = time.time()
+        try:
+            with self.timings.phase('fetch'):
+                if await get_fetch_coalescer().fetch(key, self.watch_uuid, self.fetcher, run_fetch, requested_at=self.enqueued_at or time.time()):
+                    logger.debug(f"Using the response fetched for another watch with the same request for {self.watch_uuid}")
+                elif self.preferred_proxy:
+                    self.datastore.proxy_registry.record_success(self.preferred_proxy, time.time() - fetch_started)
+        except Exception as e:
+            # Only the proxy's own failures count against it, not what the site replied
+            if self.preferred_proxy:
+                if is_proxy_failure(e):
+                    self.datastore.proxy_registry.record_failure(self.preferred_proxy, e)
+                else:
+                    self.datastore.proxy_registry.record_success(self.preferred_proxy)
+            raise
+        finally:
+            self.timings.update(self.fetcher.fetch_timings)
 
         # @todo .quit here could go on close object, so we can run JS if change-detected
         await self.fetcher.quit(watch=self.watch)
 
+        from changedetectionio.content_fetchers.base import check_text_body_size
+        body = self.fetcher.body
+        check_text_body_size(body, url=url, max_bytes=self.fetcher.max_bytes)
+
+        if body is not None:
+            self.timings.memory('body', len(body.raw) if body.raw is not None else len(body.text or ''))
+        self.record_memory()
+
         # Sanitize lone surrogates - these can appear when servers return malformed/mixed-encoding
         # content that gets decoded into surrogate characters (e.g. \udcad). Without this,
         # encode('utf-8') raises UnicodeEncodeError downstream in checksums, diffs, file writes, etc.
         # Covers all fetchers (requests, playwright, puppeteer, selenium) in one place.
         # Also note: By this point we SHOULD know the original encoding so it can safely convert to utf-8 for the rest of the app.
         # See: https://github.com/dgtlmoon/changedetection.io/issues/3952
+        # Bodies fetched as bytes (requests) come out of their decoder clean, and are left undecoded here.
 
-        if self.fetcher.content and isinstance(self.fetcher.content, str):
-            self.fetcher.content = self.fetcher.content.encode('utf-8', errors='replace').decode('utf-8')
+        if body is not None and body.raw is None and body.text and isinstance(body.text, str):
+            self.fetcher.content = body.text.encode('utf-8', errors='replace').decode('utf-8')
 
         # After init, call run_changedetection() which will do the actual change-detection
 
@@ -405,11 +518,24 @@ class difference_detection_processor():
     def get_raw_document_checksum(self):
         checksum = None
 
+        # Hashed while it was downloaded, so an unchanged page is found without decoding it
+        body = self.fetcher.body
+        if body is not None and body.checksum and body.raw:
+            return body.checksum
+
         if self.fetcher.content:
             checksum = hashlib.md5(self.fetcher.content.encode('utf-8')).hexdigest()
 
         return checksum
 
+    def record_memory(self, *working_copies):
+        """
+        Note how much memory the check's content is holding right now, the fetched response plus
+        `working_copies` (the processor's own versions of it), the largest is reported as the check's peak
+        """
+        from changedetectionio.content_fetchers.base import buffers_size
+        self.timings.memory('peak', buffers_size(*self.fetcher.content_buffers(), *working_copies))
+
     @abstractmethod
     def run_changedetection(self, watch, force_reprocess=False):
         update_obj = {'last_notification_error': False, 'last_error': False}
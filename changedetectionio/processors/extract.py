@@ -39,6 +39,12 @@ def render_form(watch, datastore, request, url_for, render_template, flash, redi
             data={'extract_regex': request.form.get('extract_regex', '')}
         )
 
+    # A running or finished background extraction of this watch (see process_extraction())
+    from changedetectionio.extract_job import get_job
+    extract_job = get_job(request.args.get('job', ''), uuid=uuid)
+    if extract_job and not extract_form.extract_regex.data:
+        extract_form.extract_regex.data = extract_job.regex
+
     # Get error information for the template
     screenshot_url = watch.get_screenshot()
 
@@ -61,6 +67,7 @@ def render_form(watch, datastore, request, url_for, render_template, flash, redi
         screenshot=screenshot_url,
         is_html_webdriver=is_html_webdriver,
         password_enabled_and_share_is_off=password_enabled_and_share_is_off,
+        extract_job=extract_job.to_dict() if extract_job else None,
         extra_title=f" - {watch.label} - {gettext('Extract Data')}",
         extra_stylesheets=[url_for('static_content', group='styles', filename='diff.css')],
         pure_menu_fixed=False
@@ -71,7 +78,7 @@ def render_form(watch, datastore, request, url_for, render_template, flash, redi
 
 def process_extraction(watch, datastore, request, url_for, make_response, send_from_directory, flash, redirect, extract_form=None):
     """
-    Process the data extraction request and return CSV file.
+    Start a background extraction job for the request and redirect back to the form, which follows its progress.
 
     Args:
         watch: The watch object
@@ -85,7 +92,7 @@ def process_extraction(watch, datastore, request, url_for, make_response, send_f
         extract_form: Optional pre-built extract form
 
     Returns:
-        CSV file download response or redirect to form on error
+        Redirect to the form with the job ID, or the form with errors
     """
     from changedetectionio import forms
 
@@ -113,17 +120,26 @@ def process_extraction(watch, datastore, request, url_for, make_response, send_f
             extract_form=extract_form
         )
 
-    extract_regex = request.form.get('extract_regex', '').strip()
-    output = watch.extract_regex_from_all_history(extract_regex)
-
-    if output:
-        watch_dir = os.path.join(datastore.datastore_path, uuid)
-        response = make_response(send_from_directory(directory=watch_dir, path=output, as_attachment=True))
-        response.headers['Content-type'] = 'text/csv'
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = "0"
-        return response
-
-    flash(gettext('No matches found while scanning all of the watch history for that RegEx.'), 'error')
-    return redirect(url_for('ui.ui_diff.diff_history_page_extract_GET', uuid=uuid))
+    import datetime
+    from changedetectionio.extract_job import ExtractJob
+    from changedetectionio.job_registry import JobRegistryFull
+
+    # Whole days in the server's local time, same as the dates in the CSV
+    from_timestamp = to_timestamp = None
+    if extract_form.extract_from_date.data:
+        from_timestamp = int(datetime.datetime.combine(extract_form.extract_from_date.data, datetime.time.min).timestamp())
+    if extract_form.extract_to_date.data:
+        to_timestamp = int(datetime.datetime.combine(extract_form.extract_to_date.data, datetime.time.max).timestamp())
+
+    # Scanning years of history can take longer than a request may, so it runs in the background
+    # and the form page polls it until the CSV can be downloaded
+    try:
+        job = ExtractJob(watch=watch,
+                         regex=extract_form.extract_regex.data.strip(),
+                         from_timestamp=from_timestamp,
+                         to_timestamp=to_timestamp).start()
+    except JobRegistryFull:
+        flash(gettext("Too many extractions are running, please try again when one has finished."), "error")
+        return redirect(url_for('ui.ui_diff.diff_history_page_extract_GET', uuid=uuid))
+
+    return redirect(url_for('ui.ui_diff.diff_history_page_extract_GET', uuid=uuid, job=job.job_id))
@@ -30,6 +30,12 @@ class perform_site_check(difference_detection_processor):
     # Override to use PNG format for better image comparison (JPEG compression creates noise)
     screenshot_format = SCREENSHOT_FORMAT_PNG
 
+    def xpath_element_data_wanted(self):
+        # Cropping to the first include filter needs the element positions from this check
+        if any(f.strip() for f in self.watch.get('include_filters') or []):
+            return True
+        return super().xpath_element_data_wanted()
+
     def run_changedetection(self, watch, force_reprocess=False):
         """
         Perform screenshot comparison using OpenCV subprocess handler.
@@ -2,6 +2,7 @@
 from babel.numbers import parse_decimal
 from changedetectionio.model.Watch import model as BaseWatch
 from decimal import Decimal, InvalidOperation
+from loguru import logger
 from typing import Union
 import re
 
@@ -105,25 +106,47 @@ class Watch(BaseWatch):
         super().clear_watch()
         self.update({'restock': Restock()})
 
+    def save_history_blob(self, contents, timestamp, snapshot_id):
+        snapshot_fname = super().save_history_blob(contents=contents, timestamp=timestamp, snapshot_id=snapshot_id)
+        # Keep the compact price/stock series in step so the graph and price tokens never have to re-read snapshots
+        from .price_series import append_point, parse_restock_snapshot
+        try:
+            price, in_stock = parse_restock_snapshot(contents if isinstance(contents, str) else '')
+            append_point(self.data_dir, timestamp, price, in_stock, (self.get('restock') or {}).get('currency'))
+        except Exception as e:
+            logger.error(f"{self.get('uuid')} - Could not append to the price series: {e}")
+        return snapshot_fname
+
+    def get_price_series(self):
+        """The full price/stock timeline as a price_series.PriceSeries (oldest -> newest)"""
+        from .price_series import load_series
+        return load_series(self)
+
     def extra_notification_token_values(self):
         values = super().extra_notification_token_values()
         # Copy so the derived 'previous_price' token added below doesn't mutate the stored restock object
         values['restock'] = dict(self.get('restock', {}))
 
         values['restock']['previous_price'] = None
+        values['restock']['min_price'] = None
+        values['restock']['max_price'] = None
+        values['restock']['average_price'] = None
         if self.history_n >= 2:
-            history = self.history
-            if history and len(history) >=2:
-                """Unfortunately for now timestamp is stored as string key"""
-                # Keys are stored oldest-first (ascending). worker.py saves the new snapshot
-                # BEFORE sending the notification, so the newest key ([-1]) is the current check
-                # and the previous check is the second-newest ([-2]). Guaranteed to exist here
-                # because len(history) >= 2.
-                sorted_keys = sorted(list(history), key=lambda x: int(x))
-
-                price_str = self.get_history_snapshot(timestamp=sorted_keys[-2])
-                if price_str:
-                    values['restock']['previous_price'] = get_price_from_history_str(price_str)
+            # Series is oldest-first. worker.py saves the new snapshot BEFORE sending the notification,
+            # so the newest record ([-1]) is the current check and the previous check is [-2].
+            series = self.get_price_series()
+            if len(series) >= 2:
+                previous = series.price_at(-2)
+                if previous is not None:
+                    # Same string the snapshot text carried, ie "960.45"
+                    values['restock']['previous_price'] = str(Decimal(repr(previous)))
+
+            from .difference import compute_price_summary
+            summary = compute_price_summary(series)
+            if summary:
+                values['restock']['min_price'] = summary['min']
+                values['restock']['max_price'] = summary['max']
+                values['restock']['average_price'] = summary['avg']
         return values
 
     def extra_notification_token_placeholder_info(self):
@@ -133,6 +156,9 @@ class Watch(BaseWatch):
         values.append(('restock.in_stock', "In stock status"))
         values.append(('restock.last_price', "Price at the previous check"))
         values.append(('restock.previous_price', "Previous price in history"))
+        values.append(('restock.min_price', "Lowest price in history"))
+        values.append(('restock.max_price', "Highest price in history"))
+        values.append(('restock.average_price', "Average price in history"))
 
         return values
 
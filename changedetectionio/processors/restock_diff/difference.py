@@ -11,33 +11,16 @@ provides an optional get_data() hook served as JSON by /diff/<uuid>/processor-da
 (potentially long) timeline stays out of the rendered HTML - same rationale as the preview
 asset endpoint.
 """
-import re
 import statistics
 import time
 
 from flask_babel import gettext
 from loguru import logger
 
-# Snapshot format is written by processor.py:  f"In Stock: {in_stock} - Price: {price}"
-_RE_PRICE = re.compile(r"Price:\s*([\d.]+)", re.IGNORECASE)
-_RE_INSTOCK = re.compile(r"In Stock:\s*(True|False)", re.IGNORECASE)
+from .price_series import PriceSeries, downsample, load_series, parse_restock_snapshot as _parse_restock_snapshot
 
-
-def _parse_restock_snapshot(text):
-    """Parse a snapshot string into (price: float|None, in_stock: bool|None)."""
-    price = None
-    in_stock = None
-    if text:
-        m = _RE_PRICE.search(text)
-        if m:
-            try:
-                price = float(m.group(1))
-            except (TypeError, ValueError):
-                price = None
-        mi = _RE_INSTOCK.search(text)
-        if mi:
-            in_stock = mi.group(1).lower() == 'true'
-    return price, in_stock
+# Upper bound for ?max_points= on the processor-data endpoint
+RESTOCK_GRAPH_MAX_POINTS_LIMIT = 10000
 
 
 def _currency(watch):
@@ -48,17 +31,8 @@ def _currency(watch):
 
 
 def _build_series(watch):
-    """Read the full history into a [{timestamp, price, in_stock}] timeline (oldest -> newest)."""
-    series = []
-    for ts in list(watch.history.keys()):
-        try:
-            snapshot = watch.get_history_snapshot(timestamp=ts)
-        except Exception as e:
-            logger.error(f"Restock diff: unable to read snapshot {ts} for {watch.get('uuid')}: {e}")
-            continue
-        price, in_stock = _parse_restock_snapshot(snapshot)
-        series.append({'timestamp': int(ts), 'price': price, 'in_stock': in_stock})
-    return series
+    """The full history as a [{timestamp, price, in_stock}] timeline (oldest -> newest), from the price series file."""
+    return load_series(watch).to_records()
 
 
 def compute_price_summary(series):
@@ -68,9 +42,12 @@ def compute_price_summary(series):
     off an already-built series (cheap, no extra I/O) so the same function can be reused at
     check time to cache the result on the watch and avoid scanning history at render time.
 
-    Returns None when there are no prices.
+    Accepts a price_series.PriceSeries or a list of {price: ...} records. Returns None when there are no prices.
     """
-    prices = [p['price'] for p in series if p.get('price') is not None]
+    if isinstance(series, PriceSeries):
+        prices = series.priced()
+    else:
+        prices = [p['price'] for p in series if p.get('price') is not None]
     if not prices:
         return None
 
@@ -158,14 +135,26 @@ def export_xlsx(watch, datastore):
 
 def get_data(watch, datastore, request):
     """JSON payload for the price/stock graph, fetched via /diff/<uuid>/processor-data.
-    Keeps the full timeline out of the HTML page."""
-    series = _build_series(watch)
-    priced = sum(1 for p in series if p['price'] is not None)
-    logger.info(f"Restock diff get_data for {watch.get('uuid')}: {len(series)} snapshots, {priced} with a price")
+    Keeps the full timeline out of the HTML page.
+
+    Optional ?max_points=N thins a long timeline down server side (see price_series.downsample()),
+    the summary is always computed over the full timeline."""
+    series = load_series(watch)
+    summary = compute_price_summary(series)
+    if summary:
+        summary['changes'] = len(series)
+
+    max_points = request.args.get('max_points', type=int) if request else None
+    if max_points:
+        max_points = max(10, min(max_points, RESTOCK_GRAPH_MAX_POINTS_LIMIT))
+    indexes = downsample(series, max_points)
+
+    logger.debug(f"Restock diff get_data for {watch.get('uuid')}: {len(series)} records, returning {len(indexes)}")
     return {
-        'series': series,
+        'series': series.to_records(indexes),
+        'total': len(series),
         'currency': _currency(watch),
-        'summary': compute_price_summary(series),
+        'summary': summary,
     }
 
 
@@ -0,0 +1,234 @@
+"""
+Compact per-watch price/stock time-series for restock_diff watches.
+
+Every restock history snapshot is just a short string like "In Stock: True - Price: 12.34", so
+building the price graph (or working out the min/max/average price) used to mean opening and
+parsing every snapshot file in the watch history, every time - slow for watches with thousands
+of checks, and slower the older the watch gets.
+
+Instead each saved snapshot also appends one fixed-width binary record to price-series.bin in
+the watch data dir:
+
+    timestamp (int64) | price (float64, NaN = no price) | in_stock (int8, -1 = unknown) | currency (3 bytes)
+
+Reading it back is a single read() into column arrays (timestamps / prices / in_stock), no
+snapshot files are touched. The file is kept in step with the history index - when it's missing
+(watches created before this existed), behind, or the history was trimmed, load_series()
+reconciles it once, only parsing the snapshots that aren't in the series yet.
+"""
+
+import math
+import os
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from loguru import logger
+
+PRICE_SERIES_FILENAME = 'price-series.bin'
+
+_RECORD = struct.Struct('<qdb3s')
+
+# Snapshot format is written by processor.py:  f"In Stock: {in_stock} - Price: {price}"
+_RE_PRICE = re.compile(r"Price:\s*([\d.]+)", re.IGNORECASE)
+_RE_INSTOCK = re.compile(r"In Stock:\s*(True|False)", re.IGNORECASE)
+
+# Appends from the worker and reconciling reads from the UI/API must not interleave
+_lock = threading.Lock()
+
+
+def parse_restock_snapshot(text):
+    """Parse a snapshot string into (price: float|None, in_stock: bool|None)."""
+    price = None
+    in_stock = None
+    if text:
+        m = _RE_PRICE.search(text)
+        if m:
+            try:
+                price = float(m.group(1))
+            except (TypeError, ValueError):
+                price = None
+        mi = _RE_INSTOCK.search(text)
+        if mi:
+            in_stock = mi.group(1).lower() == 'true'
+    return price, in_stock
+
+
+class PriceSeries:
+    """Column arrays of one watch's price/stock timeline, oldest -> newest."""
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.prices = array('d')
+        self.in_stock = array('b')
+        self.currencies = []
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp, price, in_stock, currency=None):
+        self.timestamps.append(int(timestamp))
+        self.prices.append(math.nan if price is None else float(price))
+        self.in_stock.append(-1 if in_stock is None else int(bool(in_stock)))
+        self.currencies.append(currency or '')
+
+    def price_at(self, i):
+        p = self.prices[i]
+        return None if math.isnan(p) else p
+
+    def in_stock_at(self, i):
+        s = self.in_stock[i]
+        return None if s < 0 else bool(s)
+
+    def priced(self):
+        """All known prices, oldest -> newest"""
+        return [p for p in self.prices if not math.isnan(p)]
+
+    def slice(self, start, stop):
+        out = PriceSeries()
+        out.timestamps = self.timestamps[start:stop]
+        out.prices = self.prices[start:stop]
+        out.in_stock = self.in_stock[start:stop]
+        out.currencies = self.currencies[start:stop]
+        return out
+
+    def between(self, from_timestamp=None, to_timestamp=None):
+        """Records with from_timestamp <= timestamp <= to_timestamp"""
+        start = bisect_left(self.timestamps, int(from_timestamp)) if from_timestamp is not None else 0
+        stop = bisect_right(self.timestamps, int(to_timestamp)) if to_timestamp is not None else len(self)
+        return self.slice(start, stop)
+
+    def to_records(self, indexes=None):
+        """[{timestamp, price, in_stock}] - the shape the graph JS and the API use"""
+        if indexes is None:
+            indexes = range(len(self))
+        return [{'timestamp': self.timestamps[i], 'price': self.price_at(i), 'in_stock': self.in_stock_at(i)} for i in indexes]
+
+    def to_bytes(self):
+        return b''.join(
+            _RECORD.pack(self.timestamps[i], self.prices[i], self.in_stock[i],
+                         self.currencies[i].encode('ascii', errors='ignore')[:3])
+            for i in range(len(self))
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        series = cls()
+        usable = len(data) - (len(data) % _RECORD.size)  # Ignore a torn final record
+        for ts, price, in_stock, currency in _RECORD.iter_unpack(data[:usable]):
+            series.timestamps.append(ts)
+            series.prices.append(price)
+            series.in_stock.append(in_stock)
+            series.currencies.append(currency.rstrip(b'\x00').decode('ascii', errors='ignore'))
+        return series
+
+
+def _path(data_dir):
+    return os.path.join(data_dir, PRICE_SERIES_FILENAME)
+
+
+def read_series(data_dir):
+    try:
+        with open(_path(data_dir), 'rb') as f:
+            return PriceSeries.from_bytes(f.read())
+    except FileNotFoundError:
+        return PriceSeries()
+
+
+def write_series(data_dir, series):
+    tmp = _path(data_dir) + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(series.to_bytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _path(data_dir))
+
+
+def append_point(data_dir, timestamp, price, in_stock, currency=None):
+    """Append one record, called right after a restock snapshot is written to the history."""
+    point = PriceSeries()
+    point.append(timestamp, price, in_stock, currency)
+    with _lock:
+        with open(_path(data_dir), 'ab') as f:
+            f.write(point.to_bytes())
+
+
+def load_series(watch):
+    """
+    The watch's price series, reconciled against its history index first.
+    Only snapshots newer than the last record are read (all of them the first time for a watch
+    that never had a series file), records of history that was trimmed away are dropped.
+    """
+    keys = [int(k) for k in watch.history.keys()]
+    if not keys or not watch.data_dir or not os.path.isdir(watch.data_dir):
+        return PriceSeries()
+
+    with _lock:
+        series = read_series(watch.data_dir)
+        timestamps = list(series.timestamps)
+        if timestamps == keys:
+            return series
+
+        # History was trimmed at the front (history_snapshot_max_length)
+        if timestamps and keys[0] in series.timestamps:
+            start = timestamps.index(keys[0])
+            series = series.slice(start, len(series))
+            timestamps = timestamps[start:]
+
+        # Anything else that doesn't line up is rebuilt from the snapshots
+        if timestamps != keys[:len(timestamps)]:
+            series = PriceSeries()
+            timestamps = []
+
+        currency = (watch.get('restock') or {}).get('currency') or ''
+        missing = keys[len(timestamps):]
+        for ts in missing:
+            try:
+                price, in_stock = parse_restock_snapshot(watch.get_history_snapshot(timestamp=str(ts)))
+            except Exception as e:
+                logger.error(f"Restock price series: unable to read snapshot {ts} for {watch.get('uuid')}: {e}")
+                price, in_stock = None, None
+            series.append(ts, price, in_stock, currency)
+
+        if missing:
+            logger.debug(f"Restock price series for {watch.get('uuid')}: parsed {len(missing)} snapshots, {len(series)} records")
+        write_series(watch.data_dir, series)
+        return series
+
+
+def downsample(series, max_points):
+    """
+    Indexes of at most ~max_points records that still draw the same picture - the first and last
+    record, the cheapest and most expensive record of each bucket, and the first and last stock state
+    change in each bucket, so the line still touches its extremes and the in/out of stock colouring holds.
+    """
+    n = len(series)
+    if not max_points or n <= max_points:
+        return list(range(n))
+
+    buckets = max(1, (max_points - 2) // 4)
+    step = n / buckets
+    keep = {0, n - 1}
+    for b in range(buckets):
+        start, stop = int(b * step), min(n, int((b + 1) * step))
+        lo = hi = first_change = last_change = None
+        for i in range(start, stop):
+            if i and series.in_stock[i] != series.in_stock[i - 1]:
+                if first_change is None:
+                    first_change = i
+                last_change = i
+            p = series.prices[i]
+            if math.isnan(p):
+                continue
+            if lo is None or p < series.prices[lo]:
+                lo = i
+            if hi is None or p > series.prices[hi]:
+                hi = i
+        if lo is not None:
+            keep.update((lo, hi))
+        if first_change is not None:
+            keep.update((first_change, last_change))
+
+    return sorted(keep)
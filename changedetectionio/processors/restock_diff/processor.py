@@ -249,7 +249,6 @@ def extract_itemprop_availability_safe(html_content) -> Restock:
     if platform.system() == 'Linux':
         import multiprocessing
         import json
-        import gc
 
         try:
             ctx = multiprocessing.get_context('spawn')
@@ -263,7 +262,6 @@ def extract_itemprop_availability_safe(html_content) -> Restock:
 
             # Explicitly delete html_bytes copy immediately after sending
             del html_bytes
-            gc.collect()
 
             # Receive result as JSON
             result_bytes = parent_conn.recv_bytes()
@@ -278,7 +276,6 @@ def extract_itemprop_availability_safe(html_content) -> Restock:
 
             # Clean up all subprocess-related objects
             del p, parent_conn, child_conn, result_bytes
-            gc.collect()
 
             # Handle result or re-raise exception
             if result['success']:
@@ -286,14 +283,12 @@ def extract_itemprop_availability_safe(html_content) -> Restock:
                 restock_obj = Restock(result['data'])
                 # Clean up result dict
                 del result
-                gc.collect()
                 return restock_obj
             else:
                 # Re-raise the exception that occurred in subprocess
                 exception_type = result['exception_type']
                 exception_msg = result.get('exception_message', '')
                 del result
-                gc.collect()
 
                 if exception_type == 'MoreThanOnePriceFound':
                     raise MoreThanOnePriceFound()
@@ -303,7 +298,6 @@ def extract_itemprop_availability_safe(html_content) -> Restock:
         except Exception as e:
             # If multiprocessing itself fails, log and fall back to direct call
             logger.warning(f"Subprocess extraction failed: {e}, falling back to direct call")
-            gc.collect()
             return get_itemprop_availability(html_content)
     else:
         # Non-Linux: direct call (no subprocess overhead needed)
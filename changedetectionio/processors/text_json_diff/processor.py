@@ -31,6 +31,9 @@ JSON_FILTER_PREFIXES = ['json:', 'jq:', 'jqraw:']
 # Assume it's this type if the server says nothing on content-type
 DEFAULT_WHEN_NO_CONTENT_TYPE_HEADER = 'text/html'
 
+# Per watch, the checksum of what was left after the include filters and the text extracted from it
+FILTERED_TEXT_CACHE_FILENAME = 'last-filtered-text.json'
+
 class FilterNotFoundInResponse(ValueError):
     def __init__(self, msg, screenshot=None, xpath_data=None):
         self.screenshot = screenshot
@@ -401,6 +404,19 @@ class ContentProcessor:
             is_rss=stream_content_type.is_rss
         )
 
+    def filtered_content_checksum(self, html_content, stream_content_type):
+        """MD5 of what the include filters left, along with everything else that decides the text extracted from it."""
+        options = [
+            self.datastore.data["settings"]["application"].get("render_anchor_tag_content", False),
+            self.watch.is_source_type_url,
+            stream_content_type.is_html,
+            stream_content_type.is_rss,
+            stream_content_type.is_plaintext,
+        ]
+        m = hashlib.md5(json.dumps(options).encode('utf-8'))
+        m.update(html_content.encode('utf-8'))
+        return m.hexdigest()
+
 
 class ChecksumCalculator:
     """Calculates checksums with various options."""
@@ -424,6 +440,7 @@ class perform_site_check(difference_detection_processor):
             raise Exception("Watch no longer exists.")
 
         current_raw_document_checksum = self.get_raw_document_checksum()
+        had_raw_document_checksum = bool(self.last_raw_content_checksum)
 
         # Build filter config up front so we can hash it for the skip check.
         filter_config = FilterConfig(watch, self.datastore)
@@ -470,34 +487,35 @@ class perform_site_check(difference_detection_processor):
         # Avoid creating unnecessary intermediate string copies by reassigning only when needed
         content = self.fetcher.content
 
-        # RSS preprocessing
-        if stream_content_type.is_rss:
-            content = content_processor.preprocess_rss(content)
-            if self.datastore.data["settings"]["application"].get("rss_reader_mode"):
-                # Now just becomes regular HTML that can have xpath/CSS applied (first of the set etc)
-                stream_content_type.is_rss = False
+        with self.timings.phase('preprocess'):
+            # RSS preprocessing
+            if stream_content_type.is_rss:
+                content = content_processor.preprocess_rss(content)
+                if self.datastore.data["settings"]["application"].get("rss_reader_mode"):
+                    # Now just becomes regular HTML that can have xpath/CSS applied (first of the set etc)
+                    stream_content_type.is_rss = False
+                    stream_content_type.is_html = True
+                    self.fetcher.content = content
+
+            # PDF preprocessing
+            if watch.is_pdf or stream_content_type.is_pdf:
+                content = content_processor.preprocess_pdf(raw_content=self.fetcher.raw_content)
                 stream_content_type.is_html = True
-                self.fetcher.content = content
-
-        # PDF preprocessing
-        if watch.is_pdf or stream_content_type.is_pdf:
-            content = content_processor.preprocess_pdf(raw_content=self.fetcher.raw_content)
-            stream_content_type.is_html = True
 
-        # JSON - Always reformat it nicely for consistency.
+            # JSON - Always reformat it nicely for consistency.
 
-        if stream_content_type.is_json:
-            if not filter_config.has_include_json_filters:
-                content = content_processor.preprocess_json(raw_content=content)
-        #else, otherwise it gets sorted/formatted in the filter stage anyway
+            if stream_content_type.is_json:
+                if not filter_config.has_include_json_filters:
+                    content = content_processor.preprocess_json(raw_content=content)
+            #else, otherwise it gets sorted/formatted in the filter stage anyway
 
-        # HTML obfuscation workarounds
-        if stream_content_type.is_html:
-            content = html_tools.workarounds_for_obfuscations(content)
+            # HTML obfuscation workarounds
+            if stream_content_type.is_html:
+                content = html_tools.workarounds_for_obfuscations(content)
 
-        # Check for LD+JSON price data (for HTML content)
-        if stream_content_type.is_html:
-            update_obj['has_ldjson_price_data'] = html_tools.has_ldjson_product_info(content)
+            # Check for LD+JSON price data (for HTML content)
+            if stream_content_type.is_html:
+                update_obj['has_ldjson_price_data'] = html_tools.has_ldjson_product_info(content)
 
         # === FILTER APPLICATION ===
         # Start with content reference, avoid copy until modification
@@ -507,14 +525,37 @@ class perform_site_check(difference_detection_processor):
         # Otherwise a subtractive selector that relies on ancestor context (e.g. ".main .ads")
         # cannot match after the include filter has extracted the inner element and stripped
         # the parent wrapper.
-        if filter_config.has_subtractive_selectors:
-            html_content = content_processor.apply_subtractive_selectors(html_content)
-
-        # Apply include filters (CSS, XPath, JSON)
+        with self.timings.phase('filters'):
+            if filter_config.has_subtractive_selectors:
+                html_content = content_processor.apply_subtractive_selectors(html_content)
+
+            # Apply include filters (CSS, XPath, JSON)
+            if filter_config.has_include_filters:
+                html_content = content_processor.apply_include_filters(html_content, stream_content_type)
+
+        self.record_memory(content, html_content)
+
+        # === FILTERED CONTENT SKIP ===
+        # Noisy pages (ads, timestamps, tokens) change the raw checksum every time, but what the include filters
+        # leave is often byte-identical to last time - same skip as above, the text would come out the same.
+        # Same conditions, and deleting last-checksum.txt (settings/tag edits) turns this one off too.
+        filtered_checksum = None
+        filtered_cache = {}
         if filter_config.has_include_filters:
-            html_content = content_processor.apply_include_filters(html_content, stream_content_type)
+            filtered_checksum = content_processor.filtered_content_checksum(html_content, stream_content_type)
+            filtered_cache = self.get_extra_watch_config(FILTERED_TEXT_CACHE_FILENAME)
+            if (not force_reprocess and
+                not watch.was_edited and
+                had_raw_document_checksum and
+                watch.get('last_filter_config_hash') and
+                watch.get('last_filter_config_hash') == current_filter_config_hash and
+                filtered_cache.get('checksum') == filtered_checksum):
+                logger.debug(f"Watch UUID {watch.get('uuid')} filtered content unchanged since last check, skipping text extraction")
+                raise checksumFromPreviousCheckWasTheSame(
+                    update_obj={key: update_obj[key] for key in ('content-type', 'has_ldjson_price_data') if key in update_obj})
 
         # === TEXT EXTRACTION ===
+        extracted_text = None
         if watch.is_source_type_url:
             # For source URLs, keep raw content
             stripped_text = html_content
@@ -524,7 +565,13 @@ class perform_site_check(difference_detection_processor):
         else:
             # Extract text from HTML/RSS content (not generic XML)
             if stream_content_type.is_html or stream_content_type.is_rss:
-                stripped_text = content_processor.extract_text_from_html(html_content, stream_content_type)
+                if filtered_checksum and filtered_cache.get('checksum') == filtered_checksum and filtered_cache.get('text') is not None:
+                    # Still has to be processed (settings changed, forced recheck), but the extracted text is the same
+                    stripped_text = filtered_cache['text']
+                else:
+                    with self.timings.phase('html_to_text'):
+                        stripped_text = content_processor.extract_text_from_html(html_content, stream_content_type)
+                extracted_text = stripped_text
             else:
                 stripped_text = html_content
 
@@ -559,6 +606,10 @@ class perform_site_check(difference_detection_processor):
 
         update_obj["last_check_status"] = self.fetcher.get_last_status_code()
 
+        # Only once it made it through without an error, a skip must not hide an error the page still has
+        if filtered_checksum and filtered_cache.get('checksum') != filtered_checksum:
+            self.update_extra_watch_config(FILTERED_TEXT_CACHE_FILENAME, {'checksum': filtered_checksum, 'text': extracted_text}, merge=False)
+
         # Snapshot an ignore-applied stream BEFORE extract operations so line-level
         # ignore patterns still match original content (#4138). Otherwise an extract_text
         # regex like /(\d+\.\d+\.\d+)/ would transform "v.1.2.1" into "1.2.1" and the
@@ -602,9 +653,12 @@ class perform_site_check(difference_detection_processor):
             if strip_ignored_lines:
                 stripped_text = text_for_checksuming
 
+        self.record_memory(content, html_content, text_content_before_ignored_filter, stripped_text, text_for_checksuming)
+
         # Calculate checksum
         ignore_whitespace = self.datastore.data['settings']['application'].get('ignore_whitespace', False)
-        fetched_md5 = ChecksumCalculator.calculate(text_for_checksuming, ignore_whitespace=ignore_whitespace)
+        with self.timings.phase('checksum'):
+            fetched_md5 = ChecksumCalculator.calculate(text_for_checksuming, ignore_whitespace=ignore_whitespace)
 
         # === BLOCKING RULES EVALUATION ===
         blocked = False
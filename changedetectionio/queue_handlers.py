@@ -2,8 +2,21 @@ from blinker import signal
 from loguru import logger
 from typing import Dict, List, Any, Optional
 import heapq
+import itertools
+import os
 import queue
 import threading
+import time
+
+from changedetectionio.check_metrics import Histogram, _json_number
+from changedetectionio.queuedWatchMetaData import (
+    DEFAULT_DEADLINE_SECONDS,
+    PRIORITY_CLASSES,
+    PRIORITY_CLASS_BULK,
+    PRIORITY_CLASS_INTERACTIVE,
+    PRIORITY_CLASS_NORMAL,
+    PRIORITY_CLASS_SLA,
+)
 
 # Janus is no longer required - we use pure threading.Queue for multi-loop support
 # try:
@@ -11,6 +24,45 @@ import threading
 # except ImportError:
 #     pass  # Not needed anymore
 
+# Share of the dequeues each priority class gets while they all have work waiting
+DEFAULT_CLASS_WEIGHTS = {
+    PRIORITY_CLASS_INTERACTIVE: 8,
+    PRIORITY_CLASS_SLA: 4,
+    PRIORITY_CLASS_NORMAL: 2,
+    PRIORITY_CLASS_BULK: 1,
+}
+
+# Seconds an item waited in the queue, from "picked up at once" to "a day behind"
+QUEUE_WAIT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0, 21600.0, 86400.0)
+
+
+def class_weights_from_env():
+    """QUEUE_CLASS_WEIGHTS, for example 'interactive:8,sla:4,normal:2,bulk:1', classes left out keep their default"""
+    weights = dict(DEFAULT_CLASS_WEIGHTS)
+    for part in (os.getenv('QUEUE_CLASS_WEIGHTS') or '').split(','):
+        if not part.strip():
+            continue
+        name, _, value = part.partition(':')
+        name = name.strip().lower()
+        try:
+            weight = float(value)
+        except ValueError:
+            weight = 0
+        if name not in weights or weight <= 0:
+            logger.warning(f"Ignoring QUEUE_CLASS_WEIGHTS entry '{part.strip()}', expected <class>:<weight above 0> with class one of {', '.join(PRIORITY_CLASSES)}")
+            continue
+        weights[name] = weight
+    return weights
+
+
+class _ClassStats:
+    __slots__ = ('served', 'deadline_missed', 'wait')
+
+    def __init__(self):
+        self.served = 0
+        self.deadline_missed = 0
+        self.wait = Histogram(buckets=QUEUE_WAIT_BUCKETS)
+
 
 class RecheckPriorityQueue:
     """
@@ -36,18 +88,33 @@ class RecheckPriorityQueue:
     - With 200 workers, run_in_executor() would block 200 threads
     - Exhausts ThreadPoolExecutor, starves Flask HTTP handlers
     - Pure async approach uses 0 threads while waiting
+
+    PRIORITY CLASSES:
+    - Every item is in one class (PrioritizedItem.priority_class): interactive, sla, normal, bulk
+    - Inside a class the earliest deadline goes first (then priority, then arrival)
+    - Between classes stride scheduling shares the dequeues by weight (QUEUE_CLASS_WEIGHTS), so a
+      backlog of bulk rechecks slows the bulk class down without holding up anything else, and
+      the bulk class still moves while interactive rechecks keep coming in
+    - Time waited and deadlines missed are recorded per class, see stats()
     """
 
-    def __init__(self, maxsize: int = 0):
+    def __init__(self, maxsize: int = 0, class_weights: Optional[Dict[str, float]] = None):
         try:
             import asyncio
 
             # Sync interface: threading.Queue for ticker thread and Flask routes
             self._notification_queue = queue.Queue(maxsize=maxsize if maxsize > 0 else 0)
 
-            # Priority storage - thread-safe
-            self._priority_items = []
+            # Priority storage - thread-safe, one heap of (deadline, priority, sequence, item) per class
+            self._class_items = {name: [] for name in PRIORITY_CLASSES}
             self._lock = threading.RLock()
+            self._sequence = itertools.count()
+
+            # Stride scheduling, the class with the lowest pass is served next and its pass moves on by 1/weight
+            self._class_weights = class_weights or class_weights_from_env()
+            self._class_pass = {name: 0.0 for name in PRIORITY_CLASSES}
+            self._virtual_time = 0.0
+            self._class_stats = {name: _ClassStats() for name in PRIORITY_CLASSES}
 
             # No event signaling needed - pure polling approach
             # Workers check queue every 50ms (latency acceptable: 0-500ms)
@@ -69,17 +136,29 @@ class RecheckPriorityQueue:
             # Stamp an enqueue timestamp on the item if it doesn't already carry one
             # — gives the queue UI a "queued Ns ago" reading without all callers
             # having to opt in. setdefault preserves callers that DO supply their own.
+            enqueued_at = time.time()
             try:
                 if hasattr(item, 'item') and isinstance(item.item, dict):
-                    import time as _t
-                    item.item.setdefault('enqueued_at', _t.time())
+                    enqueued_at = item.item.setdefault('enqueued_at', enqueued_at)
             except Exception:
                 pass
 
+            priority_class = self._item_class(item)
+            if getattr(item, 'deadline', None) is None:
+                try:
+                    item.deadline = enqueued_at + DEFAULT_DEADLINE_SECONDS[priority_class]
+                except AttributeError:
+                    pass
+            entry = (getattr(item, 'deadline', None) or 0, item.priority, next(self._sequence), item)
+
             # CRITICAL: Add to both priority storage AND notification queue atomically
             # to prevent desynchronization where item exists but no notification
             with self._lock:
-                heapq.heappush(self._priority_items, item)
+                class_items = self._class_items[priority_class]
+                if not class_items:
+                    # A class that was idle starts level with the others instead of catching up on the turns it didn't need
+                    self._class_pass[priority_class] = max(self._class_pass[priority_class], self._virtual_time)
+                heapq.heappush(class_items, entry)
 
                 # Add notification - use blocking with timeout for safety
                 # Notification queue is unlimited size, so should never block in practice
@@ -90,8 +169,8 @@ class RecheckPriorityQueue:
                     # Notification failed - MUST remove from priority_items to keep in sync
                     # This prevents "Priority queue inconsistency" errors in get()
                     logger.critical(f"CRITICAL: Notification queue put failed, removing from priority_items: {notif_e}")
-                    self._priority_items.remove(item)
-                    heapq.heapify(self._priority_items)
+                    class_items.remove(entry)
+                    heapq.heapify(class_items)
                     raise  # Re-raise to be caught by outer exception handler
 
             # Signal emission after successful queue - log but don't fail the operation
@@ -119,10 +198,14 @@ class RecheckPriorityQueue:
 
             # Get highest priority item
             with self._lock:
-                if not self._priority_items:
+                priority_class = self._next_class(self._class_pass, self._class_items)
+                if priority_class is None:
                     logger.critical(f"CRITICAL: Queue notification received but no priority items available")
                     raise Exception("Priority queue inconsistency")
-                item = heapq.heappop(self._priority_items)
+                item = heapq.heappop(self._class_items[priority_class])[3]
+                self._virtual_time = self._class_pass[priority_class]
+                self._class_pass[priority_class] += 1.0 / self._class_weights[priority_class]
+                self._record_served(priority_class, item)
 
             # Signal emission after successful retrieval - log but don't lose the item
             # Item is already retrieved, so signal failure shouldn't affect queue state
@@ -216,7 +299,7 @@ class RecheckPriorityQueue:
         """Get current queue size"""
         try:
             with self._lock:
-                return len(self._priority_items)
+                return sum(len(class_items) for class_items in self._class_items.values())
         except Exception as e:
             logger.critical(f"CRITICAL: Failed to get queue size: {str(e)}")
             return 0
@@ -229,7 +312,7 @@ class RecheckPriorityQueue:
         """Get list of all queued UUIDs efficiently with single lock"""
         try:
             with self._lock:
-                return [item.item['uuid'] for item in self._priority_items if hasattr(item, 'item') and 'uuid' in item.item]
+                return [item.item['uuid'] for item in self._all_items() if hasattr(item, 'item') and 'uuid' in item.item]
         except Exception as e:
             logger.critical(f"CRITICAL: Failed to get queued UUIDs: {str(e)}")
             return []
@@ -239,7 +322,8 @@ class RecheckPriorityQueue:
         try:
             with self._lock:
                 # Clear priority items
-                self._priority_items.clear()
+                for class_items in self._class_items.values():
+                    class_items.clear()
 
                 # Drain all notifications to prevent stale notifications
                 # This is critical for test cleanup to prevent queue desynchronization
@@ -270,10 +354,10 @@ class RecheckPriorityQueue:
     # COMPATIBILITY METHODS (from original implementation)
     @property
     def queue(self):
-        """Provide compatibility with original queue access"""
+        """Provide compatibility with original queue access, in the order the items will be served"""
         try:
             with self._lock:
-                return list(self._priority_items)
+                return self._dequeue_order()
         except Exception as e:
             logger.critical(f"CRITICAL: Failed to get queue list: {str(e)}")
             return []
@@ -282,23 +366,22 @@ class RecheckPriorityQueue:
         """Find position of UUID in queue"""
         try:
             with self._lock:
-                queue_list = list(self._priority_items)
+                queue_list = self._dequeue_order()
                 total_items = len(queue_list)
                 
                 if total_items == 0:
                     return {'position': None, 'total_items': 0, 'priority': None, 'found': False}
                 
-                # Find target item
-                for item in queue_list:
+                # Find target item, its position is how many will be served before it
+                for position, item in enumerate(queue_list):
                     if (hasattr(item, 'item') and isinstance(item.item, dict) and 
                         item.item.get('uuid') == target_uuid):
-                        
-                        # Count items with higher priority
-                        position = sum(1 for other in queue_list if other.priority < item.priority)
                         return {
                             'position': position,
                             'total_items': total_items, 
                             'priority': item.priority,
+                            'priority_class': self._item_class(item),
+                            'deadline': getattr(item, 'deadline', None),
                             'found': True
                         }
                 
@@ -312,7 +395,7 @@ class RecheckPriorityQueue:
         """Get all queued UUIDs with pagination"""
         try:
             with self._lock:
-                queue_list = sorted(self._priority_items)  # Sort by priority
+                queue_list = self._dequeue_order()  # The order get() will hand them out
                 total_items = len(queue_list)
                 
                 if total_items == 0:
@@ -330,6 +413,8 @@ class RecheckPriorityQueue:
                             'uuid': item.item['uuid'],
                             'position': position,
                             'priority': item.priority,
+                            'priority_class': self._item_class(item),
+                            'deadline': getattr(item, 'deadline', None),
                             'enqueued_at': item.item.get('enqueued_at'),
                         })
                 
@@ -348,13 +433,15 @@ class RecheckPriorityQueue:
         """Get queue summary statistics"""
         try:
             with self._lock:
-                queue_list = list(self._priority_items)
+                queue_list = self._all_items()
                 total_items = len(queue_list)
+                classes = {name: len(class_items) for name, class_items in self._class_items.items()}
                 
                 if total_items == 0:
                     return {
                         'total_items': 0, 'priority_breakdown': {},
-                        'immediate_items': 0, 'clone_items': 0, 'scheduled_items': 0
+                        'immediate_items': 0, 'clone_items': 0, 'scheduled_items': 0,
+                        'classes': classes
                     }
                 
                 immediate_items = clone_items = scheduled_items = 0
@@ -377,6 +464,7 @@ class RecheckPriorityQueue:
                     'immediate_items': immediate_items,
                     'clone_items': clone_items,
                     'scheduled_items': scheduled_items,
+                    'classes': classes,
                     'min_priority': min(priority_counts.keys()) if priority_counts else None,
                     'max_priority': max(priority_counts.keys()) if priority_counts else None
                 }
@@ -384,9 +472,103 @@ class RecheckPriorityQueue:
         except Exception as e:
             logger.critical(f"CRITICAL: Failed to get queue summary: {str(e)}")
             return {'total_items': 0, 'priority_breakdown': {}, 'immediate_items': 0, 
-                   'clone_items': 0, 'scheduled_items': 0}
+                   'clone_items': 0, 'scheduled_items': 0, 'classes': {}}
+
+    def stats(self) -> Dict[str, Any]:
+        """Per priority class: waiting now, how long the oldest has waited, served, time waited and deadlines missed"""
+        now = time.time()
+        with self._lock:
+            classes = {}
+            for name in PRIORITY_CLASSES:
+                class_items = self._class_items[name]
+                stats = self._class_stats[name]
+                enqueued = [entry[3].item.get('enqueued_at') or now for entry in class_items
+                            if isinstance(getattr(entry[3], 'item', None), dict)]
+                classes[name] = {
+                    'weight': self._class_weights[name],
+                    'queued': len(class_items),
+                    'overdue': sum(1 for entry in class_items if entry[0] and entry[0] < now),
+                    'oldest_wait_seconds': round(now - min(enqueued), 3) if enqueued else 0.0,
+                    'served': stats.served,
+                    'deadline_missed': stats.deadline_missed,
+                    'wait': {
+                        'avg_seconds': round(stats.wait.sum / stats.wait.count, 3) if stats.wait.count else 0.0,
+                        'p50_seconds': _json_number(stats.wait.quantile(0.5)),
+                        'p95_seconds': _json_number(stats.wait.quantile(0.95)),
+                    },
+                }
+        return {'classes': classes}
+
+    def openmetrics_lines(self):
+        with self._lock:
+            depth = {name: len(self._class_items[name]) for name in PRIORITY_CLASSES}
+            waits = {name: (s.wait.cumulative(), s.wait.count, s.wait.sum) for name, s in self._class_stats.items()}
+            missed = {name: s.deadline_missed for name, s in self._class_stats.items()}
+        lines = [
+            '# TYPE changedetection_queue_class_depth gauge',
+            '# HELP changedetection_queue_class_depth Watches waiting in the check queue by priority class.',
+        ]
+        lines += [f'changedetection_queue_class_depth{{class="{name}"}} {depth[name]}' for name in PRIORITY_CLASSES]
+        lines += [
+            '# TYPE changedetection_queue_wait_seconds histogram',
+            '# UNIT changedetection_queue_wait_seconds seconds',
+            '# HELP changedetection_queue_wait_seconds Time from queued to picked up by a worker, by priority class.',
+        ]
+        for name in PRIORITY_CLASSES:
+            cumulative, count, total = waits[name]
+            for upper, seen in zip(QUEUE_WAIT_BUCKETS, cumulative):
+                lines.append(f'changedetection_queue_wait_seconds_bucket{{class="{name}",le="{upper}"}} {seen}')
+            lines.append(f'changedetection_queue_wait_seconds_bucket{{class="{name}",le="+Inf"}} {count}')
+            lines.append(f'changedetection_queue_wait_seconds_count{{class="{name}"}} {count}')
+            lines.append(f'changedetection_queue_wait_seconds_sum{{class="{name}"}} {total}')
+        lines += [
+            '# TYPE changedetection_queue_deadline_missed counter',
+            '# HELP changedetection_queue_deadline_missed Checks picked up after their deadline, by priority class.',
+        ]
+        lines += [f'changedetection_queue_deadline_missed_total{{class="{name}"}} {missed[name]}' for name in PRIORITY_CLASSES]
+        return lines
     
     # PRIVATE METHODS
+    def _item_class(self, item) -> str:
+        priority_class = getattr(item, 'priority_class', None)
+        if priority_class in self._class_items:
+            return priority_class
+        return PRIORITY_CLASS_INTERACTIVE if getattr(item, 'priority', 0) <= 100 else PRIORITY_CLASS_NORMAL
+
+    def _all_items(self) -> list:
+        return [entry[3] for class_items in self._class_items.values() for entry in class_items]
+
+    def _next_class(self, class_pass, class_items):
+        """The class with work waiting and the lowest pass, ties go to the more urgent class"""
+        best = None
+        for name in PRIORITY_CLASSES:
+            if class_items[name] and (best is None or class_pass[name] < class_pass[best]):
+                best = name
+        return best
+
+    def _dequeue_order(self) -> list:
+        """Every queued item in the order get() would hand them out if nothing else was queued, call with _lock held"""
+        pending = {name: sorted(class_items, reverse=True) for name, class_items in self._class_items.items()}
+        class_pass = dict(self._class_pass)
+        order = []
+        while True:
+            name = self._next_class(class_pass, pending)
+            if name is None:
+                return order
+            order.append(pending[name].pop()[3])
+            class_pass[name] += 1.0 / self._class_weights[name]
+
+    def _record_served(self, priority_class, item):
+        now = time.time()
+        stats = self._class_stats[priority_class]
+        stats.served += 1
+        enqueued_at = item.item.get('enqueued_at') if isinstance(getattr(item, 'item', None), dict) else None
+        if enqueued_at:
+            stats.wait.observe(max(0.0, now - enqueued_at))
+        deadline = getattr(item, 'deadline', None)
+        if deadline and now > deadline:
+            stats.deadline_missed += 1
+
     def _get_item_uuid(self, item) -> str:
         """Safely extract UUID from item for logging"""
         try:
@@ -1,5 +1,30 @@
+import time
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Any, Optional
+
+# Priority classes, RecheckPriorityQueue shares the workers between them by weight (QUEUE_CLASS_WEIGHTS)
+PRIORITY_CLASS_INTERACTIVE = 'interactive'  # Someone is waiting on it - manual recheck, clone, new watch
+PRIORITY_CLASS_SLA = 'sla'                  # Scheduled check of a watch set to "high" check priority
+PRIORITY_CLASS_NORMAL = 'normal'            # Scheduled check
+PRIORITY_CLASS_BULK = 'bulk'                # Mass rechecks and watches set to "low" check priority
+
+PRIORITY_CLASSES = (PRIORITY_CLASS_INTERACTIVE, PRIORITY_CLASS_SLA, PRIORITY_CLASS_NORMAL, PRIORITY_CLASS_BULK)
+
+# Watch 'check_priority' setting -> the class its scheduled checks are queued in
+CHECK_PRIORITY_CLASSES = {
+    'high': PRIORITY_CLASS_SLA,
+    'normal': PRIORITY_CLASS_NORMAL,
+    'low': PRIORITY_CLASS_BULK,
+}
+
+# Seconds until an item is late when it's queued without a deadline
+DEFAULT_DEADLINE_SECONDS = {
+    PRIORITY_CLASS_INTERACTIVE: 60,
+    PRIORITY_CLASS_SLA: 300,
+    PRIORITY_CLASS_NORMAL: 3600,
+    PRIORITY_CLASS_BULK: 6 * 3600,
+}
+
 
 # So that we can queue some metadata in `item`
 # https://docs.python.org/3/library/queue.html#queue.PriorityQueue
@@ -8,3 +33,16 @@ from typing import Any
 class PrioritizedItem:
     priority: int
     item: Any=field(compare=False)
+    # One of PRIORITY_CLASSES, when not given it follows the old convention, 1-100 interactive, the rest normal
+    priority_class: Optional[str] = field(default=None, compare=False)
+    # Epoch time the check should have happened by, stamped by the queue when not given
+    deadline: Optional[float] = field(default=None, compare=False)
+
+    def __post_init__(self):
+        if self.priority_class not in PRIORITY_CLASSES:
+            self.priority_class = PRIORITY_CLASS_INTERACTIVE if self.priority <= 100 else PRIORITY_CLASS_NORMAL
+
+    def deferred(self):
+        """The same check queued again (its watch was busy), keeps its class and deadline so it isn't pushed back"""
+        return PrioritizedItem(priority=max(self.priority, int(time.time())), item=self.item,
+                               priority_class=self.priority_class, deadline=self.deadline)
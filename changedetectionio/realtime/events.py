@@ -19,6 +19,11 @@ def register_watch_operation_handlers(socketio, datastore):
                 emit('operation_result', {'success': False, 'error': 'Missing operation or UUID'})
                 return
             
+            # Read-only while the datastore is migrating, same as the HTTP routes (see read_only_while_migrating)
+            if datastore.migrating.is_set():
+                emit('operation_result', {'success': False, 'error': 'Datastore upgrade in progress'})
+                return
+
             # Check if watch exists
             if not datastore.data['watching'].get(uuid):
                 emit('operation_result', {'success': False, 'error': 'Watch not found'})
@@ -46,6 +46,9 @@ class SignalHandler:
         general_stats_signal = signal('general_stats_update')
         general_stats_signal.connect(self.handle_general_stats_update, weak=False)
 
+        bulk_import_progress_signal = signal('bulk_import_progress')
+        bulk_import_progress_signal.connect(self.handle_bulk_import_progress, weak=False)
+
 
     def handle_general_stats_update(self, *args, **kwargs):
         """Emit the global counters once, without touching any individual row.
@@ -65,6 +68,13 @@ class SignalHandler:
         except Exception as e:
             logger.error(f"Socket.IO error in handle_general_stats_update: {str(e)}")
 
+    def handle_bulk_import_progress(self, *args, **kwargs):
+        """Progress of a background import, sent once per written batch (see bulk_import.py)"""
+        job = kwargs.get('job')
+        if job:
+            self.socketio_instance.emit("bulk_import_progress", job)
+            logger.trace(f"Socket.IO: Emitted bulk_import_progress for job {job.get('job_id')}")
+
     def handle_watch_small_status_update(self, *args, **kwargs):
         """Small simple status update, for example 'Connecting...'"""
         watch_uuid = kwargs.get('watch_uuid')
@@ -80,6 +80,9 @@ echo "---------------------------- DONE parallel test --------------------------
 
 FETCH_WORKERS=20 pytest -vvv -s tests/test_queue_handler.py
 
+# Keep the benchmark harness working, the real numbers come from python3 -m changedetectionio.tests.benchmark.run
+FETCH_WORKERS=4 pytest -vv -s tests/benchmark/test_benchmark.py
+
 echo "RUNNING WITH BASE_URL SET"
 
 # Now re-run some tests with BASE_URL enabled
@@ -0,0 +1,522 @@
+"""
+Sharded mode, several changedetection.io processes (nodes) sharing one datastore directory
+
+Why: everything assumes one process owns the datastore, so checking was capped at the workers of one
+box. In sharded mode the watches are split between worker nodes by a consistent hash of the watch UUID,
+each worker node runs the scheduler and worker pool for its own share only, and one coordinator node
+serves the UI and API. The nodes share nothing but the datastore directory (a shared filesystem - NFS,
+a mounted volume or one local disk).
+
+Roles (SHARD_ROLE):
+  coordinator   serves the UI/API, owns the settings, tags and watch configuration, runs no checks
+  worker        checks the watches the hash ring gives it, point people at the coordinator for the UI
+
+Membership - every node writes <datastore>/shards/<node id>.json with a heartbeat. A worker that hasn't
+written one for SHARD_NODE_TIMEOUT_SECONDS is gone. The hash ring is rebuilt from the live workers, so
+when one joins or leaves only its share of the watches changes hands, and nothing has to be copied
+because every node reads the same files. A watch can be checked twice around a handover, never lost.
+
+Keeping in step - every SHARD_SYNC_SECONDS each node reads back what the others wrote:
+  - watch.json files that changed, new watch directories, watch directories that were removed
+  - changedetection.json and the tag.json files (worker nodes, the coordinator writes them)
+  - recheck requests (worker nodes), "Recheck" on the coordinator drops <datastore>/shards/rechecks/<uuid>
+    and the worker that owns the watch queues it
+The fields of a watch belong to one side: what a check writes (CHECK_FIELDS) to the worker that owns
+the watch, everything else to the coordinator. A node only takes the other side's fields from disk,
+and does so again right before it writes a watch.json, so neither side overwrites what the other changed.
+That read-merge-write holds an advisory lock (flock) on <datastore>/shards/locks/<uuid>.lock, so two
+nodes committing the same watch at once take turns instead of the last writer winning.
+Snapshots, screenshots and the other per-watch files are only written by the owning worker.
+
+Schema updates are run by the coordinator, worker nodes wait for them at startup.
+
+Trying it on one machine:
+  SHARD_NODE_ID=coordinator SHARD_ROLE=coordinator ./changedetection.py -C -d /tmp/sharded -p 5000
+  SHARD_NODE_ID=worker-1 ./changedetection.py -C -d /tmp/sharded -p 5001
+  SHARD_NODE_ID=worker-2 ./changedetection.py -C -d /tmp/sharded -p 5002
+
+Environment variables:
+  SHARD_NODE_ID                — turns sharded mode on, unique name of this node
+  SHARD_ROLE                   — worker (default) or coordinator
+  SHARD_SYNC_SECONDS           — how often to heartbeat and read back the other nodes' writes (default 5)
+  SHARD_NODE_TIMEOUT_SECONDS   — a worker without a heartbeat for this long has left (default 30)
+  SHARD_VNODES                 — points per worker on the hash ring (default 64)
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, no advisory locks, commits from different nodes aren't serialized
+    fcntl = None
+
+SHARDS_DIR = 'shards'
+RECHECKS_DIR = 'rechecks'
+LOCKS_DIR = 'locks'
+
+ROLE_COORDINATOR = 'coordinator'
+ROLE_WORKER = 'worker'
+
+# What a check writes to the watch (worker.py, the processors, the LLM evaluator and the notifications
+# the check sends), these belong to the worker node that owns the watch
+CHECK_FIELDS = frozenset({
+    '_llm_change_summary',
+    '_llm_intent',
+    '_llm_result',
+    'adaptive_recheck_seconds',
+    'browser_steps_last_error_step',
+    'check_count',
+    'consecutive_filter_failures',
+    'content-type',
+    'fetch_time',
+    'has_ldjson_price_data',
+    'last_check_status',
+    'last_checked',
+    'last_error',
+    'last_filter_config_hash',
+    'last_notification_error',
+    'llm_evaluation_cache',
+    'llm_last_tokens_used',
+    'llm_prefilter',
+    'llm_tokens_period_key',
+    'llm_tokens_this_period',
+    'llm_tokens_used_cumulative',
+    'notification_alert_count',
+    'page_title',
+    'previous_md5',
+    'previous_md5_before_filters',
+    'remote_server_reply',
+    'restock',
+})
+
+
+def shard_role():
+    """This node's role, None when sharded mode is off"""
+    if not os.getenv('SHARD_NODE_ID'):
+        return None
+    return ROLE_COORDINATOR if os.getenv('SHARD_ROLE', ROLE_WORKER).strip().lower() == ROLE_COORDINATOR else ROLE_WORKER
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def _read_json(path):
+    with open(path, 'rb') as f:
+        return json.loads(f.read())
+
+
+class HashRing:
+    """Consistent hash of watch UUIDs onto nodes, each node is placed at `vnodes` points so the watches spread evenly"""
+
+    def __init__(self, nodes=(), vnodes=64):
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted((_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(vnodes))
+        self._points = [point for point, _node in points]
+        self._owners = [node for _point, node in points]
+
+    def node_for(self, key):
+        if not self._points:
+            return None
+        return self._owners[bisect.bisect(self._points, _hash(key)) % len(self._points)]
+
+
+def wait_for_schema(datastore_path, schema_version, exit_event=None, poll_seconds=5):
+    """Block until the coordinator has created changedetection.json at (at least) schema_version"""
+    settings_json = os.path.join(datastore_path, 'changedetection.json')
+    waiting_since = time.time()
+    while True:
+        try:
+            current = _read_json(settings_json).get('settings', {}).get('application', {}).get('schema_version', 0)
+        except (OSError, ValueError):
+            current = None
+        if current is not None and current >= schema_version:
+            return current
+        if time.time() - waiting_since > poll_seconds:
+            logger.warning(f"Sharded mode: waiting for the coordinator to bring {settings_json} to schema {schema_version} (at {current})")
+        if exit_event is not None:
+            if exit_event.wait(poll_seconds):
+                return current
+        else:
+            time.sleep(poll_seconds)
+
+
+class ShardNode:
+    """This process in sharded mode, its place on the ring and the read back of the other nodes' writes"""
+
+    def __init__(self, datastore_path, node_id, role=ROLE_WORKER, sync_seconds=None, node_timeout_seconds=None, vnodes=None):
+        self.datastore_path = datastore_path
+        self.node_id = node_id
+        self.role = role
+        self.sync_seconds = float(sync_seconds if sync_seconds is not None else os.getenv('SHARD_SYNC_SECONDS', 5))
+        self.node_timeout_seconds = float(node_timeout_seconds if node_timeout_seconds is not None else os.getenv('SHARD_NODE_TIMEOUT_SECONDS', 30))
+        self.vnodes = int(vnodes if vnodes is not None else os.getenv('SHARD_VNODES', 64))
+        self.started = time.time()
+
+        self.datastore = None
+        self.update_q = None
+        self._lock = threading.RLock()
+        self._ring = HashRing((node_id,) if role == ROLE_WORKER else (), self.vnodes)
+        # uuid -> _signature() of the watch.json / tag.json as last read or written by this node
+        self._watch_seen = {}
+        self._tag_seen = {}
+        self._settings_seen = None
+
+        self.rebalances = 0
+        self.watches_loaded = 0
+        self.watches_merged = 0
+        self.watches_removed = 0
+        self.rechecks_forwarded = 0
+        self.rechecks_queued = 0
+        self.last_sync = None
+
+    @property
+    def shards_dir(self):
+        return os.path.join(self.datastore_path, SHARDS_DIR)
+
+    @property
+    def runs_checks(self):
+        return self.role == ROLE_WORKER
+
+    # ---- Membership and ownership
+
+    def heartbeat(self):
+        from changedetectionio.store.file_saving_datastore import save_json_atomic
+        save_json_atomic(os.path.join(self.shards_dir, f'{self.node_id}.json'), {
+            'node_id': self.node_id,
+            'role': self.role,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'started': int(self.started),
+            'heartbeat': time.time(),
+        }, label='shard heartbeat')
+
+    def live_workers(self, now=None):
+        now = now or time.time()
+        workers = set()
+        try:
+            names = os.listdir(self.shards_dir)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                node = _read_json(os.path.join(self.shards_dir, name))
+            except (OSError, ValueError):
+                continue
+            if node.get('role') == ROLE_WORKER and now - node.get('heartbeat', 0) <= self.node_timeout_seconds:
+                workers.add(node.get('node_id'))
+        if self.runs_checks:
+            workers.add(self.node_id)
+        return workers
+
+    def refresh_ring(self, now=None):
+        """Rebuild the ring when workers joined or left, returns True when it changed"""
+        workers = self.live_workers(now=now)
+        with self._lock:
+            if set(self._ring.nodes) == workers:
+                return False
+            previous = self._ring.nodes
+            self._ring = HashRing(workers, self.vnodes)
+            self.rebalances += 1
+        logger.info(f"Sharded mode: workers changed from {list(previous)} to {sorted(workers)}, rebalanced")
+        return True
+
+    def owner_of(self, uuid):
+        return self._ring.node_for(uuid)
+
+    def owns(self, uuid):
+        return self.runs_checks and self._ring.node_for(uuid) == self.node_id
+
+    def leave(self):
+        try:
+            os.unlink(os.path.join(self.shards_dir, f'{self.node_id}.json'))
+        except FileNotFoundError:
+            pass
+
+    # ---- Rechecks for watches another node checks
+
+    def request_recheck(self, uuid):
+        """Ask the worker that owns the watch to check it now"""
+        os.makedirs(os.path.join(self.shards_dir, RECHECKS_DIR), exist_ok=True)
+        with open(os.path.join(self.shards_dir, RECHECKS_DIR, uuid), 'w') as f:
+            f.write(self.node_id)
+        self.rechecks_forwarded += 1
+        return True
+
+    def _queue_requested_rechecks(self):
+        from changedetectionio import queuedWatchMetaData, worker_pool
+        rechecks_dir = os.path.join(self.shards_dir, RECHECKS_DIR)
+        try:
+            uuids = os.listdir(rechecks_dir)
+        except FileNotFoundError:
+            return
+        for uuid in uuids:
+            if not self.owns(uuid) or self.update_q is None:
+                continue
+            try:
+                os.unlink(os.path.join(rechecks_dir, uuid))
+            except FileNotFoundError:
+                # Another node got to it during a handover
+                continue
+            if uuid in self.datastore.data['watching']:
+                worker_pool.queue_item_async_safe(self.update_q, queuedWatchMetaData.PrioritizedItem(priority=1, item={'uuid': uuid}))
+                self.rechecks_queued += 1
+
+    # ---- Reading back what the other nodes wrote
+
+    def attach(self, datastore, update_q=None):
+        """Start from what the datastore already loaded, only later changes are read back"""
+        self.datastore = datastore
+        self.update_q = update_q
+        for uuid, watch in list(datastore.data['watching'].items()):
+            seen = self._signature(os.path.join(self.datastore_path, uuid, 'watch.json'))
+            if seen is not None:
+                self._watch_seen[uuid] = seen
+        for uuid in list(datastore.data['settings']['application']['tags'].keys()):
+            seen = self._signature(os.path.join(self.datastore_path, uuid, 'tag.json'))
+            if seen is not None:
+                self._tag_seen[uuid] = seen
+        self._settings_seen = self._signature(os.path.join(self.datastore_path, 'changedetection.json'))
+
+    @staticmethod
+    def _signature(path):
+        """Changes on every write, save_json_atomic() renames a new file into place so the inode changes even within one mtime tick"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _foreign_fields(self, uuid, data):
+        """The fields of a watch on disk that the other side owns"""
+        if self.role == ROLE_COORDINATOR:
+            return {k: v for k, v in data.items() if k in CHECK_FIELDS}
+        if self.owns(uuid):
+            return {k: v for k, v in data.items() if k not in CHECK_FIELDS and k != 'uuid'}
+        return data
+
+    def _merge_watch(self, watch, data):
+        changes = {k: v for k, v in self._foreign_fields(watch.get('uuid'), data).items() if watch.get(k) != v}
+        if changes:
+            with self.datastore.lock:
+                watch.update(changes)
+            self.watches_merged += 1
+
+    def sync(self, now=None):
+        """One round of heartbeat, rebalance and read back, run every sync_seconds"""
+        self.heartbeat()
+        self.refresh_ring(now=now)
+        if self.datastore is None:
+            return
+        with self._lock:
+            if self.role == ROLE_WORKER:
+                self._sync_settings()
+            self._sync_entities()
+            if self.runs_checks:
+                self._queue_requested_rechecks()
+        self.last_sync = time.time()
+
+    def _sync_settings(self):
+        settings_json = os.path.join(self.datastore_path, 'changedetection.json')
+        seen = self._signature(settings_json)
+        if seen is None or seen == self._settings_seen:
+            return
+        try:
+            settings = _read_json(settings_json).get('settings', {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Sharded mode: could not read {settings_json} - {e}")
+            return
+        for section in ('headers', 'requests', 'application'):
+            incoming = dict(settings.get(section) or {})
+            # Tags are in their own tag.json files
+            incoming.pop('tags', None)
+            self.datastore.data['settings'][section].update(incoming)
+        self._settings_seen = seen
+        logger.debug("Sharded mode: settings changed on disk, reloaded")
+
+    def _sync_entities(self):
+        watching = self.datastore.data['watching']
+        tags = self.datastore.data['settings']['application']['tags']
+        watches_on_disk = set()
+        tags_on_disk = set()
+
+        for entry in os.scandir(self.datastore_path):
+            if not entry.is_dir() or entry.name == SHARDS_DIR:
+                continue
+            uuid = entry.name
+            watch_json = os.path.join(entry.path, 'watch.json')
+            seen = self._signature(watch_json)
+            if seen is not None:
+                watches_on_disk.add(uuid)
+                if self._watch_seen.get(uuid) != seen:
+                    self._read_watch(uuid, watch_json, seen)
+                continue
+
+            if self.role == ROLE_WORKER:
+                tag_json = os.path.join(entry.path, 'tag.json')
+                seen = self._signature(tag_json)
+                if seen is not None:
+                    tags_on_disk.add(uuid)
+                    if self._tag_seen.get(uuid) != seen:
+                        self._read_tag(uuid, tag_json, seen)
+
+        # Only what this node has seen on disk before can be gone, a watch that was just added may not be written yet
+        for uuid in [uuid for uuid in self._watch_seen if uuid not in watches_on_disk]:
+            del self._watch_seen[uuid]
+            if uuid in watching:
+                from blinker import signal
+                with self.datastore.lock:
+                    watching.pop(uuid, None)
+                signal('watch_deleted').send(watch_uuid=uuid)
+                self.watches_removed += 1
+                logger.debug(f"Sharded mode: watch {uuid} was deleted by another node")
+
+        if self.role == ROLE_WORKER:
+            for uuid in [uuid for uuid in self._tag_seen if uuid not in tags_on_disk]:
+                del self._tag_seen[uuid]
+                if uuid in tags:
+                    # Already gone from the disk, TagsDict.__delitem__ would try to remove its directory again
+                    dict.__delitem__(tags, uuid)
+                    if hasattr(tags, 'version'):
+                        tags.version += 1
+
+    def _read_watch(self, uuid, watch_json, seen):
+        try:
+            data = _read_json(watch_json)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Sharded mode: could not read {watch_json} - {e}")
+            return
+        watch = self.datastore.data['watching'].get(uuid)
+        if watch is None:
+            watch = self.datastore.rehydrate_entity(uuid, data)
+            with self.datastore.lock:
+                self.datastore.data['watching'][uuid] = watch
+            self.watches_loaded += 1
+            logger.debug(f"Sharded mode: watch {uuid} was added by another node")
+        else:
+            self._merge_watch(watch, data)
+        self._watch_seen[uuid] = seen
+
+    def _read_tag(self, uuid, tag_json, seen):
+        try:
+            data = _read_json(tag_json)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Sharded mode: could not read {tag_json} - {e}")
+            return
+        tags = self.datastore.data['settings']['application']['tags']
+        tag = tags.get(uuid)
+        if tag is None:
+            tags[uuid] = self.datastore.rehydrate_tag(uuid, data)
+        else:
+            data.pop('processor', None)
+            tag.update({k: v for k, v in data.items() if tag.get(k) != v})
+        self._tag_seen[uuid] = seen
+
+    # ---- Writing a watch.json, called from watch_base.commit()
+
+    @contextmanager
+    def committing(self, watch):
+        """
+        Around writing the watch.json, the lock file is held from re-reading the other side's fields
+        until the file is written so another node's commit can't land in between
+        """
+        locks_dir = os.path.join(self.shards_dir, LOCKS_DIR)
+        os.makedirs(locks_dir, exist_ok=True)
+        with open(os.path.join(locks_dir, f"{watch.get('uuid')}.lock"), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.before_commit(watch)
+                yield
+                self.after_commit(watch)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def before_commit(self, watch):
+        """Take the other side's fields from disk first when they changed since this node last saw the file"""
+        if self.datastore is None:
+            return
+        uuid = watch.get('uuid')
+        watch_json = os.path.join(self.datastore_path, uuid, 'watch.json')
+        with self._lock:
+            seen = self._signature(watch_json)
+            if seen is None or seen == self._watch_seen.get(uuid, seen):
+                return
+            try:
+                self._merge_watch(watch, _read_json(watch_json))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Sharded mode: could not read {watch_json} before saving - {e}")
+
+    def after_commit(self, watch):
+        uuid = watch.get('uuid')
+        seen = self._signature(os.path.join(self.datastore_path, uuid, 'watch.json'))
+        if seen is not None:
+            with self._lock:
+                self._watch_seen[uuid] = seen
+
+    # ----
+
+    def run(self, exit_event):
+        while not exit_event.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Sharded mode: sync failed - {e}")
+            exit_event.wait(self.sync_seconds)
+        self.leave()
+
+    def stats(self):
+        owned = None
+        if self.datastore is not None and self.runs_checks:
+            owned = sum(1 for uuid in list(self.datastore.data['watching'].keys()) if self.owns(uuid))
+        return {
+            'node_id': self.node_id,
+            'role': self.role,
+            'workers': list(self._ring.nodes),
+            'owned_watches': owned,
+            'rebalances': self.rebalances,
+            'watches_loaded': self.watches_loaded,
+            'watches_merged': self.watches_merged,
+            'watches_removed': self.watches_removed,
+            'rechecks_forwarded': self.rechecks_forwarded,
+            'rechecks_queued': self.rechecks_queued,
+            'last_sync': self.last_sync,
+        }
+
+
+_shard = None
+_shard_lock = threading.Lock()
+
+
+def get_shard():
+    """This node when sharded mode is on (SHARD_NODE_ID is set and start_shard() ran), otherwise None"""
+    return _shard
+
+
+def start_shard(datastore, update_q, exit_event):
+    global _shard
+    role = shard_role()
+    if not role:
+        return None
+    with _shard_lock:
+        if _shard is None:
+            node = ShardNode(datastore_path=datastore.datastore_path, node_id=os.getenv('SHARD_NODE_ID').strip(), role=role)
+            node.attach(datastore, update_q)
+            node.sync()
+            _shard = node
+            threading.Thread(target=node.run, args=(exit_event,), daemon=True, name='ShardSync').start()
+            logger.success(f"Sharded mode: node '{node.node_id}' started as {role}, workers {list(node._ring.nodes)}")
+    return _shard
@@ -0,0 +1,34 @@
+// Follows a background "Extract Data" job (see changedetectionio/extract_job.py) until its CSV is ready.
+$(document).ready(function () {
+    const $job = $('#extract-job');
+    if (!$job.length) return;
+
+    const statusUrl = $job.data('status-url');
+
+    function update(job) {
+        $('#extract-job-progress').attr('max', job.total || 1).val(job.processed);
+        $('#extract-job-text .processed').text(job.processed);
+        $('#extract-job-text .total').text(job.total);
+        $('#extract-job-text .rows').text(job.rows);
+
+        const running = job.status === 'queued' || job.status === 'running';
+        $('#extract-job-cancel').toggle(running);
+        $('#extract-job-download').toggle(job.has_output);
+        $('#extract-job-nomatch').toggle(job.status === 'done' && !job.has_output);
+        $('#extract-job-cancelled').toggle(job.status === 'cancelled' || job.status === 'failed');
+        return running;
+    }
+
+    function poll() {
+        $.getJSON(statusUrl).done(function (job) {
+            if (update(job)) {
+                setTimeout(poll, 1000);
+            }
+        });
+    }
+
+    const status = $job.data('status');
+    if (status === 'queued' || status === 'running') {
+        poll();
+    }
+});
@@ -269,10 +269,11 @@
             if (sub) $pill.append($('<span class="rg-status-sub"></span>').text(sub));
         }
 
-        const avgPrice = prices.reduce((a, b) => a + b, 0) / prices.length;
+        // Over the full history - the series may have been thinned down server side
+        const avgPrice = (summary && summary.avg !== undefined) ? summary.avg : prices.reduce((a, b) => a + b, 0) / prices.length;
         const $stats = $('<div class="rg-stats"></div>')
             .text((i18n.avg_price || 'Average price') + ' ' + fmtPrice(avgPrice, currency) +
-                  ', ' + (series ? series.length : data.length) + ' ' + (i18n.changes || 'Changes'));
+                  ', ' + ((summary && summary.changes) || (series ? series.length : data.length)) + ' ' + (i18n.changes || 'Changes'));
 
         $header.append($pill).append($stats);
         $container.prepend($header);
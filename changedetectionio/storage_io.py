@@ -0,0 +1,167 @@
+"""
+Ordered background executor for the disk writes a check makes (snapshots, screenshots, watch.json)
+
+Saving a check's results - brotli compressing and fsync'ing the snapshot, writing the screenshot,
+xpath data, last fetched HTML and favicon, committing watch.json - used to run straight on the
+worker's event loop, on slow storage (NFS) every one of those calls froze the loop for as long as
+the disk took. The worker now hands them to this executor and awaits the result, so the loop keeps
+running while the write is in progress.
+
+Writes are keyed (by watch UUID): writes with the same key run one after the other in the order
+they were submitted, writes for different watches run in parallel on the pool. submit() doesn't
+wait at all, run() is the awaitable version, flush() waits for everything already queued for a key.
+
+Queue depth and per-operation wait/run latency are reported in /api/v1/systeminfo and /metrics.
+
+Environment variables:
+  STORAGE_IO_WORKERS  — threads doing the writes (default 8)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from loguru import logger
+
+from changedetectionio.check_metrics import BUCKETS, Histogram, format_labels
+
+
+class StorageIO:
+
+    def __init__(self, workers=None):
+        self.workers = max(1, int(workers if workers is not None else os.getenv('STORAGE_IO_WORKERS', 8)))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='StorageIO')
+        self._lock = threading.Lock()
+        # key -> "finished" Future of the last write submitted for it, the next write for the key chains onto it.
+        # Separate from the Future handed to the caller, cancelling that one must not let the next write jump ahead
+        self._tails = {}
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        # (operation, 'wait'|'run') -> Histogram
+        self._latency = {}
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) behind every earlier write for key, returns a concurrent.futures.Future"""
+        future = Future()
+        finished = Future()
+        operation = getattr(fn, '__name__', 'write')
+        queued = time.perf_counter()
+
+        def _run():
+            if not future.set_running_or_notify_cancel():
+                self._finished(key, finished, operation, queued, None, failed=False)
+                return
+            started = time.perf_counter()
+            with self._lock:
+                self.running += 1
+            try:
+                future.set_result(fn(*args, **kwargs))
+                failed = False
+            except BaseException as e:
+                logger.error(f"Storage write {operation} for {key} failed: {e}")
+                future.set_exception(e)
+                failed = True
+            self._finished(key, finished, operation, queued, started, failed=failed)
+
+        with self._lock:
+            previous = self._tails.get(key)
+            self._tails[key] = finished
+            self.pending += 1
+
+        if previous is None:
+            self._pool.submit(_run)
+        else:
+            previous.add_done_callback(lambda _previous: self._pool.submit(_run))
+        return future
+
+    def _finished(self, key, finished, operation, queued, started, failed):
+        now = time.perf_counter()
+        with self._lock:
+            self.pending -= 1
+            if started is not None:
+                self.running -= 1
+                self._observe(operation, 'wait', started - queued)
+                self._observe(operation, 'run', now - started)
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+            if self._tails.get(key) is finished:
+                del self._tails[key]
+        finished.set_result(None)
+
+    def _observe(self, operation, kind, seconds):
+        histogram = self._latency.get((operation, kind))
+        if histogram is None:
+            histogram = self._latency[(operation, kind)] = Histogram()
+        histogram.observe(seconds)
+
+    async def run(self, key, fn, *args, **kwargs):
+        """submit() and wait for the result without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(key, fn, *args, **kwargs))
+
+    async def flush(self, key):
+        """Wait until every write already queued for key has finished (failures are not raised here)"""
+        with self._lock:
+            tail = self._tails.get(key)
+        if tail is not None:
+            await asyncio.wait([asyncio.wrap_future(tail)])
+
+    def stats(self):
+        with self._lock:
+            operations = {}
+            for (operation, kind), h in self._latency.items():
+                op = operations.setdefault(operation, {'count': 0})
+                if kind == 'run':
+                    op['count'] = h.count
+                op[f'avg_{kind}_seconds'] = round(h.sum / h.count, 4) if h.count else 0.0
+            return {
+                'workers': self.workers,
+                'queue_depth': self.pending - self.running,
+                'in_flight': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'operations': operations,
+            }
+
+    def openmetrics_lines(self):
+        with self._lock:
+            latency = sorted((key, h.cumulative(), h.count, h.sum) for key, h in self._latency.items())
+            queued, running = self.pending - self.running, self.running
+
+        lines = [
+            '# TYPE changedetection_storage_io_queue_depth gauge',
+            '# HELP changedetection_storage_io_queue_depth Storage writes waiting for an I/O thread (or an earlier write of the same watch).',
+            f'changedetection_storage_io_queue_depth {queued}',
+            '# TYPE changedetection_storage_io_in_flight gauge',
+            '# HELP changedetection_storage_io_in_flight Storage writes running.',
+            f'changedetection_storage_io_in_flight {running}',
+            '# TYPE changedetection_storage_io_seconds histogram',
+            '# UNIT changedetection_storage_io_seconds seconds',
+            '# HELP changedetection_storage_io_seconds Storage write latency, time queued (wait) and time writing (run).',
+        ]
+        for (operation, kind), cumulative, count, total in latency:
+            base = format_labels(('operation', 'stage'), (operation, kind))
+            for upper, seen in zip(BUCKETS, cumulative):
+                lines.append(f'changedetection_storage_io_seconds_bucket{{{base},le="{upper}"}} {seen}')
+            lines.append(f'changedetection_storage_io_seconds_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'changedetection_storage_io_seconds_count{{{base}}} {count}')
+            lines.append(f'changedetection_storage_io_seconds_sum{{{base}}} {total}')
+        return lines
+
+
+_storage_io = None
+_storage_io_lock = threading.Lock()
+
+
+def get_storage_io():
+    global _storage_io
+    if _storage_io is None:
+        with _storage_io_lock:
+            if _storage_io is None:
+                _storage_io = StorageIO()
+    return _storage_io
@@ -17,6 +17,7 @@ import os
 import re
 import secrets
 import sys
+import threading
 import time
 import uuid as uuid_builder
 from loguru import logger
@@ -24,18 +25,14 @@ from blinker import signal
 
 from ..model.Tags import TagsDict
 
-# Try to import orjson for faster JSON serialization
-try:
-    import orjson
-
-    HAS_ORJSON = True
-except ImportError:
-    HAS_ORJSON = False
-
 from ..processors import get_custom_watch_obj_for_processor, find_processors
+from ..sharding import ROLE_WORKER, shard_role, wait_for_schema
 
 # Import the base class and helpers
-from .file_saving_datastore import FileSavingDataStore, load_all_watches, load_all_tags, save_json_atomic
+from .backend import BACKEND_FILE, open_backend
+from .file_saving_datastore import FileSavingDataStore
+from .proxy_registry import ProxyRegistry
+from .tag_index import TagIndex
 from .updates import DatastoreUpdatesMixin
 
 # Because the server will run as a daemon and wont know the URL for notification links when firing off a notification
@@ -58,6 +55,14 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         # logging.basicConfig(filename='/dev/stdout', level=logging.INFO)
         self.datastore_path = datastore_path
         self.start_time = time.time()
+        # Set while schema updates run in the background, the datastore is read-only until they're done
+        self.migrating = threading.Event()
+        self.migration_status = {'running': False, 'update': None, 'target': None, 'progress': {}, 'error': None}
+        self.proxy_registry = ProxyRegistry(get_datastore_path=lambda: self.datastore_path,
+                                            get_extra_proxies=lambda: self.data['settings']['requests'].get('extra_proxies'))
+        self.tag_index = TagIndex(get_watches=lambda: self.data['watching'],
+                                  get_tags=lambda: self.data['settings']['application']['tags'],
+                                  get_datastore_path=lambda: self.datastore_path)
         self.save_version_copy_json_db(version_tag)
         self.reload_state(datastore_path=datastore_path, include_default_watches=include_default_watches, version_tag=version_tag)
 
@@ -83,21 +88,13 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         """
         Load settings from storage.
 
-        File backend implementation: reads from changedetection.json
+        Reads changedetection.json (or `filename`, the legacy url-watches.json) with the file backend,
+        the settings row with the SQLite backend.
 
         Returns:
             dict: Settings data loaded from storage
         """
-        changedetection_json = os.path.join(self.datastore_path, filename)
-
-        logger.info(f"Loading settings from {changedetection_json}")
-
-        if HAS_ORJSON:
-            with open(changedetection_json, 'rb') as f:
-                return orjson.loads(f.read())
-        else:
-            with open(changedetection_json, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        return self.backend.load_settings(filename=filename)
 
     def _apply_settings(self, settings_data):
         """
@@ -202,6 +199,11 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         # CRITICAL: Update datastore_path (was using old path from __init__)
         self.datastore_path = datastore_path
 
+        # Where the settings, watches, tags and history indexes are loaded from and saved to (see backend.py)
+        self.backend = open_backend(datastore_path)
+        if shard_role() and self.backend.name != BACKEND_FILE:
+            raise ValueError("Sharded mode (SHARD_NODE_ID) needs the file datastore backend, unset DATASTORE_BACKEND")
+
         # Initialize data structure
         self.__data = App.model(datastore_path=datastore_path)
         self.json_store_path = os.path.join(self.datastore_path, "changedetection.json")
@@ -218,14 +220,27 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         changedetection_json = os.path.join(self.datastore_path, "changedetection.json")
         changedetection_json_old_schema = os.path.join(self.datastore_path, "url-watches.json")
 
-        if os.path.exists(changedetection_json):
+        if shard_role() == ROLE_WORKER:
+            # Sharded mode, the coordinator creates the datastore and runs the schema updates
+            wait_for_schema(self.datastore_path, self.get_updates_available()[-1])
+
+        if self.backend.name != BACKEND_FILE and not self.backend.exists() and (
+                os.path.exists(changedetection_json) or os.path.exists(changedetection_json_old_schema)):
+            raise ValueError(f"'{datastore_path}' holds a file datastore, convert it first with "
+                             f"'python3 -m changedetectionio.store.migrate_backend -d {datastore_path} --to {self.backend.name}'")
+
+        if self.backend.exists():
             # Run schema updates if needed
             # Pass current schema version from loaded datastore (defaults to 0 if not set)
             # Load existing datastore (changedetection.json + watch.json files)
             logger.info("Loading existing datastore")
             self._load_state()
             current_schema = self.data['settings']['application'].get('schema_version', 0)
-            self.run_updates(current_schema_version=current_schema)
+            if self.get_updates_available()[-1] > current_schema and self.can_run_updates_in_background(current_schema):
+                logger.critical(f"Running datastore updates from schema {current_schema} in the background, read-only until they finish")
+                self.run_updates_in_background(current_schema_version=current_schema)
+            else:
+                self.run_updates(current_schema_version=current_schema)
 
         # Legacy datastore detected - trigger migration, even works if the schema is much before the migration step.
         elif os.path.exists(changedetection_json_old_schema):
@@ -377,58 +392,39 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         """
         Save settings to storage.
 
-        File backend implementation: saves to changedetection.json
+        Written by the datastore backend, changedetection.json with the file backend.
         Implementation of abstract method from FileSavingDataStore.
-        Uses the generic save_json_atomic helper.
 
         Raises:
             OSError: If disk is full or other I/O error
         """
-        settings_data = self._build_settings_data()
-        changedetection_json = os.path.join(self.datastore_path, "changedetection.json")
-        save_json_atomic(changedetection_json, settings_data, label="settings")
+        if shard_role() == ROLE_WORKER:
+            # Sharded mode, the settings belong to the coordinator (see sharding.py)
+            return
+
+        self.backend.save_settings(self._build_settings_data())
 
     def _load_watches(self):
         """
         Load all watches from storage.
 
-        File backend implementation: reads individual watch.json files
+        Read through the datastore backend, individual watch.json files with the file backend.
         Implementation of abstract method from FileSavingDataStore.
-        Delegates to helper function and stores results in internal data structure.
         """
 
         # Store loaded data
         # @note this will also work for the old legacy format because self.__data['watching'] should already have them loaded by this point.
-        self.__data['watching'].update(load_all_watches(
-            self.datastore_path,
-            self.rehydrate_entity
-        ))
+        self.__data['watching'].update(self.backend.load_watches(self.rehydrate_entity))
         logger.debug(f"Loaded {len(self.__data['watching'])} watches")
 
     def _load_tags(self):
         """
         Load all tags from storage.
 
-        File backend implementation: reads individual tag.json files.
-        Tags loaded from files override any tags in settings (migration path).
+        Read through the datastore backend, individual tag.json files with the file backend.
+        Tags loaded from the backend override any tags in settings (migration path).
         """
-        from ..model import Tag
-
-        def rehydrate_tag(uuid, entity_dict):
-            """Rehydrate tag as Tag object with forced restock_diff processor."""
-            entity_dict['uuid'] = uuid
-            entity_dict['processor'] = 'restock_diff'  # Force processor for override functionality
-
-            return Tag.model(
-                datastore_path=self.datastore_path,
-                __datastore=self.__data,
-                default=entity_dict
-            )
-
-        tags = load_all_tags(
-            self.datastore_path,
-            rehydrate_tag
-        )
+        tags = self.backend.load_tags(self.rehydrate_tag)
 
         # Override settings tags with loaded tags
         # This ensures tag.json files take precedence over settings
@@ -436,26 +432,39 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
             self.__data['settings']['application']['tags'].update(tags)
             logger.info(f"Loaded {len(tags)} tags from individual tag.json files")
 
+    def rehydrate_tag(self, uuid, entity_dict):
+        """Rehydrate tag as Tag object with forced restock_diff processor."""
+        from ..model import Tag
+
+        entity_dict['uuid'] = uuid
+        entity_dict['processor'] = 'restock_diff'  # Force processor for override functionality
+
+        return Tag.model(
+            datastore_path=self.datastore_path,
+            __datastore=self.__data,
+            default=entity_dict
+        )
+
     def _delete_watch(self, uuid):
         """
         Delete a watch from storage.
 
-        File backend implementation: deletes entire {uuid}/ directory recursively.
+        Removes it from the datastore backend along with its entire {uuid}/ directory.
         Implementation of abstract method from FileSavingDataStore.
 
         Args:
             uuid: Watch UUID to delete
         """
-        watch_dir = os.path.join(self.datastore_path, uuid)
-        if os.path.exists(watch_dir):
-            shutil.rmtree(watch_dir)
-            logger.info(f"Deleted watch directory: {watch_dir}")
+        self.backend.delete_watch(uuid)
 
     # ============================================================================
     # Watch Management Methods
     # ============================================================================
 
     def set_last_viewed(self, uuid, timestamp, send_signal=True):
+        if self.migrating.is_set():
+            # Viewing a diff is still served while migrating, the watch just isn't marked viewed
+            return
         logger.debug(f"Setting watch UUID: {uuid} last viewed to {int(timestamp)}")
         self.data['watching'][uuid].update({'last_viewed': int(timestamp)})
         self.data['watching'][uuid].commit()
@@ -673,6 +682,11 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
 
         return False
 
+    def build_url_index(self):
+        """Lowercased set of every watched URL, for checking many URLs at once (url_exists() is a scan per call)"""
+        with self.lock:
+            return {watch['url'].lower() for watch in self.data['watching'].values()}
+
     # Remove a watchs data but keep the entry (URL etc)
     def clear_watch_history(self, uuid):
         self.__data['watching'][uuid].clear_watch()
@@ -904,33 +918,8 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
 
     @property
     def proxy_list(self):
-        proxy_list = {}
-        proxy_list_file = os.path.join(self.datastore_path, 'proxies.json')
-
-        # Load from external config file
-        if path.isfile(proxy_list_file):
-            if HAS_ORJSON:
-                # orjson.loads() expects UTF-8 encoded bytes #3611
-                with open(os.path.join(self.datastore_path, "proxies.json"), 'rb') as f:
-                    proxy_list = orjson.loads(f.read())
-            else:
-                with open(os.path.join(self.datastore_path, "proxies.json"), encoding='utf-8') as f:
-                    proxy_list = json.load(f)
-
-        # Mapping from UI config if available
-        extras = self.data['settings']['requests'].get('extra_proxies')
-        if extras:
-            i = 0
-            for proxy in extras:
-                i += 0
-                if proxy.get('proxy_name') and proxy.get('proxy_url'):
-                    k = "ui-" + str(i) + proxy.get('proxy_name')
-                    proxy_list[k] = {'label': proxy.get('proxy_name'), 'url': proxy.get('proxy_url')}
-
-        if proxy_list and strtobool(os.getenv('ENABLE_NO_PROXY_OPTION', 'True')):
-            proxy_list["no-proxy"] = {'label': "No proxy", 'url': ''}
-
-        return proxy_list if len(proxy_list) else None
+        # Loaded once, and again when proxies.json or the proxies in settings change (see store/proxy_registry.py)
+        return self.proxy_registry.proxies
 
     def get_preferred_proxy_for_watch(self, uuid):
         """
@@ -939,7 +928,8 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         :return: proxy "key" id
         """
 
-        if self.proxy_list is None:
+        proxy_list = self.proxy_list
+        if proxy_list is None:
             return None
 
         # If it's a valid one
@@ -948,19 +938,19 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         if strtobool(os.getenv('ENABLE_NO_PROXY_OPTION', 'True')) and watch.get('proxy') == "no-proxy":
             return None
 
-        if watch.get('proxy') and watch.get('proxy') in list(self.proxy_list.keys()):
+        if watch.get('proxy') and watch.get('proxy') in proxy_list:
             return watch.get('proxy')
 
         # not valid (including None), try the system one
         else:
             system_proxy_id = self.data['settings']['requests'].get('proxy')
             # Is not None and exists
-            if self.proxy_list.get(system_proxy_id):
+            if proxy_list.get(system_proxy_id):
                 return system_proxy_id
 
         # Fallback - Did not resolve anything, or doesnt exist, use the first available
-        if system_proxy_id is None or not self.proxy_list.get(system_proxy_id):
-            first_default = list(self.proxy_list)[0]
+        if system_proxy_id is None or not proxy_list.get(system_proxy_id):
+            first_default = next(iter(proxy_list))
             return first_default
 
         return None
@@ -978,51 +968,12 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         return headers
 
     def get_all_headers_in_textfile_for_watch(self, uuid):
-        from ..model.App import parse_headers_from_text_file
-        headers = {}
-
-        # Global in /datastore/headers.txt
-        filepath = os.path.join(self.datastore_path, 'headers.txt')
-        try:
-            if os.path.isfile(filepath):
-                headers.update(parse_headers_from_text_file(filepath))
-        except Exception as e:
-            logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
-
-        watch = self.data['watching'].get(uuid)
-        if watch:
-
-            # In /datastore/xyz-xyz/headers.txt
-            filepath = os.path.join(watch.data_dir, 'headers.txt')
-            try:
-                if os.path.isfile(filepath):
-                    headers.update(parse_headers_from_text_file(filepath))
-            except Exception as e:
-                logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
-
-            # In /datastore/tag-name.txt
-            tags = self.get_all_tags_for_watch(uuid=uuid)
-            for tag_uuid, tag in tags.items():
-                fname = "headers-" + re.sub(r'[\W_]', '', tag.get('title')).lower().strip() + ".txt"
-                filepath = os.path.join(self.datastore_path, fname)
-                try:
-                    if os.path.isfile(filepath):
-                        headers.update(parse_headers_from_text_file(filepath))
-                except Exception as e:
-                    logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
-
-        return headers
+        # /datastore/headers.txt, /datastore/xyz-xyz/headers.txt and /datastore/headers-<tag name>.txt,
+        # parsed again only when the files change
+        return self.tag_index.headers_for_watch(uuid)
 
     def get_tag_overrides_for_watch(self, uuid, attr):
-        tags = self.get_all_tags_for_watch(uuid=uuid)
-        ret = []
-
-        if tags:
-            for tag_uuid, tag in tags.items():
-                if attr in tag and tag[attr]:
-                    ret = [*ret, *tag[attr]]
-
-        return ret
+        return self.tag_index.tag_overrides(uuid, attr)
 
     def add_tag(self, title):
         # If name exists, return that
@@ -1058,22 +1009,19 @@ class ChangeDetectionStore(DatastoreUpdatesMixin, FileSavingDataStore):
         return new_uuid
 
     def get_all_tags_for_watch(self, uuid):
-        """This should be in Watch model but Watch doesn't have access to datastore, not sure how to solve that yet"""
-        watch = self.data['watching'].get(uuid)
-        if not watch:
-            return {}
+        """Manually assigned tags plus any tag whose url_match_pattern matches the watch's URL (see store/tag_index.py)"""
+        return self.tag_index.tags_for_watch(uuid)
 
-        # Start with manually assigned tags
-        result = dictfilt(self.__data['settings']['application']['tags'], watch.get('tags', []))
+    def get_watches_for_tag(self, tag_uuid):
+        """UUIDs of the watches the tag applies to, assigned or matched by url_match_pattern"""
+        return self.tag_index.watches_for_tag(tag_uuid)
 
-        # Additionally include any tag whose url_match_pattern matches this watch's URL
-        watch_url = watch.get('url', '')
-        if watch_url:
-            for tag_uuid, tag in self.__data['settings']['application']['tags'].items():
-                if tag_uuid not in result and tag.matches_url(watch_url):
-                    result[tag_uuid] = tag
-
-        return result
+    def query_watches(self, **filters):
+        """
+        UUIDs of the watches matching the filters (paused, has_error, tag_uuid, checked_before, changed_since),
+        from the SQLite indexes, or a scan of the in-memory watches with the file backend (see backend.py)
+        """
+        return self.backend.query_watches(watches=self.__data['watching'], **filters)
 
     @property
     def extra_browsers(self):
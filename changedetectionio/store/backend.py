@@ -0,0 +1,341 @@
+"""
+Storage backends for the datastore.
+
+The datastore keeps everything in memory while the app runs, a backend is what it is loaded from and
+written back to: the settings, the watches, the tags and the history index of every watch (the list of
+timestamp -> snapshot filename). Snapshots, screenshots and the other per-watch files always stay in
+the {uuid}/ data directories, whatever the backend.
+
+  - file    one JSON file per watch/tag plus changedetection.json, history.txt per watch (the default)
+  - sqlite  one changedetection.db (WAL mode) with indexed columns for the fields the watch list and
+            scheduler filter on, see sqlite_backend.py
+
+Environment:
+  DATASTORE_BACKEND  — 'file' (default) or 'sqlite'
+
+A datastore is moved between the two with `python -m changedetectionio.store.migrate_backend`.
+"""
+
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from loguru import logger
+
+from .file_saving_datastore import (
+    HAS_ORJSON,
+    load_all_tags,
+    load_all_watches,
+    save_entity_atomic,
+    save_json_atomic,
+)
+
+if HAS_ORJSON:
+    import orjson
+
+BACKEND_FILE = 'file'
+BACKEND_SQLITE = 'sqlite'
+
+SETTINGS_FILENAME = 'changedetection.json'
+
+# Largest serialized watch/tag accepted, anything bigger is a bug or corrupted data
+MAX_ENTITY_SIZE_MB = {'watch': 10, 'tag': 1}
+
+
+def watch_hot_fields(watch_dict):
+    """The values a backend can index for a watch: (last_checked, paused, last_error, tag uuids)"""
+    return (int(watch_dict.get('last_checked') or 0),
+            bool(watch_dict.get('paused')),
+            watch_dict.get('last_error') or None,
+            list(watch_dict.get('tags') or []))
+
+
+def last_changed_from_history(timestamps):
+    """Same rule as Watch.last_changed, the newest snapshot but 0 while there is only one"""
+    if len(timestamps) <= 1:
+        return 0
+    return int(timestamps[-1])
+
+
+def history_index_name(processor):
+    # Mirrors Watch.history_index_filename
+    if not processor or processor == 'text_json_diff':
+        return 'history.txt'
+    return f'history-{processor}.txt'
+
+
+class DataStoreBackend(ABC):
+    """
+    Where the datastore is persisted.
+
+    Implementations must be safe to call from several threads, watches are committed from the
+    check workers and the storage I/O executor while the UI saves settings.
+    """
+
+    name = None
+
+    def __init__(self, datastore_path):
+        self.datastore_path = datastore_path
+
+    @abstractmethod
+    def exists(self):
+        """True once a datastore has been created here (the settings were saved at least once)"""
+
+    # ---- Settings
+
+    @abstractmethod
+    def load_settings(self, filename=SETTINGS_FILENAME):
+        """The saved settings dict (app_guid, settings, build_sha, version_tag)"""
+
+    @abstractmethod
+    def save_settings(self, settings_data):
+        pass
+
+    # ---- Watches and tags
+
+    @abstractmethod
+    def load_watches(self, rehydrate_entity_func):
+        """uuid -> Watch object for every saved watch"""
+
+    @abstractmethod
+    def load_tags(self, rehydrate_entity_func):
+        """uuid -> Tag object for every saved tag"""
+
+    @abstractmethod
+    def save_entity(self, entity_type, uuid, data_dict):
+        """Save one watch or tag, entity_type is 'watch' or 'tag'"""
+
+    @abstractmethod
+    def delete_watch(self, uuid):
+        """Remove the watch and its data directory"""
+
+    @abstractmethod
+    def delete_tag(self, uuid):
+        pass
+
+    @abstractmethod
+    def query_watches(self, paused=None, has_error=None, tag_uuid=None, checked_before=None,
+                      changed_since=None, order_by='last_checked', limit=None, watches=None):
+        """
+        UUIDs of the saved watches matching every filter given, ordered by order_by (ascending).
+        watches is the datastore's in-memory uuid -> watch mapping, for backends without an index to query.
+        """
+
+    # ---- History index
+
+    @abstractmethod
+    def load_history(self, uuid, index_name):
+        """[(timestamp, snapshot filename), ...] oldest first, as written"""
+
+    @abstractmethod
+    def history_index_names(self, uuid):
+        """Every history index the watch has, one per processor it has been checked with"""
+
+    @abstractmethod
+    def append_history(self, uuid, index_name, timestamp, filename):
+        pass
+
+    @abstractmethod
+    def replace_history(self, uuid, index_name, entries):
+        """Replace the whole index with entries, [(timestamp, snapshot filename), ...]"""
+
+    @abstractmethod
+    def has_history(self, uuid, index_name):
+        pass
+
+    @abstractmethod
+    def clear_history(self, uuid):
+        """Forget every history index of the watch (the snapshot files are removed by the caller)"""
+
+    # ---- Housekeeping
+
+    @contextmanager
+    def batch(self):
+        """Group many writes, backends that support it write them in one transaction"""
+        yield self
+
+    def snapshot_to(self, dest_path):
+        """
+        Write a consistent copy of whatever this backend keeps outside the {uuid}/ directories to
+        dest_path, for backups. Returns False when there is nothing beyond the files themselves.
+        """
+        return False
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {'backend': self.name}
+
+    def _entity_dir(self, uuid):
+        return os.path.join(self.datastore_path, uuid)
+
+
+class FileBackend(DataStoreBackend):
+    """{uuid}/watch.json, {uuid}/tag.json, changedetection.json and {uuid}/history*.txt"""
+
+    name = BACKEND_FILE
+
+    def exists(self):
+        return os.path.isfile(os.path.join(self.datastore_path, SETTINGS_FILENAME))
+
+    def load_settings(self, filename=SETTINGS_FILENAME):
+        settings_json = os.path.join(self.datastore_path, filename)
+        logger.info(f"Loading settings from {settings_json}")
+        if HAS_ORJSON:
+            with open(settings_json, 'rb') as f:
+                return orjson.loads(f.read())
+        with open(settings_json, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_settings(self, settings_data):
+        save_json_atomic(os.path.join(self.datastore_path, SETTINGS_FILENAME), settings_data, label="settings")
+
+    def load_watches(self, rehydrate_entity_func):
+        return load_all_watches(self.datastore_path, rehydrate_entity_func)
+
+    def load_tags(self, rehydrate_entity_func):
+        return load_all_tags(self.datastore_path, rehydrate_entity_func)
+
+    def save_entity(self, entity_type, uuid, data_dict):
+        save_entity_atomic(self._entity_dir(uuid), uuid, data_dict,
+                           filename=f'{entity_type}.json',
+                           entity_type=entity_type,
+                           max_size_mb=MAX_ENTITY_SIZE_MB.get(entity_type, 1))
+
+    def delete_watch(self, uuid):
+        watch_dir = self._entity_dir(uuid)
+        if os.path.exists(watch_dir):
+            shutil.rmtree(watch_dir)
+            logger.info(f"Deleted watch directory: {watch_dir}")
+
+    def delete_tag(self, uuid):
+        tag_dir = self._entity_dir(uuid)
+        tag_json_file = os.path.join(tag_dir, "tag.json")
+        if not os.path.exists(tag_json_file):
+            logger.critical(f"Aborting deletion of directory '{tag_dir}' because '{tag_json_file}' does not exist.")
+            return
+        try:
+            shutil.rmtree(tag_dir)
+            logger.info(f"Deleted tag directory for tag {uuid!r}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to delete tag directory for tag {uuid!r}: {e}")
+
+    def query_watches(self, paused=None, has_error=None, tag_uuid=None, checked_before=None,
+                      changed_since=None, order_by='last_checked', limit=None, watches=None):
+        # No index to use, every watch is scanned, the in-memory ones when given, otherwise every watch.json is read
+        if order_by not in ('last_checked', 'last_changed'):
+            raise ValueError("Can only order by ('last_checked', 'last_changed')")
+        if watches is None:
+            watches = self.load_watches(lambda uuid, data: data)
+        rows = []
+        for uuid, watch in list(watches.items()):
+            last_checked, is_paused, last_error, tags = watch_hot_fields(watch)
+            if paused is not None and is_paused != bool(paused):
+                continue
+            if has_error is not None and bool(last_error) != bool(has_error):
+                continue
+            if tag_uuid is not None and tag_uuid not in tags:
+                continue
+            if checked_before is not None and last_checked >= checked_before:
+                continue
+            last_changed = 0
+            if changed_since is not None or order_by == 'last_changed':
+                index_name = history_index_name(watch.get('processor'))
+                last_changed = last_changed_from_history([t for t, _ in self.load_history(uuid, index_name)])
+                if changed_since is not None and last_changed < changed_since:
+                    continue
+            rows.append((last_changed if order_by == 'last_changed' else last_checked, uuid))
+        rows.sort()
+        return [uuid for _, uuid in rows[:limit]]
+
+    def _history_path(self, uuid, index_name):
+        return os.path.join(self._entity_dir(uuid), index_name)
+
+    def load_history(self, uuid, index_name):
+        entries = []
+        fname = self._history_path(uuid, index_name)
+        if not os.path.isfile(fname):
+            return entries
+        with open(fname, "r", encoding='utf-8') as f:
+            for line in f.readlines():
+                if ',' in line:
+                    k, v = line.strip().split(',', 2)
+                    entries.append((k, v.strip()))
+        return entries
+
+    def history_index_names(self, uuid):
+        return sorted(os.path.basename(fname) for fname in glob.glob(os.path.join(self._entity_dir(uuid), "history*.txt")))
+
+    def append_history(self, uuid, index_name, timestamp, filename):
+        with open(self._history_path(uuid, index_name), 'a', encoding='utf-8') as f:
+            f.write(f"{timestamp},{filename}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replace_history(self, uuid, index_name, entries):
+        output = "\r\n".join(f"{k},{v}" for k, v in entries) + "\r\n"
+        with tempfile.NamedTemporaryFile('w', delete=False, dir=self._entity_dir(uuid), encoding='utf-8') as tmp:
+            tmp.write(output)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            tmp_path = tmp.name
+        os.replace(tmp_path, self._history_path(uuid, index_name))
+
+    def has_history(self, uuid, index_name):
+        return os.path.isfile(self._history_path(uuid, index_name))
+
+    def clear_history(self, uuid):
+        for fname in glob.glob(os.path.join(self._entity_dir(uuid), "history*.txt")):
+            os.unlink(fname)
+
+
+def backend_name_from_env():
+    name = (os.getenv('DATASTORE_BACKEND') or BACKEND_FILE).strip().lower()
+    if name not in (BACKEND_FILE, BACKEND_SQLITE):
+        raise ValueError(f"Unknown DATASTORE_BACKEND '{name}', use '{BACKEND_FILE}' or '{BACKEND_SQLITE}'")
+    return name
+
+
+def create_backend(datastore_path, name=None):
+    """A new backend instance, not shared, for tools that open a datastore next to the running one"""
+    name = name or backend_name_from_env()
+    if name == BACKEND_SQLITE:
+        from .sqlite_backend import SQLiteBackend
+        return SQLiteBackend(datastore_path)
+    return FileBackend(datastore_path)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def open_backend(datastore_path, name=None):
+    """(Re)open the backend of datastore_path, every watch and tag of that datastore then writes through it"""
+    key = os.path.abspath(datastore_path)
+    backend = create_backend(datastore_path, name=name)
+    with _backends_lock:
+        previous = _backends.get(key)
+        _backends[key] = backend
+    if previous:
+        previous.close()
+    logger.info(f"Datastore backend is '{backend.name}' for '{datastore_path}'")
+    return backend
+
+
+def get_backend(datastore_path):
+    """The backend in use for datastore_path, opened on first use"""
+    key = os.path.abspath(datastore_path)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = _backends[key] = create_backend(datastore_path)
+    return backend
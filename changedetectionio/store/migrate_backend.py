@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Convert a datastore from one backend to the other (see backend.py), with the app stopped.
+
+    # run from dir above changedetectionio/ dir
+    python3 -m changedetectionio.store.migrate_backend -d /datastore --to sqlite
+    python3 -m changedetectionio.store.migrate_backend -d /datastore --to file
+
+Settings, watches, tags and every history index are copied, snapshots and the other files in the
+{uuid}/ data directories are shared by both backends and stay where they are. The source is left in
+place (the app just stops reading it) unless --remove-source is given, so going back is a matter of
+unsetting DATASTORE_BACKEND.
+
+The datastore must be at the current schema version, start the app once with the old backend first
+if it says otherwise.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from loguru import logger
+
+from .backend import BACKEND_FILE, BACKEND_SQLITE, SETTINGS_FILENAME, create_backend
+from .sqlite_backend import SQLITE_FILENAME
+
+
+def _raw(uuid, entity_dict):
+    entity_dict['uuid'] = uuid
+    return entity_dict
+
+
+def latest_schema_version():
+    from .updates import DatastoreUpdatesMixin
+    return DatastoreUpdatesMixin.get_updates_available(DatastoreUpdatesMixin())[-1]
+
+
+def migrate(datastore_path, to_name, remove_source=False):
+    """Copy everything from the other backend into to_name, returns counts of what was copied"""
+    from_name = BACKEND_FILE if to_name == BACKEND_SQLITE else BACKEND_SQLITE
+    if from_name == BACKEND_SQLITE and not os.path.isfile(os.path.join(datastore_path, SQLITE_FILENAME)):
+        raise ValueError(f"No {from_name} datastore at '{datastore_path}'")
+    source = create_backend(datastore_path, name=from_name)
+    dest = create_backend(datastore_path, name=to_name)
+    try:
+        if not source.exists():
+            raise ValueError(f"No {from_name} datastore at '{datastore_path}'")
+        if dest.exists():
+            raise ValueError(f"'{datastore_path}' already has a {to_name} datastore, remove it first "
+                             f"({SQLITE_FILENAME if to_name == BACKEND_SQLITE else SETTINGS_FILENAME})")
+
+        settings = source.load_settings()
+        schema_version = settings.get('settings', {}).get('application', {}).get('schema_version', 0)
+        if schema_version < latest_schema_version():
+            raise ValueError(f"Datastore is at schema {schema_version}, start the app once with the {from_name} "
+                             f"backend so the updates up to {latest_schema_version()} run, then migrate")
+
+        start = time.perf_counter()
+        watches = source.load_watches(_raw)
+        tags = source.load_tags(_raw)
+        counts = {'watches': 0, 'tags': 0, 'history_entries': 0}
+
+        with dest.batch():
+            dest.save_settings(settings)
+            for uuid, watch in watches.items():
+                dest.save_entity('watch', uuid, watch)
+                for index_name in source.history_index_names(uuid):
+                    entries = source.load_history(uuid, index_name)
+                    dest.replace_history(uuid, index_name, entries)
+                    counts['history_entries'] += len(entries)
+                counts['watches'] += 1
+            for uuid, tag in tags.items():
+                dest.save_entity('tag', uuid, tag)
+                counts['tags'] += 1
+
+        # Read back before anything of the source is removed
+        if len(dest.load_watches(_raw)) != len(watches) or len(dest.load_tags(_raw)) != len(tags):
+            raise RuntimeError("Migrated datastore does not hold every watch and tag, the source was left untouched")
+
+        if remove_source:
+            _remove_source(source, watches, tags)
+
+        counts['seconds'] = round(time.perf_counter() - start, 3)
+        logger.success(f"Migrated {counts['watches']} watches, {counts['tags']} tags and {counts['history_entries']} "
+                       f"history entries from {from_name} to {to_name} in {counts['seconds']}s")
+        return counts
+    finally:
+        source.close()
+        dest.close()
+
+
+def _remove_source(source, watches, tags):
+    if source.name == BACKEND_SQLITE:
+        source.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(source.db_path + suffix):
+                os.unlink(source.db_path + suffix)
+        return
+
+    for uuid in watches:
+        for name in ['watch.json'] + source.history_index_names(uuid):
+            os.unlink(os.path.join(source.datastore_path, uuid, name))
+    for uuid in tags:
+        os.unlink(os.path.join(source.datastore_path, uuid, 'tag.json'))
+    os.unlink(os.path.join(source.datastore_path, SETTINGS_FILENAME))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a changedetection.io datastore to another storage backend')
+    parser.add_argument('-d', '--datastore-path', required=True, help='Datastore directory')
+    parser.add_argument('--to', required=True, choices=(BACKEND_SQLITE, BACKEND_FILE), help='Backend to convert to')
+    parser.add_argument('--remove-source', action='store_true', help='Remove the source files/database once the copy is verified')
+    args = parser.parse_args(argv)
+
+    try:
+        migrate(args.datastore_path, args.to, remove_source=args.remove_source)
+    except (ValueError, RuntimeError) as e:
+        logger.critical(str(e))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+The proxy list (proxies.json plus the proxies added under Settings), loaded once, with per-proxy health
+and rotation across proxy pools.
+
+Why: ChangeDetectionStore.proxy_list used to open and parse proxies.json every time it was read, and it
+is read a lot - several times per get_preferred_proxy_for_watch(), which the ticker calls for every due
+watch, and once per row of the watch list. Now the parsed list is kept until proxies.json changes on
+disk (mtime/size) or the proxies in Settings change.
+
+Pools: proxies.json entries can name a pool, and optionally a weight:
+
+    "eu-1": {"label": "EU 1", "url": "http://eu-1:3128", "pool": "eu"},
+    "eu-2": {"label": "EU 2", "url": "http://eu-2:3128", "pool": "eu", "weight": 2}
+
+Each pool shows up as one more proxy choice ("pool-eu") for watches and the system default. Every
+check of a watch set to a pool gets one of its proxies, see resolve().
+
+Health: call_browser() reports each fetch through a proxy (record_success/record_failure). A proxy
+that fails PROXY_FAILURES_BEFORE_BACKOFF times in a row (default 3) is taken out of its pools for
+PROXY_BACKOFF_SECONDS (default 60), doubling on every further failure up to PROXY_BACKOFF_MAX_SECONDS
+(default 3600); the first success puts it back. A watch set to one specific proxy keeps using it.
+
+Environment variables:
+  PROXY_POOL_ROTATION             — "weighted" (default, smooth weighted round robin) or "round-robin"
+  PROXY_FAILURES_BEFORE_BACKOFF   — consecutive failures before a proxy is taken out (default 3)
+  PROXY_BACKOFF_SECONDS           — first backoff (default 60)
+  PROXY_BACKOFF_MAX_SECONDS       — longest backoff (default 3600)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from loguru import logger
+
+from changedetectionio.strtobool import strtobool
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+POOL_PREFIX = 'pool-'
+
+# Enough recent checks for a success rate that reacts within a few minutes
+HEALTH_WINDOW = 20
+
+
+class ProxyHealth:
+    __slots__ = ('outcomes', 'latency', 'consecutive_failures', 'down_until', 'last_error')
+
+    def __init__(self):
+        self.outcomes = deque(maxlen=HEALTH_WINDOW)
+        # Exponentially weighted, seconds
+        self.latency = None
+        self.consecutive_failures = 0
+        self.down_until = 0
+        self.last_error = None
+
+    @property
+    def success_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else None
+
+    def to_dict(self, now):
+        return {
+            'checks': len(self.outcomes),
+            'success_rate': round(self.success_rate, 4) if self.success_rate is not None else None,
+            'latency_seconds': round(self.latency, 3) if self.latency is not None else None,
+            'consecutive_failures': self.consecutive_failures,
+            'available': self.down_until <= now,
+            'backoff_seconds_left': max(0, round(self.down_until - now, 1)),
+            'last_error': self.last_error,
+        }
+
+
+class ProxyRegistry:
+    """Thread-safe, the ticker, the workers and the UI all read it"""
+
+    def __init__(self, get_datastore_path, get_extra_proxies):
+        self._get_datastore_path = get_datastore_path
+        self._get_extra_proxies = get_extra_proxies
+
+        self._lock = threading.Lock()
+        self._proxies = None
+        self._pools = {}
+        self._signature = None
+
+        self._health = {}
+        # Smooth weighted round robin state, pool -> {proxy_id: current weight}
+        self._pool_weights = {}
+        self._pool_cursor = {}
+
+        self.reloads = 0
+
+    @property
+    def proxies_json_path(self):
+        return os.path.join(self._get_datastore_path(), 'proxies.json')
+
+    def _current_signature(self):
+        try:
+            st = os.stat(self.proxies_json_path)
+            file_signature = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            file_signature = None
+        extras = tuple((p.get('proxy_name'), p.get('proxy_url')) for p in (self._get_extra_proxies() or []))
+        return file_signature, extras, os.getenv('ENABLE_NO_PROXY_OPTION', 'True')
+
+    def _load(self):
+        proxy_list = {}
+        proxy_list_file = self.proxies_json_path
+
+        # Load from external config file
+        if os.path.isfile(proxy_list_file):
+            if HAS_ORJSON:
+                # orjson.loads() expects UTF-8 encoded bytes #3611
+                with open(proxy_list_file, 'rb') as f:
+                    proxy_list = orjson.loads(f.read())
+            else:
+                with open(proxy_list_file, encoding='utf-8') as f:
+                    proxy_list = json.load(f)
+
+        # Mapping from UI config if available
+        extras = self._get_extra_proxies()
+        if extras:
+            i = 0
+            for proxy in extras:
+                i += 0
+                if proxy.get('proxy_name') and proxy.get('proxy_url'):
+                    k = "ui-" + str(i) + proxy.get('proxy_name')
+                    proxy_list[k] = {'label': proxy.get('proxy_name'), 'url': proxy.get('proxy_url')}
+
+        pools = {}
+        for proxy_id, proxy in proxy_list.items():
+            if isinstance(proxy, dict) and proxy.get('pool'):
+                pools.setdefault(f"{POOL_PREFIX}{proxy['pool']}", []).append(proxy_id)
+        for pool_id, members in pools.items():
+            proxy_list[pool_id] = {'label': f"{pool_id[len(POOL_PREFIX):]} pool ({len(members)} proxies)", 'url': None, 'pool_members': members}
+
+        if proxy_list and strtobool(os.getenv('ENABLE_NO_PROXY_OPTION', 'True')):
+            proxy_list["no-proxy"] = {'label': "No proxy", 'url': ''}
+
+        return (proxy_list if len(proxy_list) else None), pools
+
+    @property
+    def proxies(self):
+        """proxy id -> {'label', 'url', ...}, or None when there are no proxies (same as the old proxy_list)"""
+        signature = self._current_signature()
+        if signature == self._signature:
+            return self._proxies
+        with self._lock:
+            if signature != self._signature:
+                self._proxies, self._pools = self._load()
+                self._pool_weights = {}
+                self._pool_cursor = {}
+                self._signature = signature
+                self.reloads += 1
+                if self.reloads > 1:
+                    logger.info(f"Proxy list reloaded, {len(self._proxies or {})} entries")
+        return self._proxies
+
+    def invalidate(self):
+        """Forget the loaded list, the next read loads it again"""
+        with self._lock:
+            self._signature = None
+
+    def is_pool(self, proxy_id):
+        return bool(proxy_id) and proxy_id in self._pools
+
+    def is_available(self, proxy_id, now=None):
+        health = self._health.get(proxy_id)
+        return health is None or health.down_until <= (now or time.time())
+
+    def resolve(self, proxy_id):
+        """The proxy id to fetch through: pools pick one of their proxies for this check, anything else is itself"""
+        proxies = self.proxies
+        if not proxies or proxy_id not in self._pools:
+            return proxy_id
+
+        with self._lock:
+            members = self._pools.get(proxy_id) or []
+            if not members:
+                return None
+            now = time.time()
+            available = [m for m in members if self.is_available(m, now)]
+            if not available:
+                # Everything is failing, the one coming back soonest is the best bet
+                return min(members, key=lambda m: self._health[m].down_until)
+
+            if os.getenv('PROXY_POOL_ROTATION', 'weighted').strip().lower() == 'round-robin':
+                cursor = self._pool_cursor.get(proxy_id, -1) + 1
+                self._pool_cursor[proxy_id] = cursor
+                return available[cursor % len(available)]
+
+            # Smooth weighted round robin (as nginx does it), only over the proxies that are up
+            current = self._pool_weights.setdefault(proxy_id, {})
+            total = 0
+            for m in available:
+                weight = max(0.0, float(proxies[m].get('weight', 1) or 0))
+                current[m] = current.get(m, 0) + weight
+                total += weight
+            chosen = max(available, key=lambda m: current[m])
+            current[chosen] -= total
+            return chosen
+
+    def record_success(self, proxy_id, seconds=None):
+        if not proxy_id:
+            return
+        with self._lock:
+            health = self._health.setdefault(proxy_id, ProxyHealth())
+            health.outcomes.append(1)
+            if seconds is not None:
+                health.latency = seconds if health.latency is None else health.latency * 0.8 + seconds * 0.2
+            if health.consecutive_failures >= int(os.getenv('PROXY_FAILURES_BEFORE_BACKOFF', 3)):
+                logger.info(f"Proxy '{proxy_id}' is working again")
+            health.consecutive_failures = 0
+            health.down_until = 0
+
+    def record_failure(self, proxy_id, error=None):
+        if not proxy_id:
+            return
+        with self._lock:
+            health = self._health.setdefault(proxy_id, ProxyHealth())
+            health.outcomes.append(0)
+            health.consecutive_failures += 1
+            health.last_error = str(error)[:200] if error else None
+
+            threshold = int(os.getenv('PROXY_FAILURES_BEFORE_BACKOFF', 3))
+            if threshold and health.consecutive_failures >= threshold:
+                backoff = float(os.getenv('PROXY_BACKOFF_SECONDS', 60)) * 2 ** (health.consecutive_failures - threshold)
+                backoff = min(backoff, float(os.getenv('PROXY_BACKOFF_MAX_SECONDS', 3600)))
+                health.down_until = time.time() + backoff
+                logger.warning(f"Proxy '{proxy_id}' failed {health.consecutive_failures} times in a row, out of rotation for {int(backoff)}s")
+
+    def stats(self):
+        now = time.time()
+        proxies = self.proxies or {}
+        with self._lock:
+            return {
+                'proxies': {proxy_id: (self._health[proxy_id].to_dict(now) if proxy_id in self._health else ProxyHealth().to_dict(now))
+                            for proxy_id, proxy in proxies.items() if proxy.get('url')},
+                'pools': {pool_id: list(members) for pool_id, members in self._pools.items()},
+                'reloads': self.reloads,
+            }
+
+
+# Chromium's net errors for the proxy itself failing, anything else the browser reports is about the site
+_BROWSER_PROXY_ERRORS_RE = re.compile(r'ERR_(?:PROXY_\w+|TUNNEL_CONNECTION_FAILED|SOCKS_CONNECTION_FAILED|'
+                                      r'NO_SUPPORTED_PROXIES|MANDATORY_PROXY_CONFIGURATION_FAILED)')
+
+
+def is_proxy_failure(exception):
+    """
+    Did this fetch fail because of the proxy (can't connect to it, the tunnel failed, 407), rather than the site?
+    A slow or broken site (read timeouts, pages that don't load) must not back off a proxy every other watch uses.
+    """
+    from requests.exceptions import ConnectTimeout, ProxyError
+    from changedetectionio.content_fetchers import exceptions as content_fetcher_exceptions
+
+    if isinstance(exception, (ProxyError, ConnectTimeout)):
+        return True
+    if isinstance(exception, content_fetcher_exceptions.PageUnloadable):
+        return bool(_BROWSER_PROXY_ERRORS_RE.search(exception.message or ''))
+    if isinstance(exception, content_fetcher_exceptions.Non200ErrorCodeReceived) and exception.status_code == 407:
+        return True
+    return False
@@ -0,0 +1,329 @@
+"""
+SQLite datastore backend, everything the file backend keeps in JSON and history*.txt files in one
+changedetection.db next to the watch data directories.
+
+- WAL journal, readers (the migration tool, the benchmark, a backup) never block the app writing
+- last_checked, paused, last_error and last_changed are columns of their own with an index each,
+  tags are in watch_tags (indexed by tag), so the watches matching a filter are found without
+  reading every watch
+- every write is a transaction, batch() groups many of them (bulk import, migrations) into one
+- the rest of each watch is the same JSON the file backend writes to watch.json
+
+One connection shared by every thread behind a lock, writes are serialized anyway and the app reads
+everything into memory once at startup.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+
+from .backend import (
+    BACKEND_SQLITE,
+    MAX_ENTITY_SIZE_MB,
+    DataStoreBackend,
+    history_index_name,
+    last_changed_from_history,
+    watch_hot_fields,
+)
+from .file_saving_datastore import FORCE_FSYNC_DATA_IS_CRITICAL, HAS_ORJSON
+
+if HAS_ORJSON:
+    import orjson
+
+SQLITE_FILENAME = 'changedetection.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watches (
+    uuid TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    last_checked INTEGER NOT NULL DEFAULT 0,
+    paused INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    last_changed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS watches_last_checked ON watches (last_checked);
+CREATE INDEX IF NOT EXISTS watches_paused ON watches (paused);
+CREATE INDEX IF NOT EXISTS watches_last_error ON watches (last_error);
+CREATE INDEX IF NOT EXISTS watches_last_changed ON watches (last_changed);
+CREATE TABLE IF NOT EXISTS watch_tags (
+    watch_uuid TEXT NOT NULL,
+    tag_uuid TEXT NOT NULL,
+    PRIMARY KEY (watch_uuid, tag_uuid)
+);
+CREATE INDEX IF NOT EXISTS watch_tags_tag ON watch_tags (tag_uuid);
+CREATE TABLE IF NOT EXISTS tags (
+    uuid TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    watch_uuid TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    filename TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_watch ON history (watch_uuid, index_name, id);
+"""
+
+ORDER_BY_COLUMNS = ('last_checked', 'last_changed')
+
+
+def _dumps(data_dict, label, max_size_mb):
+    if HAS_ORJSON:
+        data = orjson.dumps(data_dict).decode('utf-8')
+    else:
+        data = json.dumps(data_dict, ensure_ascii=False)
+    if len(data) > max_size_mb * 1024 * 1024:
+        raise ValueError(
+            f"{label.capitalize()} data is unexpectedly large: {len(data) / 1024 / 1024:.2f}MB "
+            f"(max: {max_size_mb}MB). This indicates a bug or data corruption."
+        )
+    return data
+
+
+def _loads(data):
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+
+class SQLiteBackend(DataStoreBackend):
+
+    name = BACKEND_SQLITE
+
+    def __init__(self, datastore_path):
+        super().__init__(datastore_path)
+        self.db_path = os.path.join(datastore_path, SQLITE_FILENAME)
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._transactions = 0
+        os.makedirs(datastore_path, exist_ok=True)
+        # Autocommit mode, transactions are opened explicitly in _write()/batch()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL in WAL mode can lose the last transactions on power loss but never corrupts the database
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if FORCE_FSYNC_DATA_IS_CRITICAL else 'NORMAL'}")
+        self._conn.executescript(SCHEMA)
+
+    # ---- Transactions
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            if self._batch_depth:
+                # Part of the open batch() transaction
+                yield self._conn
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._transactions += 1
+
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            if not self._batch_depth:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._conn.execute("COMMIT")
+                self._transactions += 1
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ---- Settings
+
+    def exists(self):
+        return bool(self._read("SELECT 1 FROM settings WHERE id = 1"))
+
+    def load_settings(self, filename=None):
+        rows = self._read("SELECT data FROM settings WHERE id = 1")
+        if not rows:
+            raise FileNotFoundError(f"No settings saved in {self.db_path}")
+        logger.info(f"Loading settings from {self.db_path}")
+        return _loads(rows[0][0])
+
+    def save_settings(self, settings_data):
+        data = _dumps(settings_data, "settings", max_size_mb=10)
+        with self._write() as conn:
+            conn.execute("INSERT INTO settings (id, data) VALUES (1, ?) ON CONFLICT (id) DO UPDATE SET data = excluded.data", (data,))
+
+    # ---- Watches and tags
+
+    def _load_entities(self, table, rehydrate_entity_func):
+        entities = {}
+        failed = 0
+        for uuid, data in self._read(f"SELECT uuid, data FROM {table}"):
+            try:
+                entities[uuid] = rehydrate_entity_func(uuid, _loads(data))
+            except Exception as e:
+                logger.critical(f"CORRUPTED DATA: Failed to load {table} row {uuid} from {self.db_path}: {e}")
+                failed += 1
+        if failed:
+            logger.critical(f"LOAD COMPLETE: {len(entities)} {table} loaded, {failed} FAILED to load")
+        return entities
+
+    def load_watches(self, rehydrate_entity_func):
+        start_time = time.perf_counter()
+        watching = self._load_entities('watches', rehydrate_entity_func)
+        logger.info(f"Loaded {len(watching)} watches from {self.db_path} in {time.perf_counter() - start_time:.2f}s")
+        return watching
+
+    def load_tags(self, rehydrate_entity_func):
+        return self._load_entities('tags', rehydrate_entity_func)
+
+    def save_entity(self, entity_type, uuid, data_dict):
+        data = _dumps(data_dict, f"{entity_type} {uuid}", max_size_mb=MAX_ENTITY_SIZE_MB.get(entity_type, 1))
+        if entity_type != 'watch':
+            with self._write() as conn:
+                conn.execute("INSERT INTO tags (uuid, data) VALUES (?, ?) ON CONFLICT (uuid) DO UPDATE SET data = excluded.data",
+                             (uuid, data))
+            return
+
+        last_checked, paused, last_error, tags = watch_hot_fields(data_dict)
+        with self._write() as conn:
+            is_new = not conn.execute("SELECT 1 FROM watches WHERE uuid = ?", (uuid,)).fetchone()
+            # last_changed is left alone, it follows the history index
+            conn.execute(
+                "INSERT INTO watches (uuid, data, last_checked, paused, last_error) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (uuid) DO UPDATE SET data = excluded.data, last_checked = excluded.last_checked, "
+                "paused = excluded.paused, last_error = excluded.last_error",
+                (uuid, data, last_checked, int(paused), str(last_error) if last_error else None))
+            current = {row[0] for row in conn.execute("SELECT tag_uuid FROM watch_tags WHERE watch_uuid = ?", (uuid,))}
+            if current != set(tags):
+                conn.execute("DELETE FROM watch_tags WHERE watch_uuid = ?", (uuid,))
+                conn.executemany("INSERT OR IGNORE INTO watch_tags (watch_uuid, tag_uuid) VALUES (?, ?)",
+                                 [(uuid, tag_uuid) for tag_uuid in tags])
+            if is_new:
+                # The history index can be written before the watch (a restore), catch up with it
+                self._update_last_changed(conn, uuid, history_index_name(data_dict.get('processor')))
+
+    def delete_watch(self, uuid):
+        with self._write() as conn:
+            conn.execute("DELETE FROM watches WHERE uuid = ?", (uuid,))
+            conn.execute("DELETE FROM watch_tags WHERE watch_uuid = ?", (uuid,))
+            conn.execute("DELETE FROM history WHERE watch_uuid = ?", (uuid,))
+        watch_dir = self._entity_dir(uuid)
+        if os.path.exists(watch_dir):
+            shutil.rmtree(watch_dir)
+            logger.info(f"Deleted watch directory: {watch_dir}")
+
+    def delete_tag(self, uuid):
+        with self._write() as conn:
+            conn.execute("DELETE FROM tags WHERE uuid = ?", (uuid,))
+        logger.info(f"Deleted tag {uuid!r}")
+
+    def query_watches(self, paused=None, has_error=None, tag_uuid=None, checked_before=None,
+                      changed_since=None, order_by='last_checked', limit=None, watches=None):
+        if order_by not in ORDER_BY_COLUMNS:
+            raise ValueError(f"Can only order by {ORDER_BY_COLUMNS}")
+        sql = "SELECT watches.uuid FROM watches"
+        where, params = [], []
+        if tag_uuid is not None:
+            sql += " JOIN watch_tags ON watch_tags.watch_uuid = watches.uuid"
+            where.append("watch_tags.tag_uuid = ?")
+            params.append(tag_uuid)
+        if paused is not None:
+            where.append("paused = ?")
+            params.append(int(bool(paused)))
+        if has_error is not None:
+            where.append("last_error IS NOT NULL" if has_error else "last_error IS NULL")
+        if checked_before is not None:
+            where.append("last_checked < ?")
+            params.append(int(checked_before))
+        if changed_since is not None:
+            where.append("last_changed >= ?")
+            params.append(int(changed_since))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order_by}, watches.uuid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [row[0] for row in self._read(sql, params)]
+
+    # ---- History index
+
+    def _update_last_changed(self, conn, uuid, index_name):
+        timestamps = [row[0] for row in conn.execute(
+            "SELECT timestamp FROM history WHERE watch_uuid = ? AND index_name = ? ORDER BY id", (uuid, index_name))]
+        conn.execute("UPDATE watches SET last_changed = ? WHERE uuid = ?", (last_changed_from_history(timestamps), uuid))
+
+    def load_history(self, uuid, index_name):
+        return [(str(timestamp), filename) for timestamp, filename in self._read(
+            "SELECT timestamp, filename FROM history WHERE watch_uuid = ? AND index_name = ? ORDER BY id", (uuid, index_name))]
+
+    def history_index_names(self, uuid):
+        return [row[0] for row in self._read(
+            "SELECT DISTINCT index_name FROM history WHERE watch_uuid = ? ORDER BY index_name", (uuid,))]
+
+    def append_history(self, uuid, index_name, timestamp, filename):
+        with self._write() as conn:
+            conn.execute("INSERT INTO history (watch_uuid, index_name, timestamp, filename) VALUES (?, ?, ?, ?)",
+                         (uuid, index_name, str(timestamp), filename))
+            self._update_last_changed(conn, uuid, index_name)
+
+    def replace_history(self, uuid, index_name, entries):
+        with self._write() as conn:
+            conn.execute("DELETE FROM history WHERE watch_uuid = ? AND index_name = ?", (uuid, index_name))
+            conn.executemany("INSERT INTO history (watch_uuid, index_name, timestamp, filename) VALUES (?, ?, ?, ?)",
+                             [(uuid, index_name, str(k), v) for k, v in entries])
+            self._update_last_changed(conn, uuid, index_name)
+
+    def has_history(self, uuid, index_name):
+        return bool(self._read("SELECT 1 FROM history WHERE watch_uuid = ? AND index_name = ? LIMIT 1", (uuid, index_name)))
+
+    def clear_history(self, uuid):
+        with self._write() as conn:
+            conn.execute("DELETE FROM history WHERE watch_uuid = ?", (uuid,))
+            conn.execute("UPDATE watches SET last_changed = 0 WHERE uuid = ?", (uuid,))
+
+    # ---- Housekeeping
+
+    def snapshot_to(self, dest_path):
+        with self._lock:
+            dest = sqlite3.connect(dest_path)
+            try:
+                self._conn.backup(dest)
+            finally:
+                dest.close()
+        return True
+
+    def close(self):
+        with self._lock:
+            try:
+                # Fold the WAL back into changedetection.db so the database is one file again
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        counts = {table: self._read(f"SELECT COUNT(*) FROM {table}")[0][0] for table in ('watches', 'tags', 'history')}
+        return {
+            'backend': self.name,
+            'path': self.db_path,
+            'transactions': self._transactions,
+            **counts,
+        }
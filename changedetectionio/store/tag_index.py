@@ -0,0 +1,195 @@
+"""
+Which tags apply to each watch, and the settings a watch gets from them, worked out once and kept.
+
+Why: get_all_tags_for_watch() looked through every tag and ran Tag.matches_url() (fnmatch/substring)
+for every call, and it is called a lot - once per attribute by FilterConfig through
+get_tag_overrides_for_watch(), by the API, RSS, notifications, the watch list filters and for the
+headers-<tag>.txt files read on every check. With many tags and watches that adds up.
+
+Results are kept per watch and checked against version counters, no scanning:
+  - watch.config_version, bumped when one of the watch's settings changes (model/__init__.py)
+  - the watch's own tag list and URL, so in-place edits like watch['tags'].append() are seen too
+  - TagsDict.version, bumped when a tag is added or removed (model/Tags.py)
+  - Tag.model.config_generation, bumped when any tag's settings change (model/Tag.py)
+
+The headers.txt files are parsed once and parsed again only when their mtime/size changes.
+"""
+
+import os
+import re
+import threading
+
+from loguru import logger
+
+from ..model import Tag
+
+
+class _WatchEntry:
+    __slots__ = ('watch', 'key', 'tags', 'overrides', 'header_files')
+
+    def __init__(self, watch, key, tags, header_files):
+        self.watch = watch
+        self.key = key
+        self.tags = tags
+        self.overrides = {}
+        self.header_files = header_files
+
+
+class TagIndex:
+    """watch -> tags and tag -> watches, plus the tag settings for each watch"""
+
+    def __init__(self, get_watches, get_tags, get_datastore_path):
+        self._get_watches = get_watches
+        self._get_tags = get_tags
+        self._get_datastore_path = get_datastore_path
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._tag_members = {}
+        self._tags_generation = None
+        # path -> ((mtime_ns, size), headers)
+        self._header_files = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def _current_tags_generation(self):
+        tags = self._get_tags()
+        version = getattr(tags, 'version', None)
+        if version is None:
+            # Plain dict (not loaded through TagsDict), only adding/removing can be seen
+            version = tuple(tags.keys())
+        return id(tags), version, Tag.model.config_generation
+
+    def generation(self):
+        """Changes whenever a tag is added, removed or edited"""
+        return self._current_tags_generation()
+
+    def _watch_key(self, watch):
+        return watch.config_version, watch.get('url', ''), tuple(watch.get('tags') or ())
+
+    def _resolve(self, uuid, watch):
+        tags = self._get_tags()
+
+        # Start with manually assigned tags, then any tag whose url_match_pattern matches this watch's URL
+        assigned = set(watch.get('tags') or ())
+        result = {tag_uuid: tag for tag_uuid, tag in tags.items() if tag_uuid in assigned}
+        watch_url = watch.get('url', '')
+        if watch_url:
+            for tag_uuid, tag in tags.items():
+                if tag_uuid not in result and tag.matches_url(watch_url):
+                    result[tag_uuid] = tag
+
+        datastore_path = self._get_datastore_path()
+        header_files = [os.path.join(datastore_path, 'headers.txt'),
+                        os.path.join(watch.data_dir, 'headers.txt') if getattr(watch, 'data_dir', None) else None]
+        for tag in result.values():
+            # In /datastore/tag-name.txt
+            fname = "headers-" + re.sub(r'[\W_]', '', tag.get('title')).lower().strip() + ".txt"
+            header_files.append(os.path.join(datastore_path, fname))
+
+        return result, [f for f in header_files if f]
+
+    def _entry(self, uuid):
+        watch = self._get_watches().get(uuid)
+        if not watch:
+            return None
+
+        generation = self._current_tags_generation()
+        key = self._watch_key(watch)
+        entry = self._entries.get(uuid)
+        if entry and generation == self._tags_generation and entry.watch is watch and entry.key == key:
+            self.hits += 1
+            return entry
+
+        with self._lock:
+            if generation != self._tags_generation:
+                self._entries = {}
+                self._tag_members = {}
+                self._tags_generation = generation
+
+            previous = self._entries.get(uuid)
+            if previous:
+                for tag_uuid in previous.tags:
+                    self._tag_members.get(tag_uuid, set()).discard(uuid)
+
+            tags, header_files = self._resolve(uuid, watch)
+            entry = _WatchEntry(watch=watch, key=key, tags=tags, header_files=header_files)
+            self._entries[uuid] = entry
+            for tag_uuid in tags:
+                self._tag_members.setdefault(tag_uuid, set()).add(uuid)
+            self.misses += 1
+        return entry
+
+    def tags_for_watch(self, uuid):
+        """Tags that apply to the watch, assigned or matched by url_match_pattern, keyed by tag UUID"""
+        entry = self._entry(uuid)
+        return dict(entry.tags) if entry else {}
+
+    def watches_for_tag(self, tag_uuid):
+        """UUIDs of the watches a tag applies to"""
+        watches = self._get_watches()
+        for uuid in list(watches.keys()):
+            self._entry(uuid)
+        with self._lock:
+            # Forget watches that were deleted
+            for uuid in [uuid for uuid in self._entries if uuid not in watches]:
+                for t in self._entries.pop(uuid).tags:
+                    self._tag_members.get(t, set()).discard(uuid)
+            return set(self._tag_members.get(tag_uuid, ()))
+
+    def tag_overrides(self, uuid, attr):
+        """The values of `attr` from all the tags of the watch, in tag order"""
+        entry = self._entry(uuid)
+        if not entry:
+            return []
+        ret = entry.overrides.get(attr)
+        if ret is None:
+            ret = []
+            for tag_uuid, tag in entry.tags.items():
+                if attr in tag and tag[attr]:
+                    ret = [*ret, *tag[attr]]
+            entry.overrides[attr] = ret
+        return list(ret)
+
+    def _read_headers_file(self, filepath):
+        from ..model.App import parse_headers_from_text_file
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            self._header_files.pop(filepath, None)
+            return {}
+        except OSError as e:
+            logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
+            return {}
+
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = self._header_files.get(filepath)
+        if cached and cached[0] == signature:
+            return cached[1]
+        try:
+            headers = parse_headers_from_text_file(filepath)
+        except Exception as e:
+            logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
+            return {}
+        self._header_files[filepath] = (signature, headers)
+        return headers
+
+    def headers_for_watch(self, uuid):
+        """Headers from /datastore/headers.txt, the watch's headers.txt and headers-<tag>.txt for each of its tags"""
+        entry = self._entry(uuid)
+        if not entry:
+            return dict(self._read_headers_file(os.path.join(self._get_datastore_path(), 'headers.txt')))
+        headers = {}
+        for filepath in entry.header_files:
+            headers.update(self._read_headers_file(filepath))
+        return headers
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / (self.hits + self.misses), 4) if (self.hits + self.misses) else 0.0,
+            'header_files': len(self._header_files),
+        }
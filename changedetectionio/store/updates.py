@@ -6,13 +6,28 @@ These are mixed into ChangeDetectionStore to keep the main store file focused.
 
 IMPORTANT: Each update could be run even when they have a new install and the schema is correct.
 Therefore - each `update_n` should be very careful about checking if it needs to actually run.
+
+Updates that transform watches or tags one by one declare that by their name instead of looping
+themselves: `update_n_watch(uuid, watch)` / `update_n_tag(uuid, tag)` are called for every watch/tag
+on a thread pool and return True when they changed the entity (which is then committed). Any plain
+`update_n()` runs first, for settings and anything global.
+
+All pending updates are one batch: a single backup tarball is taken before the first one, and
+progress (which update, how far through the watches/tags) is checkpointed in migration-progress.json
+so an interrupted upgrade resumes where it stopped and reuses the same backup.
+
+Environment variables:
+  MIGRATION_WORKERS           — threads running per-watch/per-tag transforms (default 8)
+  MIGRATION_CHECKPOINT_EVERY  — entities migrated between checkpoints (default 500)
 """
 
+import json
 import os
 import re
 import shutil
 import tarfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 from copy import deepcopy
 
@@ -29,6 +44,11 @@ from ..processors.restock_diff import Restock, get_price_from_history_str
 from ..blueprint.rss import RSS_CONTENT_FORMAT_DEFAULT
 from ..model import USE_SYSTEM_DEFAULT_NOTIFICATION_FORMAT_FOR_WATCH
 
+MIGRATION_CHECKPOINT_FILENAME = "migration-progress.json"
+
+# update_26 moved the datastore to one watch.json per watch, nothing before it can run while the app is up
+BACKGROUND_MIGRATIONS_MIN_SCHEMA = 26
+
 def create_backup_tarball(datastore_path, update_number):
     """
     Create a tarball backup of the entire datastore structure before running an update.
@@ -38,11 +58,12 @@ def create_backup_tarball(datastore_path, update_number):
     - All {uuid}/tag.json files
     - changedetection.json (settings, if it exists)
     - url-watches.json (legacy format, if it exists)
+    - changedetection.db (a consistent copy, SQLite datastore backend)
     - Directory structure preserved
 
     Args:
         datastore_path: Path to datastore directory
-        update_number: Update number being applied
+        update_number: Update number being applied, or the range ("30-33") for a batch of updates
 
     Returns:
         str: Path to created tarball, or None if backup failed
@@ -73,6 +94,18 @@ def create_backup_tarball(datastore_path, update_number):
                 tar.add(url_watches_json, arcname="url-watches.json")
                 logger.debug("Added url-watches.json to backup")
 
+            # SQLite datastore backend, copied through the SQLite backup API so the copy is consistent
+            from .backend import get_backend
+            from .sqlite_backend import SQLITE_FILENAME
+            db_copy = os.path.join(datastore_path, f".{backup_filename}.db")
+            try:
+                if get_backend(datastore_path).snapshot_to(db_copy):
+                    tar.add(db_copy, arcname=SQLITE_FILENAME)
+                    logger.debug(f"Added {SQLITE_FILENAME} to backup")
+            finally:
+                if os.path.exists(db_copy):
+                    os.unlink(db_copy)
+
             # Backup all watch/tag directories with their JSON files
             # This preserves the UUID directory structure
             watch_count = 0
@@ -133,14 +166,13 @@ class DatastoreUpdatesMixin:
             list: Sorted list of update version numbers (e.g., [1, 2, 3, ..., 26])
         """
         import inspect
-        updates_available = []
+        updates_available = set()
         for i, o in inspect.getmembers(self, predicate=inspect.ismethod):
-            m = re.search(r'update_(\d+)$', i)
+            m = re.search(r'^update_(\d+)(?:_watch|_tag)?$', i)
             if m:
-                updates_available.append(int(m.group(1)))
-        updates_available.sort()
+                updates_available.add(int(m.group(1)))
 
-        return updates_available
+        return sorted(updates_available)
 
     def run_updates(self, current_schema_version=None):
         import sys
@@ -158,13 +190,13 @@ class DatastoreUpdatesMixin:
 
         Process:
         1. Get list of available updates
-        2. For each update > current schema version:
-           - Create backup of datastore
-           - Run update method
+        2. Create one backup of the datastore for all updates > current schema version
+           (or reuse the backup of an interrupted run, see migration-progress.json)
+        3. For each of those updates:
+           - Run update_N(), then update_N_watch()/update_N_tag() for every watch/tag in parallel,
+             committing the ones that changed and checkpointing progress as it goes
            - Update schema version and commit settings
-           - Commit all watches and tags
-        3. If any update fails, stop processing
-        4. All changes saved via individual .commit() calls
+        4. If any update fails, stop processing, the checkpoint is kept so the next start resumes
         """
         updates_available = self.get_updates_available()
         if self.data.get('watching'):
@@ -208,35 +240,137 @@ class DatastoreUpdatesMixin:
 
         logger.info(f"Current schema version: {current_schema_version}")
 
-        updates_ran = []
+        pending = [update_n for update_n in updates_available if update_n > current_schema_version]
+        if not pending:
+            return
 
-        for update_n in updates_available:
-            if update_n > current_schema_version:
-                logger.critical(f"Applying update_{update_n}")
+        # Resume an interrupted batch with the same target, it already has its backup
+        checkpoint = self._read_migration_checkpoint()
+        if checkpoint and checkpoint.get('target') == pending[-1] and checkpoint.get('backup') and os.path.isfile(checkpoint['backup']):
+            logger.critical(f"Resuming interrupted datastore upgrade to {pending[-1]} (backup {checkpoint['backup']})")
+        else:
+            # One backup of the entire datastore structure for the whole batch
+            # This includes all watch.json files, settings, and preserves directory structure
+            batch_name = f"{pending[0]}-{pending[-1]}" if len(pending) > 1 else pending[0]
+            backup_path = create_backup_tarball(self.datastore_path, batch_name)
+            if backup_path:
+                logger.info(f"Backup created at: {backup_path}")
+            else:
+                logger.warning("Backup creation failed, but continuing with update")
+            checkpoint = {'target': pending[-1], 'backup': backup_path, 'update': None, 'position': {}}
+            self._write_migration_checkpoint(checkpoint)
 
-                # Create tarball backup of entire datastore structure
-                # This includes all watch.json files, settings, and preserves directory structure
-                backup_path = create_backup_tarball(self.datastore_path, update_n)
-                if backup_path:
-                    logger.info(f"Backup created at: {backup_path}")
-                else:
-                    logger.warning("Backup creation failed, but continuing with update")
+        self.migration_status.update({'running': True, 'target': pending[-1], 'error': None})
+        self.migrating.set()
+        try:
+            for update_n in pending:
+                logger.critical(f"Applying update_{update_n}")
+                if checkpoint.get('update') != update_n:
+                    checkpoint.update({'update': update_n, 'position': {}})
+                self.migration_status.update({'update': update_n, 'progress': {}})
 
                 try:
-                    update_method = getattr(self, f"update_{update_n}")()
+                    if hasattr(self, f"update_{update_n}"):
+                        getattr(self, f"update_{update_n}")()
+                    for entity_type in ('watch', 'tag'):
+                        transform = getattr(self, f"update_{update_n}_{entity_type}", None)
+                        if transform:
+                            self._run_entity_migration(update_n, entity_type, transform, checkpoint)
                 except Exception as e:
                     logger.critical(f"Error while trying update_{update_n}")
                     logger.exception(e)
+                    self.migration_status['error'] = f"update_{update_n}: {e}"
                     sys.exit(1)
                 else:
                     # Bump the version
                     self.data['settings']['application']['schema_version'] = update_n
                     self.commit()
+                    checkpoint.update({'update': None, 'position': {}})
+                    self._write_migration_checkpoint(checkpoint)
 
                     logger.success(f"Update {update_n} completed")
 
-                    # Track which updates ran
-                    updates_ran.append(update_n)
+            self._remove_migration_checkpoint()
+        finally:
+            self.migration_status['running'] = False
+            # Stays read-only when an update failed, restarting resumes from the checkpoint
+            if not self.migration_status.get('error'):
+                self.migrating.clear()
+
+    def can_run_updates_in_background(self, current_schema_version):
+        """Pending updates can run while the app serves read-only, not the ones that change the on-disk format"""
+        from changedetectionio.strtobool import strtobool
+        if not strtobool(os.getenv('DATASTORE_MIGRATE_IN_BACKGROUND', 'true')):
+            return False
+        return (current_schema_version or 0) >= BACKGROUND_MIGRATIONS_MIN_SCHEMA
+
+    def run_updates_in_background(self, current_schema_version):
+        """run_updates() on a thread, the datastore is read-only (self.migrating is set) until it's done"""
+        import threading
+
+        def _run():
+            try:
+                self.run_updates(current_schema_version=current_schema_version)
+            except SystemExit:
+                logger.critical("Datastore upgrade failed, staying read-only. Fix the error and restart to resume the upgrade.")
+
+        # Read-only from now, not from whenever the thread gets going
+        self.migrating.set()
+        thread = threading.Thread(target=_run, daemon=True, name='DatastoreMigration')
+        thread.start()
+        return thread
+
+    def _run_entity_migration(self, update_n, entity_type, transform, checkpoint):
+        """Run update_n_watch/update_n_tag over every entity on a thread pool, committing the changed ones"""
+        entities = self.data['watching'] if entity_type == 'watch' else self.data['settings']['application']['tags']
+        # Sorted so the checkpoint position means the same entities after a restart
+        uuids = sorted(entities.keys())
+        start = checkpoint['position'].get(entity_type, 0)
+        chunk_size = max(1, int(os.getenv('MIGRATION_CHECKPOINT_EVERY', 500)))
+        workers = max(1, int(os.getenv('MIGRATION_WORKERS', 8)))
+
+        if start:
+            logger.info(f"update_{update_n}: resuming {entity_type}s at {start}/{len(uuids)}")
+
+        def _migrate(uuid):
+            entity = entities.get(uuid)
+            if entity is None or not transform(uuid, entity):
+                return False
+            entity.commit()
+            return True
+
+        changed = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'DatastoreMigration-{update_n}') as pool:
+            for position in range(start, len(uuids), chunk_size):
+                changed += sum(pool.map(_migrate, uuids[position:position + chunk_size]))
+                done = min(position + chunk_size, len(uuids))
+                checkpoint['position'][entity_type] = done
+                self._write_migration_checkpoint(checkpoint)
+                self.migration_status['progress'][entity_type] = {'done': done, 'total': len(uuids)}
+                logger.info(f"update_{update_n}: {done}/{len(uuids)} {entity_type}s")
+
+        logger.info(f"update_{update_n}: changed {changed} {entity_type}s")
+        return changed
+
+    def _read_migration_checkpoint(self):
+        try:
+            with open(os.path.join(self.datastore_path, MIGRATION_CHECKPOINT_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {MIGRATION_CHECKPOINT_FILENAME}: {e}")
+            return None
+
+    def _write_migration_checkpoint(self, checkpoint):
+        from .file_saving_datastore import save_json_atomic
+        save_json_atomic(os.path.join(self.datastore_path, MIGRATION_CHECKPOINT_FILENAME), checkpoint, label="migration checkpoint")
+
+    def _remove_migration_checkpoint(self):
+        try:
+            os.unlink(os.path.join(self.datastore_path, MIGRATION_CHECKPOINT_FILENAME))
+        except FileNotFoundError:
+            pass
 
     # ============================================================================
     # Individual Update Methods
@@ -730,50 +864,48 @@ class DatastoreUpdatesMixin:
         # (left this out by accident in previous update, added tags={} in the changedetection.json save_to_disk)
         self._save_settings()
 
-    def update_30(self):
+    def update_30_watch(self, uuid, watch):
         """Migrate restock_settings out of watch.json into restock_diff.json processor config file.
 
         Previously, restock_diff processor settings (in_stock_processing, follow_price_changes, etc.)
         were stored directly in the watch dict (watch.json). They now belong in a separate per-watch
         processor config file (restock_diff.json) consistent with the processor_config_* API system.
 
-        For tags: restock_settings key is renamed to processor_config_restock_diff in the tag dict,
-        matching what the API writes when updating a tag.
-
-        Safe to re-run: skips watches that already have a restock_diff.json, skips tags that already
-        have processor_config_restock_diff set.
+        Safe to re-run: skips watches that already have a restock_diff.json.
         """
         import json
 
-        # --- Watches ---
-        for uuid, watch in self.data['watching'].items():
-            if watch.get('processor') != 'restock_diff':
-                continue
-            restock_settings = watch.get('restock_settings')
-            if not restock_settings:
-                continue
+        if watch.get('processor') != 'restock_diff':
+            return False
+        restock_settings = watch.get('restock_settings')
+        if not restock_settings:
+            return False
+
+        data_dir = watch.data_dir
+        if data_dir:
+            watch.ensure_data_dir_exists()
+            filepath = os.path.join(data_dir, 'restock_diff.json')
+            if not os.path.isfile(filepath):
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump({'restock_diff': restock_settings}, f, indent=2)
+                logger.info(f"update_30: migrated restock_settings → {filepath}")
+
+        del watch['restock_settings']
+        return True
+
+    def update_30_tag(self, uuid, tag):
+        """For tags: restock_settings key is renamed to processor_config_restock_diff in the tag dict,
+        matching what the API writes when updating a tag.
 
-            data_dir = watch.data_dir
-            if data_dir:
-                watch.ensure_data_dir_exists()
-                filepath = os.path.join(data_dir, 'restock_diff.json')
-                if not os.path.isfile(filepath):
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        json.dump({'restock_diff': restock_settings}, f, indent=2)
-                    logger.info(f"update_30: migrated restock_settings → {filepath}")
-
-            del self.data['watching'][uuid]['restock_settings']
-            watch.commit()
-
-        # --- Tags ---
-        for tag_uuid, tag in self.data['settings']['application']['tags'].items():
-            restock_settings = tag.get('restock_settings')
-            if not restock_settings or tag.get('processor_config_restock_diff'):
-                continue
-            tag['processor_config_restock_diff'] = restock_settings
-            del tag['restock_settings']
-            tag.commit()
-            logger.info(f"update_30: migrated tag {tag_uuid} restock_settings → processor_config_restock_diff")
+        Safe to re-run: skips tags that already have processor_config_restock_diff set.
+        """
+        restock_settings = tag.get('restock_settings')
+        if not restock_settings or tag.get('processor_config_restock_diff'):
+            return False
+        tag['processor_config_restock_diff'] = restock_settings
+        del tag['restock_settings']
+        logger.info(f"update_30: migrated tag {uuid} restock_settings → processor_config_restock_diff")
+        return True
 
     def update_31(self):
         """Fold any flat application.llm_* key into nested application.llm.<stripped>.
@@ -825,7 +957,7 @@ class DatastoreUpdatesMixin:
             self.data['settings']['application']['llm'] = llm
             logger.info("update_32: cleaned up obsolete max_tokens_per_check / renamed max_tokens_cumulative")
 
-    def update_33(self):
+    def update_33_watch(self, uuid, watch):
         """Restock: consolidate the old price-history fields into a single 'last_price'.
 
         Earlier schemas carried 'original_price' (misnamed - it was re-stamped with the current
@@ -838,37 +970,33 @@ class DatastoreUpdatesMixin:
         immediately; fall back to the old original_price; then drop the obsolete keys. Idempotent.
 
         """
-        migrated = 0
-        for uuid, watch in self.data['watching'].items():
-            if watch.get('processor') != 'restock_diff':
-                continue
-            restock = watch.get('restock')
-            if not isinstance(restock, dict):
-                continue
-
-            # Best-effort backfill of last_price = previous price (second-to-last history snapshot)
-            try:
-                versions = list(watch.history.keys())
-            except Exception:
-                versions = []
-
-            if len(versions) >= 1 and not restock.get('price'):
-                snapshot = watch.get_history_snapshot(timestamp=versions[-1])
-                restock['price'] = get_price_from_history_str(history_str=snapshot)
-                logger.trace(f"UUID {uuid} restock current price set to '{restock['last_price']}'")
-
-            if len(versions) >= 2:
-                snapshot = watch.get_history_snapshot(timestamp=versions[-2])
-                if snapshot:
-                    restock['last_price'] = get_price_from_history_str(history_str=snapshot)
-                    logger.trace(f"UUID {uuid} restock last_price set to '{restock['last_price']}'")
-
-            # Fall back to the old preserved value if history gave us nothing
-            if not restock.get('last_price') and restock.get('original_price') is not None:
-                restock['last_price'] = restock.get('original_price')
-
-            restock.pop('original_price', None)
-            restock.pop('prev_price', None)
-            watch.commit()
-
+        if watch.get('processor') != 'restock_diff':
+            return False
+        restock = watch.get('restock')
+        if not isinstance(restock, dict):
+            return False
 
+        # Best-effort backfill of last_price = previous price (second-to-last history snapshot)
+        try:
+            versions = list(watch.history.keys())
+        except Exception:
+            versions = []
+
+        if len(versions) >= 1 and not restock.get('price'):
+            snapshot = watch.get_history_snapshot(timestamp=versions[-1])
+            restock['price'] = get_price_from_history_str(history_str=snapshot)
+            logger.trace(f"UUID {uuid} restock current price set to '{restock['price']}'")
+
+        if len(versions) >= 2:
+            snapshot = watch.get_history_snapshot(timestamp=versions[-2])
+            if snapshot:
+                restock['last_price'] = get_price_from_history_str(history_str=snapshot)
+                logger.trace(f"UUID {uuid} restock last_price set to '{restock['last_price']}'")
+
+        # Fall back to the old preserved value if history gave us nothing
+        if not restock.get('last_price') and restock.get('original_price') is not None:
+            restock['last_price'] = restock.get('original_price')
+
+        restock.pop('original_price', None)
+        restock.pop('prev_price', None)
+        return True
@@ -0,0 +1 @@
+"""Throughput benchmark suite, see run.py"""
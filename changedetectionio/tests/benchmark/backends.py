@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Datastore backend benchmark, the file backend against the SQLite backend (store/backend.py)
+
+Both get the same synthetic datastore: N watches spread over a few tags, some paused, some with an
+error, each with a history index. Timed per backend:
+  - insert          every watch saved in one batch() (bulk import, migration)
+  - commit          every watch saved again one at a time (a check result)
+  - load            every watch read back (app startup)
+  - history         every history index appended to one entry at a time, then read back
+  - query_*         watches with an error / paused / in one tag / due (oldest last_checked first)
+plus the bytes on disk.
+
+    # run from dir above changedetectionio/ dir
+    python3 -m changedetectionio.tests.benchmark.backends --watches 5000 --output backends.json
+    python3 -m changedetectionio.tests.benchmark.backends --output backends-new.json --compare backends-old.json
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+import uuid as uuid_builder
+
+from loguru import logger
+
+from changedetectionio.store.backend import BACKEND_FILE, BACKEND_SQLITE, create_backend
+from changedetectionio.tests.benchmark.run import _time_call, compare, directory_bytes, environment_info
+
+
+def synthetic_watches(watches, tags):
+    tag_uuids = [str(uuid_builder.uuid4()) for _ in range(tags)]
+    data = {}
+    for i in range(watches):
+        uuid = str(uuid_builder.uuid4())
+        data[uuid] = {
+            'uuid': uuid,
+            'url': f"https://example.com/products/{i}",
+            'title': f"Watch {i}",
+            'processor': 'text_json_diff',
+            'include_filters': ['#products'],
+            'tags': [tag_uuids[i % tags]] if tags else [],
+            'paused': i % 10 == 0,
+            'last_error': 'Connection refused' if i % 7 == 0 else False,
+            'last_checked': 1700000000 + i,
+            'time_between_check': {'weeks': None, 'days': None, 'hours': 3, 'minutes': None, 'seconds': None},
+        }
+    return data, tag_uuids
+
+
+def run_backend(name, watches, tag_uuids, history_entries=5, repeat=3):
+    datastore_path = tempfile.mkdtemp(prefix=f'changedetection-benchmark-{name}-')
+    backend = create_backend(datastore_path, name=name)
+    results = {}
+    try:
+        t = time.perf_counter()
+        with backend.batch():
+            for uuid, watch in watches.items():
+                backend.save_entity('watch', uuid, watch)
+        results['insert_seconds'] = round(time.perf_counter() - t, 6)
+
+        t = time.perf_counter()
+        for uuid, watch in watches.items():
+            watch['last_checked'] += 1
+            backend.save_entity('watch', uuid, watch)
+        results['commit_per_watch_seconds'] = round((time.perf_counter() - t) / len(watches), 8)
+
+        results['load'] = _time_call(lambda: backend.load_watches(lambda uuid, data: data), 1, repeat=repeat)
+        results['load']['watches'] = len(backend.load_watches(lambda uuid, data: data))
+
+        t = time.perf_counter()
+        for n in range(history_entries):
+            for uuid in watches:
+                backend.append_history(uuid, 'history.txt', 1700000000 + n, f"{uuid_builder.uuid4().hex}.txt")
+        results['history_append_per_entry_seconds'] = round((time.perf_counter() - t) / max(1, history_entries * len(watches)), 8)
+        results['history_load'] = _time_call(lambda: [backend.load_history(uuid, 'history.txt') for uuid in watches], 1, repeat=repeat)
+        results['history_load']['entries'] = sum(len(backend.load_history(uuid, 'history.txt')) for uuid in watches)
+
+        queries = {
+            'query_errored': dict(has_error=True),
+            'query_paused': dict(paused=True),
+            'query_tag': dict(tag_uuid=tag_uuids[0] if tag_uuids else None),
+            'query_due': dict(paused=False, checked_before=1700000000 + len(watches) // 2, limit=100),
+        }
+        for label, kwargs in queries.items():
+            results[label] = dict(_time_call(lambda: backend.query_watches(watches=watches, **kwargs), 1, repeat=repeat),
+                                  matches=len(backend.query_watches(watches=watches, **kwargs)))
+
+        results['disk_bytes'] = directory_bytes(datastore_path)
+        results['stats'] = backend.stats()
+    finally:
+        backend.close()
+        shutil.rmtree(datastore_path, ignore_errors=True)
+    return results
+
+
+def run_backend_benchmark(watches=2000, tags=20, history_entries=5, repeat=3, backends=(BACKEND_FILE, BACKEND_SQLITE)):
+    results = {'watches': watches, 'tags': tags, 'history_entries': history_entries}
+    for name in backends:
+        data, tag_uuids = synthetic_watches(watches, tags)
+        results[name] = run_backend(name, data, tag_uuids, history_entries=history_entries, repeat=repeat)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='changedetection.io datastore backend benchmark')
+    parser.add_argument('--watches', type=int, default=2000, help='Watches to create (default 2000)')
+    parser.add_argument('--tags', type=int, default=20, help='Tags the watches are spread over (default 20)')
+    parser.add_argument('--history-entries', type=int, default=5, help='History entries per watch (default 5)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeats of the load and query timings (default 3)')
+    parser.add_argument('--output', help='Write the results JSON here (default stdout)')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    results = {'meta': environment_info(),
+               'backends': run_backend_benchmark(watches=args.watches, tags=args.tags,
+                                                 history_entries=args.history_entries, repeat=args.repeat)}
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(json.load(f), results)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Page corpus for the benchmark suite, served from a local HTTP server
+
+Each page type stands in for a kind of site people watch, at a realistic size:
+
+    spa    JS-bundle heavy product listing page (~210KB), watched with a CSS include filter
+    rss    news feed, 60 items with CDATA descriptions
+    json   JSON API response, watched with a JSONPath filter
+    table  2000 row price table, watched with an XPath filter and an ignore rule
+    pdf    the test PDF (needs pdftohtml, left out of the mix when it's not installed)
+
+Pages are generated from (page type, page id, version) only, so every run serves exactly the same
+bytes. The server's `round_no` is the version for the first `change_percent` % of page ids and 0
+for the rest, so each round a fixed share of the watches sees a change and the rest don't.
+"""
+
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_TYPES = ('spa', 'rss', 'json', 'table', 'pdf')
+
+# Per page type watch settings, so the filter stages get exercised too
+WATCH_EXTRAS = {
+    'spa': {'include_filters': ['#products']},
+    'rss': {},
+    'json': {'include_filters': ['json:$.items[*].price']},
+    'table': {'include_filters': ['//table[@id="prices"]'], 'ignore_text': ['Last updated']},
+    'pdf': {},
+}
+
+TEST_PDF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'test.pdf')
+
+
+def available_page_types():
+    """PAGE_TYPES minus what can't be processed here"""
+    return tuple(t for t in PAGE_TYPES if t != 'pdf' or shutil.which('pdftohtml'))
+
+
+def _price(page_id, item, version):
+    return f"{((page_id * 31 + item * 17 + version * 7) % 9000) / 100 + 10:.2f}"
+
+
+def render_spa(page_id, version):
+    # Minified-bundle-ish inline script, the part a real SPA ships that html_to_text has to skip
+    bundle = ''.join(f'function m{i}(e,t){{return e.map(function(n){{return n*{i}+t}})}};' for i in range(2500))
+    cards = ''.join(
+        f'<div class="card" data-sku="SKU-{page_id}-{i}"><div class="card-body"><h3 class="title">Product {i} '
+        f'of shop {page_id}</h3><p class="desc">Lorem ipsum dolor sit amet, consectetur adipiscing elit, item {i}.</p>'
+        f'<span class="price">${_price(page_id, i, version)}</span><button class="buy">Add to cart</button></div></div>'
+        for i in range(200)
+    )
+    nav = ''.join(f'<li><a href="/category/{i}">Category {i}</a></li>' for i in range(40))
+    return (f'<!DOCTYPE html><html><head><title>Shop {page_id}</title><script>{bundle}</script>'
+            f'<style>.card{{display:inline-block}}</style></head><body><header><nav><ul>{nav}</ul></nav></header>'
+            f'<main><div id="products">{cards}</div></main><footer>Shop {page_id} footer</footer></body></html>')
+
+
+def render_rss(page_id, version):
+    items = ''.join(
+        f'<item><title>Headline {i} from feed {page_id} (rev {version if i < 3 else 0})</title>'
+        f'<link>https://example.com/{page_id}/{i}</link><guid>https://example.com/{page_id}/{i}</guid>'
+        f'<description><![CDATA[<p>Story <b>{i}</b> body text, lorem ipsum dolor sit amet.</p>]]></description>'
+        f'<pubDate>Mon, 0{i % 9 + 1} Jan 2024 10:00:00 GMT</pubDate></item>'
+        for i in range(60)
+    )
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Feed {page_id}</title>'
+            f'<link>https://example.com/{page_id}</link><description>Benchmark feed</description>{items}</channel></rss>')
+
+
+def render_json(page_id, version):
+    return json.dumps({
+        'page': page_id,
+        'items': [{'id': i, 'name': f'Item {i}', 'price': _price(page_id, i, version), 'in_stock': (i + version) % 5 != 0,
+                   'tags': ['a', 'b', 'c']} for i in range(200)],
+    })
+
+
+def render_table(page_id, version):
+    rows = ''.join(
+        f'<tr><td>{i}</td><td>Part number {page_id}-{i}</td><td>{_price(page_id, i, version)}</td><td>{i % 13}</td></tr>'
+        for i in range(2000)
+    )
+    return (f'<html><head><title>Price list {page_id}</title></head><body><p>Last updated round {version}</p>'
+            f'<table id="prices"><thead><tr><th>#</th><th>Part</th><th>Price</th><th>Qty</th></tr></thead>'
+            f'<tbody>{rows}</tbody></table></body></html>')
+
+
+def render_page(page_type, page_id, version):
+    """(body bytes, content type) of one page"""
+    if page_type == 'spa':
+        return render_spa(page_id, version).encode('utf-8'), 'text/html; charset=utf-8'
+    if page_type == 'rss':
+        return render_rss(page_id, version).encode('utf-8'), 'application/rss+xml; charset=utf-8'
+    if page_type == 'json':
+        return render_json(page_id, version).encode('utf-8'), 'application/json'
+    if page_type == 'table':
+        return render_table(page_id, version).encode('utf-8'), 'text/html; charset=utf-8'
+    if page_type == 'pdf':
+        with open(TEST_PDF, 'rb') as f:
+            return f.read(), 'application/pdf'
+    raise ValueError(f"Unknown page type {page_type!r}")
+
+
+class CorpusServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, change_percent=50):
+        super().__init__(address, _CorpusHandler)
+        self.change_percent = change_percent
+        self.round_no = 0
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def version_for(self, page_id):
+        return self.round_no if page_id % 100 < self.change_percent else 0
+
+
+class _CorpusHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        try:
+            _, page_type, page_id = self.path.split('/', 2)
+            page_id = int(page_id)
+            body, content_type = render_page(page_type, page_id, self.server.version_for(page_id))
+        except ValueError:
+            self.send_error(404)
+            return
+        self.server.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def corpus_server(change_percent=50, host='127.0.0.1'):
+    """Serve the corpus on a free port for the duration of the with block"""
+    server = CorpusServer((host, 0), change_percent=change_percent)
+    thread = threading.Thread(target=server.serve_forever, daemon=True, name='BenchmarkCorpusServer')
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+"""
+Throughput benchmark of the check pipeline, results as JSON so runs can be compared across commits
+
+End-to-end: serves the page corpus (corpus.py) on a local HTTP server, adds N watches to a temporary
+datastore and queues every watch each round on the real RecheckPriorityQueue for the real worker pool,
+then reports checks/sec, p50/p99 of every check phase (check_metrics.py), peak RSS and the bytes
+written to disk.
+
+Micro: html_to_text, include_filters (CSS / XPath / JSONPath), render_diff and datastore save/load.
+
+    # run from dir above changedetectionio/ dir
+    python3 -m changedetectionio.tests.benchmark.run --watches 200 --rounds 3 --workers 10 --output bench-new.json
+    python3 -m changedetectionio.tests.benchmark.run --output bench-new.json --compare bench-old.json
+
+Round 1 is every watch's first check (nothing to diff against), later rounds are steady state where
+--change-percent of the pages changed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from unittest.mock import patch
+
+import psutil
+from loguru import logger
+
+from changedetectionio.tests.benchmark.corpus import WATCH_EXTRAS, available_page_types, corpus_server, render_page
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, q in 0..100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(round(q / 100 * len(ordered) + 0.5))))
+    return ordered[rank - 1]
+
+
+def directory_bytes(path):
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class _PeakRSS:
+    """Samples this process' RSS in the background"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process(os.getpid())
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True, name='BenchmarkRSSSampler')
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _disk_write_bytes():
+    try:
+        return psutil.Process(os.getpid()).io_counters().write_bytes
+    except (AttributeError, psutil.Error):
+        return None
+
+
+def run_end_to_end(datastore, update_q, server, watches=100, rounds=3, page_types=None, timeout=600):
+    """
+    Check `watches` watches `rounds` times through the running worker pool, the workers must already
+    be started for this datastore/update_q (changedetection_app() does that)
+    """
+    from changedetectionio import queuedWatchMetaData, worker_pool
+    from changedetectionio.check_metrics import get_metrics
+
+    page_types = page_types or available_page_types()
+    app_settings = datastore.data['settings']['application']
+    was_paused = app_settings.get('all_paused', False)
+    # Keep the scheduler out of it, only the rounds queue checks
+    app_settings['all_paused'] = True
+
+    uuids = {}
+    for i in range(watches):
+        page_type = page_types[i % len(page_types)]
+        uuids[datastore.add_watch(url=f"{server.base_url}/{page_type}/{i}", extras=dict(WATCH_EXTRAS[page_type]))] = page_type
+
+    metrics = get_metrics()
+    observe_check = metrics.observe_check
+    lock = threading.Lock()
+    phases = {}
+    completed = [0]
+
+    def _observe_check(timings):
+        with lock:
+            for phase, seconds in timings.phases.items():
+                phases.setdefault(phase, []).append(seconds)
+            completed[0] += 1
+        observe_check(timings)
+
+    write_bytes_before = _disk_write_bytes()
+    datastore_bytes_before = directory_bytes(datastore.datastore_path)
+    round_results = []
+    started = time.perf_counter()
+
+    try:
+        with patch.object(metrics, 'observe_check', _observe_check), _PeakRSS() as rss:
+            for round_no in range(1, rounds + 1):
+                server.round_no = round_no
+                expected = completed[0] + len(uuids)
+                round_started = time.perf_counter()
+                for uuid in uuids:
+                    worker_pool.queue_item_async_safe(update_q, queuedWatchMetaData.PrioritizedItem(priority=1, item={'uuid': uuid}))
+
+                deadline = time.monotonic() + timeout
+                while completed[0] < expected or worker_pool.get_running_uuids():
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Round {round_no}: only {completed[0] - expected + len(uuids)} of {len(uuids)} checks finished in {timeout}s")
+                    time.sleep(0.01)
+
+                seconds = time.perf_counter() - round_started
+                round_results.append({'round': round_no, 'seconds': round(seconds, 4), 'checks_per_second': round(len(uuids) / seconds, 2)})
+                logger.info(f"Benchmark round {round_no}: {len(uuids)} checks in {seconds:.2f}s")
+    finally:
+        app_settings['all_paused'] = was_paused
+
+    elapsed = time.perf_counter() - started
+    errors = {}
+    for uuid, page_type in uuids.items():
+        last_error = datastore.data['watching'][uuid].get('last_error')
+        if last_error:
+            errors.setdefault(page_type, {'count': 0, 'last_error': last_error})['count'] += 1
+    write_bytes_after = _disk_write_bytes()
+    steady = round_results[1:] or round_results
+
+    return {
+        'watches': watches,
+        'rounds': rounds,
+        'workers': worker_pool.get_worker_count(),
+        'page_types': list(page_types),
+        'change_percent': server.change_percent,
+        'checks': completed[0],
+        'errors': sum(e['count'] for e in errors.values()),
+        'errors_by_page_type': errors,
+        'seconds': round(elapsed, 4),
+        'checks_per_second': round(completed[0] / elapsed, 2) if elapsed else 0.0,
+        'steady_state_checks_per_second': round(statistics.mean(r['checks_per_second'] for r in steady), 2),
+        'round_results': round_results,
+        'phases': {
+            phase: {
+                'count': len(values),
+                'mean_seconds': round(statistics.mean(values), 6),
+                'p50_seconds': round(percentile(values, 50), 6),
+                'p99_seconds': round(percentile(values, 99), 6),
+            } for phase, values in sorted(phases.items())
+        },
+        'peak_rss_bytes': rss.peak,
+        'datastore_bytes_added': directory_bytes(datastore.datastore_path) - datastore_bytes_before,
+        'disk_write_bytes': write_bytes_after - write_bytes_before if write_bytes_before is not None else None,
+        'http_requests': server.requests,
+    }
+
+
+def _time_call(fn, number, repeat=3):
+    results = [t / number for t in timeit.repeat(fn, number=number, repeat=repeat)]
+    return {'calls': number * repeat, 'best_seconds': round(min(results), 6), 'median_seconds': round(statistics.median(results), 6)}
+
+
+def run_micro(scale=1.0, store_watches=500):
+    """Micro-benchmarks of the hot functions, `scale` multiplies the number of calls"""
+    from changedetectionio import html_tools
+    from changedetectionio.diff import render_diff
+    from changedetectionio.store import ChangeDetectionStore
+
+    def n(calls):
+        return max(1, int(calls * scale))
+
+    spa = render_page('spa', 1, 0)[0].decode('utf-8')
+    table = render_page('table', 1, 0)[0].decode('utf-8')
+    table_changed = render_page('table', 1, 1)[0].decode('utf-8')
+    rss = render_page('rss', 1, 0)[0].decode('utf-8')
+    api = render_page('json', 1, 0)[0].decode('utf-8')
+    table_text = html_tools.html_to_text(table)
+    table_changed_text = html_tools.html_to_text(table_changed)
+
+    results = {
+        'html_to_text_spa': _time_call(lambda: html_tools.html_to_text(spa), n(20)),
+        'html_to_text_table': _time_call(lambda: html_tools.html_to_text(table), n(10)),
+        'html_to_text_rss': _time_call(lambda: html_tools.html_to_text(rss, is_rss=True), n(50)),
+        'include_filters_css': _time_call(lambda: html_tools.include_filters('#products', spa), n(10)),
+        'include_filters_xpath': _time_call(lambda: html_tools.xpath_filter('//table[@id="prices"]', table), n(10)),
+        'include_filters_jsonpath': _time_call(lambda: html_tools.extract_json_as_string(api, 'json:$.items[*].price'), n(50)),
+        'render_diff': _time_call(lambda: render_diff(table_text, table_changed_text), n(10)),
+    }
+
+    datastore_path = tempfile.mkdtemp(prefix='changedetection-benchmark-store-')
+    try:
+        datastore = ChangeDetectionStore(datastore_path=datastore_path, include_default_watches=False)
+        for i in range(store_watches):
+            datastore.add_watch(url=f"https://example.com/{i}", extras={'include_filters': ['#products'], 'title': f"Watch {i}"})
+        watches = list(datastore.data['watching'].values())
+
+        def _save():
+            for watch in watches:
+                watch.commit()
+            datastore.commit()
+
+        results['store_save'] = dict(_time_call(_save, 1, repeat=max(1, n(3))), watches=store_watches)
+        results['store_load'] = dict(_time_call(lambda: ChangeDetectionStore(datastore_path=datastore_path, include_default_watches=False),
+                                                1, repeat=max(1, n(3))), watches=store_watches)
+        datastore.stop_thread = True
+    finally:
+        shutil.rmtree(datastore_path, ignore_errors=True)
+
+    return results
+
+
+def environment_info():
+    from changedetectionio import __version__
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'version': __version__,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': int(time.time()),
+    }
+
+
+def _flatten(results, prefix=''):
+    out = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            out.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[f"{prefix}{key}"] = value
+    return out
+
+
+def compare(old, new):
+    """Lines of 'metric old new change%' for every number both results have"""
+    old_flat = _flatten({k: v for k, v in old.items() if k != 'meta'})
+    new_flat = _flatten({k: v for k, v in new.items() if k != 'meta'})
+    lines = [f"{'metric':<60} {'old':>14} {'new':>14} {'change':>8}"]
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else '-'
+        lines.append(f"{key:<60} {before:>14} {after:>14} {change:>8}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='changedetection.io check pipeline benchmark')
+    parser.add_argument('--watches', type=int, default=100, help='Watches to create (default 100)')
+    parser.add_argument('--rounds', type=int, default=3, help='Times every watch is checked (default 3)')
+    parser.add_argument('--workers', type=int, default=10, help='Fetch workers (default 10)')
+    parser.add_argument('--change-percent', type=int, default=50, help='Percent of pages that change each round (default 50)')
+    parser.add_argument('--page-types', default=','.join(available_page_types()), help='Comma separated page types to use')
+    parser.add_argument('--micro-scale', type=float, default=1.0, help='Multiplier for the number of micro-benchmark calls')
+    parser.add_argument('--skip-e2e', action='store_true', help='Only run the micro-benchmarks')
+    parser.add_argument('--skip-micro', action='store_true', help='Only run the end-to-end benchmark')
+    parser.add_argument('--output', help='Write the results JSON here (default stdout)')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    results = {'meta': environment_info()}
+    datastore_path = tempfile.mkdtemp(prefix='changedetection-benchmark-')
+    try:
+        if not args.skip_e2e:
+            # The corpus server is on localhost
+            os.environ['ALLOW_IANA_RESTRICTED_ADDRESSES'] = 'true'
+            os.environ['FETCH_WORKERS'] = str(args.workers)
+
+            from changedetectionio import store, worker_pool
+            from changedetectionio.flask_app import changedetection_app, update_q
+
+            datastore = store.ChangeDetectionStore(datastore_path=datastore_path, include_default_watches=False)
+            app = changedetection_app({'datastore_path': datastore_path, 'disable_checkver': True}, datastore)
+            try:
+                with corpus_server(change_percent=args.change_percent) as server:
+                    results['end_to_end'] = run_end_to_end(datastore, update_q, server, watches=args.watches, rounds=args.rounds,
+                                                           page_types=tuple(args.page_types.split(',')))
+            finally:
+                app.config.exit.set()
+                datastore.stop_thread = True
+                worker_pool.shutdown_workers()
+
+        if not args.skip_micro:
+            results['micro'] = run_micro(scale=args.micro_scale)
+    finally:
+        shutil.rmtree(datastore_path, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(json.load(f), results)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
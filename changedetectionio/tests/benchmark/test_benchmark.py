@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+# Small run of the benchmark harness so it keeps working, the real numbers come from run.py
+
+import json
+
+from changedetectionio.tests.benchmark.corpus import available_page_types, corpus_server
+from changedetectionio.tests.benchmark.run import compare, run_end_to_end, run_micro
+
+
+def test_benchmark_harness(client, live_server, measure_memory_usage, datastore_path):
+    from changedetectionio.flask_app import update_q
+
+    datastore = client.application.config.get('DATASTORE')
+    watches = len(available_page_types())
+
+    with corpus_server() as server:
+        result = run_end_to_end(datastore, update_q, server, watches=watches, rounds=2, timeout=120)
+
+    assert result['checks'] == watches * 2
+    assert result['errors'] == 0, result['errors_by_page_type']
+    assert result['http_requests'] == watches * 2
+    assert result['checks_per_second'] > 0
+    assert result['phases']['total']['count'] == watches * 2
+    assert result['phases']['fetch']['p99_seconds'] >= result['phases']['fetch']['p50_seconds']
+    assert result['peak_rss_bytes'] > 0
+    assert result['datastore_bytes_added'] > 0
+    # The scheduler is left as it was
+    assert not datastore.data['settings']['application'].get('all_paused')
+
+    micro = run_micro(scale=0.05, store_watches=10)
+    assert micro['html_to_text_spa']['best_seconds'] > 0
+    assert micro['store_load']['watches'] == 10
+
+    results = json.loads(json.dumps({'end_to_end': result, 'micro': micro}))
+    lines = compare(results, results)
+    assert any(line.startswith('end_to_end.checks_per_second ') and line.endswith('+0.0%') for line in lines)
+
+
+def test_backend_benchmark_harness():
+    from changedetectionio.tests.benchmark.backends import run_backend_benchmark
+
+    result = run_backend_benchmark(watches=30, tags=3, history_entries=2, repeat=1)
+    # Both backends read back everything that was written and answer the same queries the same way
+    for name in ('file', 'sqlite'):
+        assert result[name]['load']['watches'] == 30
+        assert result[name]['history_load']['entries'] == 60
+        assert result[name]['query_errored']['matches'] == 5
+        assert result[name]['query_paused']['matches'] == 3
+        assert result[name]['query_tag']['matches'] == 10
+        assert result[name]['query_due']['matches'] == 12
+        assert result[name]['load']['best_seconds'] > 0
@@ -126,6 +126,14 @@ def pytest_runtest_makereport(item, call):
     setattr(item, f"rep_{rep.when}", rep)
 
 
+@pytest.fixture(autouse=True)
+def clear_llm_response_cache():
+    """The LLM response cache is process-wide, so a mocked completion from one test must not answer the next."""
+    from changedetectionio.llm.response_cache import get_response_cache
+    get_response_cache().clear()
+    yield
+
+
 @pytest.fixture
 def environment(mocker):
     """Mock arrow.now() to return a fixed datetime for testing jinja2 time extension."""
@@ -0,0 +1,155 @@
+"""
+Unit tests for changedetectionio/llm/response_cache.py
+
+Uses mocked LLM calls — no real API key needed.
+"""
+import threading
+import time
+from unittest.mock import patch
+
+from changedetectionio.llm.response_cache import LLMResponseCache, compute_response_cache_key, provider_key
+
+
+def _messages(system='sys', user='user'):
+    return [{'role': 'system', 'content': system}, {'role': 'user', 'content': user}]
+
+
+class TestCacheKey:
+    def test_same_prompt_same_key(self):
+        assert compute_response_cache_key('gpt-4o-mini', _messages()) == compute_response_cache_key('gpt-4o-mini', _messages())
+
+    def test_model_prompt_and_max_tokens_change_the_key(self):
+        base = compute_response_cache_key('gpt-4o-mini', _messages(), max_tokens=400)
+        assert base != compute_response_cache_key('gpt-4o', _messages(), max_tokens=400)
+        assert base != compute_response_cache_key('gpt-4o-mini', _messages(user='other'), max_tokens=400)
+        assert base != compute_response_cache_key('gpt-4o-mini', _messages(system='other'), max_tokens=400)
+        assert base != compute_response_cache_key('gpt-4o-mini', _messages(), max_tokens=800)
+
+    def test_thinking_budget_changes_the_key(self):
+        base = compute_response_cache_key('gemini/gemini-2.5-flash', _messages(), extra_body={'thinkingConfig': {'thinkingBudget': 1024}})
+        assert base != compute_response_cache_key('gemini/gemini-2.5-flash', _messages(), extra_body={'thinkingConfig': {'thinkingBudget': 4096}})
+        assert base != compute_response_cache_key('gemini/gemini-2.5-flash', _messages())
+        assert compute_response_cache_key('claude-x', _messages(), extra_body={}) == compute_response_cache_key('claude-x', _messages())
+        assert compute_response_cache_key('m', _messages(), extra_body={'a': 1, 'b': 2}) == \
+            compute_response_cache_key('m', _messages(), extra_body={'b': 2, 'a': 1})
+
+    def test_anthropic_cache_control_wrapper_is_transparent(self):
+        wrapped = [{'role': 'system', 'content': [{'type': 'text', 'text': 'sys', 'cache_control': {'type': 'ephemeral'}}]},
+                   {'role': 'user', 'content': 'user'}]
+        assert compute_response_cache_key('claude-x', wrapped) == compute_response_cache_key('claude-x', _messages())
+
+    def test_provider_key(self):
+        assert provider_key('gemini/gemini-2.0-flash') == 'gemini'
+        assert provider_key('gpt-4o-mini') == 'gpt-4o-mini'
+        assert provider_key('ollama/llama3', api_base='http://10.0.0.5:11434') == '10.0.0.5:11434'
+
+
+class TestLLMResponseCache:
+    def test_second_identical_call_is_served_from_cache(self):
+        cache = LLMResponseCache(ttl=60, max_entries=10)
+        with patch('changedetectionio.llm.client.completion', return_value=('answer', 100, 80, 20)) as mock_llm:
+            first = cache.completion(model='gpt-4o-mini', messages=_messages(), max_tokens=400)
+            second = cache.completion(model='gpt-4o-mini', messages=_messages(), max_tokens=400)
+            mock_llm.assert_called_once()
+
+        assert first == ('answer', 100, 80, 20)
+        # Nothing was spent on the cached answer
+        assert second == ('answer', 0, 0, 0)
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['tokens_saved'] == 100
+
+    def test_failures_and_empty_answers_are_not_cached(self):
+        cache = LLMResponseCache(ttl=60, max_entries=10)
+        with patch('changedetectionio.llm.client.completion', return_value=('', 10)) as mock_llm:
+            cache.completion(model='m', messages=_messages())
+            cache.completion(model='m', messages=_messages())
+            assert mock_llm.call_count == 2
+
+    def test_ttl_zero_disables_cache(self):
+        cache = LLMResponseCache(ttl=0, max_entries=10)
+        with patch('changedetectionio.llm.client.completion', return_value=('answer', 10)) as mock_llm:
+            cache.completion(model='m', messages=_messages())
+            cache.completion(model='m', messages=_messages())
+            assert mock_llm.call_count == 2
+
+    def test_lru_size_limit(self):
+        cache = LLMResponseCache(ttl=60, max_entries=2)
+        with patch('changedetectionio.llm.client.completion', return_value=('answer', 10)):
+            for user in ('a', 'b', 'c'):
+                cache.completion(model='m', messages=_messages(user=user))
+        assert cache.stats()['entries'] == 2
+
+    def test_concurrent_identical_requests_are_coalesced(self):
+        cache = LLMResponseCache(ttl=60, max_entries=10)
+        release = threading.Event()
+        calls = []
+
+        def _slow_completion(**kwargs):
+            calls.append(1)
+            release.wait(5)
+            return 'answer', 50, 40, 10
+
+        results = []
+        with patch('changedetectionio.llm.client.completion', side_effect=_slow_completion):
+            threads = [threading.Thread(target=lambda: results.append(cache.completion(model='m', messages=_messages())))
+                       for _ in range(4)]
+            for t in threads:
+                t.start()
+            # Let every thread reach the in-flight wait before the single real call returns
+            deadline = time.time() + 5
+            while cache.stats()['coalesced'] < 3 and time.time() < deadline:
+                time.sleep(0.01)
+            release.set()
+            for t in threads:
+                t.join(5)
+
+        assert len(calls) == 1
+        assert sorted(r[0] for r in results) == ['answer'] * 4
+        assert sum(r[1] for r in results) == 50
+
+    def test_in_flight_calls_are_bounded_per_provider(self):
+        cache = LLMResponseCache(ttl=0, max_entries=10, max_concurrent_per_provider=2)
+        lock = threading.Lock()
+        active = {'now': 0, 'peak': 0}
+
+        def _completion(**kwargs):
+            with lock:
+                active['now'] += 1
+                active['peak'] = max(active['peak'], active['now'])
+            time.sleep(0.05)
+            with lock:
+                active['now'] -= 1
+            return 'answer', 1
+
+        with patch('changedetectionio.llm.client.completion', side_effect=_completion):
+            threads = [threading.Thread(target=cache.completion, kwargs={'model': 'gemini/x', 'messages': _messages(user=str(i))})
+                       for i in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(5)
+
+        assert active['peak'] == 2
+
+
+class TestEvaluatorUsesSharedCache:
+    def test_identical_diff_on_two_watches_costs_one_call(self):
+        from changedetectionio.llm.evaluator import evaluate_change
+        from changedetectionio.tests.llm.test_evaluator import _make_datastore, _make_watch
+
+        ds = _make_datastore(llm_cfg={'model': 'gpt-4o-mini', 'api_key': 'sk-test'})
+        watch_a = _make_watch(llm_intent='flag price drops', uuid='watch-a')
+        watch_b = _make_watch(llm_intent='flag price drops', uuid='watch-b')
+        # Same vendor page on both watches
+        watch_b['url'] = watch_a['url']
+        watch_b['page_title'] = watch_a['page_title']
+
+        llm_response = '{"important": true, "summary": "Price dropped"}'
+        with patch('changedetectionio.llm.client.completion', return_value=(llm_response, 150)) as mock_llm:
+            result_a = evaluate_change(watch_a, ds, diff='- $500\n+ $400')
+            result_b = evaluate_change(watch_b, ds, diff='- $500\n+ $400')
+            mock_llm.assert_called_once()
+
+        assert result_a == result_b
+        assert watch_b['llm_last_tokens_used'] == 0